@@ -1,6 +1,9 @@
 from django.contrib import admin
-from .models import AgentConfig, Chat, Message
+from .models import AgentConfig, Chat, Message, InboundSMS, OutboundSMS, TurnMetrics
 
 admin.site.register(AgentConfig)
 admin.site.register(Chat)
 admin.site.register(Message)
+admin.site.register(InboundSMS)
+admin.site.register(OutboundSMS)
+admin.site.register(TurnMetrics)
@@ -0,0 +1,141 @@
+"""
+Per-process pool of LangChain agents, one per chat.
+
+Building a LangChainAgent loads the business, the chat and its whole history,
+renders the system prompt and creates the LLM client and tools. The pool keeps
+recently used agents so a chat's next message only appends the messages saved
+since its last turn (LangChainAgent.sync_messages).
+
+Agents are dropped least recently used first once AGENT_POOL_SIZE is reached,
+and rebuilt when Business.catalog_version moves on, i.e. when the business, its
+services, service items or AgentConfig change (see ai_agent.signals).
+
+A pooled agent is only used by one thread at a time: lease() holds the agent's
+lock for the whole turn, which also keeps two messages of one chat in order
+within a process.
+"""
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+
+from django.conf import settings
+
+from business.models import Business
+from core.tracing import get_tracer
+
+trace = get_tracer('agent')
+
+# Most agents kept per process
+AGENT_POOL_SIZE = getattr(settings, 'AGENT_POOL_SIZE', 200)
+
+
+def catalog_version(business_id):
+    """Return the business's current catalog version."""
+    return Business.objects.filter(id=business_id).values_list('catalog_version', flat=True).first()
+
+
+class PooledAgent:
+    """A pooled agent with the catalog version it was built for."""
+
+    def __init__(self, agent, version):
+        self.agent = agent
+        self.version = version
+        self.lock = threading.Lock()
+
+
+class AgentPool:
+    """
+    Bounded LRU pool of LangChainAgent instances keyed by chat ID.
+    """
+
+    def __init__(self, max_size=AGENT_POOL_SIZE):
+        self.max_size = max_size
+        # chat_id -> PooledAgent, least recently used first
+        self._entries = OrderedDict()
+        # (business_id, phone_number, session_key) -> chat_id
+        self._chat_ids = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def _build(self, business_id, phone_number=None, session_key=None, chat_id=None):
+        from .langchain_agent import LangChainAgent
+
+        return LangChainAgent(
+            business_id=business_id,
+            chat_id=chat_id,
+            phone_number=phone_number,
+            session_key=session_key
+        )
+
+    def _checkout(self, business_id, phone_number=None, session_key=None, chat_id=None):
+        """Return a fresh PooledAgent for the chat, building one on a miss."""
+        alias = (str(business_id), phone_number, session_key)
+        version = catalog_version(business_id)
+
+        with self._lock:
+            key = chat_id or self._chat_ids.get(alias)
+            entry = self._entries.get(key) if key else None
+            if entry is not None and entry.version == version:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry, True
+            self.misses += 1
+
+        # Build outside the pool lock, other chats keep being served meanwhile
+        agent = self._build(business_id, phone_number, session_key, chat_id)
+        # The version the agent's prompt was actually rendered from
+        version = agent.business.catalog_version
+        entry = PooledAgent(agent, version)
+
+        with self._lock:
+            current = self._entries.get(agent.chat.id)
+            if current is not None and current.version == version:
+                # Another thread built this chat's agent first
+                self._entries.move_to_end(agent.chat.id)
+                return current, True
+            self._entries[agent.chat.id] = entry
+            self._chat_ids[alias] = agent.chat.id
+            while len(self._entries) > self.max_size:
+                evicted_id, _ = self._entries.popitem(last=False)
+                self._chat_ids = {k: v for k, v in self._chat_ids.items() if v != evicted_id}
+                trace.debug("Evicted agent for chat {}", evicted_id)
+        return entry, False
+
+    @contextmanager
+    def lease(self, business_id, phone_number=None, session_key=None, chat_id=None):
+        """
+        Borrow the chat's agent for one turn.
+
+        Args:
+            business_id: ID of the business
+            phone_number: Optional phone number for SMS-based chats
+            session_key: Optional session key for web-based chats
+            chat_id: Optional chat ID to continue an existing conversation
+
+        Yields:
+            LangChainAgent: The chat's agent, caught up with the saved messages
+        """
+        entry, reused = self._checkout(business_id, phone_number, session_key, chat_id)
+        with entry.lock:
+            if reused:
+                entry.agent.sync_messages()
+            yield entry.agent
+
+    def discard(self, chat_id):
+        """Drop a chat's agent, e.g. when the chat is deleted."""
+        with self._lock:
+            self._entries.pop(chat_id, None)
+            self._chat_ids = {k: v for k, v in self._chat_ids.items() if v != chat_id}
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._chat_ids.clear()
+            self.hits = self.misses = 0
+
+
+agent_pool = AgentPool()
@@ -2,7 +2,6 @@ from langchain.tools import BaseTool
 from pydantic import BaseModel
 from typing import Optional, List, Dict, Any, Type, Annotated
 from datetime import datetime, timedelta
-import pytz
 from django.utils import timezone
 from django.db.models import Q
 from .inputs import CheckAvailabilityInput, BookAppointmentInput, RescheduleAppointmentInput, CancelAppointmentInput, GetServiceItemsInput
@@ -11,7 +10,13 @@ from bookings.models import Booking, BookingStatus, StaffAvailability, StaffMemb
 from business.models import Business, ServiceOffering, ServiceItem, ServiceOfferingItem
 from leads.models import Lead
 from bookings.availability import check_timeslot_availability, find_available_slots_on_date, is_staff_available
+from bookings.reservations import reserve_booking, SlotUnavailable
+from bookings.assignment import get_strategy
+from .turn_cache import check_slot, find_slots, get_business, get_service, get_service_item, invalidate
 from decimal import Decimal
+from core.tracing import get_tracer
+
+trace = get_tracer('agent.tools')
 
 
 class CheckAvailabilityTool(BaseTool):
@@ -23,129 +28,109 @@ class CheckAvailabilityTool(BaseTool):
              service_name: Optional[str] = None, business_id: str = None,
              duration_minutes: Optional[int] = None) -> str:
         try:
-            print(f"[DEBUG] CheckAvailabilityTool called with: date={date}, time={time}, service_name={service_name}, business_id={business_id}, duration_minutes={duration_minutes}")
+            trace.debug("CheckAvailabilityTool called with: date={}, time={}, service_name={}, business_id={}, duration_minutes={}", date, time, service_name, business_id, duration_minutes)
             
             # Get the business
             try:
                 # Try to get by ID first
                 try:
                     # Check if business_id is a valid ID
-                    print(f"[DEBUG] Attempting to find business with ID: {business_id}")
-                    business = Business.objects.get(id=business_id)
-                    print(f"[DEBUG] Found business by ID: {business.name}")
+                    trace.debug("Attempting to find business with ID: {}", business_id)
+                    business = get_business(business_id)
+                    trace.debug("Found business by ID: {}", business.name)
                 except (Business.DoesNotExist) as e:
-                    print(f"[DEBUG] Business not found with ID: {str(e)}")
+                    trace.debug("Business not found with ID: {}", e)
                     # If not found by ID, try to find by name
-                    print(f"[DEBUG] Trying to find business by name: {business_id}")
+                    trace.debug("Trying to find business by name: {}", business_id)
                     business = Business.objects.filter(name__iexact=business_id).first()
                     if not business:
-                        print(f"[DEBUG] Business with name '{business_id}' not found")
+                        trace.debug("Business with name '{}' not found", business_id)
                         return f"Business with name '{business_id}' not found. Please use a valid business ID."
-                    print(f"[DEBUG] Found business by name: {business.name} (ID: {business.id})")
+                    trace.debug("Found business by name: {} (ID: {})", business.name, business.id)
             except Exception as e:
-                print(f"[DEBUG] Error finding business: {str(e)}")
+                trace.error("Error finding business: {}", e)
                 return f"Error finding business: {str(e)}"
             
             # Parse the date
             try:
-                print(f"[DEBUG] Parsing date: {date}")
+                trace.debug("Parsing date: {}", date)
                 date_obj = datetime.strptime(date, '%Y-%m-%d').date()
-                print(f"[DEBUG] Parsed date: {date_obj}")
+                trace.debug("Parsed date: {}", date_obj)
                 
                 # Check if date is in the past
-                today = timezone.now().date()
-                print(f"[DEBUG] Today's date: {today}")
+                today = timezone.localdate(timezone=business.tzinfo)
+                trace.debug("Today's date: {}", today)
                 if date_obj < today:
-                    print(f"[DEBUG] Date {date} is in the past")
+                    trace.debug("Date {} is in the past", date)
                     return f"The date {date} is in the past. Please select a current or future date."
                 
             except ValueError as e:
-                print(f"[DEBUG] Invalid date format: {date}, error: {str(e)}")
+                trace.debug("Invalid date format: {}, error: {}", date, e)
                 return f"Invalid date format: {date}. Please use YYYY-MM-DD format."
             
             # If time is provided, check specific time slot
             if time:
                 try:
-                    print(f"[DEBUG] Parsing time: {time}")
+                    trace.debug("Parsing time: {}", time)
                     # Parse the time
                     time_obj = datetime.strptime(time, '%H:%M').time()
-                    print(f"[DEBUG] Parsed time: {time_obj}")
+                    trace.debug("Parsed time: {}", time_obj)
                     
                     # Get service if provided
                     service = None
                     if service_name:
                         try:
-                            print(f"[DEBUG] Looking for service: {service_name}")
-                            service = ServiceOffering.objects.get(
-                                business=business,
-                                name__iexact=service_name,
-                                is_active=True
-                            )
-                            print(f"[DEBUG] Found service: {service.name} (ID: {service.id})")
+                            trace.debug("Looking for service: {}", service_name)
+                            service = get_service(business, service_name)
+                            trace.debug("Found service: {} (ID: {})", service.name, service.id)
                             # Use service duration if no duration provided
                             if not duration_minutes:
                                 duration_minutes = service.duration
-                                print(f"[DEBUG] Using service duration: {duration_minutes} minutes")
+                                trace.debug("Using service duration: {} minutes", duration_minutes)
                         except ServiceOffering.DoesNotExist:
-                            print(f"[DEBUG] Service '{service_name}' not found")
+                            trace.debug("Service '{}' not found", service_name)
                             return f"Service '{service_name}' not found for business '{business.name}'."
                     
                     # Use default duration if not specified
                     if not duration_minutes:
                         duration_minutes = 60  # Default duration
-                        print(f"[DEBUG] Using default duration: {duration_minutes} minutes")
+                        trace.debug("Using default duration: {} minutes", duration_minutes)
                     
                     # Create datetime object for the appointment
-                    # Use UTC timezone as default since the Business model doesn't have a timezone field
-                    print(f"[DEBUG] Using default timezone: UTC")
-                    tz = pytz.UTC
-                    appointment_datetime = tz.localize(
-                        datetime.combine(date_obj, time_obj)
+                    # Times given to the agent are wall time in the business timezone
+                    appointment_datetime = timezone.make_aware(
+                        datetime.combine(date_obj, time_obj), business.tzinfo
                     )
-                    print(f"[DEBUG] Appointment datetime: {appointment_datetime}")
+                    trace.debug("Appointment datetime: {}", appointment_datetime)
                     
                     # Check if the time is in the past
                     now = timezone.now()
-                    print(f"[DEBUG] Current time: {now}")
+                    trace.debug("Current time: {}", now)
                     if appointment_datetime < now:
-                        print(f"[DEBUG] Time {time} on {date} is in the past")
+                        trace.debug("Time {} on {} is in the past", time, date)
                         return f"The time {time} on {date} is in the past. Please select a current or future time."
                     
                     # Check availability
-                    print(f"[DEBUG] Checking availability with check_timeslot_availability")
-                    print(f"[DEBUG] Parameters: business={business.id}, start_time={appointment_datetime}, duration_minutes={duration_minutes}, service={service.id if service else None}")
+                    trace.debug("Checking availability with check_timeslot_availability")
+                    trace.debug("Parameters: business={}, start_time={}, duration_minutes={}, service={}", business.id, appointment_datetime, duration_minutes, service.id if service else None)
                     
                     try:
-                        is_available, reason, _ = check_timeslot_availability(
-                            business=business,
-                            start_time=appointment_datetime,
-                            duration_minutes=duration_minutes,
-                            service=service
-                        )
-                        print(f"[DEBUG] Availability result: is_available={is_available}, reason={reason}")
+                        is_available, reason, _ = check_slot(business, appointment_datetime, duration_minutes, service)
+                        trace.debug("Availability result: is_available={}, reason={}", is_available, reason)
                     except Exception as e:
-                        import traceback
-                        print(f"[DEBUG] Error in check_timeslot_availability: {str(e)}")
-                        print(f"[DEBUG] Traceback: {traceback.format_exc()}")
+                        trace.error("Error in check_timeslot_availability: {}", e, exc_info=True)
                         raise
                     
                     if is_available:
                         return f"The time slot at {time} on {date} is available for booking."
                     else:
                         # Find alternative slots
-                        print(f"[DEBUG] Finding alternative slots with find_available_slots_on_date")
+                        trace.debug("Finding alternative slots with find_available_slots_on_date")
                         try:
-                            alternative_slots = find_available_slots_on_date(
-                                business_id=str(business.id),
-                                date=date_obj,
-                                duration_minutes=duration_minutes,
-                                service_offering_id=str(service.id) if service else None
-                            )
-                            print(f"[DEBUG] Found {len(alternative_slots)} alternative slots")
+                            alternative_slots = find_slots(business, date_obj, duration_minutes, service)
+                            trace.debug("Found {} alternative slots", len(alternative_slots))
                         except Exception as e:
-                            import traceback
-                            print(f"[DEBUG] Error in find_available_slots_on_date: {str(e)}")
-                            print(f"[DEBUG] Traceback: {traceback.format_exc()}")
+                            trace.error("Error in find_available_slots_on_date: {}", e, exc_info=True)
                             raise
                         
                         if alternative_slots:
@@ -161,7 +146,7 @@ class CheckAvailabilityTool(BaseTool):
                             return f"The time slot at {time} on {date} is not available. Reason: {reason}. There are no alternative times available on this date."
                 
                 except ValueError as e:
-                    print(f"[DEBUG] Invalid time format: {time}, error: {str(e)}")
+                    trace.debug("Invalid time format: {}, error: {}", time, e)
                     return f"Invalid time format: {time}. Please use HH:MM format."
             
             # If no time provided, find all available slots for the date
@@ -170,11 +155,7 @@ class CheckAvailabilityTool(BaseTool):
                 service = None
                 if service_name:
                     try:
-                        service = ServiceOffering.objects.get(
-                            business=business,
-                            name__iexact=service_name,
-                            is_active=True
-                        )
+                        service = get_service(business, service_name)
                         # Use service duration if no duration provided
                         if not duration_minutes:
                             duration_minutes = service.duration
@@ -186,12 +167,7 @@ class CheckAvailabilityTool(BaseTool):
                     duration_minutes = 60  # Default duration
                 
                 # Find available slots
-                available_slots = find_available_slots_on_date(
-                    business_id=str(business.id),
-                    date=date_obj,
-                    duration_minutes=duration_minutes,
-                    service_offering_id=str(service.id) if service else None
-                )
+                available_slots = find_slots(business, date_obj, duration_minutes, service)
                 
                 if available_slots:
                     # Handle different return formats
@@ -207,8 +183,7 @@ class CheckAvailabilityTool(BaseTool):
         
         except Exception as e:
             import traceback
-            print(f"[DEBUG] Error in CheckAvailabilityTool: {str(e)}")
-            print(f"[DEBUG] Traceback: {traceback.format_exc()}")
+            trace.error("Error in CheckAvailabilityTool: {}", e, exc_info=True)
             return f"An error occurred while checking availability: {str(e)}\n{traceback.format_exc()}"
 
 
@@ -222,13 +197,13 @@ class BookAppointmentTool(BaseTool):
              service_items: Optional[List[Dict[str, Any]]] = None,
              notes: Optional[str] = None) -> str:
         try:
-            print(f"[DEBUG] BookAppointmentTool called with: date={date}, time={time}, service_name={service_name}, business_id={business_id}, customer_name={customer_name}, customer_phone={customer_phone}, customer_email={customer_email}, service_items={service_items}, notes={notes}")
+            trace.debug("BookAppointmentTool called with: date={}, time={}, service_name={}, business_id={}, customer_name={}, customer_phone={}, customer_email={}, service_items={}, notes={}", date, time, service_name, business_id, customer_name, customer_phone, customer_email, service_items, notes)
             
             # Get the business
             try:
-                business = Business.objects.get(id=business_id)
+                business = get_business(business_id)
             except Business.DoesNotExist:
-                print(f"[DEBUG] Business with ID {business_id} not found")
+                trace.debug("Business with ID {} not found", business_id)
                 return f"Business with ID {business_id} not found."
             
             # Parse the date and time
@@ -237,26 +212,24 @@ class BookAppointmentTool(BaseTool):
                 time_obj = datetime.strptime(time, '%H:%M').time()
                 
                 # Check if date is in the past
-                today = timezone.now().date()
-                print(f"[DEBUG] Today's date: {today}")
+                today = timezone.localdate(timezone=business.tzinfo)
+                trace.debug("Today's date: {}", today)
                 if date_obj < today:
-                    print(f"[DEBUG] Date {date} is in the past")
+                    trace.debug("Date {} is in the past", date)
                     return f"The date {date} is in the past. Please select a current or future date."
                 
                 # Create datetime object for the appointment
-                # Use UTC timezone as default since the Business model doesn't have a timezone field
-                print(f"[DEBUG] Using default timezone: UTC")
-                tz = pytz.UTC
-                appointment_datetime = tz.localize(
-                    datetime.combine(date_obj, time_obj)
+                # Times given to the agent are wall time in the business timezone
+                appointment_datetime = timezone.make_aware(
+                    datetime.combine(date_obj, time_obj), business.tzinfo
                 )
-                print(f"[DEBUG] Appointment datetime: {appointment_datetime}")
+                trace.debug("Appointment datetime: {}", appointment_datetime)
                 
                 # Check if the time is in the past
                 now = timezone.now()
-                print(f"[DEBUG] Current time: {now}")
+                trace.debug("Current time: {}", now)
                 if appointment_datetime < now:
-                    print(f"[DEBUG] Time {time} on {date} is in the past")
+                    trace.debug("Time {} on {} is in the past", time, date)
                     return f"The time {time} on {date} is in the past. Please select a current or future time."
                 
             except ValueError as e:
@@ -267,21 +240,17 @@ class BookAppointmentTool(BaseTool):
             
             # Get the service
             try:
-                print(f"[DEBUG] Looking for service: {service_name}")
-                service = ServiceOffering.objects.get(
-                    business=business,
-                    name__iexact=service_name,
-                    is_active=True
-                )
-                print(f"[DEBUG] Found service: {service.name} (ID: {service.id})")
+                trace.debug("Looking for service: {}", service_name)
+                service = get_service(business, service_name)
+                trace.debug("Found service: {} (ID: {})", service.name, service.id)
             except ServiceOffering.DoesNotExist:
-                print(f"[DEBUG] Service '{service_name}' not found")
+                trace.debug("Service '{}' not found", service_name)
                 return f"Service '{service_name}' not found for business '{business.name}'."
             
             # Calculate total duration including service items if provided
             total_duration = service.duration
             if service_items:
-                print(f"[DEBUG] Pre-calculating duration with service items for availability check")
+                trace.debug("Pre-calculating duration with service items for availability check")
                 for item in service_items:
                     try:
                         identifier = item.get('identifier')
@@ -289,11 +258,7 @@ class BookAppointmentTool(BaseTool):
                         quantity = int(item.get('quantity', 1))
                         
                         # Find service item
-                        service_item = ServiceItem.objects.filter(
-                            business=business,
-                            identifier__iexact=identifier,
-                            is_active=True
-                        ).first()
+                        service_item = get_service_item(business, identifier)
                         
                         if service_item:
                             # For number fields, use value as quantity
@@ -302,45 +267,31 @@ class BookAppointmentTool(BaseTool):
                             
                             # Add duration
                             total_duration += service_item.duration_minutes * quantity
-                            print(f"[DEBUG] Added {service_item.duration_minutes * quantity} minutes for {service_item.name}")
+                            trace.debug("Added {} minutes for {}", service_item.duration_minutes * quantity, service_item.name)
                     except Exception as e:
-                        print(f"[DEBUG] Error calculating duration for item: {str(e)}")
+                        trace.error("Error calculating duration for item: {}", e)
                         continue
             
-            print(f"[DEBUG] Total duration for availability check: {total_duration} minutes")
+            trace.debug("Total duration for availability check: {} minutes", total_duration)
             
             # Check availability with total duration
-            print(f"[DEBUG] Checking availability with check_timeslot_availability")
+            trace.debug("Checking availability with check_timeslot_availability")
             try:
-                is_available, reason, _available_staff = check_timeslot_availability(
-                    business=business,
-                    start_time=appointment_datetime,
-                    duration_minutes=total_duration,
-                    service=service
-                )
-                print(f"[DEBUG] Availability result: is_available={is_available}, reason={reason}")
+                is_available, reason, _available_staff = check_slot(business, appointment_datetime, total_duration, service)
+                trace.debug("Availability result: is_available={}, reason={}", is_available, reason)
             except Exception as e:
-                import traceback
-                print(f"[DEBUG] Error in check_timeslot_availability: {str(e)}")
-                print(f"[DEBUG] Traceback: {traceback.format_exc()}")
+                trace.error("Error in check_timeslot_availability: {}", e, exc_info=True)
                 return f"Error checking availability: {str(e)}"
             
             if not is_available:
                 # Find alternative slots
-                print(f"[DEBUG] Time slot not available, finding alternatives")
-                print(f"[DEBUG] Finding alternative slots with find_available_slots_on_date")
+                trace.debug("Time slot not available, finding alternatives")
+                trace.debug("Finding alternative slots with find_available_slots_on_date")
                 try:
-                    alternative_slots = find_available_slots_on_date(
-                        business_id=str(business.id),
-                        date=date_obj,
-                        duration_minutes=total_duration,
-                        service_offering_id=str(service.id) if service else None
-                    )
-                    print(f"[DEBUG] Found {len(alternative_slots)} alternative slots")
+                    alternative_slots = find_slots(business, date_obj, total_duration, service)
+                    trace.debug("Found {} alternative slots", len(alternative_slots))
                 except Exception as e:
-                    import traceback
-                    print(f"[DEBUG] Error in find_available_slots_on_date: {str(e)}")
-                    print(f"[DEBUG] Traceback: {traceback.format_exc()}")
+                    trace.error("Error in find_available_slots_on_date: {}", e, exc_info=True)
                     return f"Error finding alternative slots: {str(e)}"
                 
                 if alternative_slots:
@@ -357,7 +308,7 @@ class BookAppointmentTool(BaseTool):
             
             # Find or create lead
             try:
-                print(f"[DEBUG] Finding or creating lead with phone: {customer_phone}")
+                trace.debug("Finding or creating lead with phone: {}", customer_phone)
                 
                 # Split customer name into first and last name
                 name_parts = customer_name.split(' ', 1)
@@ -369,16 +320,16 @@ class BookAppointmentTool(BaseTool):
                     defaults={
                         'first_name': first_name,
                         'last_name': last_name,
-                        'email': customer_email,
+                        'email': customer_email or '',
                         'business': business,
                         'source': 'ai_agent'
                     }
                 )
                 
                 if created:
-                    print(f"[DEBUG] Created new lead: {lead.id}")
+                    trace.debug("Created new lead: {}", lead.id)
                 else:
-                    print(f"[DEBUG] Found existing lead: {lead.id}")
+                    trace.debug("Found existing lead: {}", lead.id)
                 
                 # If lead exists but some fields are empty, update them
                 if not created:
@@ -395,99 +346,60 @@ class BookAppointmentTool(BaseTool):
                     
                     if updated_fields:
                         lead.save(update_fields=updated_fields)
-                        print(f"[DEBUG] Updated lead fields: {updated_fields}")
+                        trace.debug("Updated lead fields: {}", updated_fields)
             except Exception as e:
-                import traceback
-                print(f"[DEBUG] Error finding/creating lead: {str(e)}")
-                print(f"[DEBUG] Traceback: {traceback.format_exc()}")
+                trace.error("Error finding/creating lead: {}", e, exc_info=True)
                 return f"Error creating customer record: {str(e)}"
             
-            # Final availability check right before creating booking (to prevent race conditions)
-            print(f"[DEBUG] Final availability check before creating booking")
-            try:
-                is_available_final, reason_final, _available_staff_final = check_timeslot_availability(
-                    business=business,
-                    start_time=appointment_datetime,
-                    duration_minutes=total_duration,
-                    service=service
-                )
-                
-                if not is_available_final:
-                    print(f"[DEBUG] Final check failed - time slot no longer available")
-                    return f"❌ Sorry, this time slot was just booked by someone else. Reason: {reason_final}\n\nPlease select a different time."
-                    
-                print(f"[DEBUG] Final availability check passed")
-            except Exception as e:
-                import traceback
-                print(f"[DEBUG] Error in final availability check: {str(e)}")
-                print(f"[DEBUG] Traceback: {traceback.format_exc()}")
-                # Continue anyway - don't block booking on check error
-            
-            # Create the booking
+            # Re-check the slot and create the booking with its staff assignment atomically
             try:
-                print(f"[DEBUG] Creating booking")
-                booking = Booking.objects.create(
-                    business=business,
-                    lead=lead,
+                trace.debug("Reserving booking")
+                booking, assigned_staff = reserve_booking(
+                    business,
+                    date_obj,
+                    time_obj,
+                    (datetime.combine(date_obj, time_obj) + timedelta(minutes=total_duration)).time(),
                     service_offering=service,
+                    lead=lead,
                     name=customer_name,
                     email=customer_email or '',
                     phone_number=customer_phone,
-                    booking_date=date_obj,
-                    start_time=time_obj,
-                    end_time=(datetime.combine(date_obj, time_obj) + timedelta(minutes=service.duration)).time(),
                     status=BookingStatus.CONFIRMED,
                     notes=notes or ''
                 )
-                print(f"[DEBUG] Created booking: {booking.id}")
-                
+                staff_name = assigned_staff.get_full_name()
+                trace.debug("Created booking: {}, assigned staff: {}", booking.id, staff_name)
+                invalidate('availability')
+            except SlotUnavailable as e:
+                trace.debug("Reservation failed - time slot no longer available: {}", e.reason)
+                invalidate('availability')
+                if e.alternate_slots:
+                    alt_slots_str = ", ".join(f"{slot['date']} {slot['time']}" for slot in e.alternate_slots)
+                    return f"❌ Sorry, this time slot was just booked by someone else. Reason: {e.reason}\n\nAlternative available times: {alt_slots_str}\n\nPlease select a different time."
+                return f"❌ Sorry, this time slot was just booked by someone else. Reason: {e.reason}\n\nPlease select a different time."
+
+            try:
                 # Add service items to the booking
                 total_extra_duration = 0
                 total_extra_price = Decimal('0.00')
                 
                 if service_items:
-                    print(f"[DEBUG] Processing service items: {service_items}")
+                    trace.debug("Processing service items: {}", service_items)
                     for item in service_items:
                         try:
                             identifier = item.get('identifier')
                             value = item.get('value')
                             quantity = int(item.get('quantity', 1))
                             
-                            print(f"[DEBUG] Processing item: identifier={identifier}, value={value}, quantity={quantity}")
+                            trace.debug("Processing item: identifier={}, value={}, quantity={}", identifier, value, quantity)
                             
-                            # Find service item by identifier
-                            service_item = None
-                            try:
-                                # Try exact match first
-                                service_item = ServiceItem.objects.get(
-                                    business=business,
-                                    identifier=identifier,
-                                    is_active=True
-                                )
-                                print(f"[DEBUG] Found service item by exact identifier: {service_item.name} (ID: {service_item.id}, field_type: {service_item.field_type})")
-                            except ServiceItem.DoesNotExist:
-                                # Try case-insensitive match
-                                service_item = ServiceItem.objects.filter(
-                                    business=business,
-                                    identifier__iexact=identifier,
-                                    is_active=True
-                                ).first()
-                                
-                                if service_item:
-                                    print(f"[DEBUG] Found service item by case-insensitive identifier: {service_item.name} (ID: {service_item.id})")
-                                else:
-                                    # Try name match
-                                    service_item = ServiceItem.objects.filter(
-                                        business=business,
-                                        name__iexact=identifier,
-                                        is_active=True
-                                    ).first()
-                                    
-                                    if service_item:
-                                        print(f"[DEBUG] Found service item by name: {service_item.name} (ID: {service_item.id})")
-                                    else:
-                                        print(f"[DEBUG] Service item '{identifier}' not found")
-                                        continue
+                            # Find service item by identifier, then by name
+                            service_item = get_service_item(business, identifier)
+                            if service_item:
+                                trace.debug("Found service item: {} (ID: {}, field_type: {})", service_item.name, service_item.id, service_item.field_type)
+                            else:
+                                trace.debug("Service item '{}' not found", identifier)
+                                continue
                             
                             if service_item:
                                 # Prepare the data for BookingServiceItem
@@ -535,7 +447,7 @@ class BookAppointmentTool(BaseTool):
                                 item_price = service_item.calculate_price(service.price, quantity, selected_value)
                                 booking_item_data['price_at_booking'] = item_price
                                 
-                                print(f"[DEBUG] Calculated price for {service_item.name}: ${item_price} (field_type: {service_item.field_type}, selected_value: {selected_value}, quantity: {quantity})")
+                                trace.debug("Calculated price for {}: ${} (field_type: {}, selected_value: {}, quantity: {})", service_item.name, item_price, service_item.field_type, selected_value, quantity)
                                 
                                 # Create the BookingServiceItem
                                 booking_service_item = BookingServiceItem.objects.create(**booking_item_data)
@@ -544,78 +456,25 @@ class BookAppointmentTool(BaseTool):
                                 total_extra_duration += service_item.duration_minutes * quantity
                                 total_extra_price += item_price
                                 
-                                print(f"[DEBUG] Created booking service item: {booking_service_item.id}, Price: {item_price}, Extra Duration: {service_item.duration_minutes * quantity} minutes")
+                                trace.debug("Created booking service item: {}, Price: {}, Extra Duration: {} minutes", booking_service_item.id, item_price, service_item.duration_minutes * quantity)
                         except Exception as e:
-                            import traceback
-                            print(f"[DEBUG] Error creating booking service item: {str(e)}")
-                            print(f"[DEBUG] Traceback: {traceback.format_exc()}")
+                            trace.error("Error creating booking service item: {}", e, exc_info=True)
                             continue
                 else:
                     # Just add the main service without any additional service items
-                    print(f"[DEBUG] No service items provided, just using the main service")
+                    trace.debug("No service items provided, just using the main service")
                     
                     # No additional service items, so no extra duration or price
                     pass
                 
-                # Update booking end time if there's extra duration
-                if total_extra_duration > 0:
-                    new_end_time = (datetime.combine(date_obj, time_obj) + 
-                                   timedelta(minutes=service.duration + total_extra_duration)).time()
+                # Update booking end time if the saved items add up to a different duration than reserved
+                new_end_time = (datetime.combine(date_obj, time_obj) + 
+                               timedelta(minutes=service.duration + total_extra_duration)).time()
+                if new_end_time != booking.end_time:
                     booking.end_time = new_end_time
                     booking.save(update_fields=['end_time'])
-                    print(f"[DEBUG] Updated booking end time to include extra duration: {new_end_time}")
+                    trace.debug("Updated booking end time to include extra duration: {}", new_end_time)
                 
-                # Assign staff members based on availability
-                try:
-                    print(f"[DEBUG] Finding available staff")
-                    
-                    # Get all staff for this business
-                    all_staff = StaffMember.objects.filter(
-                        business=business,
-                        is_active=True
-                    )
-                    
-                    print(f"[DEBUG] Total staff members: {all_staff.count()}")
-                    
-                    # Check availability for each staff member
-                    available_staff = []
-                    for staff in all_staff:
-                        # Use the is_staff_available function from availability.py
-                        from bookings.availability import is_staff_available
-                        if is_staff_available(staff, date_obj, time_obj, booking.end_time):
-                            available_staff.append(staff)
-                            print(f"[DEBUG] Staff {staff.id} is available")
-                    
-                    print(f"[DEBUG] Found {len(available_staff)} available staff members")
-                    
-                    if available_staff:
-                        # Assign the first available staff member
-                        staff = available_staff[0]
-                        BookingStaffAssignment.objects.create(
-                            booking=booking,
-                            staff_member=staff
-                        )
-                        staff_name = staff.get_full_name()
-                        print(f"[DEBUG] Assigned staff: {staff_name}")
-                    else:
-                        # If no staff is available, assign the first staff member anyway
-                        if all_staff.exists():
-                            staff = all_staff.first()
-                            BookingStaffAssignment.objects.create(
-                                booking=booking,
-                                staff_member=staff
-                            )
-                            staff_name = staff.get_full_name()
-                            print(f"[DEBUG] No available staff found, assigned first staff: {staff_name}")
-                        else:
-                            staff_name = "No staff assigned yet"
-                            print(f"[DEBUG] No staff assigned")
-                except Exception as e:
-                    import traceback
-                    print(f"[DEBUG] Error assigning staff: {str(e)}")
-                    print(f"[DEBUG] Traceback: {traceback.format_exc()}")
-                    staff_name = "No staff assigned yet"
-            
                 # Create a natural response with booking details
                 # Calculate totals
                 total_price = service.price
@@ -656,15 +515,11 @@ class BookAppointmentTool(BaseTool):
                 return response
             
             except Exception as e:
-                import traceback
-                print(f"[DEBUG] Error in BookAppointmentTool: {str(e)}")
-                print(f"[DEBUG] Traceback: {traceback.format_exc()}")
+                trace.error("Error in BookAppointmentTool: {}", e, exc_info=True)
                 return f"An error occurred while booking the appointment: {str(e)}"
             
         except Exception as e:
-            import traceback
-            print(f"[DEBUG] Error in BookAppointmentTool: {str(e)}")
-            print(f"[DEBUG] Traceback: {traceback.format_exc()}")
+            trace.error("Error in BookAppointmentTool: {}", e, exc_info=True)
             return f"An error occurred while booking the appointment: {str(e)}"
 
 
@@ -684,7 +539,7 @@ class RescheduleAppointmentTool(BaseTool):
             
             # Get the business
             try:
-                business = Business.objects.get(id=business_id)
+                business = get_business(business_id)
             except Business.DoesNotExist:
                 return f"Business with ID {business_id} not found."
             
@@ -705,28 +560,19 @@ class RescheduleAppointmentTool(BaseTool):
             # Check availability using the existing function
             try:
                 # Create a datetime object for the new appointment time
-                tz = pytz.UTC
-                new_appointment_datetime = tz.localize(
-                    datetime.combine(new_booking_date, new_booking_time)
+                new_appointment_datetime = timezone.make_aware(
+                    datetime.combine(new_booking_date, new_booking_time), business.tzinfo
                 )
                 
                 # Check availability
-                is_available, reason, _available_staff = check_timeslot_availability(
-                    business=business,
-                    start_time=new_appointment_datetime,
-                    duration_minutes=duration_minutes,
-                    service=service_offering
+                is_available, reason, _available_staff = check_slot(
+                    business, new_appointment_datetime, duration_minutes, service_offering
                 )
                 
                 if not is_available:
                     # Find alternative slots
                     try:
-                        alternative_slots = find_available_slots_on_date(
-                            business_id=str(business.id),
-                            date=new_booking_date,
-                            duration_minutes=duration_minutes,
-                            service_offering_id=str(service_offering.id) if service_offering else None
-                        )
+                        alternative_slots = find_slots(business, new_booking_date, duration_minutes, service_offering)
                         
                         if alternative_slots:
                             alt_slots_text = ", ".join([f"{slot['time']}" for slot in alternative_slots[:3]])
@@ -734,10 +580,10 @@ class RescheduleAppointmentTool(BaseTool):
                         else:
                             return f"Cannot reschedule to {new_date} at {new_time}. Reason: {reason}. No alternative times available on this date."
                     except Exception as e:
-                        print(f"[DEBUG] Error finding alternative slots: {str(e)}")
+                        trace.error("Error finding alternative slots: {}", e)
                         return f"Cannot reschedule to {new_date} at {new_time}. Reason: {reason}."
             except Exception as e:
-                print(f"[DEBUG] Error checking availability: {str(e)}")
+                trace.error("Error checking availability: {}", e)
                 return f"Error checking availability for the new time: {str(e)}"
             
             # Calculate new end time
@@ -751,6 +597,7 @@ class RescheduleAppointmentTool(BaseTool):
             booking.end_time = new_booking_end_time
             booking.status = BookingStatus.RESCHEDULED
             booking.save()
+            invalidate('availability')
             
             # Get available staff
             available_staff = StaffMember.objects.filter(
@@ -759,11 +606,9 @@ class RescheduleAppointmentTool(BaseTool):
             ).exclude(
                 # Exclude staff with conflicting bookings
                 id__in=BookingStaffAssignment.objects.filter(
-                    booking__start_time__lt=end_datetime.time(),
-                    booking__end_time__gt=new_booking_time,
-                    booking__booking_date=new_booking_date,
-                    booking__status__in=[BookingStatus.CONFIRMED, BookingStatus.PENDING, BookingStatus.RESCHEDULED]
-                ).values_list('staff_member_id', flat=True)
+                    start_at__lt=booking.end_at,
+                    end_at__gt=booking.start_at
+                ).exclude(booking=booking).values_list('staff_member_id', flat=True)
             ).exclude(
                 # Exclude staff with unavailability records (off days)
                 id__in=StaffAvailability.objects.filter(
@@ -783,9 +628,12 @@ class RescheduleAppointmentTool(BaseTool):
                 # Clear existing staff assignments
                 current_staff_assignments.delete()
                 
-                # Assign new staff
-                if available_staff.exists():
-                    staff = available_staff.first()
+                # Assign new staff, in the order the business's assignment strategy ranked them
+                if available_staff_ids:
+                    ranked_ids = [member['id'] for member in _available_staff if member['id'] in available_staff_ids]
+                    staff_id = ranked_ids[0] if ranked_ids else sorted(available_staff_ids)[0]
+                    staff = next(staff for staff in available_staff if staff.id == staff_id)
+                    get_strategy(business.id).assigned(business.id, staff.id)
                     
                     # Create staff assignment
                     BookingStaffAssignment.objects.create(
@@ -794,7 +642,7 @@ class RescheduleAppointmentTool(BaseTool):
                     )
                     
                     staff_name = staff.get_full_name()
-                    print(f"[DEBUG] Assigned new staff: {staff_name}")
+                    trace.debug("Assigned new staff: {}", staff_name)
             
             return f"Appointment rescheduled successfully to {new_date} at {new_time}. Booking ID: {booking.id}"
             
@@ -809,42 +657,41 @@ class CancelAppointmentTool(BaseTool):
     
     def _run(self, booking_id: str, business_id: str, reason: Optional[str] = None) -> str:
         try:
-            print(f"[DEBUG] CancelAppointmentTool called with: booking_id={booking_id}, business_id={business_id}, reason={reason}")
+            trace.debug("CancelAppointmentTool called with: booking_id={}, business_id={}, reason={}", booking_id, business_id, reason)
             
             # Get the business
             try:
-                business = Business.objects.get(id=business_id)
+                business = get_business(business_id)
                 
             except Business.DoesNotExist:
-                print(f"[DEBUG] Business with ID {business_id} not found")
+                trace.debug("Business with ID {} not found", business_id)
                 return f"Business with ID {business_id} not found."
             
             # Get the booking
             try:
-                print(f"[DEBUG] Looking for booking with ID: {booking_id}")
+                trace.debug("Looking for booking with ID: {}", booking_id)
                 booking = Booking.objects.get(id=booking_id, business=business)
-                print(f"[DEBUG] Found booking: {booking.id}")
+                trace.debug("Found booking: {}", booking.id)
             except Booking.DoesNotExist:
-                print(f"[DEBUG] Booking with ID {booking_id} not found")
+                trace.debug("Booking with ID {} not found", booking_id)
                 return f"Booking with ID {booking_id} not found for business {business.name}."
             
             # Check if booking is already cancelled
             if booking.status == BookingStatus.CANCELLED:
-                print(f"[DEBUG] Booking is already cancelled")
+                trace.debug("Booking is already cancelled")
                 return f"This appointment is already cancelled."
             
             # Cancel the booking
             booking.status = BookingStatus.CANCELLED
             booking.cancellation_reason = reason or "Cancelled by customer"
             booking.save(update_fields=['status', 'cancellation_reason'])
+            invalidate('availability')
             
-            print(f"[DEBUG] Booking cancelled successfully")
+            trace.debug("Booking cancelled successfully")
             return f"Appointment cancelled successfully. Cancellation reason: {booking.cancellation_reason}"
             
         except Exception as e:
-            import traceback
-            print(f"[DEBUG] Error in CancelAppointmentTool: {str(e)}")
-            print(f"[DEBUG] Traceback: {traceback.format_exc()}")
+            trace.error("Error in CancelAppointmentTool: {}", e, exc_info=True)
             return f"An error occurred while cancelling the appointment: {str(e)}"
 
 class GetServiceItemsTool(BaseTool):
@@ -854,13 +701,13 @@ class GetServiceItemsTool(BaseTool):
     
     def _run(self, business_id: str, service_name: Optional[str] = None) -> str:
         try:
-            print(f"[DEBUG] GetServiceItemsTool called with: business_id={business_id}, service_name={service_name}")
+            trace.debug("GetServiceItemsTool called with: business_id={}, service_name={}", business_id, service_name)
             
             # Get the business
             try:
-                business = Business.objects.get(id=business_id)
+                business = get_business(business_id)
             except Business.DoesNotExist:
-                print(f"[DEBUG] Business with ID {business_id} not found")
+                trace.debug("Business with ID {} not found", business_id)
                 return f"Business with ID {business_id} not found."
             
             # Get service items
@@ -873,15 +720,11 @@ class GetServiceItemsTool(BaseTool):
             service = None
             if service_name:
                 try:
-                    service = ServiceOffering.objects.get(
-                        business=business,
-                        name__iexact=service_name,
-                        is_active=True
-                    )
+                    service = get_service(business, service_name)
                     # Filter items linked to this service offering
                     service_items_query = service_items_query.filter(service_offering=service)
                 except ServiceOffering.DoesNotExist:
-                    print(f"[DEBUG] Service '{service_name}' not found")
+                    trace.debug("Service '{}' not found", service_name)
                     return f"Service '{service_name}' not found for business '{business.name}'."
             
             service_items = service_items_query.all()
@@ -942,7 +785,5 @@ class GetServiceItemsTool(BaseTool):
             return response
             
         except Exception as e:
-            import traceback
-            print(f"[DEBUG] Error in GetServiceItemsTool: {str(e)}")
-            print(f"[DEBUG] Traceback: {traceback.format_exc()}")
+            trace.error("Error in GetServiceItemsTool: {}", e, exc_info=True)
             return f"An error occurred while getting service items: {str(e)}"
\ No newline at end of file
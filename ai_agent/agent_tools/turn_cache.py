@@ -0,0 +1,164 @@
+"""
+Turn-scoped memoization for the agent tools.
+
+Within one agent turn the tools often look up the same things: check_availability
+followed by book_appointment resolves the business, the service and its items
+twice and checks the same slot twice. LangChainAgent.process_message opens a
+TurnCache for each AgentExecutor run; the lookups below reuse its results for
+the rest of the turn and count hits and misses.
+
+Outside a turn (e.g. the Retell API views calling the tools directly) every
+lookup goes to the database as before. Tools that write bookings call
+invalidate('availability') so later checks in the same turn see the booking.
+"""
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from bookings.availability import check_timeslot_availability, find_available_slots_on_date
+from business.models import Business, ServiceItem, ServiceOffering
+
+_current = ContextVar('agent_turn_cache', default=None)
+
+# Cached values that aren't found, so misses of missing objects are cached too
+_NOT_FOUND = object()
+
+
+class TurnCache:
+    """Results of the tool lookups of one agent turn."""
+
+    def __init__(self):
+        self._values = {}
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key, compute):
+        """Return the cached value for key, computing and storing it on a miss."""
+        if key in self._values:
+            self.hits += 1
+            return self._values[key]
+        self.misses += 1
+        value = self._values[key] = compute()
+        return value
+
+    def invalidate(self, kind):
+        """Drop the cached values of one kind, e.g. 'availability'."""
+        self._values = {key: value for key, value in self._values.items() if key[0] != kind}
+
+    def stats(self):
+        return {'hits': self.hits, 'misses': self.misses}
+
+
+@contextmanager
+def turn_cache():
+    """Open a TurnCache for the tool calls made inside the block."""
+    cache = TurnCache()
+    token = _current.set(cache)
+    try:
+        yield cache
+    finally:
+        _current.reset(token)
+
+
+def _memo(key, compute):
+    cache = _current.get()
+    if cache is None:
+        return compute()
+    return cache.get(key, compute)
+
+
+def invalidate(kind):
+    """Drop the current turn's cached values of one kind."""
+    cache = _current.get()
+    if cache is not None:
+        cache.invalidate(kind)
+
+
+def get_business(business_id):
+    """
+    Return a business by ID.
+
+    Raises:
+        Business.DoesNotExist: If there is no such business
+    """
+    def compute():
+        try:
+            return Business.objects.get(id=business_id)
+        except Business.DoesNotExist:
+            return _NOT_FOUND
+
+    business = _memo(('business', str(business_id)), compute)
+    if business is _NOT_FOUND:
+        raise Business.DoesNotExist(f"Business with ID {business_id} not found")
+    return business
+
+
+def get_service(business, service_name):
+    """
+    Return an active service of a business by name, ignoring case.
+
+    Raises:
+        ServiceOffering.DoesNotExist: If the business has no such service
+    """
+    def compute():
+        try:
+            return ServiceOffering.objects.get(business=business, name__iexact=service_name, is_active=True)
+        except ServiceOffering.DoesNotExist:
+            return _NOT_FOUND
+
+    service = _memo(('service', business.id, service_name.lower()), compute)
+    if service is _NOT_FOUND:
+        raise ServiceOffering.DoesNotExist(f"Service '{service_name}' not found")
+    return service
+
+
+def get_service_item(business, identifier):
+    """
+    Return an active service item of a business by identifier, falling back
+    to a case-insensitive identifier and then name match. All of the
+    business's active items are loaded once per turn.
+
+    Returns:
+        ServiceItem: The matching item, or None
+    """
+    items = _memo(
+        ('service_items', business.id),
+        lambda: list(ServiceItem.objects.filter(business=business, is_active=True))
+    )
+    if not identifier:
+        return None
+    identifier = str(identifier)
+    for matches in (
+        lambda item: item.identifier == identifier,
+        lambda item: item.identifier.lower() == identifier.lower(),
+        lambda item: item.name.lower() == identifier.lower(),
+    ):
+        item = next((item for item in items if matches(item)), None)
+        if item is not None:
+            return item
+    return None
+
+
+def check_slot(business, start_time, duration_minutes, service=None):
+    """Memoized check_timeslot_availability."""
+    return _memo(
+        ('availability', 'slot', business.id, start_time, duration_minutes, service.id if service else None),
+        lambda: check_timeslot_availability(
+            business=business,
+            start_time=start_time,
+            duration_minutes=duration_minutes,
+            service=service
+        )
+    )
+
+
+def find_slots(business, date, duration_minutes, service=None):
+    """Memoized find_available_slots_on_date."""
+    return _memo(
+        ('availability', 'date', business.id, date, duration_minutes, service.id if service else None),
+        lambda: find_available_slots_on_date(
+            business_id=str(business.id),
+            date=date,
+            duration_minutes=duration_minutes,
+            service_offering_id=str(service.id) if service else None
+        )
+    )
@@ -0,0 +1,103 @@
+"""
+Deterministic, offline stand-in for the agent's chat model.
+
+ScriptedChatModel plays a customer booking flow without calling OpenAI: for a
+message made by booking_request() it calls check_availability, books the slot
+with book_appointment if it's free, and relays the tool's answer. Any other
+message gets a fixed reply. Every call can be delayed to simulate API latency.
+
+Set AGENT_LLM = 'fake' (and optionally AGENT_FAKE_LLM_LATENCY in seconds) to
+make LangChainAgent use it; the agent load test does this.
+"""
+import json
+import re
+import time
+from typing import Any, List, Optional
+
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, BaseMessage, FunctionMessage, HumanMessage
+from langchain_core.outputs import ChatGeneration, ChatResult
+
+from .memory import count_message_tokens
+
+DEFAULT_REPLY = "Thanks for reaching out! Is there anything else I can help you with?"
+
+BOOKING_REQUEST = "I'd like to book {service} on {date} at {time}. My name is {name}, phone {phone}."
+BOOKING_REQUEST_PATTERN = re.compile(
+    r"book (?P<service>.+?) on (?P<date>\d{4}-\d{2}-\d{2}) at (?P<time>\d{2}:\d{2})\. "
+    r"My name is (?P<name>[^,]+), phone (?P<phone>\+?\d+)\."
+)
+
+
+def booking_request(service, date, time, name, phone):
+    """Return a customer message that ScriptedChatModel answers by booking the slot."""
+    return BOOKING_REQUEST.format(service=service, date=date, time=time, name=name, phone=phone)
+
+
+def _function_call(name, arguments):
+    return AIMessage(content='', additional_kwargs={
+        'function_call': {'name': name, 'arguments': json.dumps(arguments)}
+    })
+
+
+class ScriptedChatModel(BaseChatModel):
+    """Chat model that answers booking requests with scripted function calls."""
+
+    # Seconds every call takes
+    latency: float = 0.0
+    # Set by streamed turns; responses are never streamed
+    streaming: bool = False
+
+    @property
+    def _llm_type(self) -> str:
+        return 'scripted'
+
+    def _request(self, messages):
+        for message in reversed(messages):
+            if isinstance(message, HumanMessage):
+                match = BOOKING_REQUEST_PATTERN.search(str(message.content))
+                return match.groupdict() if match else None
+        return None
+
+    def _reply(self, messages) -> AIMessage:
+        last = messages[-1]
+        request = self._request(messages)
+
+        if isinstance(last, FunctionMessage):
+            if last.name == 'check_availability' and request and 'is available' in last.content:
+                return _function_call('book_appointment', {
+                    'date': request['date'],
+                    'time': request['time'],
+                    'service_name': request['service'],
+                    'customer_name': request['name'],
+                    'customer_phone': request['phone'],
+                })
+            if last.name == 'book_appointment' and 'BOOKING_CONFIRMED' in last.content:
+                booking_line = next(line for line in last.content.splitlines() if line.startswith('Booking ID'))
+                return AIMessage(content=f"You're all set! Your appointment is confirmed. {booking_line}.")
+            return AIMessage(content=last.content)
+
+        if isinstance(last, HumanMessage) and request:
+            return _function_call('check_availability', {
+                'date': request['date'],
+                'time': request['time'],
+                'service_name': request['service'],
+            })
+
+        return AIMessage(content=DEFAULT_REPLY)
+
+    def _generate(self, messages: List[BaseMessage], stop: Optional[List[str]] = None,
+                  run_manager: Any = None, **kwargs: Any) -> ChatResult:
+        if self.latency:
+            time.sleep(self.latency)
+        message = self._reply(messages)
+        prompt_tokens = count_message_tokens(messages)
+        completion_tokens = count_message_tokens([message])
+        return ChatResult(
+            generations=[ChatGeneration(message=message)],
+            llm_output={'token_usage': {
+                'prompt_tokens': prompt_tokens,
+                'completion_tokens': completion_tokens,
+                'total_tokens': prompt_tokens + completion_tokens,
+            }}
+        )
@@ -14,22 +14,204 @@ import inspect
 from langchain.agents import AgentExecutor
 from langchain.agents.openai_functions_agent.base import OpenAIFunctionsAgent
 from langchain.schema import SystemMessage, HumanMessage, AIMessage
-from langchain.prompts import MessagesPlaceholder
-from langchain.memory import ConversationBufferMemory
+from langchain.prompts import MessagesPlaceholder, SystemMessagePromptTemplate
 from langchain_community.chat_models import ChatOpenAI
 
 from django.conf import settings
+from django.db.models import Count, Max, Min, Prefetch
 from django.utils import timezone
 
 from business.models import Business, ServiceOffering, ServiceItem
+from .fake_llm import ScriptedChatModel
+from .metrics import TurnMetricsHandler
+from .memory import AGENT_MEMORY_TOKEN_LIMIT, AGENT_MEMORY_TURNS, ChatSummaryMemory, stored_memory
 from .models import Chat, Message, AgentConfig
+from .prompt_cache import cached_prompt
+from .agent_tools.turn_cache import turn_cache
 from .agent_tools.tools import CheckAvailabilityTool, BookAppointmentTool, RescheduleAppointmentTool, CancelAppointmentTool, GetServiceItemsTool
+from core.tracing import get_tracer, trace_context
+
+trace = get_tracer('agent')
+
+# Filled in on every turn, so agents kept in the pool don't go stale
+CLOCK_TEMPLATE = "Today's date is {current_date} and the current time is {current_time}."
+
+
+def render_system_prompt(business) -> str:
+    """
+    Generate a dynamic system prompt based on business details.
+    Use LangChainAgent._get_system_prompt, which caches the result per catalog version.
+    """
+    # Get agent config from database or use default
+    agent_config = AgentConfig.objects.filter(business=business, is_active=True).first()
+    
+    if agent_config and agent_config.prompt:
+        # Use custom prompt from database
+        system_prompt = agent_config.prompt
+    else:
+        # Generate default prompt
+        business_name = business.name
+        business_description = business.description or ""
+        business_id = str(business.id)  # Convert UUID to string
+        
+        # Get services with their active service items in one extra query
+        services = ServiceOffering.objects.filter(business=business, is_active=True).prefetch_related(
+            Prefetch('service_items', queryset=ServiceItem.objects.filter(is_active=True))
+        )
+        
+        services_text = ""
+        for service in services:
+            services_text += f"\n{service.name} - ${service.price} ({service.duration} minutes):\n"
+            services_text += f"  Description: {service.description or 'No description'}\n"
+            
+            # Get service items linked to this service
+            service_items = service.service_items.all()
+            if service_items:
+                services_text += f"  Customization Options:\n"
+                for item in service_items:
+                    # Build item description with price and duration
+                    item_desc = f"    • {item.name} (identifier: {item.identifier})"
+                    
+                    # Add pricing information based on field type
+                    if item.field_type == 'boolean' and item.option_pricing:
+                        services_text += f"{item_desc}\n"
+                        services_text += f"      Type: Yes/No question\n"
+                        services_text += f"      Options:\n"
+                        for option, config in item.option_pricing.items():
+                            price_type = config.get('price_type', 'free')
+                            duration_info = f", +{item.duration_minutes} min" if item.duration_minutes > 0 else ""
+                            if price_type == 'paid':
+                                services_text += f"        - {option.capitalize()}: ${config.get('price_value', 0)}{duration_info}\n"
+                            else:
+                                services_text += f"        - {option.capitalize()}: Free{duration_info}\n"
+                    elif item.field_type == 'select' and item.option_pricing:
+                        services_text += f"{item_desc}\n"
+                        services_text += f"      Type: Choose one option\n"
+                        services_text += f"      Options:\n"
+                        for option, config in item.option_pricing.items():
+                            price_type = config.get('price_type', 'free')
+                            duration_info = f", +{item.duration_minutes} min" if item.duration_minutes > 0 else ""
+                            if price_type == 'paid':
+                                services_text += f"        - {option}: ${config.get('price_value', 0)}{duration_info}\n"
+                            else:
+                                services_text += f"        - {option}: Free{duration_info}\n"
+                    elif item.field_type == 'number':
+                        duration_info = f", +{item.duration_minutes} min each" if item.duration_minutes > 0 else ""
+                        if item.price_type == 'paid':
+                            services_text += f"{item_desc} - ${item.price_value} per unit{duration_info}\n"
+                        else:
+                            services_text += f"{item_desc} - Free{duration_info}\n"
+                        services_text += f"      Type: Enter quantity\n"
+                    else:  # text, textarea
+                        duration_info = f", +{item.duration_minutes} min" if item.duration_minutes > 0 else ""
+                        if item.price_type == 'paid':
+                            services_text += f"{item_desc} - ${item.price_value}{duration_info}\n"
+                        else:
+                            services_text += f"{item_desc} - Free{duration_info}\n"
+                        services_text += f"      Type: Text input\n"
+                    
+                    services_text += f"      {'Required' if not item.is_optional else 'Optional'}\n"
+            services_text += "\n"
+        
+        # Default system prompt
+        system_prompt = f"""You are a friendly booking assistant for {business_name}. 
+{business_description}
+
+AVAILABLE SERVICES:
+{services_text}
+
+YOUR CONVERSATION STYLE:
+- Write naturally like you're texting a friend
+- Use simple, casual language
+- NO markdown formatting (no **, no ##, no bullets)
+- NO numbered lists in your responses
+- Ask ONE question at a time
+- Keep messages short and conversational
+- Use natural transitions like "Great!", "Perfect!", "Got it!"
+
+CONVERSATION FLOW:
+1. Greet warmly and ask if they want to book a service
+2. Once they choose a service, ask for customization details ONE AT A TIME
+3. After each answer, acknowledge it and move to the next question
+4. Calculate running total as you go and mention it naturally
+5. Ask for their preferred date and time
+6. Collect their name, phone, and email
+7. Summarize everything and confirm before booking
+8. IMPORTANT: Actually call the book_appointment tool (don't just say it's booked)
+
+HOW TO PRESENT SERVICES:
+- When customer asks about services, mention the price and duration
+- Example: "We offer Standard Cleaning for $100, takes about 120 minutes."
+- If they choose a service, mention if there are customization options available
+
+HOW TO ASK FOR SERVICE ITEMS:
+- Ask for ONE item at a time, not all at once
+- ALWAYS mention the price when asking about an option
+- Use natural questions like:
+  * "How many bedrooms would you like cleaned? It's $10 per bedroom."
+  * "Would you like us to clean the driveway too? That's an extra $20."
+  * "Which cleaner product would you prefer - best cleaner ($10) or better cleaner ($5)?"
+- After they answer, acknowledge and move to next item
+- Keep track of pricing and mention running totals naturally
+
+EXAMPLE GOOD CONVERSATION:
+Customer: I want cleaning service
+You: Great! I can help you book our Standard Cleaning service. How many bedrooms would you like us to clean?
+Customer: 3 bedrooms
+You: Perfect! That's 3 bedrooms at $10 each, so $30 added to the base price of $100. Would you also like the driveway cleaned?
+Customer: No thanks
+You: Got it, no driveway cleaning. Last question - which cleaner product would you prefer, the best cleaner or better cleaner?
+
+FORMATTING RULES (ALWAYS FOLLOW):
+- NEVER EVER use ** for bold (not even in confirmations)
+- NEVER use numbered lists like "1.", "2.", "3."
+- NEVER use bullet points like "- " or "* "
+- Write naturally in plain text only
+- Use line breaks for readability, not formatting
+- This applies to ALL messages including booking confirmations
+
+TECHNICAL DETAILS:
+- Convert dates to YYYY-MM-DD format internally
+- Convert times to HH:MM 24-hour format internally
+- Use exact identifiers from service items list
+- business_id is automatically provided
+
+SERVICE ITEMS FORMAT FOR TOOL CALLS:
+[
+  {{"identifier": "item_id", "value": "user_response", "quantity": 1}}
+]
+
+TOOLS YOU MUST USE:
+- check_availability: Check if time slot is free
+- book_appointment: MUST call this to actually create the booking (required: date, time, service_name, customer_name, customer_phone, customer_email, service_items)
+- reschedule_appointment: Change existing booking
+- cancel_appointment: Cancel booking
+- get_service_items: Get more details if needed
+
+CRITICAL RULES:
+1. When customer confirms, you MUST call book_appointment tool. Just saying "booked" doesn't create it in the system.
+2. After booking is created, you will receive booking details including Booking ID. ALWAYS share the Booking ID with the customer.
+3. NEVER use ** or any markdown in your confirmation message.
+4. Remember all bookings you create in the conversation - if customer asks for booking ID later, provide it from context.
+
+BOOKING CONFIRMATION FORMAT:
+When you receive BOOKING_CONFIRMED from the tool, respond naturally like:
+"All set! Your appointment is confirmed for [date] at [time]. Your booking ID is [ID]. You'll receive a confirmation email at [email]. Total is $[amount] for [duration] minutes."
+
+Be warm, helpful, and conversational. Guide them smoothly through the booking process.
+"""
+    
+    return system_prompt
+
 
 class LangChainAgent:
     """
     LangChain-based conversational agent for handling SMS interactions.
     This agent uses OpenAI's function calling capabilities to execute tools
     for appointment booking, rescheduling, cancellation, and availability checking.
+
+    Agents are long-lived: ai_agent.agent_pool keeps one per chat and calls
+    sync_messages() before each turn to pick up messages saved elsewhere.
     """
     
     def __init__(self, business_id: str, chat_id: Optional[str] = None, 
@@ -47,6 +229,8 @@ class LangChainAgent:
         self.chat_id = chat_id
         self.phone_number = phone_number
         self.session_key = session_key
+        # Hit/miss counts of the tool lookups of the last turn
+        self.tool_cache_stats = {}
         
         # Load business information
         try:
@@ -97,6 +281,10 @@ class LangChainAgent:
     
     def _initialize_llm(self) -> ChatOpenAI:
         """Initialize the LLM with appropriate settings."""
+        # Offline stand-in for load tests, see ai_agent.fake_llm
+        if getattr(settings, 'AGENT_LLM', 'openai') == 'fake':
+            return ScriptedChatModel(latency=getattr(settings, 'AGENT_FAKE_LLM_LATENCY', 0))
+        
         api_key = settings.OPENAI_API_KEY
         model_name = getattr(settings, 'OPENAI_MODEL_NAME', 'gpt-4-0125-preview')
         
@@ -107,30 +295,80 @@ class LangChainAgent:
             max_tokens=1024,
         )
     
-    def _initialize_memory(self) -> ConversationBufferMemory:
-        """Initialize conversation memory and load existing messages."""
-        memory = ConversationBufferMemory(
+    def _initialize_memory(self) -> ChatSummaryMemory:
+        """
+        Initialize conversation memory from the chat's stored rolling summary
+        and its most recent turns, so loading doesn't grow with the chat.
+        """
+        summary, through_message_id = stored_memory(self.chat)
+        self._stored_summary = (summary, through_message_id)
+        self._last_message_id = through_message_id
+        
+        memory = ChatSummaryMemory(
+            llm=self.llm,
             memory_key="chat_history",
-            return_messages=True
+            input_key="input",
+            return_messages=True,
+            max_turns=AGENT_MEMORY_TURNS,
+            max_token_limit=AGENT_MEMORY_TOKEN_LIMIT,
+            moving_summary_buffer=summary,
+            pruned_through_message_id=through_message_id
         )
         
-        # Load existing messages from database
-        messages = self.chat.messages.all().order_by('created_at')
+        # Load the latest messages the summary doesn't cover
+        recent = self.chat.messages.filter(
+            id__gt=through_message_id, role__in=['user', 'assistant']
+        ).order_by('-id')[:AGENT_MEMORY_TURNS * 2]
+        self._add_messages(memory, reversed(list(recent)))
         
+        return memory
+    
+    def _save_memory(self) -> None:
+        """Store the rolling summary on the chat after it changed."""
+        stored = (self.memory.moving_summary_buffer, self.memory.pruned_through_message_id)
+        if stored == self._stored_summary:
+            return
+        
+        summary, through_message_id = stored
+        self.chat.summary = {
+            **(self.chat.summary or {}),
+            'memory': {'summary': summary, 'through_message_id': through_message_id},
+        }
+        self.chat.save(update_fields=['summary', 'updated_at'])
+        self._stored_summary = stored
+    
+    def _tag_turn(self, user_message_id, assistant_message_id) -> None:
+        """Give the messages the executor added to memory this turn the IDs of their stored Messages."""
+        for message in reversed(self.memory.chat_memory.messages):
+            if message.id:
+                break
+            message.id = str(user_message_id if isinstance(message, HumanMessage) else assistant_message_id)
+    
+    def _add_messages(self, memory, messages) -> None:
+        """Append saved messages to memory and remember the last one seen."""
         for msg in messages:
             if msg.role == 'user':
-                memory.chat_memory.add_user_message(msg.content)
+                memory.chat_memory.add_message(HumanMessage(content=msg.content, id=str(msg.id)))
             elif msg.role == 'assistant':
-                memory.chat_memory.add_ai_message(msg.content)
+                memory.chat_memory.add_message(AIMessage(content=msg.content, id=str(msg.id)))
             elif msg.role == 'system':
                 # System messages are handled separately in the agent initialization
                 pass
-        
-        return memory
+            self._last_message_id = max(self._last_message_id, msg.id)
+    
+    def sync_messages(self) -> None:
+        """
+        Append messages saved since this agent last saw the chat,
+        e.g. by another worker process, so a pooled agent never replays the whole history.
+        """
+        self._add_messages(
+            self.memory,
+            self.chat.messages.filter(id__gt=self._last_message_id).order_by('created_at', 'id')
+        )
     
     def _initialize_tools(self) -> List:
         """Initialize the tools for the agent."""
-        print(f"[DEBUG] Initializing tools for business: {self.business.name} (ID: {self.business.id})")
+        trace.debug("Initializing tools for business: {} (ID: {})", self.business.name, self.business.id)
         
         # Create the tools
         check_availability_tool = CheckAvailabilityTool()
@@ -142,33 +380,28 @@ class LangChainAgent:
         # Add business_id to the tools that need it
         def wrap_tool_run(tool, original_run):
             """Wrap the tool's _run method to add business_id if not provided."""
+            valid_params = inspect.signature(original_run).parameters.keys()
+            
             @functools.wraps(original_run)
             def wrapped_run(*args, **kwargs):
-                print(f"[DEBUG] Running {tool.name} with args: {args}, kwargs: {kwargs}")
+                trace.debug("Running {} with args: {}, kwargs: {}", tool.name, args, kwargs)
                 
                 # Only add business_id if the tool accepts it
-                if 'business_id' in inspect.signature(original_run).parameters:
+                if 'business_id' in valid_params:
                     if 'business_id' not in kwargs or not kwargs['business_id']:
                         kwargs['business_id'] = str(self.business.id)
-                        print(f"[DEBUG] Added business_id: {kwargs['business_id']}")
                 
                 # Filter out kwargs that aren't accepted by the function
-                valid_params = inspect.signature(original_run).parameters.keys()
                 filtered_kwargs = {k: v for k, v in kwargs.items() if k in valid_params}
                 
-                if filtered_kwargs != kwargs:
-                    print(f"[DEBUG] Filtered kwargs: {kwargs} -> {filtered_kwargs}")
-                
-                return original_run(*args, **filtered_kwargs)
+                with trace.span('tool', tool=tool.name):
+                    return original_run(*args, **filtered_kwargs)
             return wrapped_run
         
         # Wrap each tool's _run method
         for tool in [check_availability_tool, book_appointment_tool, reschedule_appointment_tool, cancel_appointment_tool, get_service_items_tool]:
             original_run = tool._run
             tool._run = wrap_tool_run(tool, original_run)
-            print(f"[DEBUG] Wrapped {tool.name}._run method")
-        
-        print(f"[DEBUG] Created tools: {check_availability_tool.name}, {book_appointment_tool.name}, {reschedule_appointment_tool.name}, {cancel_appointment_tool.name}, {get_service_items_tool.name}")
         
         return [
             check_availability_tool,
@@ -180,186 +413,24 @@ class LangChainAgent:
 
     def _get_system_prompt(self) -> str:
         """
-        Generate a dynamic system prompt based on business details.
+        Return the business's system prompt, rendered once per catalog version.
         This customizes the agent's behavior for each business.
         """
-        # Get agent config from database or use default
-        agent_config = AgentConfig.objects.filter(business=self.business, is_active=True).first()
-        
-        # Get current date and time
-        current_date = timezone.now().strftime("%Y-%m-%d")
-        current_time = timezone.now().strftime("%H:%M")
-        
-        if agent_config and agent_config.prompt:
-            # Use custom prompt from database
-            system_prompt = agent_config.prompt
-        else:
-            # Generate default prompt
-            business_name = self.business.name
-            business_description = self.business.description or ""
-            business_id = str(self.business.id)  # Convert UUID to string
-            
-            # Get services with their linked service items
-            services = ServiceOffering.objects.filter(business=self.business, is_active=True).prefetch_related('service_items')
-            
-            services_text = ""
-            for service in services:
-                services_text += f"\n{service.name} - ${service.price} ({service.duration} minutes):\n"
-                services_text += f"  Description: {service.description or 'No description'}\n"
-                
-                # Get service items linked to this service
-                service_items = service.service_items.filter(is_active=True)
-                if service_items.exists():
-                    services_text += f"  Customization Options:\n"
-                    for item in service_items:
-                        # Build item description with price and duration
-                        item_desc = f"    • {item.name} (identifier: {item.identifier})"
-                        
-                        # Add pricing information based on field type
-                        if item.field_type == 'boolean' and item.option_pricing:
-                            services_text += f"{item_desc}\n"
-                            services_text += f"      Type: Yes/No question\n"
-                            services_text += f"      Options:\n"
-                            for option, config in item.option_pricing.items():
-                                price_type = config.get('price_type', 'free')
-                                duration_info = f", +{item.duration_minutes} min" if item.duration_minutes > 0 else ""
-                                if price_type == 'paid':
-                                    services_text += f"        - {option.capitalize()}: ${config.get('price_value', 0)}{duration_info}\n"
-                                else:
-                                    services_text += f"        - {option.capitalize()}: Free{duration_info}\n"
-                        elif item.field_type == 'select' and item.option_pricing:
-                            services_text += f"{item_desc}\n"
-                            services_text += f"      Type: Choose one option\n"
-                            services_text += f"      Options:\n"
-                            for option, config in item.option_pricing.items():
-                                price_type = config.get('price_type', 'free')
-                                duration_info = f", +{item.duration_minutes} min" if item.duration_minutes > 0 else ""
-                                if price_type == 'paid':
-                                    services_text += f"        - {option}: ${config.get('price_value', 0)}{duration_info}\n"
-                                else:
-                                    services_text += f"        - {option}: Free{duration_info}\n"
-                        elif item.field_type == 'number':
-                            duration_info = f", +{item.duration_minutes} min each" if item.duration_minutes > 0 else ""
-                            if item.price_type == 'paid':
-                                services_text += f"{item_desc} - ${item.price_value} per unit{duration_info}\n"
-                            else:
-                                services_text += f"{item_desc} - Free{duration_info}\n"
-                            services_text += f"      Type: Enter quantity\n"
-                        else:  # text, textarea
-                            duration_info = f", +{item.duration_minutes} min" if item.duration_minutes > 0 else ""
-                            if item.price_type == 'paid':
-                                services_text += f"{item_desc} - ${item.price_value}{duration_info}\n"
-                            else:
-                                services_text += f"{item_desc} - Free{duration_info}\n"
-                            services_text += f"      Type: Text input\n"
-                        
-                        services_text += f"      {'Required' if not item.is_optional else 'Optional'}\n"
-                services_text += "\n"
-            
-            # Default system prompt
-            system_prompt = f"""You are a friendly booking assistant for {business_name}. 
-{business_description}
-
-Today's date is {current_date} and the current time is {current_time}.
-
-AVAILABLE SERVICES:
-{services_text}
-
-YOUR CONVERSATION STYLE:
-- Write naturally like you're texting a friend
-- Use simple, casual language
-- NO markdown formatting (no **, no ##, no bullets)
-- NO numbered lists in your responses
-- Ask ONE question at a time
-- Keep messages short and conversational
-- Use natural transitions like "Great!", "Perfect!", "Got it!"
-
-CONVERSATION FLOW:
-1. Greet warmly and ask if they want to book a service
-2. Once they choose a service, ask for customization details ONE AT A TIME
-3. After each answer, acknowledge it and move to the next question
-4. Calculate running total as you go and mention it naturally
-5. Ask for their preferred date and time
-6. Collect their name, phone, and email
-7. Summarize everything and confirm before booking
-8. IMPORTANT: Actually call the book_appointment tool (don't just say it's booked)
-
-HOW TO PRESENT SERVICES:
-- When customer asks about services, mention the price and duration
-- Example: "We offer Standard Cleaning for $100, takes about 120 minutes."
-- If they choose a service, mention if there are customization options available
-
-HOW TO ASK FOR SERVICE ITEMS:
-- Ask for ONE item at a time, not all at once
-- ALWAYS mention the price when asking about an option
-- Use natural questions like:
-  * "How many bedrooms would you like cleaned? It's $10 per bedroom."
-  * "Would you like us to clean the driveway too? That's an extra $20."
-  * "Which cleaner product would you prefer - best cleaner ($10) or better cleaner ($5)?"
-- After they answer, acknowledge and move to next item
-- Keep track of pricing and mention running totals naturally
-
-EXAMPLE GOOD CONVERSATION:
-Customer: I want cleaning service
-You: Great! I can help you book our Standard Cleaning service. How many bedrooms would you like us to clean?
-Customer: 3 bedrooms
-You: Perfect! That's 3 bedrooms at $10 each, so $30 added to the base price of $100. Would you also like the driveway cleaned?
-Customer: No thanks
-You: Got it, no driveway cleaning. Last question - which cleaner product would you prefer, the best cleaner or better cleaner?
-
-FORMATTING RULES (ALWAYS FOLLOW):
-- NEVER EVER use ** for bold (not even in confirmations)
-- NEVER use numbered lists like "1.", "2.", "3."
-- NEVER use bullet points like "- " or "* "
-- Write naturally in plain text only
-- Use line breaks for readability, not formatting
-- This applies to ALL messages including booking confirmations
-
-TECHNICAL DETAILS:
-- Convert dates to YYYY-MM-DD format internally
-- Convert times to HH:MM 24-hour format internally
-- Use exact identifiers from service items list
-- business_id is automatically provided
-
-SERVICE ITEMS FORMAT FOR TOOL CALLS:
-[
-  {{"identifier": "item_id", "value": "user_response", "quantity": 1}}
-]
-
-TOOLS YOU MUST USE:
-- check_availability: Check if time slot is free
-- book_appointment: MUST call this to actually create the booking (required: date, time, service_name, customer_name, customer_phone, customer_email, service_items)
-- reschedule_appointment: Change existing booking
-- cancel_appointment: Cancel booking
-- get_service_items: Get more details if needed
-
-CRITICAL RULES:
-1. When customer confirms, you MUST call book_appointment tool. Just saying "booked" doesn't create it in the system.
-2. After booking is created, you will receive booking details including Booking ID. ALWAYS share the Booking ID with the customer.
-3. NEVER use ** or any markdown in your confirmation message.
-4. Remember all bookings you create in the conversation - if customer asks for booking ID later, provide it from context.
-
-BOOKING CONFIRMATION FORMAT:
-When you receive BOOKING_CONFIRMED from the tool, respond naturally like:
-"All set! Your appointment is confirmed for [date] at [time]. Your booking ID is [ID]. You'll receive a confirmation email at [email]. Total is $[amount] for [duration] minutes."
-
-Be warm, helpful, and conversational. Guide them smoothly through the booking process.
-"""
-        
-        return system_prompt
+        return cached_prompt(self.business, 'chat', render_system_prompt)
     
     def _initialize_agent(self) -> OpenAIFunctionsAgent:
         """Initialize the OpenAI Functions agent."""
-        print(f"[DEBUG] Initializing agent for business: {self.business.name} (ID: {self.business.id})")
-        
         # Get system prompt
         system_prompt = self._get_system_prompt()
-        print(f"[DEBUG] System prompt length: {len(system_prompt)}")
+        trace.debug("System prompt length: {}", len(system_prompt))
         
-        # Create the prompt
+        # Create the prompt; the clock is rendered per turn, see _clock()
         prompt = OpenAIFunctionsAgent.create_prompt(
             system_message=SystemMessage(content=system_prompt),
-            extra_prompt_messages=[MessagesPlaceholder(variable_name="chat_history")]
+            extra_prompt_messages=[
+                MessagesPlaceholder(variable_name="chat_history"),
+                SystemMessagePromptTemplate.from_template(CLOCK_TEMPLATE),
+            ]
         )
         
         # Create the agent
@@ -369,102 +440,127 @@ Be warm, helpful, and conversational. Guide them smoothly through the booking pr
             prompt=prompt
         )
         
-        print(f"[DEBUG] Agent created successfully")
-        
         return agent
     
     def _initialize_agent_executor(self) -> AgentExecutor:
         """Initialize the agent executor."""
-        print(f"[DEBUG] Initializing agent executor")
-        
         return AgentExecutor(
             agent=self.agent,
             tools=self.tools,
             memory=self.memory,
-            verbose=True,
+            # LangChain's verbose output is printed unconditionally, so follow the trace level
+            verbose=trace.enabled(),
             handle_parsing_errors=True,
             max_iterations=5,
             early_stopping_method="generate"
         )
     
-    def process_message(self, user_message: str) -> str:
+    def _clock(self) -> Dict[str, str]:
+        """Current date and time in the business timezone, for CLOCK_TEMPLATE."""
+        local_now = timezone.localtime(timezone.now(), self.business.tzinfo)
+        return {
+            'current_date': local_now.strftime("%Y-%m-%d"),
+            'current_time': local_now.strftime("%H:%M"),
+        }
+    
+    def process_message(self, user_message: str, callbacks: Optional[List] = None, raise_errors: bool = False) -> str:
         """
         Process a user message and return the agent's response.
         
         Args:
             user_message: The message from the user
+            callbacks: Optional LangChain callback handlers for this turn, e.g. to stream it
+            raise_errors: Raise a failed turn's error instead of returning an apology
             
         Returns:
             The agent's response
         """
-        print(f"[DEBUG] Running agent with message: '{user_message}'")
-        
-        # Save user message to database
-        Message.objects.create(
-            chat=self.chat,
-            role='user',
-            content=user_message,
-            created_at=timezone.now()
-        )
-        
-        try:
-            # Process with LangChain agent
-            response = self.agent_executor.run(user_message)
+        with trace_context(self.business.id), trace.span('turn', chat=self.chat.id):
+            trace.debug("Running agent with message: '{}'", user_message)
             
-            print(f"[DEBUG] Agent response: {response}")
-            
-            # Save assistant response to database
-            Message.objects.create(
-                chat=self.chat,
-                role='assistant',
-                content=response,
-                created_at=timezone.now()
-            )
-            
-            return response
-            
-        except Exception as e:
-            import traceback
-            error_traceback = traceback.format_exc()
-            print(f"[DEBUG] Error running agent: {str(e)}")
-            print(f"[DEBUG] Traceback: {error_traceback}")
-            
-            # Save error as system message
-            Message.objects.create(
+            # Save user message to database
+            saved = Message.objects.create(
                 chat=self.chat,
-                role='system',
-                content=f"Error processing message: {str(e)}",
+                role='user',
+                content=user_message,
                 created_at=timezone.now()
             )
+            # The executor adds the turn to memory itself
+            self._last_message_id = saved.id
+            user_message_id = saved.id
             
-            # Return a user-friendly error message
-            return "I'm sorry, I encountered an error processing your request. Please try again later."
+            metrics = TurnMetricsHandler()
+            self.tool_cache_stats = {}
+            try:
+                # Process with LangChain agent, tool lookups are memoized for the turn
+                with turn_cache() as tool_cache:
+                    response = self.agent_executor.run(
+                        input=user_message, callbacks=[metrics, *(callbacks or [])], **self._clock()
+                    )
+                metrics.finish()
+                self.tool_cache_stats = tool_cache.stats()
+                trace.debug("Tool cache: {} hits, {} misses", tool_cache.hits, tool_cache.misses)
+                
+                trace.debug("Agent response: {}", response)
+                
+                # Save assistant response to database
+                saved = Message.objects.create(
+                    chat=self.chat,
+                    role='assistant',
+                    content=response,
+                    created_at=timezone.now()
+                )
+                self._last_message_id = saved.id
+                metrics.save(self, message=saved)
+                self._tag_turn(user_message_id, saved.id)
+                self._save_memory()
+                
+                return response
+                
+            except Exception as e:
+                trace.error("Error running agent: {}", e, exc_info=True)
+                metrics.save(self, failed=True)
+                
+                # Save error as system message
+                Message.objects.create(
+                    chat=self.chat,
+                    role='system',
+                    content=f"Error processing message: {str(e)}",
+                    created_at=timezone.now()
+                )
+                if raise_errors:
+                    raise
+                
+                # Return a user-friendly error message
+                return "I'm sorry, I encountered an error processing your request. Please try again later."
     
     def update_chat_summary(self, booking_id: Optional[str] = None) -> None:
         """
         Update the chat summary with key information extracted from the conversation.
         This is useful for analytics and quick reference.
         """
-        # Get all messages in this chat
-        messages = self.chat.messages.all().order_by('created_at')
+        # Extract basic summary info in one query
+        stats = self.chat.messages.aggregate(
+            message_count=Count('id'),
+            first_message_time=Min('created_at'),
+            last_message_time=Max('created_at')
+        )
         
-        if not messages:
+        if not stats['message_count']:
             return
         
-        # Extract basic summary info
-        message_count = messages.count()
-        first_message_time = messages.first().created_at
-        last_message_time = messages.last().created_at
+        first_message_time = stats['first_message_time']
+        last_message_time = stats['last_message_time']
         
         # Create a simple summary
         summary = {
-            'message_count': message_count,
+            'message_count': stats['message_count'],
             'first_message': first_message_time.isoformat(),
             'last_message': last_message_time.isoformat(),
             'duration_seconds': (last_message_time - first_message_time).total_seconds(),
             'booking_id': booking_id or '',
         }
         
-        # Update the chat summary
-        self.chat.summary = summary
+        # Update the chat summary, keeping the conversation memory stored alongside
+        self.chat.summary = {**(self.chat.summary or {}), **summary}
         self.chat.save(update_fields=['summary', 'updated_at'])
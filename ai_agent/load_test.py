@@ -0,0 +1,180 @@
+"""
+End-to-end load test of the SMS agent.
+
+Replays synthetic customer conversations through process_sms_with_langchain
+against the local database, with the agent running on the offline
+ScriptedChatModel (ai_agent.fake_llm), so no OpenAI or Twilio calls are made.
+Every conversation asks to book a slot that was free when the test started
+(check_availability, then book_appointment) and then says goodbye; the
+conversations run on a thread pool so agent pooling, reservations and the
+database see concurrent chats.
+
+Fixtures come from bookings.benchmarks and have to be committed, since every
+thread has its own database connection; the load_test_agent command deletes
+them afterwards. Bookings made by the agent fire the usual signals, so their
+notification tasks are queued as for real bookings.
+"""
+import random
+import statistics
+import time as timer
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+
+from django.db import connection
+from django.test.utils import CaptureQueriesContext, override_settings
+
+from bookings.availability import check_timeslot_availability, find_available_slots_on_date
+from bookings.models import Booking
+from .agent_pool import agent_pool
+from .fake_llm import booking_request
+from .utils import process_sms_with_langchain
+
+FOLLOW_UP = "Thanks, that's all!"
+
+# Replies of process_sms_with_langchain and LangChainAgent.process_message when a turn
+# fails, and tool errors, which ScriptedChatModel relays as they are
+ERROR_REPLIES = (
+    "Sorry, we're experiencing technical difficulties",
+    "I'm sorry, I encountered an error",
+    "An error occurred",
+)
+
+
+def _pick_slot(rng, business, services, days, taken, attempts=20):
+    """
+    Return a (service, date, 'HH:MM') the agent can book. Slots are offered per
+    staff member, but check_availability also rejects any slot overlapping
+    another booking of the business, so candidates are checked with it too,
+    and slots overlapping one taken by an earlier conversation are skipped.
+    """
+    for _ in range(attempts):
+        service = rng.choice(services)
+        day = rng.choice(days)
+        slots = find_available_slots_on_date(
+            business_id=str(business.id), date=day, duration_minutes=service.duration,
+            service_offering_id=str(service.id)
+        )
+        rng.shuffle(slots)
+        for slot in slots:
+            start = datetime.combine(day, datetime.strptime(slot['time'], '%H:%M').time())
+            end = start + timedelta(minutes=service.duration)
+            if any(start < taken_end and taken_start < end for taken_start, taken_end in taken):
+                continue
+            if check_timeslot_availability(business, start, service.duration, service)[0]:
+                taken.append((start, end))
+                return service, day, slot['time']
+    return None
+
+
+def build_conversations(fixtures, conversations=20, seed=42):
+    """
+    Script one booking conversation per customer, each for a slot that is free.
+
+    Args:
+        fixtures (dict): Output of bookings.benchmarks.build_synthetic_businesses
+        conversations (int): Number of conversations
+        seed (int): Random seed
+
+    Returns:
+        list: Dicts with the business, the customer phone number and the messages to send
+    """
+    rng = random.Random(seed)
+    weekdays = [
+        fixtures['start_date'] + timedelta(days=offset)
+        for offset in range((fixtures['end_date'] - fixtures['start_date']).days + 1)
+        if (fixtures['start_date'] + timedelta(days=offset)).weekday() < 5
+    ]
+
+    scripts = []
+    # business ID -> (start, end) of the slots already scripted
+    taken = {}
+    for i in range(conversations):
+        tenant = fixtures['businesses'][i % len(fixtures['businesses'])]
+        business = tenant['business']
+        phone = f'+1999{i:07d}'
+        messages = []
+        slot = _pick_slot(rng, business, tenant['services'], weekdays, taken.setdefault(business.id, []))
+        if slot:
+            service, day, start = slot
+            messages.append(booking_request(service.name, day.isoformat(), start, f'Load Test {i}', phone))
+        messages.append(FOLLOW_UP)
+        scripts.append({'business_id': business.id, 'phone': phone, 'messages': messages})
+    return scripts
+
+
+def _run_conversation(script):
+    """Send a conversation's messages in order, timing every turn."""
+    turns = []
+    for message in script['messages']:
+        with CaptureQueriesContext(connection) as captured:
+            started = timer.perf_counter()
+            response = process_sms_with_langchain(script['business_id'], script['phone'], message)
+            elapsed = (timer.perf_counter() - started) * 1000
+        turns.append({
+            'ms': elapsed,
+            'queries': len(captured.captured_queries),
+            'failed': response.startswith(ERROR_REPLIES),
+        })
+    return turns
+
+
+def _run_conversation_in_thread(script):
+    try:
+        return _run_conversation(script)
+    finally:
+        # Pool threads would keep their connection open otherwise
+        connection.close()
+
+
+def _stats(values):
+    values = sorted(values)
+    if not values:
+        return {'mean': 0, 'p50': 0, 'p95': 0, 'max': 0}
+    return {
+        'mean': round(statistics.mean(values), 2),
+        'p50': round(values[len(values) // 2], 2),
+        'p95': round(values[min(len(values) - 1, int(len(values) * 0.95))], 2),
+        'max': round(values[-1], 2),
+    }
+
+
+def run_load_test(scripts, concurrency=8, latency=0.0):
+    """
+    Replay conversations through the SMS agent.
+
+    Args:
+        scripts (list): Output of build_conversations
+        concurrency (int): Conversations run at the same time; 1 runs them in the calling thread
+        latency (float): Seconds every fake LLM call takes
+
+    Returns:
+        dict: Turn and booking counts, throughput, latency and query stats per turn,
+            and the agent pool's hits and misses
+    """
+    agent_pool.clear()
+    business_ids = {script['business_id'] for script in scripts}
+    bookings_before = Booking.objects.filter(business_id__in=business_ids, lead__isnull=False).count()
+
+    with override_settings(AGENT_LLM='fake', AGENT_FAKE_LLM_LATENCY=latency):
+        started = timer.perf_counter()
+        if concurrency > 1:
+            with ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix='agent-load') as executor:
+                results = list(executor.map(_run_conversation_in_thread, scripts))
+        else:
+            results = [_run_conversation(script) for script in scripts]
+        elapsed = timer.perf_counter() - started
+
+    turns = [turn for conversation in results for turn in conversation]
+    bookings = Booking.objects.filter(business_id__in=business_ids, lead__isnull=False).count() - bookings_before
+    return {
+        'conversations': len(scripts),
+        'turns': len(turns),
+        'failed_turns': sum(turn['failed'] for turn in turns),
+        'booking_requests': sum(len(script['messages']) > 1 for script in scripts),
+        'bookings': bookings,
+        'seconds': round(elapsed, 3),
+        'turns_per_second': round(len(turns) / elapsed, 2) if elapsed else 0,
+        'latency_ms': _stats([turn['ms'] for turn in turns]),
+        'queries_per_turn': _stats([turn['queries'] for turn in turns]),
+        'agent_pool': {'hits': agent_pool.hits, 'misses': agent_pool.misses},
+    }
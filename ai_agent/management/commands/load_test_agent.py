@@ -0,0 +1,89 @@
+import json
+import platform
+from datetime import datetime
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+
+from ai_agent.load_test import build_conversations, run_load_test
+from bookings.benchmarks import build_synthetic_businesses
+from bookings.free_busy import rebuild_free_busy
+
+
+class Command(BaseCommand):
+    help = 'Load tests the SMS agent with synthetic conversations on an offline fake LLM'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--conversations', type=int, default=20, help='Number of synthetic conversations')
+        parser.add_argument('--concurrency', type=int, default=8, help='Conversations run at the same time')
+        parser.add_argument('--latency', type=float, default=200, help='Milliseconds every fake LLM call takes')
+        parser.add_argument('--businesses', type=int, default=1, help='Number of synthetic businesses')
+        parser.add_argument('--staff', type=int, default=10, help='Staff members per business')
+        parser.add_argument('--days', type=int, default=14, help='Days of existing bookings')
+        parser.add_argument('--density', type=float, default=0.3, help='Share of open staff time that is already booked (0-1)')
+        parser.add_argument('--seed', type=int, default=42, help='Random seed')
+        parser.add_argument('--keep', action='store_true', help='Keep the synthetic businesses, chats and bookings')
+        parser.add_argument('--output', help='Write results to this JSON file')
+
+    def handle(self, *args, **options):
+        config = {
+            'conversations': options['conversations'],
+            'concurrency': options['concurrency'],
+            'latency_ms': options['latency'],
+            'businesses': options['businesses'],
+            'staff': options['staff'],
+            'days': options['days'],
+            'density': options['density'],
+            'seed': options['seed'],
+        }
+
+        # The fixtures are committed, every conversation thread has its own connection
+        self.stdout.write('Building synthetic businesses...')
+        fixtures = build_synthetic_businesses(
+            businesses=options['businesses'],
+            staff_per_business=options['staff'],
+            days=options['days'],
+            booking_density=options['density'],
+            seed=options['seed'],
+        )
+        try:
+            rebuild_free_busy(fixtures['start_date'], fixtures['end_date'])
+            scripts = build_conversations(fixtures, conversations=options['conversations'], seed=options['seed'])
+
+            self.stdout.write(
+                f"Replaying {len(scripts)} conversations, {options['concurrency']} at a time..."
+            )
+            results = run_load_test(scripts, concurrency=options['concurrency'], latency=options['latency'] / 1000)
+        finally:
+            if not options['keep']:
+                for tenant in fixtures['businesses']:
+                    tenant['business'].user.delete()
+
+        latency, queries = results['latency_ms'], results['queries_per_turn']
+        self.stdout.write(
+            f"{results['turns']} turns in {results['seconds']}s: {results['turns_per_second']} turns/s, "
+            f"{results['bookings']} of {results['booking_requests']} bookings made, {results['failed_turns']} failed turns"
+        )
+        self.stdout.write(
+            f"latency    p50 {latency['p50']:>9.2f}ms  p95 {latency['p95']:>9.2f}ms  max {latency['max']:>9.2f}ms"
+        )
+        self.stdout.write(
+            f"queries    mean {queries['mean']:>7}  p95 {queries['p95']:>7}  max {queries['max']:>7}"
+        )
+        self.stdout.write(
+            f"agent pool {results['agent_pool']['hits']} hits, {results['agent_pool']['misses']} misses"
+        )
+
+        if options['output']:
+            report = {
+                'meta': {
+                    'created_at': datetime.now().isoformat(),
+                    'database': connection.vendor,
+                    'python': platform.python_version(),
+                    'config': config,
+                },
+                'results': results,
+            }
+            with open(options['output'], 'w') as f:
+                json.dump(report, f, indent=2)
+            self.stdout.write(self.style.SUCCESS(f"Results written to {options['output']}"))
@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from ai_agent.sms_queue import dispatch_pending
+
+
+class Command(BaseCommand):
+    help = 'Queues processing for every idle chat with unanswered inbound SMS, e.g. after a worker restart'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--business', help='Only dispatch chats of this business ID')
+
+    def handle(self, *args, **options):
+        queued = dispatch_pending(options['business'])
+        self.stdout.write(self.style.SUCCESS(f'Queued {queued} chats'))
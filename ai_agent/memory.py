@@ -0,0 +1,116 @@
+"""
+Token-bounded conversation memory with a rolling summary.
+
+Only the last few turns of a chat are given to the LLM verbatim. Older turns
+are folded into a running summary that is stored on Chat.summary['memory']
+together with the ID of the last message it covers, so an agent is built
+from the summary plus at most AGENT_MEMORY_TURNS turns instead of the whole
+chat history.
+"""
+from django.conf import settings
+from langchain.memory import ConversationSummaryBufferMemory
+from langchain_core.messages import HumanMessage
+
+from core.tracing import get_tracer
+
+trace = get_tracer('agent')
+
+# Turns (user message plus reply) kept verbatim
+AGENT_MEMORY_TURNS = getattr(settings, 'AGENT_MEMORY_TURNS', 10)
+
+# Token budget of the verbatim turns; older turns are summarized even within AGENT_MEMORY_TURNS
+AGENT_MEMORY_TOKEN_LIMIT = getattr(settings, 'AGENT_MEMORY_TOKEN_LIMIT', 2000)
+
+# Rough tokens per message for role markers and separators
+MESSAGE_OVERHEAD_TOKENS = 4
+
+# Encodings are downloaded on first use; tiktoken is tried once per process
+_encoding = None
+_encoding_failed = False
+
+
+def count_tokens(text, model_name='gpt-4'):
+    """
+    Count the tokens of a text with tiktoken, estimating four characters
+    per token when the encoding isn't available (e.g. offline).
+    """
+    global _encoding, _encoding_failed
+
+    if _encoding is None and not _encoding_failed:
+        try:
+            import tiktoken
+            try:
+                _encoding = tiktoken.encoding_for_model(model_name)
+            except KeyError:
+                _encoding = tiktoken.get_encoding('cl100k_base')
+        except Exception as e:
+            trace.warning("tiktoken unavailable, estimating token counts: {}", e)
+            _encoding_failed = True
+
+    if _encoding is not None:
+        return len(_encoding.encode(text))
+    return len(text) // 4 + 1
+
+
+def count_message_tokens(messages):
+    """Total tokens of a list of chat messages."""
+    return sum(count_tokens(str(message.content)) + MESSAGE_OVERHEAD_TOKENS for message in messages)
+
+
+def stored_memory(chat):
+    """
+    Return the rolling summary stored on a chat.
+
+    Returns:
+        tuple: (summary text, ID of the last message the summary covers)
+    """
+    state = (chat.summary or {}).get('memory') or {}
+    return state.get('summary', ''), state.get('through_message_id', 0)
+
+
+def _turn_starts(buffer):
+    """Indexes where the turns of a buffer start: every user message, and the first message."""
+    return [i for i, message in enumerate(buffer) if i == 0 or isinstance(message, HumanMessage)]
+
+
+class ChatSummaryMemory(ConversationSummaryBufferMemory):
+    """
+    ConversationSummaryBufferMemory that keeps at most max_turns turns and
+    max_token_limit tokens verbatim, counting tokens locally instead of
+    through the LLM wrapper.
+
+    A turn is a user message and whatever follows it, so turns without a reply
+    (failed turns) are pruned whole too. Buffered messages carry the ID of their
+    stored Message as their id, and pruned_through_message_id is the last ID
+    folded into the summary.
+    """
+    max_turns: int = AGENT_MEMORY_TURNS
+    pruned_through_message_id: int = 0
+
+    def prune(self) -> None:
+        buffer = self.chat_memory.messages
+        pruned = []
+        # Always keep the latest turn, drop whole turns from the front
+        while True:
+            starts = _turn_starts(buffer)
+            if len(starts) <= 1 or (
+                len(starts) <= self.max_turns and count_message_tokens(buffer) <= self.max_token_limit
+            ):
+                break
+            pruned.extend(buffer[:starts[1]])
+            del buffer[:starts[1]]
+
+        if not pruned:
+            return
+
+        try:
+            self.moving_summary_buffer = self.predict_new_summary(pruned, self.moving_summary_buffer)
+        except Exception as e:
+            # Keep the turns and try again after the next one
+            trace.error("Error summarizing conversation: {}", e)
+            buffer[:0] = pruned
+            return
+
+        self.pruned_through_message_id = max(
+            [self.pruned_through_message_id] + [int(message.id) for message in pruned if message.id]
+        )
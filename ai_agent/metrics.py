@@ -0,0 +1,184 @@
+"""
+Per-turn agent metrics.
+
+LangChainAgent.process_message runs every AgentExecutor turn with a
+TurnMetricsHandler, which times the turn's LLM round trips and tool calls and
+counts their tokens, and stores the result as one TurnMetrics row.
+business_metrics() aggregates the rows of a business for the dashboard.
+"""
+import time
+from datetime import timedelta
+
+from django.db.models import Avg, Count, Max, Q, Sum
+from django.utils import timezone
+from langchain_core.callbacks import BaseCallbackHandler
+
+from core.tracing import get_tracer
+from .memory import count_message_tokens, count_tokens
+from .models import TurnMetrics
+
+trace = get_tracer('agent')
+
+
+def _ms(seconds):
+    return int(round(seconds * 1000))
+
+
+class TurnMetricsHandler(BaseCallbackHandler):
+    """
+    Collects the timing and token counts of one agent turn. Token counts come
+    from the API's usage report, or are estimated when it has none (streaming).
+    """
+
+    def __init__(self):
+        self.started = time.monotonic()
+        self.wall_ms = 0
+        self.llm_calls = 0
+        self.llm_ms = 0
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+        self.tool_calls = 0
+        self.tool_ms = 0
+        self.tools = {}
+        # run_id -> (start time, function estimating the prompt tokens, or tool name)
+        self._runs = {}
+
+    def on_chat_model_start(self, serialized, messages, *, run_id, **kwargs):
+        self._runs[run_id] = (time.monotonic(), lambda: sum(count_message_tokens(batch) for batch in messages))
+
+    def on_llm_start(self, serialized, prompts, *, run_id, **kwargs):
+        self._runs[run_id] = (time.monotonic(), lambda: sum(count_tokens(prompt) for prompt in prompts))
+
+    def on_llm_end(self, response, *, run_id, **kwargs):
+        started, prompt_estimate = self._runs.pop(run_id, (None, None))
+        if started is None:
+            return
+        self.llm_calls += 1
+        self.llm_ms += _ms(time.monotonic() - started)
+
+        usage = (response.llm_output or {}).get('token_usage') or {}
+        if usage.get('prompt_tokens') is not None:
+            self.prompt_tokens += usage['prompt_tokens']
+            self.completion_tokens += usage.get('completion_tokens') or 0
+        else:
+            self.prompt_tokens += prompt_estimate()
+            self.completion_tokens += sum(
+                count_tokens(generation.text or str(getattr(generation, 'message', '')))
+                for generations in response.generations for generation in generations
+            )
+
+    def on_llm_error(self, error, *, run_id, **kwargs):
+        started, _ = self._runs.pop(run_id, (None, None))
+        if started is not None:
+            self.llm_calls += 1
+            self.llm_ms += _ms(time.monotonic() - started)
+
+    def on_tool_start(self, serialized, input_str, *, run_id, **kwargs):
+        self._runs[run_id] = (time.monotonic(), (serialized or {}).get('name') or 'unknown')
+
+    def on_tool_end(self, output, *, run_id, **kwargs):
+        started, name = self._runs.pop(run_id, (None, None))
+        if started is None:
+            return
+        elapsed = _ms(time.monotonic() - started)
+        self.tool_calls += 1
+        self.tool_ms += elapsed
+        calls, ms = self.tools.get(name, (0, 0))
+        self.tools[name] = [calls + 1, ms + elapsed]
+
+    on_tool_error = on_tool_end
+
+    def finish(self):
+        self.wall_ms = _ms(time.monotonic() - self.started)
+
+    def save(self, agent, message=None, failed=False):
+        """
+        Store the turn's metrics.
+
+        Args:
+            agent: LangChainAgent that ran the turn
+            message: Optional assistant Message of the turn
+            failed: Whether the turn failed
+
+        Returns:
+            TurnMetrics: The stored row, or None if it couldn't be stored
+        """
+        if not self.wall_ms:
+            self.finish()
+        cache_stats = getattr(agent, 'tool_cache_stats', None) or {}
+        try:
+            return TurnMetrics.objects.create(
+                business_id=agent.business.id,
+                chat=agent.chat,
+                message=message,
+                wall_ms=self.wall_ms,
+                llm_calls=self.llm_calls,
+                llm_ms=self.llm_ms,
+                prompt_tokens=self.prompt_tokens,
+                completion_tokens=self.completion_tokens,
+                tool_calls=self.tool_calls,
+                tool_ms=self.tool_ms,
+                tools=self.tools,
+                cache_hits=cache_stats.get('hits', 0),
+                cache_misses=cache_stats.get('misses', 0),
+                failed=failed
+            )
+        except Exception as e:
+            # Metrics never fail a turn
+            trace.error("Error saving turn metrics: {}", e)
+            return None
+
+
+def _percentile(values, fraction):
+    if not values:
+        return 0
+    return values[min(len(values) - 1, int(len(values) * fraction))]
+
+
+def business_metrics(business, days=7):
+    """
+    Aggregate a business's agent turns.
+
+    Args:
+        business: Business object
+        days: Number of days to aggregate, counted back from now
+
+    Returns:
+        dict: Turn count, failures, latency (average, p50, p95, max), LLM calls and
+              tokens, and per tool call counts and average latency
+    """
+    turns = TurnMetrics.objects.filter(business=business, created_at__gte=timezone.now() - timedelta(days=days))
+
+    totals = turns.aggregate(
+        turns=Count('id'),
+        failed=Count('id', filter=Q(failed=True)),
+        avg_wall_ms=Avg('wall_ms'),
+        max_wall_ms=Max('wall_ms'),
+        avg_llm_ms=Avg('llm_ms'),
+        avg_llm_calls=Avg('llm_calls'),
+        max_llm_calls=Max('llm_calls'),
+        prompt_tokens=Sum('prompt_tokens'),
+        completion_tokens=Sum('completion_tokens'),
+        tool_calls=Sum('tool_calls'),
+        cache_hits=Sum('cache_hits'),
+        cache_misses=Sum('cache_misses'),
+    )
+    totals = {key: value or 0 for key, value in totals.items()}
+
+    wall_times = sorted(turns.values_list('wall_ms', flat=True))
+    totals['p50_wall_ms'] = _percentile(wall_times, 0.5)
+    totals['p95_wall_ms'] = _percentile(wall_times, 0.95)
+    totals['total_tokens'] = totals['prompt_tokens'] + totals['completion_tokens']
+    totals['avg_tokens'] = totals['total_tokens'] / totals['turns'] if totals['turns'] else 0
+
+    tools = {}
+    for per_tool in turns.values_list('tools', flat=True):
+        for name, (calls, ms) in (per_tool or {}).items():
+            tool = tools.setdefault(name, {'name': name, 'calls': 0, 'ms': 0})
+            tool['calls'] += calls
+            tool['ms'] += ms
+    for tool in tools.values():
+        tool['avg_ms'] = tool['ms'] / tool['calls'] if tool['calls'] else 0
+    totals['tools'] = sorted(tools.values(), key=lambda tool: -tool['calls'])
+    totals['days'] = days
+    return totals
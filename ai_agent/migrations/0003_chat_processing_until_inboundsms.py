@@ -0,0 +1,38 @@
+# Generated by Django 5.2 on 2026-10-17 07:12
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ai_agent', '0002_chat_response_received'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='chat',
+            name='processing_until',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.CreateModel(
+            name='InboundSMS',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('to_number', models.CharField(max_length=20)),
+                ('body', models.TextField()),
+                ('message_sid', models.CharField(blank=True, max_length=64, null=True, unique=True)),
+                ('status', models.CharField(choices=[('pending', 'Pending'), ('processing', 'Processing'), ('processed', 'Processed'), ('failed', 'Failed')], default='pending', max_length=20)),
+                ('attempts', models.PositiveSmallIntegerField(default=0)),
+                ('error', models.TextField(blank=True, null=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('processed_at', models.DateTimeField(blank=True, null=True)),
+                ('chat', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='inbound_sms', to='ai_agent.chat')),
+            ],
+            options={
+                'ordering': ['created_at', 'id'],
+                'indexes': [models.Index(fields=['chat', 'status'], name='ai_agent_in_chat_id_3d5cc2_idx'), models.Index(fields=['status', 'created_at'], name='ai_agent_in_status_86f9e4_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,47 @@
+# Generated by Django 5.2 on 2026-10-17 07:15
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ai_agent', '0003_chat_processing_until_inboundsms'),
+        ('business', '0016_business_catalog_version'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SMSSendLane',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('from_number', models.CharField(max_length=20, unique=True)),
+                ('locked_until', models.DateTimeField(blank=True, null=True)),
+                ('last_sent_at', models.DateTimeField(blank=True, null=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='OutboundSMS',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('from_number', models.CharField(max_length=20)),
+                ('to_number', models.CharField(max_length=20)),
+                ('body', models.TextField()),
+                ('status', models.CharField(choices=[('queued', 'Queued'), ('sent', 'Sent'), ('delivered', 'Delivered'), ('undelivered', 'Undelivered'), ('failed', 'Failed')], default='queued', max_length=20)),
+                ('message_sid', models.CharField(blank=True, max_length=64, null=True, unique=True)),
+                ('attempts', models.PositiveSmallIntegerField(default=0)),
+                ('error_code', models.CharField(blank=True, max_length=20, null=True)),
+                ('error', models.TextField(blank=True, null=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('sent_at', models.DateTimeField(blank=True, null=True)),
+                ('status_updated_at', models.DateTimeField(blank=True, null=True)),
+                ('business', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='outbound_sms', to='business.business')),
+                ('chat', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='outbound_sms', to='ai_agent.chat')),
+            ],
+            options={
+                'ordering': ['created_at', 'id'],
+                'indexes': [models.Index(fields=['from_number', 'status'], name='ai_agent_ou_from_nu_68ead2_idx')],
+            },
+        ),
+    ]
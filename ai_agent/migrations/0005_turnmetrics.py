@@ -0,0 +1,39 @@
+# Generated by Django 5.2 on 2026-10-17 07:20
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ai_agent', '0004_smssendlane_outboundsms'),
+        ('business', '0016_business_catalog_version'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TurnMetrics',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('wall_ms', models.PositiveIntegerField(default=0)),
+                ('llm_calls', models.PositiveSmallIntegerField(default=0)),
+                ('llm_ms', models.PositiveIntegerField(default=0)),
+                ('prompt_tokens', models.PositiveIntegerField(default=0)),
+                ('completion_tokens', models.PositiveIntegerField(default=0)),
+                ('tool_calls', models.PositiveSmallIntegerField(default=0)),
+                ('tool_ms', models.PositiveIntegerField(default=0)),
+                ('tools', models.JSONField(blank=True, default=dict)),
+                ('cache_hits', models.PositiveSmallIntegerField(default=0)),
+                ('cache_misses', models.PositiveSmallIntegerField(default=0)),
+                ('failed', models.BooleanField(default=False)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('business', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='agent_turn_metrics', to='business.business')),
+                ('chat', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='turn_metrics', to='ai_agent.chat')),
+                ('message', models.OneToOneField(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='turn_metrics', to='ai_agent.message')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['business', 'created_at'], name='ai_agent_tu_busines_7768d6_idx')],
+            },
+        ),
+    ]
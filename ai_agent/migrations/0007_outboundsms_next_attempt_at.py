@@ -0,0 +1,18 @@
+# Generated by Django 5.2 on 2026-10-17 07:59
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ai_agent', '0006_inboundsms_next_attempt_at'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='outboundsms',
+            name='next_attempt_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+    ]
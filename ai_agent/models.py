@@ -35,6 +35,9 @@ class Chat(models.Model):
     summary = models.JSONField(default=dict, blank=True, null=True)
 
     response_received = models.BooleanField(default=False)
+
+    # Lease on the chat's SMS queue, held by the worker running its turns (see ai_agent.sms_queue)
+    processing_until = models.DateTimeField(blank=True, null=True)
     
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
@@ -82,3 +85,123 @@ class Message(models.Model):
     def __str__(self):
         return f"{self.chat.id} - {self.role} - {self.created_at.strftime('%Y-%m-%d %H:%M')}"
 
+
+
+class InboundSMS(models.Model):
+    """
+    Model for queueing inbound SMS messages until the agent has answered them.
+    Messages of one chat are answered in order by ai_agent.sms_queue.
+    """
+    STATUS_CHOICES = (
+        ('pending', 'Pending'),
+        ('processing', 'Processing'),
+        ('processed', 'Processed'),
+        ('failed', 'Failed'),
+    )
+
+    chat = models.ForeignKey(Chat, on_delete=models.CASCADE, related_name='inbound_sms')
+    to_number = models.CharField(max_length=20)
+    body = models.TextField()
+    # Twilio's MessageSid, so a retried webhook isn't queued twice
+    message_sid = models.CharField(max_length=64, unique=True, blank=True, null=True)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending')
+    attempts = models.PositiveSmallIntegerField(default=0)
+    # Set while a new message is held for coalescing or after a failed turn, it isn't answered before then
+    next_attempt_at = models.DateTimeField(blank=True, null=True)
+    error = models.TextField(blank=True, null=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    processed_at = models.DateTimeField(blank=True, null=True)
+
+    class Meta:
+        ordering = ['created_at', 'id']
+        indexes = [
+            models.Index(fields=['chat', 'status']),
+            models.Index(fields=['status', 'created_at']),
+        ]
+
+    def __str__(self):
+        return f"{self.chat} - {self.status} - {self.created_at.strftime('%Y-%m-%d %H:%M')}"
+
+
+class OutboundSMS(models.Model):
+    """
+    Model for queueing outbound SMS and tracking their delivery.
+    Messages are sent in batches per sending number by ai_agent.sms_sender.
+    """
+    STATUS_CHOICES = (
+        ('queued', 'Queued'),
+        ('sent', 'Sent'),
+        ('delivered', 'Delivered'),
+        ('undelivered', 'Undelivered'),
+        ('failed', 'Failed'),
+    )
+
+    business = models.ForeignKey(Business, on_delete=models.CASCADE, related_name='outbound_sms')
+    chat = models.ForeignKey(Chat, on_delete=models.SET_NULL, related_name='outbound_sms', blank=True, null=True)
+    from_number = models.CharField(max_length=20)
+    to_number = models.CharField(max_length=20)
+    body = models.TextField()
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='queued')
+    # Twilio's MessageSid, set once Twilio accepted the message
+    message_sid = models.CharField(max_length=64, unique=True, blank=True, null=True)
+    attempts = models.PositiveSmallIntegerField(default=0)
+    # Set after a failed send, the message isn't sent again before then
+    next_attempt_at = models.DateTimeField(blank=True, null=True)
+    error_code = models.CharField(max_length=20, blank=True, null=True)
+    error = models.TextField(blank=True, null=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    sent_at = models.DateTimeField(blank=True, null=True)
+    status_updated_at = models.DateTimeField(blank=True, null=True)
+
+    class Meta:
+        ordering = ['created_at', 'id']
+        indexes = [
+            models.Index(fields=['from_number', 'status']),
+        ]
+
+    def __str__(self):
+        return f"{self.business.name} - {self.to_number} - {self.status}"
+
+
+class SMSSendLane(models.Model):
+    """
+    Lease on a sending number, so one worker at a time sends from it and
+    sends can be paced per number.
+    """
+    from_number = models.CharField(max_length=20, unique=True)
+    locked_until = models.DateTimeField(blank=True, null=True)
+    last_sent_at = models.DateTimeField(blank=True, null=True)
+
+    def __str__(self):
+        return self.from_number
+
+
+class TurnMetrics(models.Model):
+    """
+    Model for storing the cost and timing of one agent turn (see ai_agent.metrics).
+    """
+    business = models.ForeignKey(Business, on_delete=models.CASCADE, related_name='agent_turn_metrics')
+    chat = models.ForeignKey(Chat, on_delete=models.SET_NULL, related_name='turn_metrics', blank=True, null=True)
+    # The assistant reply of the turn, unset if the turn failed
+    message = models.OneToOneField(Message, on_delete=models.SET_NULL, related_name='turn_metrics', blank=True, null=True)
+    wall_ms = models.PositiveIntegerField(default=0)
+    llm_calls = models.PositiveSmallIntegerField(default=0)
+    llm_ms = models.PositiveIntegerField(default=0)
+    prompt_tokens = models.PositiveIntegerField(default=0)
+    completion_tokens = models.PositiveIntegerField(default=0)
+    tool_calls = models.PositiveSmallIntegerField(default=0)
+    tool_ms = models.PositiveIntegerField(default=0)
+    # Per tool: {name: [calls, milliseconds]}
+    tools = models.JSONField(default=dict, blank=True)
+    cache_hits = models.PositiveSmallIntegerField(default=0)
+    cache_misses = models.PositiveSmallIntegerField(default=0)
+    failed = models.BooleanField(default=False)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['business', 'created_at']),
+        ]
+
+    def __str__(self):
+        return f"{self.business.name} - {self.wall_ms}ms - {self.created_at.strftime('%Y-%m-%d %H:%M')}"
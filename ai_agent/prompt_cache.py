@@ -0,0 +1,40 @@
+"""
+Cache of rendered agent system prompts.
+
+Prompts list the whole service catalog, so they are rendered once per
+(business, catalog version, channel) and then read from the cache.
+Business.catalog_version changes whenever the business, its services,
+service items or agent config change (see ai_agent.signals), so old
+entries are simply never read again and expire with the timeout.
+"""
+from django.conf import settings
+from django.core.cache import caches
+
+PROMPT_CACHE_TIMEOUT = getattr(settings, 'PROMPT_CACHE_TIMEOUT', 60 * 60 * 24)
+
+CACHE_ALIAS = 'default'
+
+
+def prompt_cache_key(business, channel):
+    return f'ai_agent:prompt:{business.id}:{business.catalog_version}:{channel}'
+
+
+def cached_prompt(business, channel, render):
+    """
+    Return a business's system prompt for a channel, rendering it on a miss.
+
+    Args:
+        business (Business): Business the prompt is for
+        channel (str): 'chat' for the SMS/web agent, 'voice' for Retell
+        render (callable): Builds the prompt from the business
+
+    Returns:
+        str: The system prompt
+    """
+    cache = caches[CACHE_ALIAS]
+    key = prompt_cache_key(business, channel)
+    prompt = cache.get(key)
+    if prompt is None:
+        prompt = render(business)
+        cache.set(key, prompt, timeout=PROMPT_CACHE_TIMEOUT)
+    return prompt
@@ -0,0 +1,37 @@
+"""
+Signal receivers that keep agent prompts and pooled agents current.
+
+Agents bake the business and its service catalog into their system prompt,
+so any change to them gives the business a new catalog version. Changes to
+the Business's prompt fields bump the version in Business.save().
+"""
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+
+from business.models import Business, ServiceOffering, ServiceItem, ServiceOfferingItem
+from .agent_pool import agent_pool
+from .models import AgentConfig, Chat
+
+
+@receiver(post_save, sender=ServiceOffering)
+@receiver(post_delete, sender=ServiceOffering)
+@receiver(post_save, sender=ServiceItem)
+@receiver(post_delete, sender=ServiceItem)
+@receiver(post_save, sender=AgentConfig)
+@receiver(post_delete, sender=AgentConfig)
+def bump_catalog_version(sender, instance, **kwargs):
+    Business.bump_catalog_version(instance.business_id)
+
+
+@receiver(post_save, sender=ServiceOfferingItem)
+@receiver(post_delete, sender=ServiceOfferingItem)
+def bump_catalog_version_for_offering_item(sender, instance, **kwargs):
+    business_id = ServiceOffering.objects.filter(
+        id=instance.service_offering_id
+    ).values_list('business_id', flat=True).first()
+    Business.bump_catalog_version(business_id)
+
+
+@receiver(post_delete, sender=Chat)
+def discard_agent_for_chat(sender, instance, **kwargs):
+    agent_pool.discard(instance.id)
@@ -0,0 +1,234 @@
+"""
+Durable, per-chat serialized queue for inbound SMS.
+
+twilio_webhook stores each message as an InboundSMS and queues a django-q task
+for its chat. The task takes the chat's lease (Chat.processing_until) so only
+one worker answers a chat at a time, then answers the chat's pending messages
+oldest first. Messages that arrive while a chat is queued or being answered
+are coalesced, so a customer's quick follow-up texts get one agent turn.
+
+At most SMS_BUSINESS_CONCURRENCY chats of a business are answered at once,
+leases are taken under a lock on the business row. A chat that finds no free
+slot stays pending and is dispatched when another chat of the business
+releases its lease. Leases expire, so the messages of a
+worker that died are picked up again by the next task or by the
+process_sms_queue command.
+
+A chat isn't answered before the next_attempt_at of its messages, which holds
+new messages for SMS_COALESCE_SECONDS and failed ones for a retry backoff. A
+one-off django-q schedule queues the chat again when they are due, so no
+worker sleeps, and dispatch_pending leaves chats that aren't due alone.
+"""
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import Q
+from django.utils import timezone
+from django_q.models import Schedule
+from django_q.tasks import async_task, schedule
+
+from business.models import Business
+from core.tracing import get_tracer
+from .models import Chat, InboundSMS
+from .sms_sender import queue_sms
+
+trace = get_tracer('agent')
+
+# How long a worker may hold a chat before it's considered dead, at least the django-q task timeout
+SMS_CHAT_LEASE_SECONDS = getattr(settings, 'SMS_CHAT_LEASE_SECONDS', 300)
+
+# Chats of one business answered at the same time
+SMS_BUSINESS_CONCURRENCY = getattr(settings, 'SMS_BUSINESS_CONCURRENCY', 4)
+
+# Seconds a new message is held, so texts sent in quick succession share a turn. The
+# chat is queued again by a django-q schedule, which the cluster checks about every
+# 15 seconds, so holding delays the reply by that much; off by default
+SMS_COALESCE_SECONDS = getattr(settings, 'SMS_COALESCE_SECONDS', 0)
+
+# Turns tried before a message is marked failed
+SMS_MAX_ATTEMPTS = getattr(settings, 'SMS_MAX_ATTEMPTS', 3)
+
+# Seconds before a failed turn is retried, doubled for every further attempt
+SMS_RETRY_SECONDS = getattr(settings, 'SMS_RETRY_SECONDS', 30)
+
+UNANSWERED = ['pending', 'processing']
+
+TASK = 'ai_agent.sms_queue.process_chat_sms'
+
+
+def enqueue_sms(business_id, from_number, to_number, body, message_sid=None):
+    """
+    Store an inbound SMS and queue its chat for processing.
+
+    Args:
+        business_id: ID of the business the SMS was sent to
+        from_number: Customer number the SMS came from
+        to_number: Business number the SMS was sent to
+        body: Text content of the SMS
+        message_sid: Optional Twilio MessageSid, used to drop webhook retries
+
+    Returns:
+        InboundSMS: The queued message, or None if it was already queued
+    """
+    chat, _ = Chat.objects.get_or_create(business_id=business_id, phone_number=from_number)
+    hold_until = timezone.now() + timedelta(seconds=SMS_COALESCE_SECONDS) if SMS_COALESCE_SECONDS else None
+    try:
+        with transaction.atomic():
+            sms = InboundSMS.objects.create(
+                chat=chat, to_number=to_number, body=body, message_sid=message_sid or None,
+                next_attempt_at=hold_until
+            )
+    except IntegrityError:
+        trace.info("Dropping duplicate SMS {}", message_sid)
+        return None
+
+    transaction.on_commit(lambda: _queue(chat.id, hold_until))
+    return sms
+
+
+def _acquire(chat):
+    """Take the chat's lease if it's free and its business has a free slot."""
+    with transaction.atomic():
+        # Workers of one business count and take slots one at a time while they
+        # hold the business row, so the count can't go stale before the update
+        list(Business.objects.select_for_update().filter(pk=chat.business_id).values_list('pk', flat=True))
+
+        now = timezone.now()
+        active = Chat.objects.filter(
+            business_id=chat.business_id, processing_until__gt=now
+        ).exclude(pk=chat.pk).count()
+        if active >= SMS_BUSINESS_CONCURRENCY:
+            return False
+
+        # The conditional update is atomic, only one worker can win a free lease
+        return Chat.objects.filter(
+            Q(processing_until__isnull=True) | Q(processing_until__lte=now), pk=chat.pk
+        ).update(processing_until=now + timedelta(seconds=SMS_CHAT_LEASE_SECONDS)) == 1
+
+
+def _renew(chat):
+    Chat.objects.filter(pk=chat.pk).update(
+        processing_until=timezone.now() + timedelta(seconds=SMS_CHAT_LEASE_SECONDS)
+    )
+
+
+def _release(chat):
+    Chat.objects.filter(pk=chat.pk).update(processing_until=None)
+
+
+def _queue(chat_id, when=None):
+    """Queue a task for a chat, now or at a later time."""
+    if when is None or when <= timezone.now():
+        async_task(TASK, chat_id)
+    else:
+        schedule(TASK, chat_id, schedule_type=Schedule.ONCE, next_run=when)
+
+
+def _retry_at(attempts):
+    return timezone.now() + timedelta(seconds=SMS_RETRY_SECONDS * 2 ** (attempts - 1))
+
+
+def _next_batch(chat):
+    """
+    Return the chat's unanswered messages, oldest first, and None, or an empty
+    batch and the time to come back if they aren't due yet. Messages left
+    processing by a worker whose lease expired are included.
+    """
+    batch = list(InboundSMS.objects.filter(chat=chat, status__in=UNANSWERED))
+    due_at = max((sms.next_attempt_at for sms in batch if sms.next_attempt_at), default=None)
+    if due_at and due_at > timezone.now():
+        return [], due_at
+    return batch, None
+
+
+def _answer(chat, batch):
+    """
+    Run one agent turn for a batch of messages and send the reply. A failed turn
+    is retried, the customer only gets an apology once the last attempt failed.
+    """
+    from .utils import SMS_ERROR_REPLY, process_sms_with_langchain
+
+    ids = [sms.id for sms in batch]
+    attempts = max(sms.attempts for sms in batch) + 1
+    InboundSMS.objects.filter(id__in=ids).update(status='processing', attempts=attempts)
+
+    try:
+        message = '\n'.join(sms.body for sms in batch)
+        response = process_sms_with_langchain(chat.business_id, chat.phone_number, message, raise_errors=True)
+        # Reply from the number the customer wrote to last
+        queue_sms(chat.business, batch[-1].to_number, chat.phone_number, response, chat=chat)
+    except Exception as e:
+        trace.error("Error answering SMS for chat {}: {}", chat.id, e, exc_info=True)
+        if attempts >= SMS_MAX_ATTEMPTS:
+            InboundSMS.objects.filter(id__in=ids).update(status='failed', error=str(e))
+            queue_sms(chat.business, batch[-1].to_number, chat.phone_number, SMS_ERROR_REPLY, chat=chat)
+        else:
+            InboundSMS.objects.filter(id__in=ids).update(
+                status='pending', error=str(e), next_attempt_at=_retry_at(attempts)
+            )
+        return False
+
+    InboundSMS.objects.filter(id__in=ids).update(status='processed', processed_at=timezone.now())
+    return True
+
+
+def process_chat_sms(chat_id):
+    """
+    django-q task: answer a chat's queued SMS, in order, until none are left.
+
+    Args:
+        chat_id: ID of the chat whose messages to answer
+    """
+    chat = Chat.objects.select_related('business').filter(id=chat_id).first()
+    if chat is None:
+        return
+    if not _acquire(chat):
+        # Busy chats pick up their new messages themselves, others are
+        # dispatched once a slot of the business frees up
+        trace.debug("Chat {} is busy or its business is at capacity", chat_id)
+        return
+
+    try:
+        while True:
+            batch, due_at = _next_batch(chat)
+            if due_at:
+                # Held for coalescing or waiting for a retry
+                _queue(chat.id, due_at)
+                break
+            if not batch:
+                break
+            _renew(chat)
+            _answer(chat, batch)
+    finally:
+        _release(chat)
+        dispatch_pending(chat.business_id)
+
+
+def dispatch_pending(business_id=None):
+    """
+    Queue a task for every idle chat with unanswered messages that are due.
+
+    Args:
+        business_id: Optional business to limit dispatching to
+
+    Returns:
+        int: Number of chats queued
+    """
+    now = timezone.now()
+    waiting = InboundSMS.objects.filter(status__in=UNANSWERED, next_attempt_at__gt=now).values('chat_id')
+    pending = InboundSMS.objects.filter(
+        status__in=UNANSWERED
+    ).filter(
+        Q(chat__processing_until__isnull=True) | Q(chat__processing_until__lte=now)
+    ).exclude(chat_id__in=waiting)
+    if business_id is not None:
+        pending = pending.filter(chat__business_id=business_id)
+
+    # Oldest waiting chats first; a business only gets as many as it has slots
+    chat_ids = list(dict.fromkeys(pending.order_by('created_at').values_list('chat_id', flat=True)))
+    if business_id is not None:
+        chat_ids = chat_ids[:SMS_BUSINESS_CONCURRENCY]
+    for chat_id in chat_ids:
+        async_task(TASK, chat_id)
+    return len(chat_ids)
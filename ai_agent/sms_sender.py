@@ -0,0 +1,234 @@
+"""
+Outbound SMS through Twilio.
+
+Replies are stored as OutboundSMS and sent by a django-q task per sending
+number. The task holds the number's SMSSendLane lease, sends up to
+TWILIO_SEND_BATCH_SIZE messages paced at TWILIO_SENDS_PER_SECOND, and queues
+itself again while messages are left. A failed send is retried after a
+backoff by a one-off django-q schedule. Twilio clients are cached per account,
+so their HTTP session (and its kept-alive connections) is reused across sends.
+
+Twilio reports delivery to twilio_status_callback, which updates the message's
+status, so no worker waits for delivery. Callbacks must be signed with the auth
+token of the business that sent the message.
+"""
+import time
+from datetime import timedelta
+from functools import lru_cache
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import Min, Q
+from django.urls import reverse
+from django.utils import timezone
+from django_q.models import Schedule
+from django_q.tasks import async_task, schedule
+from twilio.http.http_client import TwilioHttpClient
+from twilio.request_validator import RequestValidator
+from twilio.rest import Client
+
+from core.tracing import get_tracer
+from .models import OutboundSMS, SMSSendLane
+
+trace = get_tracer('agent')
+
+# Seconds before a request to Twilio is given up
+TWILIO_TIMEOUT = getattr(settings, 'TWILIO_TIMEOUT', 10)
+
+# Sends per second from one number (Twilio queues anything above a long code's 1/s)
+TWILIO_SENDS_PER_SECOND = getattr(settings, 'TWILIO_SENDS_PER_SECOND', 1)
+
+# Messages sent by one task before it queues itself again
+TWILIO_SEND_BATCH_SIZE = getattr(settings, 'TWILIO_SEND_BATCH_SIZE', 50)
+
+# How long a sender may hold a number before it's considered dead
+TWILIO_SEND_LEASE_SECONDS = getattr(settings, 'TWILIO_SEND_LEASE_SECONDS', 120)
+
+# Sends tried before a message is marked failed
+SMS_SEND_MAX_ATTEMPTS = getattr(settings, 'SMS_SEND_MAX_ATTEMPTS', 3)
+
+# Seconds before a failed send is retried, doubled for every further attempt
+SMS_SEND_RETRY_SECONDS = getattr(settings, 'SMS_SEND_RETRY_SECONDS', 30)
+
+TASK = 'ai_agent.sms_sender.send_queued_sms'
+
+# Twilio statuses recorded from status callbacks, and the ones they may replace
+CALLBACK_STATUSES = {
+    'sent': ['queued'],
+    'delivered': ['queued', 'sent'],
+    'undelivered': ['queued', 'sent'],
+    'failed': ['queued', 'sent'],
+}
+
+
+@lru_cache(maxsize=256)
+def get_twilio_client(account_sid, auth_token):
+    """
+    Return a Twilio client for an account, reusing one per SID and token.
+
+    Args:
+        account_sid: Twilio account SID
+        auth_token: Twilio auth token
+
+    Returns:
+        Client: Twilio REST client with a pooled HTTP session
+    """
+    http_client = TwilioHttpClient(pool_connections=True, timeout=TWILIO_TIMEOUT)
+    return Client(account_sid, auth_token, http_client=http_client)
+
+
+def queue_sms(business, from_number, to_number, body, chat=None):
+    """
+    Queue an SMS to be sent from a business number.
+
+    Args:
+        business: Business object sending the SMS
+        from_number: Twilio number to send from
+        to_number: Number to send to
+        body: Message content
+        chat: Optional chat the message answers
+
+    Returns:
+        OutboundSMS: The queued message
+    """
+    sms = OutboundSMS.objects.create(
+        business=business, chat=chat, from_number=from_number, to_number=to_number, body=body
+    )
+    transaction.on_commit(lambda: async_task(TASK, from_number))
+    return sms
+
+
+def status_callback_url():
+    return f"{settings.BASE_URL}{reverse('ai_agent:twilio_status_callback')}"
+
+
+def _lane(from_number):
+    try:
+        return SMSSendLane.objects.get_or_create(from_number=from_number)[0]
+    except IntegrityError:
+        # Created by another sender meanwhile
+        return SMSSendLane.objects.get(from_number=from_number)
+
+
+def _acquire(lane):
+    now = timezone.now()
+    return SMSSendLane.objects.filter(
+        Q(locked_until__isnull=True) | Q(locked_until__lte=now), pk=lane.pk
+    ).update(locked_until=now + timedelta(seconds=TWILIO_SEND_LEASE_SECONDS)) == 1
+
+
+def _send(sms):
+    """Send one message, recording the result on it."""
+    config = getattr(sms.business, 'configuration', None)
+    if not config or not config.twilio_sid or not config.twilio_auth_token:
+        sms.status = 'failed'
+        sms.error = 'Twilio is not configured for this business'
+        sms.save(update_fields=['status', 'error'])
+        return
+
+    sms.attempts += 1
+    try:
+        client = get_twilio_client(config.twilio_sid, config.twilio_auth_token)
+        message = client.messages.create(
+            body=sms.body,
+            from_=sms.from_number,
+            to=sms.to_number,
+            status_callback=status_callback_url()
+        )
+    except Exception as e:
+        trace.error("Error sending SMS {} to {}: {}", sms.id, sms.to_number, e)
+        if sms.attempts >= SMS_SEND_MAX_ATTEMPTS:
+            sms.status = 'failed'
+        else:
+            sms.next_attempt_at = timezone.now() + timedelta(
+                seconds=SMS_SEND_RETRY_SECONDS * 2 ** (sms.attempts - 1)
+            )
+        sms.error = str(e)
+        sms.save(update_fields=['status', 'attempts', 'error', 'next_attempt_at'])
+        return
+
+    sms.status = 'sent'
+    sms.message_sid = message.sid
+    sms.sent_at = timezone.now()
+    sms.save(update_fields=['status', 'attempts', 'message_sid', 'sent_at'])
+
+
+def send_queued_sms(from_number):
+    """
+    django-q task: send a batch of the messages queued for a number, oldest first.
+
+    Args:
+        from_number: Twilio number whose queued messages to send
+    """
+    due = Q(next_attempt_at__isnull=True) | Q(next_attempt_at__lte=timezone.now())
+    lane = _lane(from_number)
+    if not _acquire(lane):
+        # The sender holding the number picks the messages up
+        return
+
+    interval = 1.0 / TWILIO_SENDS_PER_SECOND
+    last_sent_at = lane.last_sent_at
+    try:
+        batch = OutboundSMS.objects.filter(
+            due, from_number=from_number, status='queued'
+        ).select_related('business__configuration')[:TWILIO_SEND_BATCH_SIZE]
+
+        for sms in batch:
+            if last_sent_at:
+                wait = interval - (timezone.now() - last_sent_at).total_seconds()
+                if wait > 0:
+                    time.sleep(wait)
+            _send(sms)
+            last_sent_at = timezone.now()
+    finally:
+        SMSSendLane.objects.filter(pk=lane.pk).update(locked_until=None, last_sent_at=last_sent_at)
+
+    # The rest of the queue goes in the next batch, failed sends once their retry is due
+    queued = OutboundSMS.objects.filter(from_number=from_number, status='queued')
+    if queued.filter(due).exists():
+        async_task(TASK, from_number)
+    else:
+        retry_at = queued.aggregate(retry_at=Min('next_attempt_at'))['retry_at']
+        if retry_at:
+            schedule(TASK, from_number, schedule_type=Schedule.ONCE, next_run=retry_at)
+
+
+def verify_status_callback(message_sid, params, signature):
+    """
+    Check a status callback's X-Twilio-Signature against the auth token of the
+    business that sent the message.
+
+    Args:
+        message_sid: Twilio MessageSid the callback is about
+        params: POST parameters of the callback
+        signature: Value of the X-Twilio-Signature header
+
+    Returns:
+        bool: Whether the callback was signed by the message's Twilio account
+    """
+    sms = OutboundSMS.objects.select_related('business__configuration').filter(message_sid=message_sid).first()
+    config = getattr(sms.business, 'configuration', None) if sms else None
+    if not signature or not config or not config.twilio_auth_token:
+        return False
+    # Twilio signs the URL it was given when the message was sent
+    return RequestValidator(config.twilio_auth_token).validate(status_callback_url(), params, signature)
+
+
+def record_status(message_sid, status, error_code=None):
+    """
+    Record a delivery status reported by Twilio.
+
+    Args:
+        message_sid: Twilio MessageSid
+        status: Twilio MessageStatus
+        error_code: Optional Twilio ErrorCode
+
+    Returns:
+        bool: Whether a message was updated
+    """
+    if status not in CALLBACK_STATUSES:
+        return False
+    # Callbacks can arrive out of order, never go back to an earlier status
+    return OutboundSMS.objects.filter(
+        message_sid=message_sid, status__in=CALLBACK_STATUSES[status] + [status]
+    ).update(status=status, error_code=error_code or None, status_updated_at=timezone.now()) > 0
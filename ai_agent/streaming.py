@@ -0,0 +1,140 @@
+"""
+Streaming web chat over Server-Sent Events (django-eventstream).
+
+The widget POSTs a message to stream_message, which returns the SSE channel of
+its chat and hands the agent turn to a small thread pool, so the request
+returns at once. The turn publishes to the channel as it runs:
+
+    token  {"turn", "text"}             Pieces of the reply, coalesced every TOKEN_FLUSH_SECONDS
+    tool   {"turn", "name", "status"}   A tool call started or finished
+    done   {"turn", "response"}         The complete reply
+    error  {"turn", "error"}            The turn failed
+
+Turns run in the web process because django-eventstream only pushes events to
+listeners in the sending process unless EVENTSTREAM_REDIS is configured. Events
+are also stored, so a client that connects after the turn started recovers the
+earlier events through the lastEventId in the returned URL.
+"""
+import json
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core import signing
+from django.db import close_old_connections
+from django_eventstream import send_event
+from django_eventstream.utils import get_storage, make_id
+from langchain_core.callbacks import BaseCallbackHandler
+
+from core.tracing import get_tracer
+from .agent_pool import agent_pool
+
+trace = get_tracer('agent')
+
+# Concurrent streamed turns per web process; further turns wait in the pool's queue
+AGENT_STREAM_WORKERS = getattr(settings, 'AGENT_STREAM_WORKERS', 4)
+
+# Tokens are sent in batches so every token isn't its own stored event
+TOKEN_FLUSH_SECONDS = 0.1
+
+CHANNEL_SALT = 'ai_agent.streaming'
+
+# Where django-eventstream is mounted in services_ai/urls.py
+EVENTS_URL = '/events/{channel}/'
+
+_executor = ThreadPoolExecutor(max_workers=AGENT_STREAM_WORKERS, thread_name_prefix='agent-stream')
+
+
+def chat_channel(business_id, session_key):
+    """
+    Return the SSE channel of a web chat. Channels are signed so only the
+    holder of the session key can derive, and so read, a chat's channel.
+    """
+    return 'webchat-' + signing.Signer(salt=CHANNEL_SALT).signature(f'{business_id}:{session_key}')
+
+
+class StreamingCallbackHandler(BaseCallbackHandler):
+    """Publishes an agent turn's tokens and tool calls to an SSE channel."""
+
+    def __init__(self, channel, turn_id):
+        self.channel = channel
+        self.turn_id = turn_id
+        self._pending = []
+        self._last_flush = time.monotonic()
+
+    def send(self, event_type, **data):
+        send_event(self.channel, event_type, {'turn': self.turn_id, **data})
+
+    def flush(self):
+        if self._pending:
+            self.send('token', text=''.join(self._pending))
+            self._pending = []
+        self._last_flush = time.monotonic()
+
+    def on_llm_new_token(self, token, **kwargs):
+        # Rounds that only call a function stream no content
+        if not token:
+            return
+        self._pending.append(token)
+        if time.monotonic() - self._last_flush >= TOKEN_FLUSH_SECONDS:
+            self.flush()
+
+    def on_llm_end(self, response, **kwargs):
+        self.flush()
+
+    def on_tool_start(self, serialized, input_str, **kwargs):
+        self.flush()
+        self.send('tool', name=(serialized or {}).get('name'), status='started')
+
+    def on_tool_end(self, output, **kwargs):
+        self.send('tool', name=kwargs.get('name'), status='finished')
+
+
+def run_turn(business_id, session_key, message, channel, turn_id):
+    """Run one streamed agent turn. Called on the stream thread pool."""
+    close_old_connections()
+    handler = StreamingCallbackHandler(channel, turn_id)
+    try:
+        with agent_pool.lease(business_id, session_key=session_key) as agent:
+            # The agent is leased to this thread, so switching streaming on is safe
+            agent.llm.streaming = True
+            try:
+                response = agent.process_message(message, callbacks=[handler])
+            finally:
+                agent.llm.streaming = False
+            agent.update_chat_summary()
+        handler.flush()
+        handler.send('done', response=response)
+    except Exception as e:
+        trace.error("Error streaming web chat turn: {}", e, exc_info=True)
+        handler.send('error', error="Sorry, we're experiencing technical difficulties. Please try again later.")
+    finally:
+        close_old_connections()
+
+
+def start_turn(business_id, session_key, message):
+    """
+    Queue a streamed agent turn for a web chat message.
+
+    Args:
+        business_id: ID of the business
+        session_key: Session key of the web chat
+        message: Text content of the message
+
+    Returns:
+        dict: turn_id, channel and events_url (the SSE URL to listen on)
+    """
+    channel = chat_channel(business_id, session_key)
+    turn_id = uuid.uuid4().hex
+    events_url = EVENTS_URL.format(channel=channel)
+
+    # Store a first event so the client can resume right after it, and
+    # so receives every event of the turn however late it connects
+    storage = get_storage()
+    if storage:
+        event = storage.append_event(channel, 'turn', json.dumps({'turn': turn_id}))
+        events_url += '?lastEventId=' + make_id({channel: event.id})
+
+    _executor.submit(run_turn, business_id, session_key, message, channel, turn_id)
+    return {'turn_id': turn_id, 'channel': channel, 'events_url': events_url}
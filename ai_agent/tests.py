@@ -1,3 +1,428 @@
-from django.test import TestCase
+import json
+import uuid
+from types import SimpleNamespace
+from unittest import mock
 
-# Create your tests here.
+from django.contrib.auth import get_user_model
+from django.test import RequestFactory, TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from django_eventstream.utils import get_storage
+from langchain_core.language_models.fake_chat_models import FakeListChatModel
+from langchain_core.messages import AIMessage, HumanMessage
+from langchain_core.outputs import ChatGeneration, LLMResult
+from twilio.request_validator import RequestValidator
+
+from bookings.benchmarks import build_synthetic_businesses
+from business.models import Business, BusinessConfiguration, Industry, ServiceItem, ServiceOffering
+from .agent_pool import AgentPool
+from .agent_tools import turn_cache
+from .fake_llm import ScriptedChatModel
+from .langchain_agent import render_system_prompt
+from .load_test import build_conversations, run_load_test
+from .metrics import TurnMetricsHandler, business_metrics
+from .models import Chat, InboundSMS, Message, OutboundSMS
+from .prompt_cache import cached_prompt
+from .utils import SMS_ERROR_REPLY
+from . import sms_queue, sms_sender, streaming
+from .views import agent_metrics
+
+User = get_user_model()
+
+
+class AgentTestMixin:
+    """Shared fixtures for agent tests."""
+
+    def create_business(self):
+        user = User.objects.create_user(username='owner', password='testpassword')
+        self.business = Business.objects.create(
+            name='Test Cleaning', user=user, industry=Industry.objects.create(name='Cleaning'),
+            phone_number='+15550000000', email='owner@example.com'
+        )
+
+
+class AgentPoolTests(AgentTestMixin, TestCase):
+    def setUp(self):
+        self.create_business()
+        self.pool = AgentPool(max_size=2)
+
+    def lease(self, phone_number='+15550000001'):
+        with self.pool.lease(self.business.id, phone_number=phone_number) as agent:
+            return agent
+
+    def test_agent_is_reused_and_catches_up(self):
+        agent = self.lease()
+        Message.objects.create(chat=agent.chat, role='user', content='Hello from another worker')
+
+        # The catalog version and the new message are all that is read
+        with self.assertNumQueries(2):
+            self.assertIs(self.lease(), agent)
+        self.assertEqual(agent.memory.chat_memory.messages[-1].content, 'Hello from another worker')
+
+    def test_catalog_change_rebuilds_and_pool_is_bounded(self):
+        agent = self.lease()
+        ServiceOffering.objects.create(business=self.business, name='Deep Cleaning', price=150, duration=90)
+        self.assertIsNot(self.lease(), agent)
+
+        self.lease('+15550000002')
+        self.lease('+15550000003')
+        self.assertEqual(len(self.pool), 2)
+
+    def test_prompt_is_rendered_once_per_catalog_version(self):
+        service = ServiceOffering.objects.create(business=self.business, name='Deep Cleaning', price=150, duration=90)
+        ServiceItem.objects.create(
+            business=self.business, service_offering=service, name='Windows', price_type='paid', price_value=20
+        )
+        self.business.refresh_from_db()
+
+        # Config, services and their items
+        with self.assertNumQueries(3):
+            prompt = cached_prompt(self.business, 'chat', render_system_prompt)
+        with self.assertNumQueries(0):
+            cached_prompt(self.business, 'chat', render_system_prompt)
+        self.assertIn('Windows', prompt)
+
+        service.price = 175
+        service.save()
+        self.business.refresh_from_db()
+        self.assertIn('$175', cached_prompt(self.business, 'chat', render_system_prompt))
+
+    def test_only_prompt_fields_give_a_new_catalog_version(self):
+        business = Business.objects.get(id=self.business.id)
+        version = business.catalog_version
+        business.email = 'billing@example.com'
+        business.save(update_fields=['email'])
+        business.save()
+        self.assertEqual(Business.objects.get(id=business.id).catalog_version, version)
+
+        business.name = 'Better Cleaning'
+        business.save()
+        self.assertGreater(Business.objects.get(id=business.id).catalog_version, version)
+
+    def test_old_turns_are_summarized_and_not_reloaded(self):
+        agent = self.lease()
+        agent.memory.llm = FakeListChatModel(responses=['Client wants a deep clean.'])
+        agent.memory.max_turns = 2
+        # A failed turn leaves a question without an answer
+        failed = Message.objects.create(chat=agent.chat, role='user', content='anyone there?')
+        agent.sync_messages()
+        answers = []
+        for turn in range(3):
+            question = Message.objects.create(chat=agent.chat, role='user', content=f'question {turn}')
+            answers.append(Message.objects.create(chat=agent.chat, role='assistant', content=f'answer {turn}'))
+            agent.memory.save_context({'input': f'question {turn}'}, {'output': f'answer {turn}'})
+            agent._tag_turn(question.id, answers[-1].id)
+            agent._save_memory()
+
+        agent.chat.refresh_from_db()
+        self.assertEqual(agent.chat.summary['memory']['summary'], 'Client wants a deep clean.')
+        # Whole turns are summarized, through the last message they contain
+        self.assertEqual(agent.chat.summary['memory']['through_message_id'], answers[0].id)
+        self.assertLess(failed.id, answers[0].id)
+
+        # A new agent starts from the summary and the turns after it
+        fresh = AgentPool().lease(self.business.id, phone_number='+15550000001')
+        with fresh as rebuilt:
+            history = rebuilt.memory.load_memory_variables({})['chat_history']
+        self.assertEqual(
+            [message.content for message in history],
+            ['Client wants a deep clean.', 'question 1', 'answer 1', 'question 2', 'answer 2']
+        )
+
+
+class StreamingTests(AgentTestMixin, TestCase):
+    def setUp(self):
+        self.create_business()
+
+    def test_stream_message_queues_turn_and_streams_events(self):
+        with mock.patch.object(streaming, '_executor') as executor:
+            response = self.client.post(
+                reverse('ai_agent:stream_message'),
+                json.dumps({'business_id': self.business.id, 'message': 'Hi', 'session_key': 'abc'}),
+                content_type='application/json'
+            )
+        data = response.json()
+        self.assertTrue(data['success'])
+        self.assertEqual(data['channel'], streaming.chat_channel(self.business.id, 'abc'))
+        self.assertIn('?lastEventId=', data['events_url'])
+        executor.submit.assert_called_once()
+
+        # Run the queued turn with an agent that streams three tokens
+        class FakeAgent:
+            llm = mock.Mock(streaming=False)
+
+            def process_message(self, message, callbacks=None):
+                for token in ('Hello', ', ', 'there'):
+                    callbacks[0].on_llm_new_token(token)
+                callbacks[0].on_llm_end(None)
+                return 'Hello, there'
+
+            def update_chat_summary(self):
+                pass
+
+        lease = mock.MagicMock()
+        lease.return_value.__enter__.return_value = FakeAgent()
+        with mock.patch.object(streaming.agent_pool, 'lease', lease), \
+                mock.patch.object(streaming, 'TOKEN_FLUSH_SECONDS', 60):
+            streaming.run_turn(*executor.submit.call_args.args[1:])
+
+        events = get_storage().get_events(data['channel'], 0)
+        self.assertEqual([event.type for event in events], ['turn', 'token', 'done'])
+        self.assertEqual(json.loads(events[0].data), {'turn': data['turn_id']})
+        self.assertEqual(json.loads(events[1].data), {'turn': data['turn_id'], 'text': 'Hello, there'})
+        self.assertEqual(json.loads(events[2].data)['response'], 'Hello, there')
+
+
+class SMSQueueTests(AgentTestMixin, TestCase):
+    def setUp(self):
+        self.create_business()
+
+    def post_sms(self, body, sid):
+        return self.client.post(reverse('ai_agent:twilio_webhook', args=[self.business.id]), {
+            'From': '+15550000001', 'To': '+15550000000', 'Body': body, 'MessageSid': sid
+        })
+
+    @mock.patch.object(sms_queue, 'SMS_COALESCE_SECONDS', 0)
+    @mock.patch.object(sms_queue, 'async_task')
+    def test_quick_texts_are_coalesced_into_one_turn(self, async_task):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.post_sms('Hi', 'SM1')
+            self.post_sms('Can I book a clean tomorrow?', 'SM2')
+            # Twilio retrying a webhook doesn't queue the message again
+            self.post_sms('Hi', 'SM1')
+        self.assertEqual(InboundSMS.objects.count(), 2)
+        chat = Chat.objects.get()
+        async_task.assert_called_with(sms_queue.TASK, chat.id)
+
+        with mock.patch('ai_agent.utils.process_sms_with_langchain', return_value='Sure!') as process, \
+                mock.patch.object(sms_sender, 'async_task'):
+            sms_queue.process_chat_sms(chat.id)
+
+        process.assert_called_once_with(
+            self.business.id, '+15550000001', 'Hi\nCan I book a clean tomorrow?', raise_errors=True
+        )
+        self.assertEqual(list(OutboundSMS.objects.values_list('body', 'to_number')), [('Sure!', '+15550000001')])
+        self.assertEqual(set(InboundSMS.objects.values_list('status', flat=True)), {'processed'})
+        chat.refresh_from_db()
+        self.assertIsNone(chat.processing_until)
+
+    @mock.patch.object(sms_queue, 'SMS_BUSINESS_CONCURRENCY', 1)
+    @mock.patch.object(sms_queue, 'async_task')
+    def test_chat_waits_for_a_business_slot(self, async_task):
+        busy = Chat.objects.create(business=self.business, phone_number='+15550000002')
+        self.assertTrue(sms_queue._acquire(busy))
+        with self.captureOnCommitCallbacks(execute=True):
+            self.post_sms('Hi', 'SM1')
+        chat = Chat.objects.get(phone_number='+15550000001')
+
+        with mock.patch('ai_agent.utils.process_sms_with_langchain') as process:
+            sms_queue.process_chat_sms(chat.id)
+        process.assert_not_called()
+
+        # Releasing the busy chat dispatches the waiting one
+        async_task.reset_mock()
+        sms_queue._release(busy)
+        self.assertEqual(sms_queue.dispatch_pending(self.business.id), 1)
+        async_task.assert_called_once_with(sms_queue.TASK, chat.id)
+
+
+    @mock.patch.object(sms_queue, 'SMS_COALESCE_SECONDS', 30)
+    @mock.patch.object(sms_queue, 'schedule')
+    @mock.patch.object(sms_queue, 'async_task')
+    def test_new_texts_are_held_without_sleeping(self, async_task, schedule):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.post_sms('Hi', 'SM1')
+        chat = Chat.objects.get()
+        held_until = InboundSMS.objects.get().next_attempt_at
+        schedule.assert_called_once_with(sms_queue.TASK, chat.id, schedule_type='O', next_run=held_until)
+
+        with mock.patch('ai_agent.utils.process_sms_with_langchain') as process:
+            sms_queue.process_chat_sms(chat.id)
+        process.assert_not_called()
+        async_task.assert_not_called()
+
+    @override_settings(AGENT_LLM='fake')
+    @mock.patch.object(sms_queue, 'SMS_MAX_ATTEMPTS', 2)
+    @mock.patch.object(sms_queue, 'SMS_COALESCE_SECONDS', 0)
+    @mock.patch.object(sms_queue, 'schedule')
+    @mock.patch.object(sms_queue, 'async_task')
+    def test_failed_turn_is_retried_after_a_backoff(self, async_task, schedule):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.post_sms('Hi', 'SM1')
+        chat = Chat.objects.get()
+
+        # The agent itself fails, the way an OpenAI outage does
+        with mock.patch.object(ScriptedChatModel, '_generate', side_effect=RuntimeError('OpenAI is down')):
+            sms_queue.process_chat_sms(chat.id)
+
+            sms = InboundSMS.objects.get()
+            self.assertEqual((sms.status, sms.attempts), ('pending', 1))
+            self.assertGreater(sms.next_attempt_at, timezone.now())
+            schedule.assert_called_once_with(
+                sms_queue.TASK, chat.id, schedule_type='O', next_run=sms.next_attempt_at
+            )
+            # No apology is sent while the turn can still be retried
+            self.assertFalse(OutboundSMS.objects.exists())
+            # Not dispatched again before the retry is due
+            self.assertEqual(sms_queue.dispatch_pending(self.business.id), 0)
+
+            InboundSMS.objects.update(next_attempt_at=timezone.now())
+            with mock.patch.object(sms_sender, 'async_task'):
+                sms_queue.process_chat_sms(chat.id)
+
+        # The last attempt failed, so the customer is told
+        self.assertEqual(InboundSMS.objects.get().status, 'failed')
+        self.assertEqual(list(OutboundSMS.objects.values_list('body', flat=True)), [SMS_ERROR_REPLY])
+
+
+class SMSSenderTests(AgentTestMixin, TestCase):
+    def setUp(self):
+        self.create_business()
+        BusinessConfiguration.objects.update_or_create(
+            business=self.business, defaults={'twilio_sid': 'AC123', 'twilio_auth_token': 'token'}
+        )
+
+    @mock.patch.object(sms_sender, 'TWILIO_SENDS_PER_SECOND', 1000)
+    @mock.patch.object(sms_sender, 'async_task')
+    def test_queued_messages_are_sent_in_one_batch_and_tracked(self, async_task):
+        with self.captureOnCommitCallbacks(execute=True):
+            for body in ('One', 'Two'):
+                sms_sender.queue_sms(self.business, '+15550000000', '+15550000001', body)
+        async_task.assert_called_with(sms_sender.TASK, '+15550000000')
+
+        client = mock.Mock()
+        client.messages.create.side_effect = [mock.Mock(sid='SM1'), mock.Mock(sid='SM2')]
+        with mock.patch.object(sms_sender, 'get_twilio_client', return_value=client) as get_client:
+            sms_sender.send_queued_sms('+15550000000')
+
+        self.assertEqual(get_client.call_count, 2)
+        get_client.assert_called_with('AC123', 'token')
+        self.assertEqual(
+            list(OutboundSMS.objects.values_list('message_sid', 'status')), [('SM1', 'sent'), ('SM2', 'sent')]
+        )
+
+        status_url = reverse('ai_agent:twilio_status_callback')
+        signer = RequestValidator('token')
+
+        def post_status(status, token_signer=signer):
+            params = {'MessageSid': 'SM1', 'MessageStatus': status}
+            signature = token_signer.compute_signature(sms_sender.status_callback_url(), params)
+            return self.client.post(status_url, params, HTTP_X_TWILIO_SIGNATURE=signature)
+
+        # Callbacks not signed with the business's auth token are rejected
+        self.assertEqual(post_status('failed', RequestValidator('other')).status_code, 403)
+        self.assertEqual(self.client.post(status_url, {'MessageSid': 'SM1', 'MessageStatus': 'failed'}).status_code, 403)
+
+        self.assertEqual(post_status('delivered').status_code, 204)
+        # A late 'sent' callback doesn't undo the delivery
+        post_status('sent')
+        self.assertEqual(OutboundSMS.objects.get(message_sid='SM1').status, 'delivered')
+
+    @mock.patch.object(sms_sender, 'schedule')
+    @mock.patch.object(sms_sender, 'async_task')
+    def test_failed_send_is_retried_after_a_backoff(self, async_task, schedule):
+        sms = sms_sender.queue_sms(self.business, '+15550000000', '+15550000001', 'One')
+        client = mock.Mock()
+        client.messages.create.side_effect = RuntimeError('Twilio is down')
+
+        with mock.patch.object(sms_sender, 'get_twilio_client', return_value=client):
+            sms_sender.send_queued_sms('+15550000000')
+            # Not due yet, so another task doesn't send it again
+            sms_sender.send_queued_sms('+15550000000')
+
+        sms.refresh_from_db()
+        self.assertEqual((sms.status, sms.attempts), ('queued', 1))
+        self.assertGreater(sms.next_attempt_at, timezone.now())
+        async_task.assert_not_called()
+        schedule.assert_called_with(sms_sender.TASK, '+15550000000', schedule_type='O', next_run=sms.next_attempt_at)
+
+    def test_clients_are_reused_per_account(self):
+        sms_sender.get_twilio_client.cache_clear()
+        self.assertIs(sms_sender.get_twilio_client('AC123', 'token'), sms_sender.get_twilio_client('AC123', 'token'))
+        self.assertIsNot(sms_sender.get_twilio_client('AC123', 'token'), sms_sender.get_twilio_client('AC123', 'new'))
+
+
+class TurnCacheTests(AgentTestMixin, TestCase):
+    def setUp(self):
+        self.create_business()
+        ServiceOffering.objects.create(business=self.business, name='Deep Clean', price=150, duration=120)
+        ServiceItem.objects.create(business=self.business, name='Bedrooms', identifier='bedrooms', field_type='number')
+
+    def lookup(self):
+        business = turn_cache.get_business(self.business.id)
+        turn_cache.get_service(business, 'deep clean')
+        return turn_cache.get_service_item(business, 'Bedrooms')
+
+    def test_lookups_are_memoized_within_a_turn(self):
+        with turn_cache.turn_cache() as cache:
+            with self.assertNumQueries(3):
+                item = self.lookup()
+            with self.assertNumQueries(0):
+                self.assertEqual(self.lookup(), item)
+            # Services that don't exist are remembered too
+            for name in ('Window Clean', 'window clean'):
+                with self.assertRaises(ServiceOffering.DoesNotExist):
+                    turn_cache.get_service(self.business, name)
+        self.assertEqual(cache.stats(), {'hits': 4, 'misses': 4})
+
+        # Outside a turn nothing is cached
+        with self.assertNumQueries(3):
+            self.lookup()
+
+
+class TurnMetricsTests(AgentTestMixin, TestCase):
+    def setUp(self):
+        self.create_business()
+        self.chat = Chat.objects.create(business=self.business, phone_number='+15550000001')
+
+    def run_turn(self, usage):
+        handler = TurnMetricsHandler()
+        for result in ('{"name": "check_availability"}', 'Booked!'):
+            llm_run = uuid.uuid4()
+            handler.on_chat_model_start({}, [[HumanMessage(content='Book me in tomorrow')]], run_id=llm_run)
+            handler.on_llm_end(
+                LLMResult(generations=[[ChatGeneration(message=AIMessage(content=result))]], llm_output={'token_usage': usage}),
+                run_id=llm_run
+            )
+        tool_run = uuid.uuid4()
+        handler.on_tool_start({'name': 'check_availability'}, '{}', run_id=tool_run)
+        handler.on_tool_end('Available', run_id=tool_run)
+        agent = SimpleNamespace(business=self.business, chat=self.chat, tool_cache_stats={'hits': 2, 'misses': 3})
+        return handler.save(agent)
+
+    def test_turns_are_recorded_and_aggregated_per_business(self):
+        turn = self.run_turn({'prompt_tokens': 500, 'completion_tokens': 20})
+        self.assertEqual((turn.llm_calls, turn.prompt_tokens, turn.completion_tokens), (2, 1000, 40))
+        self.assertEqual(turn.tool_calls, 1)
+        self.assertEqual(turn.tools['check_availability'][0], 1)
+
+        # Without a usage report (streaming) tokens are estimated
+        estimated = self.run_turn({})
+        self.assertGreater(estimated.prompt_tokens, 0)
+        self.assertGreater(estimated.completion_tokens, 0)
+
+        request = RequestFactory().get('/', {'days': 7})
+        request.user = self.business.user
+        response = agent_metrics(request)
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, 'check_availability')
+
+        metrics = business_metrics(self.business)
+        self.assertEqual(metrics['turns'], 2)
+        self.assertEqual(metrics['tools'][0]['calls'], 2)
+        self.assertEqual(metrics['cache_hits'], 4)
+
+
+class LoadTestTests(TestCase):
+    def test_scripted_conversations_book_their_slots(self):
+        fixtures = build_synthetic_businesses(
+            businesses=1, staff_per_business=2, days=5, booking_density=0, seed=1
+        )
+        scripts = build_conversations(fixtures, conversations=2)
+
+        results = run_load_test(scripts, concurrency=1)
+
+        self.assertEqual(results['turns'], 4)
+        self.assertEqual(results['failed_turns'], 0)
+        self.assertEqual((results['booking_requests'], results['bookings']), (2, 2))
+        self.assertEqual(set(results['latency_ms']), {'mean', 'p50', 'p95', 'max'})
@@ -7,13 +7,17 @@ urlpatterns = [
     # Unified agent dashboard
     path('', views.agent_dashboard, name='dashboard'),
     
+    path('metrics/', views.agent_metrics, name='metrics'),
+    
     # Chat management
     path('chats/', views.chat_list, name='chat_list'),
     path('chats/<int:chat_id>/', views.chat_detail, name='chat_detail'),
     
     # API endpoints
     path('api/process-message/', views.process_message, name='process_message'),
+    path('api/stream-message/', views.stream_message, name='stream_message'),
     path('api/twilio-webhook/<str:business_id>/', views.twilio_webhook, name='twilio_webhook'),
+    path('api/twilio-status/', views.twilio_status_callback, name='twilio_status_callback'),
     
     # Chat widget for embedding
     path('widget/<str:business_id>/', views.chat_widget, name='chat_widget'),
@@ -6,6 +6,8 @@ import os
 import json
 from openai import OpenAI
 
+from .agent_pool import agent_pool
+
 
 load_dotenv()
 
@@ -300,7 +302,10 @@ def get_or_create_langchain_agent(business_id, phone_number=None, session_key=No
         print(f"[UTIL] Error creating LangChain agent: {e}")
         return None
 
-def process_sms_with_langchain(business_id, phone_number, message_text):
+# Reply sent when an SMS can't be answered
+SMS_ERROR_REPLY = "Sorry, we're experiencing technical difficulties. Please try again later."
+
+def process_sms_with_langchain(business_id, phone_number, message_text, raise_errors=False):
     """
     Process an incoming SMS message using the LangChain agent.
     
@@ -308,30 +313,26 @@ def process_sms_with_langchain(business_id, phone_number, message_text):
         business_id: ID of the business
         phone_number: Phone number of the sender
         message_text: Text content of the message
+        raise_errors: Raise a failed turn's error instead of returning SMS_ERROR_REPLY
         
     Returns:
         str: Response from the agent
     """
     try:
-        # Get or create agent
-        agent = get_or_create_langchain_agent(
-            business_id=business_id,
-            phone_number=phone_number
-        )
-        
-        if not agent:
-            return "Sorry, we're experiencing technical difficulties. Please try again later."
-        
-        # Process the message
-        response = agent.process_message(message_text)
-        
-        # Update chat summary
-        agent.update_chat_summary()
+        # Reuse the chat's pooled agent
+        with agent_pool.lease(business_id, phone_number=phone_number) as agent:
+            # Process the message
+            response = agent.process_message(message_text, raise_errors=raise_errors)
+            
+            # Update chat summary
+            agent.update_chat_summary()
         
         return response
     except Exception as e:
+        if raise_errors:
+            raise
         print(f"[UTIL] Error processing SMS with LangChain: {e}")
-        return "Sorry, we're experiencing technical difficulties. Please try again later."
+        return SMS_ERROR_REPLY
 
 def process_web_chat_with_langchain(business_id, session_key, message_text):
     """
@@ -346,20 +347,13 @@ def process_web_chat_with_langchain(business_id, session_key, message_text):
         str: Response from the agent
     """
     try:
-        # Get or create agent
-        agent = get_or_create_langchain_agent(
-            business_id=business_id,
-            session_key=session_key
-        )
-        
-        if not agent:
-            return "Sorry, we're experiencing technical difficulties. Please try again later."
-        
-        # Process the message
-        response = agent.process_message(message_text)
-        
-        # Update chat summary
-        agent.update_chat_summary()
+        # Reuse the chat's pooled agent
+        with agent_pool.lease(business_id, session_key=session_key) as agent:
+            # Process the message
+            response = agent.process_message(message_text)
+            
+            # Update chat summary
+            agent.update_chat_summary()
         
         return response
     except Exception as e:
@@ -6,12 +6,19 @@ from django.contrib.auth.decorators import login_required
 from django.conf import settings
 from django.utils import timezone
 import json
-import threading
 
 from business.models import Business
-from .models import Chat, Message, AgentConfig
+from core.tracing import get_tracer
+from .models import Chat, Message, AgentConfig, TurnMetrics
+from .metrics import business_metrics
+from .prompt_cache import cached_prompt
 from twilio.twiml.messaging_response import MessagingResponse
 from .utils import process_sms_with_langchain, process_web_chat_with_langchain
+from .streaming import start_turn
+from .sms_queue import enqueue_sms
+from .sms_sender import record_status, verify_status_callback
+
+trace = get_tracer('agent')
 
 @login_required
 def agent_dashboard(request):
@@ -33,10 +40,9 @@ def agent_dashboard(request):
     chats = Chat.objects.filter(business=business).order_by('-updated_at')[:10]
     
     # Generate the system prompt to display
-    from .langchain_agent import LangChainAgent
+    from .langchain_agent import render_system_prompt
     try:
-        agent = LangChainAgent(business_id=str(business.id))
-        system_prompt = agent._get_system_prompt()
+        system_prompt = cached_prompt(business, 'chat', render_system_prompt)
     except Exception as e:
         system_prompt = f"Error generating system prompt: {str(e)}"
     
@@ -57,6 +63,25 @@ def agent_dashboard(request):
     
     return render(request, 'ai_agent/ai_agent_unified.html', context)
 
+@login_required
+def agent_metrics(request):
+    """
+    Show latency, token and tool call metrics of the business's agent turns.
+    """
+    business = request.user.business
+    try:
+        days = max(1, min(int(request.GET.get('days', 7)), 90))
+    except ValueError:
+        days = 7
+    
+    context = {
+        'business': business,
+        'metrics': business_metrics(business, days=days),
+        'recent_turns': TurnMetrics.objects.filter(business=business).order_by('-created_at')[:20],
+    }
+    
+    return render(request, 'ai_agent/metrics.html', context)
+
 @login_required
 def chat_list(request):
     """
@@ -168,13 +193,47 @@ def process_message(request):
             'error': str(e)
         }, status=500)
 
+@csrf_exempt
+@require_POST
+def stream_message(request):
+    """
+    API endpoint for web chat messages whose reply is streamed over SSE.
+    Returns at once with the events URL to listen on; see ai_agent.streaming.
+    """
+    try:
+        data = json.loads(request.body)
+    except json.JSONDecodeError:
+        return JsonResponse({
+            'success': False,
+            'error': 'Invalid JSON in request body'
+        }, status=400)
+    
+    business_id = data.get('business_id')
+    message = data.get('message')
+    session_key = data.get('session_key')
+    
+    if not business_id or not message or not session_key:
+        return JsonResponse({
+            'success': False,
+            'error': 'Missing required fields: business_id, message and session_key'
+        }, status=400)
+    
+    if not Business.objects.filter(id=business_id).exists():
+        return JsonResponse({
+            'success': False,
+            'error': f'Business with ID {business_id} not found'
+        }, status=404)
+    
+    turn = start_turn(business_id, session_key, message)
+    return JsonResponse({'success': True, **turn})
+
 @csrf_exempt
 @require_POST
 def twilio_webhook(request, business_id):
     """
     Webhook for receiving SMS messages from Twilio.
-    Immediately acknowledges receipt with an empty TwiML response,
-    then processes the message in a background thread.
+    Queues the message (see ai_agent.sms_queue) and immediately
+    acknowledges receipt with an empty TwiML response.
     """
     # Extract message data from Twilio webhook
     from_number = request.POST.get('From')
@@ -184,92 +243,34 @@ def twilio_webhook(request, business_id):
     # Immediately return an empty TwiML response to acknowledge receipt
     empty_response = MessagingResponse()
     
-    # Start processing in background only if we have the required parameters
+    # Queue the message only if we have the required parameters
     if from_number and body and to_number:
-        # Create a copy of the data we need for background processing
-        process_data = {
-            'business_id': business_id,
-            'from_number': from_number,
-            'body': body,
-            'to_number': to_number
-        }
-        
-        # Start background thread to process the message
-        thread = threading.Thread(
-            target=process_twilio_message_in_background,
-            args=(process_data,)
-        )
-        thread.daemon = True  # Allow the thread to exit when main thread exits
-        thread.start()
+        if not Business.objects.filter(id=business_id).exists():
+            trace.warning("No business found for business_id {}", business_id)
+        else:
+            enqueue_sms(business_id, from_number, to_number, body, request.POST.get('MessageSid'))
     
     # Return the empty response immediately
     return HttpResponse(str(empty_response), content_type='text/xml')
 
 
-def process_twilio_message_in_background(data):
-    """
-    Process Twilio message in a background thread and send response via Twilio API.
-    
-    Args:
-        data: Dictionary containing business_id, from_number, body, and to_number
-    """
-    try:
-        business_id = data['business_id']
-        from_number = data['from_number']
-        body = data['body']
-        to_number = data['to_number']
-        
-        try:
-            business = Business.objects.get(id=business_id)
-            if not business:
-                print(f"No business found for business_id {business_id}")
-                return
-        except Exception as e:
-            print(f"Error finding business: {str(e)}")
-            return
-        
-        # Process the message
-        response = process_sms_with_langchain(business.id, from_number, body)
-        
-        # Send the response back via Twilio API
-        send_twilio_response(business, to_number, from_number, response)
-        
-    except Exception as e:
-        print(f"Error in background processing of Twilio message: {e}")
-
-
-def send_twilio_response(business, from_number, to_number, message):
+@csrf_exempt
+@require_POST
+def twilio_status_callback(request):
     """
-    Send SMS response using Twilio API directly instead of TwiML.
-    
-    Args:
-        business: Business object
-        from_number: Twilio number to send from
-        to_number: Customer number to send to
-        message: Message content
+    Webhook for Twilio delivery status updates of outbound SMS.
+    Only callbacks signed by the Twilio account that sent the message are accepted.
     """
-    try:
-        # Import Twilio client here to avoid circular imports
-        from twilio.rest import Client
-        
-        business_config = business.businessconfiguration
-        account_sid = business_config.twilio_sid
-        auth_token = business_config.twilio_auth_token
-        
-        # Initialize Twilio client
-        client = Client(account_sid, auth_token)
-        
-        # Send message
-        client.messages.create(
-            body=message,
-            from_=from_number,
-            to=to_number
-        )
-        
-    except Exception as e:
-        print(f"Error sending Twilio response: {e}")
-
-
+    if not verify_status_callback(
+        request.POST.get('MessageSid'), request.POST.dict(), request.headers.get('X-Twilio-Signature')
+    ):
+        return HttpResponse(status=403)
+    record_status(
+        request.POST.get('MessageSid'),
+        request.POST.get('MessageStatus'),
+        request.POST.get('ErrorCode')
+    )
+    return HttpResponse(status=204)
 
 
 @require_GET
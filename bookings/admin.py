@@ -1,7 +1,8 @@
 from django.contrib import admin
 from .models import (
     Booking, BookingServiceItem, StaffServiceAssignment, StaffAvailability, 
-    StaffRole, StaffMember, BookingEvent, BookingEventType, ReminderType, BookingReminder
+    StaffRole, StaffMember, BookingEvent, BookingEventType, ReminderType, BookingReminder,
+    StaffFreeBusy, SlotHold
 )
 
 @admin.register(BookingEventType)
@@ -26,4 +27,6 @@ admin.site.register(StaffRole)
 admin.site.register(StaffMember)
 admin.site.register(BookingEvent)
 admin.site.register(BookingReminder)
+admin.site.register(StaffFreeBusy)
+admin.site.register(SlotHold)
 
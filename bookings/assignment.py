@@ -0,0 +1,173 @@
+"""
+Automatic staff assignment.
+
+When a booking doesn't name a staff member, the business's assignment strategy
+(BusinessConfiguration.staff_assignment_strategy) decides which of the free
+staff members gets it. Strategies only reorder candidates that are already
+known to be free; they never decide availability.
+
+Load-based strategies read each staff member's booked minutes for the day from
+an AvailabilityEngine, which takes them from the StaffFreeBusy.booked_minutes
+counters kept current by bookings.free_busy, so ranking costs no extra queries.
+"""
+from abc import ABC, abstractmethod
+
+from django.core.cache import caches
+
+from bookings.availability_cache import CACHE_ALIAS
+from bookings.models import StaffServiceAssignment
+from business.models import BusinessConfiguration
+
+DEFAULT_STRATEGY = 'first_available'
+
+# Weight of a staff member without a rating (ratings run 1 to 5)
+DEFAULT_RATING = 3
+# Staff whose primary service is the one booked count as this much less loaded
+PRIMARY_SERVICE_WEIGHT = 2
+
+# Round robin cursors only steer the rotation, losing one is harmless
+ROUND_ROBIN_TIMEOUT = 60 * 60 * 24 * 30
+
+
+class AssignmentStrategy(ABC):
+    """
+    Base class for staff assignment strategies.
+
+    Subclasses implement order(). Strategies whose order only depends on the
+    day's bookings are cacheable, so check_timeslot_availability can cache
+    the ordered staff list with the rest of its result; the others also
+    implement rotate() to reorder a cached list on every call.
+    """
+    name = None
+    cacheable = True
+
+    @abstractmethod
+    def order(self, staff, engine, check_date, service_offering_id=None):
+        """
+        Return the staff members in the order they should be assigned.
+
+        Args:
+            staff (list): Free StaffMember objects (or dicts with an 'id' key)
+            engine (AvailabilityEngine): Engine the staff were checked against
+            check_date (date): Date of the booking
+            service_offering_id (optional): Service being booked
+
+        Returns:
+            list: The same staff members, best candidate first
+        """
+
+    def rotate(self, business_id, staff):
+        """Reorder a staff list cached in the engine's order. Only needed when not cacheable."""
+        return list(staff)
+
+    def assigned(self, business_id, staff_id):
+        """Called once a booking has been given to a staff member."""
+
+
+class FirstAvailable(AssignmentStrategy):
+    """Keep the engine's order, i.e. the first free staff member gets the booking."""
+    name = 'first_available'
+
+    def order(self, staff, engine, check_date, service_offering_id=None):
+        return list(staff)
+
+
+class LeastBooked(AssignmentStrategy):
+    """Give the booking to the free staff member with the fewest booked minutes that day."""
+    name = 'least_booked'
+
+    def order(self, staff, engine, check_date, service_offering_id=None):
+        # sorted() is stable, so ties keep the engine's order
+        return sorted(staff, key=lambda member: engine.booked_minutes(_staff_id(member), check_date))
+
+
+class SkillWeighted(AssignmentStrategy):
+    """
+    Least booked, with booked minutes divided by a skill weight: the staff
+    member's rating, doubled when the booked service is their primary one.
+    """
+    name = 'skill_weighted'
+
+    def order(self, staff, engine, check_date, service_offering_id=None):
+        staff = list(staff)
+        if not staff:
+            return staff
+
+        primary_ids = set()
+        if service_offering_id:
+            primary_ids = set(StaffServiceAssignment.objects.filter(
+                service_offering_id=service_offering_id,
+                staff_member_id__in=[_staff_id(member) for member in staff],
+                is_primary=True
+            ).values_list('staff_member_id', flat=True))
+
+        ratings = {staff_member.id: staff_member.rating for staff_member in engine.staff}
+
+        def load(member):
+            staff_id = _staff_id(member)
+            weight = float(ratings.get(staff_id) or DEFAULT_RATING)
+            if staff_id in primary_ids:
+                weight *= PRIMARY_SERVICE_WEIGHT
+            return engine.booked_minutes(staff_id, check_date) / weight
+
+        return sorted(staff, key=load)
+
+
+class RoundRobin(AssignmentStrategy):
+    """
+    Rotate through the staff: the booking goes to the first free staff member
+    after the one who was assigned last. The last assignee is kept in the
+    availability cache per business.
+    """
+    name = 'round_robin'
+    cacheable = False
+
+    @staticmethod
+    def _cursor_key(business_id):
+        return f'assignment:round_robin:{business_id}'
+
+    def order(self, staff, engine, check_date, service_offering_id=None):
+        return self.rotate(engine.business_id, staff)
+
+    def rotate(self, business_id, staff):
+        staff = sorted(staff, key=lambda member: str(_staff_id(member)))
+        last_id = caches[CACHE_ALIAS].get(self._cursor_key(business_id))
+        if last_id is None:
+            return staff
+        # Everyone after the last assignee first, then wrap around
+        return (
+            [member for member in staff if str(_staff_id(member)) > last_id]
+            + [member for member in staff if str(_staff_id(member)) <= last_id]
+        )
+
+    def assigned(self, business_id, staff_id):
+        caches[CACHE_ALIAS].set(self._cursor_key(business_id), str(staff_id), timeout=ROUND_ROBIN_TIMEOUT)
+
+
+STRATEGIES = {
+    strategy.name: strategy
+    for strategy in (FirstAvailable(), LeastBooked(), SkillWeighted(), RoundRobin())
+}
+
+
+def _staff_id(member):
+    """ID of a StaffMember, or of a serialized staff dict from check_timeslot_availability."""
+    if isinstance(member, dict):
+        return member['id']
+    return member.id
+
+
+def get_strategy(business_id):
+    """
+    Return the assignment strategy configured for a business.
+
+    Args:
+        business_id: ID of the business
+
+    Returns:
+        AssignmentStrategy: The configured strategy, first_available if unset or unknown
+    """
+    name = BusinessConfiguration.objects.filter(
+        business_id=business_id
+    ).values_list('staff_assignment_strategy', flat=True).first()
+    return STRATEGIES.get(name) or STRATEGIES[DEFAULT_STRATEGY]
@@ -1,167 +1,814 @@
 from django.utils import timezone
-from datetime import datetime, timedelta, time
+from datetime import datetime, timedelta, time, timezone as dt_timezone
 from django.db.models import Q
+import numpy as np
 
 from bookings.models import (
-    StaffMember, 
-    StaffAvailability, 
-    Booking, 
-    BookingStatus, 
-    AVAILABILITY_TYPE, 
+    StaffMember,
+    StaffAvailability,
+    Booking,
+    BookingStatus,
+    AVAILABILITY_TYPE,
     BookingStaffAssignment,
     StaffServiceAssignment,
-    Business
+    StaffFreeBusy,
+    SlotHold,
+    Business,
+    ACTIVE_BOOKING_STATUSES
 )
+from business.models import BusinessConfiguration
+from bookings.availability_cache import business_now, cached_lookup, today_bucket
+from bookings.assignment import STRATEGIES, get_strategy
+from core.tracing import get_tracer
 
+trace = get_tracer('availability')
 
-def check_timeslot_availability(business, start_time, duration_minutes, service=None):
+
+MINUTES_PER_DAY = 24 * 60
+
+# Minutes between candidate start times when a business hasn't configured it
+DEFAULT_SLOT_INTERVAL = 30
+
+
+def _to_minutes(value):
+    """Convert a time object to minutes since midnight."""
+    return value.hour * 60 + value.minute
+
+
+def _rule_end_minutes(value):
+    """
+    Convert an availability end time to minutes since midnight.
+    Rules ending at 23:59 or later are treated as running until midnight.
+    """
+    if value >= time(23, 59):
+        return MINUTES_PER_DAY
+    return _to_minutes(value)
+
+
+def _minutes_to_time(minutes):
+    """Convert minutes since midnight back to a time object."""
+    minutes = min(minutes, MINUTES_PER_DAY - 1)
+    return time(minutes // 60, minutes % 60)
+
+
+def merge_intervals(intervals):
+    """
+    Merge overlapping or touching (start, end) intervals.
+
+    Args:
+        intervals: Iterable of (start, end) tuples in minutes
+
+    Returns:
+        list: Sorted, non-overlapping list of (start, end) tuples
+    """
+    merged = []
+    for start, end in sorted(intervals):
+        if start >= end:
+            continue
+        if merged and start <= merged[-1][1]:
+            if end > merged[-1][1]:
+                merged[-1] = (merged[-1][0], end)
+        else:
+            merged.append((start, end))
+    return merged
+
+
+def subtract_intervals(intervals, busy):
+    """
+    Remove busy intervals from a list of free intervals.
+
+    Args:
+        intervals: Sorted, non-overlapping list of (start, end) tuples
+        busy: Iterable of (start, end) tuples to remove
+
+    Returns:
+        list: Sorted list of the remaining (start, end) tuples
+    """
+    result = []
+    busy = merge_intervals(busy)
+    for start, end in intervals:
+        current = start
+        for busy_start, busy_end in busy:
+            if busy_end <= current:
+                continue
+            if busy_start >= end:
+                break
+            if busy_start > current:
+                result.append((current, busy_start))
+            current = max(current, busy_end)
+            if current >= end:
+                break
+        if current < end:
+            result.append((current, end))
+    return result
+
+
+def rule_intervals(rules, check_date):
+    """
+    Compute the free intervals a set of availability rules allows on a date.
+
+    Specific-date rules take priority over weekly rules: when any specific rule
+    exists for the date, weekly rules are ignored. Off-day rules are removed
+    from the open windows. Staff without rules for the day are unavailable.
+
+    Args:
+        rules: Iterable of StaffAvailability objects for a single staff member
+        check_date (date): Date to evaluate
+
+    Returns:
+        list: Sorted list of free (start, end) tuples in minutes
+    """
+    specific = [r for r in rules if r.availability_type == AVAILABILITY_TYPE.SPECIFIC and r.specific_date == check_date]
+    if specific:
+        day_rules = specific
+    else:
+        weekday = check_date.weekday()
+        day_rules = [r for r in rules if r.availability_type == AVAILABILITY_TYPE.WEEKLY and r.weekday == weekday]
+
+    open_windows = merge_intervals(
+        (_to_minutes(r.start_time), _rule_end_minutes(r.end_time)) for r in day_rules if not r.off_day
+    )
+    off_windows = [
+        (_to_minutes(r.start_time), _rule_end_minutes(r.end_time)) for r in day_rules if r.off_day
+    ]
+    return subtract_intervals(open_windows, off_windows)
+
+
+def booking_interval(start_time, end_time):
+    """
+    Convert a booking's start and end times to (start, end) minutes.
+    Bookings ending at or before their start time run until midnight.
+    """
+    start_minutes = _to_minutes(start_time)
+    end_minutes = _to_minutes(end_time)
+    if end_minutes <= start_minutes:
+        end_minutes = MINUTES_PER_DAY
+    return start_minutes, end_minutes
+
+
+def day_intervals(start_at, end_at, tz):
+    """
+    Project an aware [start_at, end_at) range onto the local days it covers, so a
+    booking running past midnight also blocks the start of the next day.
+
+    Returns:
+        list: (date, start_minutes, end_minutes) tuples, one per day covered
+    """
+    start_at, end_at = start_at.astimezone(tz), end_at.astimezone(tz)
+    intervals = []
+    day = start_at.date()
+    while day <= end_at.date():
+        day_start = datetime.combine(day, time.min, tzinfo=tz)
+        start_minutes = max(0, int((start_at - day_start).total_seconds() // 60))
+        end_minutes = min(MINUTES_PER_DAY, int((end_at - day_start).total_seconds() // 60))
+        if start_minutes < end_minutes:
+            intervals.append((day, start_minutes, end_minutes))
+        day += timedelta(days=1)
+    return intervals
+
+
+def utc_window(start_date, end_date):
+    """
+    Return an absolute [start, end) range covering start_date to end_date in any
+    timezone, to load booking ranges before their business timezone is known.
+    """
+    return (
+        datetime.combine(start_date - timedelta(days=1), time.min, tzinfo=dt_timezone.utc),
+        datetime.combine(end_date + timedelta(days=2), time.min, tzinfo=dt_timezone.utc),
+    )
+
+
+def staff_busy_intervals(staff_ids, dates):
+    """
+    Load the active bookings of staff members overlapping the given dates, by range.
+
+    Returns:
+        dict: (staff_id, date) -> list of (start, end, booking_id) minutes
+    """
+    dates = set(dates)
+    busy = {}
+    if not dates:
+        return busy
+
+    window_start, window_end = utc_window(min(dates), max(dates))
+    # Assignments only carry a range while their booking is active
+    for staff_id, booking_id, start_at, end_at, timezone_name in BookingStaffAssignment.objects.filter(
+        staff_member_id__in=staff_ids,
+        start_at__lt=window_end,
+        end_at__gt=window_start
+    ).values_list('staff_member_id', 'booking_id', 'start_at', 'end_at', 'booking__business__timezone'):
+        tz = Business(timezone=timezone_name).tzinfo
+        for day, start_minutes, end_minutes in day_intervals(start_at, end_at, tz):
+            if day in dates:
+                busy.setdefault((staff_id, day), []).append((start_minutes, end_minutes, booking_id))
+    return busy
+
+
+def minute_grid(interval_lists):
+    """
+    Build a boolean minute-of-day grid, one row per list of (start, end) intervals.
+
+    Returns:
+        numpy.ndarray: (len(interval_lists), 1440) array, True for minutes inside an interval
+    """
+    grid = np.zeros((len(interval_lists), MINUTES_PER_DAY), dtype=bool)
+    for row, intervals in enumerate(interval_lists):
+        for start, end in intervals:
+            grid[row, start:end] = True
+    return grid
+
+
+def fitting_starts(grid, starts, duration_minutes):
+    """
+    Check, for every row of a minute grid and every candidate start, whether the
+    following duration_minutes minutes are all True. Uses a running sum per row so
+    each check is a single subtraction.
+
+    Args:
+        grid (numpy.ndarray): Boolean minute grid from minute_grid
+        starts (numpy.ndarray): Candidate start minutes; start + duration must be <= 1440
+        duration_minutes (int): Length of the run to look for
+
+    Returns:
+        numpy.ndarray: Boolean (rows, len(starts)) array
+    """
+    runs = np.zeros((grid.shape[0], MINUTES_PER_DAY + 1), dtype=np.int32)
+    np.cumsum(grid, axis=1, out=runs[:, 1:])
+    return (runs[:, starts + duration_minutes] - runs[:, starts]) == duration_minutes
+
+
+def get_slot_interval(business_id):
+    """Return the minutes between offered start times for a business."""
+    slot_interval = BusinessConfiguration.objects.filter(
+        business_id=business_id
+    ).values_list('slot_granularity_minutes', flat=True).first()
+    return slot_interval or DEFAULT_SLOT_INTERVAL
+
+
+def _contains(intervals, start, end):
+    """Check whether [start, end) lies entirely inside one of the intervals."""
+    for interval_start, interval_end in intervals:
+        if interval_start <= start and end <= interval_end:
+            return True
+        if interval_start > start:
+            break
+    return False
+
+
+class StaffEligibility:
+    """
+    In-memory evaluator of staff availability rules.
+
+    Loads the rules of one staff member or a whole team in a single query and
+    then answers any number of (date, start, end) questions from memory, using
+    the specific-over-weekly precedence of rule_intervals. Existing bookings are
+    only considered after load_bookings() has been called.
+    """
+
+    def __init__(self, staff_ids, dates=None):
+        """
+        Args:
+            staff_ids: Iterable of StaffMember IDs
+            dates (optional): Iterable of the dates that will be asked about. Only the
+                rules that can apply to them are loaded; without it every rule is loaded.
+        """
+        self.staff_ids = list(staff_ids)
+        self._rules = {staff_id: [] for staff_id in self.staff_ids}
+        self._intervals = {}
+        # staff_id -> list of (start_at, end_at, booking_id), None until load_bookings()
+        self._bookings = None
+
+        if not self.staff_ids:
+            return
+
+        rules = StaffAvailability.objects.filter(staff_member_id__in=self.staff_ids)
+        if dates is not None:
+            dates = set(dates)
+            if not dates:
+                return
+            rules = rules.filter(
+                Q(availability_type=AVAILABILITY_TYPE.WEEKLY, weekday__in={day.weekday() for day in dates}) |
+                Q(availability_type=AVAILABILITY_TYPE.SPECIFIC, specific_date__range=(min(dates), max(dates)))
+            )
+        for rule in rules:
+            self._rules[rule.staff_member_id].append(rule)
+
+    def intervals(self, staff_id, check_date):
+        """Return the free (start, end) minutes a staff member's rules allow on a date."""
+        key = (staff_id, check_date)
+        if key not in self._intervals:
+            self._intervals[key] = rule_intervals(self._rules.get(staff_id, []), check_date)
+        return self._intervals[key]
+
+    def allows(self, staff_id, check_date, start_time, end_time):
+        """
+        Check whether a staff member's rules cover the whole of [start_time, end_time).
+        End times at or before the start time run until midnight.
+        """
+        start_minutes = _to_minutes(start_time)
+        end_minutes = _to_minutes(end_time)
+        if end_minutes <= start_minutes:
+            end_minutes = MINUTES_PER_DAY
+        return _contains(self.intervals(staff_id, check_date), start_minutes, end_minutes)
+
+    def load_bookings(self, start_at, end_at):
+        """Load the active booking ranges of every staff member overlapping [start_at, end_at)."""
+        self._bookings = {staff_id: [] for staff_id in self.staff_ids}
+        for staff_id, booking_id, booking_start, booking_end in BookingStaffAssignment.objects.filter(
+            staff_member_id__in=self.staff_ids,
+            start_at__lt=end_at,
+            end_at__gt=start_at
+        ).values_list('staff_member_id', 'booking_id', 'start_at', 'end_at'):
+            self._bookings[staff_id].append((booking_start, booking_end, booking_id))
+
+    def add_booking(self, staff_id, start_at, end_at, booking_id=None):
+        """Record a booking range that isn't in the database yet, e.g. while validating a batch."""
+        if self._bookings is None:
+            self._bookings = {}
+        self._bookings.setdefault(staff_id, []).append((start_at, end_at, booking_id))
+
+    def has_conflict(self, staff_id, start_at, end_at, exclude_booking_id=None):
+        """
+        Check whether a staff member has another active booking overlapping [start_at, end_at).
+        Requires load_bookings() over a range covering the question.
+        """
+        return any(
+            booking_start < end_at and booking_end > start_at
+            for booking_start, booking_end, booking_id in (self._bookings or {}).get(staff_id, [])
+            if booking_id != exclude_booking_id
+        )
+
+
+class AvailabilityEngine:
+    """
+    Set-based availability calculator for a business.
+
+    Loads the qualified staff, their availability rules and their booking
+    assignments for a whole date range in a constant number of queries, then
+    answers slot and staff questions from memory using interval arithmetic.
+    Precomputed StaffFreeBusy rows are used where present; rules and bookings
+    are only read for staff members without full coverage of the range.
+    Active slot holds are always read live since they expire with time.
+
+    A business takes one booking at a time (see Booking.overlapping), so every
+    active booking of the business is busy time for all of its staff as well,
+    and slot listings agree with what a reservation accepts.
+    """
+
+    def __init__(self, business_id, start_date, end_date=None, service_offering_id=None,
+                 staff_member_id=None, exclude_booking_id=None, use_materialized=True,
+                 exclude_hold_id=None):
+        """
+        Args:
+            business_id: ID of the business
+            start_date (date): First date that will be queried
+            end_date (date, optional): Last date that will be queried (defaults to start_date)
+            service_offering_id (optional): Only include staff assigned to this service
+            staff_member_id (optional): Only include this staff member
+            exclude_booking_id (optional): Ignore this booking when computing busy time
+            use_materialized (bool): Read precomputed StaffFreeBusy rows where they exist
+            exclude_hold_id (optional): Ignore this slot hold when computing busy time
+        """
+        self.business_id = business_id
+        self.start_date = start_date
+        self.end_date = end_date or start_date
+        self.service_offering_id = service_offering_id
+        self.staff_member_id = staff_member_id
+        self.exclude_booking_id = exclude_booking_id
+        self.use_materialized = use_materialized
+        self.exclude_hold_id = exclude_hold_id
+
+        self._free_cache = {}
+        self._slot_interval = None
+        self._load()
+
+    def _dates(self):
+        """Return every date in the engine's range."""
+        dates = []
+        current = self.start_date
+        while current <= self.end_date:
+            dates.append(current)
+            current += timedelta(days=1)
+        return dates
+
+    @staticmethod
+    def qualified_staff(business_id, service_offering_id=None, staff_member_id=None):
+        """
+        Return a queryset of the staff members that can take bookings.
+        Staff must be assigned to at least one service (or the requested one) to be bookable.
+        """
+        staff_query = Q(business_id=business_id, is_active=True, is_available=True)
+        if staff_member_id:
+            staff_query &= Q(id=staff_member_id)
+        if service_offering_id:
+            staff_query &= Q(service_assignments__service_offering_id=service_offering_id)
+        else:
+            staff_query &= Q(service_assignments__isnull=False)
+        return StaffMember.objects.filter(staff_query).distinct()
+
+    def _load(self):
+        """Load staff, then free/busy data for the date range."""
+        self.staff = list(self.qualified_staff(self.business_id, self.service_offering_id, self.staff_member_id))
+        staff_ids = [staff.id for staff in self.staff]
+
+        # (staff_id, date) -> list of (start, end) minutes
+        self._open = {}
+        # (staff_id, date) -> list of (start, end, booking_id)
+        self._busy = {}
+        # (staff_id, date) -> list of (start, end, hold_id)
+        self._holds = {}
+        # (staff_id, date) -> minutes taken by active bookings
+        self._booked = {}
+        # date -> list of (start, end, booking_id) of every booking of the business
+        self._business_busy = {}
+
+        if not staff_ids:
+            return
+
+        self._load_holds(staff_ids)
+        self._load_business_bookings()
+
+        missing_staff_ids = staff_ids
+        if self.use_materialized:
+            missing_staff_ids = self._load_materialized(staff_ids)
+
+        if missing_staff_ids:
+            self._load_from_rules(missing_staff_ids)
+
+    def _load_materialized(self, staff_ids):
+        """
+        Load precomputed StaffFreeBusy rows.
+
+        Returns:
+            list: IDs of staff members missing a row for at least one date
+        """
+        rows = StaffFreeBusy.objects.filter(
+            staff_member_id__in=staff_ids,
+            date__range=(self.start_date, self.end_date)
+        ).values_list('staff_member_id', 'date', 'open_intervals', 'busy_intervals', 'booked_minutes')
+
+        covered_days = {}
+        for staff_id, day, open_intervals, busy_intervals, booked in rows:
+            self._open[(staff_id, day)] = [tuple(interval) for interval in open_intervals]
+            self._busy[(staff_id, day)] = [tuple(interval) for interval in busy_intervals]
+            self._booked[(staff_id, day)] = booked
+            covered_days[staff_id] = covered_days.get(staff_id, 0) + 1
+
+        day_count = (self.end_date - self.start_date).days + 1
+        return [staff_id for staff_id in staff_ids if covered_days.get(staff_id, 0) < day_count]
+
+    def _load_holds(self, staff_ids):
+        """Load the slot holds that haven't expired yet."""
+        for staff_id, hold_id, hold_date, start, end in SlotHold.objects.filter(
+            staff_member_id__in=staff_ids,
+            date__range=(self.start_date, self.end_date),
+            expires_at__gt=timezone.now()
+        ).values_list('staff_member_id', 'id', 'date', 'start_time', 'end_time'):
+            start_minutes, end_minutes = booking_interval(start, end)
+            self._holds.setdefault((staff_id, hold_date), []).append((start_minutes, end_minutes, hold_id))
+
+    def _load_business_bookings(self):
+        """Load the active bookings of the whole business by range."""
+        dates = set(self._dates())
+        window_start, window_end = utc_window(self.start_date, self.end_date)
+        for booking_id, start_at, end_at, timezone_name in Booking.objects.filter(
+            business_id=self.business_id,
+            start_at__lt=window_end,
+            end_at__gt=window_start,
+            status__in=ACTIVE_BOOKING_STATUSES
+        ).values_list('id', 'start_at', 'end_at', 'business__timezone'):
+            tz = Business(timezone=timezone_name).tzinfo
+            for day, start_minutes, end_minutes in day_intervals(start_at, end_at, tz):
+                if day in dates:
+                    self._business_busy.setdefault(day, []).append((start_minutes, end_minutes, booking_id))
+
+    def _load_from_rules(self, staff_ids):
+        """Derive open and busy intervals from availability rules and bookings."""
+        dates = self._dates()
+        eligibility = StaffEligibility(staff_ids, dates)
+        busy = staff_busy_intervals(staff_ids, dates)
+
+        for staff_id in staff_ids:
+            for day in dates:
+                key = (staff_id, day)
+                if key in self._open:
+                    # Already materialized
+                    continue
+                self._open[key] = eligibility.intervals(staff_id, day)
+                self._busy[key] = busy.get(key, [])
+                self._booked[key] = sum(end - start for start, end in merge_intervals(
+                    (start, end) for start, end, booking_id in self._busy[key]
+                ))
+
+    def open_intervals(self, staff_id, check_date):
+        """Return the (start, end) intervals a staff member's rules allow on a date."""
+        return self._open.get((staff_id, check_date), [])
+
+    def busy_intervals(self, staff_id, check_date):
+        """
+        Return the booked or held (start, end) intervals for a staff member on a date,
+        including the bookings of their colleagues.
+        """
+        key = (staff_id, check_date)
+        return [
+            (start, end) for start, end, booking_id in self._busy.get(key, []) + self._business_busy.get(check_date, [])
+            if booking_id != self.exclude_booking_id
+        ] + [
+            (start, end) for start, end, hold_id in self._holds.get(key, [])
+            if hold_id != self.exclude_hold_id
+        ]
+
+    def free_intervals(self, staff_id, check_date):
+        """
+        Return the free (start, end) intervals in minutes for a staff member on a date,
+        i.e. their availability rules minus their existing bookings.
+        """
+        key = (staff_id, check_date)
+        if key not in self._free_cache:
+            self._free_cache[key] = subtract_intervals(
+                self.open_intervals(staff_id, check_date),
+                self.busy_intervals(staff_id, check_date)
+            )
+        return self._free_cache[key]
+
+    def mark_busy(self, staff_id, check_date, start_minutes, end_minutes, booking_id=None):
+        """Record a booking that isn't in the database yet, so later questions see it as taken."""
+        key = (staff_id, check_date)
+        self._busy.setdefault(key, []).append((start_minutes, end_minutes, booking_id))
+        self._booked[key] = self._booked.get(key, 0) + end_minutes - start_minutes
+        self._free_cache.pop(key, None)
+
+    def booked_minutes(self, staff_id, check_date):
+        """Return the minutes a staff member is booked for on a date (their utilization)."""
+        return self._booked.get((staff_id, check_date), 0)
+
+    def is_available(self, staff_id, check_date, start_minutes, end_minutes):
+        """Check whether a staff member is free for the whole [start, end) range."""
+        return _contains(self.free_intervals(staff_id, check_date), start_minutes, end_minutes)
+
+    def available_staff(self, check_date, start_time, duration_minutes):
+        """
+        Return the staff members free for a slot.
+
+        Args:
+            check_date (date): Date of the slot
+            start_time (time): Start time of the slot
+            duration_minutes (int): Length of the slot in minutes
+
+        Returns:
+            list: StaffMember objects in their default ordering
+        """
+        start_minutes = _to_minutes(start_time)
+        end_minutes = start_minutes + duration_minutes
+        return [
+            staff for staff in self.staff
+            if self.is_available(staff.id, check_date, start_minutes, end_minutes)
+        ]
+
+    @property
+    def slot_interval(self):
+        """Minutes between candidate start times, from the business configuration."""
+        if self._slot_interval is None:
+            self._slot_interval = get_slot_interval(self.business_id)
+        return self._slot_interval
+
+    def day_bounds(self, check_date):
+        """
+        Determine the bookable window of a day from the staff availability rules.
+        Falls back to 9:00-17:00 and widens it to cover every staff member's hours.
+        """
+        earliest_start = _to_minutes(time(9, 0))
+        latest_end = _to_minutes(time(17, 0))
+
+        for staff in self.staff:
+            intervals = self.open_intervals(staff.id, check_date)
+            if intervals:
+                earliest_start = min(earliest_start, intervals[0][0])
+                latest_end = max(latest_end, intervals[-1][1])
+
+        return earliest_start, latest_end
+
+    def _search_bounds(self, check_date, slot_interval):
+        """
+        Return the (start, end) minutes to search on a date.
+        For today in the business timezone, the search starts from the next slot boundary.
+        """
+        day_start, day_end = self.day_bounds(check_date)
+
+        now = business_now(self.business_id, check_date)
+        if now is not None:
+            now_minutes = _to_minutes(now.time())
+            if now_minutes > day_start:
+                day_start = (now_minutes // slot_interval + 1) * slot_interval
+
+        return day_start, day_end
+
+    def slot_grid(self, check_date, duration_minutes, slot_interval=None):
+        """
+        Evaluate every candidate start time on a date for every staff member at once.
+
+        Each staff member's free time becomes a row of a minute grid and a running
+        sum finds the starts followed by at least duration_minutes free minutes.
+
+        Returns:
+            tuple: (starts, fits) where starts is an array of start minutes and fits
+                is a boolean (staff x starts) array aligned with self.staff
+        """
+        slot_interval = slot_interval or self.slot_interval
+        day_start, day_end = self._search_bounds(check_date, slot_interval)
+
+        starts = np.arange(day_start, day_end - duration_minutes + 1, slot_interval)
+        if not self.staff or not len(starts) or duration_minutes <= 0:
+            return starts, np.zeros((len(self.staff), len(starts)), dtype=bool)
+
+        grid = minute_grid([self.free_intervals(staff.id, check_date) for staff in self.staff])
+        return starts, fitting_starts(grid, starts, duration_minutes)
+
+    def open_slots(self, check_date, duration_minutes, slot_interval=None):
+        """
+        List every candidate start time on a date together with all staff free for it.
+
+        Unlike find_slots, slots are not handed out to a single staff member, so the
+        result describes the full open capacity of the day.
+
+        Returns:
+            list: List of (start_minutes, end_minutes, [StaffMember]) tuples
+        """
+        starts, fits = self.slot_grid(check_date, duration_minutes, slot_interval)
+
+        open_slots = []
+        for column in np.flatnonzero(fits.any(axis=0)):
+            slot_start = int(starts[column])
+            free_staff = [self.staff[row] for row in np.flatnonzero(fits[:, column])]
+            open_slots.append((slot_start, slot_start + duration_minutes, free_staff))
+
+        return open_slots
+
+    def find_slots(self, check_date, duration_minutes, max_slots=3, slot_interval=None):
+        """
+        Find available slots on a date, each assigned to the first free staff member.
+
+        Args:
+            check_date (date): Date to check
+            duration_minutes (int): Duration of the appointment in minutes
+            max_slots (int): Maximum number of slots to return
+            slot_interval (int, optional): Minutes between candidate start times,
+                defaults to the business's slot granularity
+
+        Returns:
+            list: List of slot dicts with date, time, end_time and staff
+        """
+        available_slots = []
+        if not self.staff or max_slots <= 0:
+            return available_slots
+
+        starts, fits = self.slot_grid(check_date, duration_minutes, slot_interval)
+
+        # Slots handed out in this call, so consecutive suggestions don't overlap for one staff member
+        suggested = {}
+
+        for column in np.flatnonzero(fits.any(axis=0)):
+            if len(available_slots) >= max_slots:
+                break
+            slot_start = int(starts[column])
+            slot_end = slot_start + duration_minutes
+
+            for row in np.flatnonzero(fits[:, column]):
+                staff = self.staff[row]
+                if any(slot_start < end and slot_end > start for start, end in suggested.get(staff.id, [])):
+                    continue
+
+                available_slots.append({
+                    'date': check_date.strftime('%Y-%m-%d'),
+                    'time': _minutes_to_time(slot_start).strftime('%H:%M'),
+                    'end_time': _minutes_to_time(slot_end).strftime('%H:%M'),
+                    'staff': {
+                        'id': str(staff.id),
+                        'name': staff.get_full_name()
+                    }
+                })
+                suggested.setdefault(staff.id, []).append((slot_start, slot_end))
+                break  # Found an available staff for this slot
+
+        return available_slots
+
+
+@trace.traced()
+def check_timeslot_availability(business, start_time, duration_minutes, service=None, use_cache=True):
     """
     Check if a specific time slot is available.
-    
+    Results are cached per business and date until a booking or availability change on that date.
+
     Args:
         business: Business object or ID
-        start_time: Datetime object for the start time
+        start_time: Datetime object for the start time. Naive datetimes are wall time
+            in the business timezone, aware ones are converted to it.
         duration_minutes: Duration of the appointment in minutes
         service: Optional ServiceOffering object
-        
+        use_cache (bool): Set to False to bypass the availability cache
+
     Returns:
-        Tuple of (is_available, reason, available_staff)
+        Tuple of (is_available, reason, available_staff), with available_staff
+        ordered by the business's staff assignment strategy (best first)
     """
     try:
-        print(f"[DEBUG] check_timeslot_availability called with: business={business}, start_time={start_time}, duration_minutes={duration_minutes}, service={service}")
-        
-        # Convert business ID to object if needed
-        if not isinstance(business, Business):
-            try:
-                print(f"[DEBUG] Converting business ID to object: {business}")
+        if timezone.is_aware(start_time):
+            if not isinstance(business, Business):
                 business = Business.objects.get(id=business)
-                print(f"[DEBUG] Found business: {business.name}")
-            except Business.DoesNotExist:
-                print(f"[DEBUG] Business with ID {business} not found")
-                return False, f"Business with ID {business} not found", []
-        
-        # Calculate end time
-        end_time = start_time + timedelta(minutes=duration_minutes)
-        print(f"[DEBUG] Calculated end time: {end_time}")
-        
-        # Note: We don't check business hours separately because staff availability IS the business hours
-        
-        # Check if there are any conflicting bookings
-        try:
-            # Get all valid booking status values
-            valid_statuses = []
-            for status in BookingStatus:
-                if str(status).upper() == 'CONFIRMED' or str(status).upper() == 'PENDING' or str(status).upper() == 'RESCHEDULED':
-                    valid_statuses.append(status)
-            
-            print(f"[DEBUG] Valid booking statuses: {valid_statuses}")
-            
-       
-            conflicting_bookings = Booking.objects.filter(
-                    business=business,
-                    booking_date=start_time.date(),
-                    start_time__lte=end_time.time(),
-                    end_time__gte=start_time.time(),
-                    status__in=valid_statuses
-                )
-            
-            print(f"[DEBUG] Found {conflicting_bookings.count()} conflicting bookings")
-            
-            if conflicting_bookings.exists():
-                return False, "Time slot conflicts with existing bookings", []
-                
-        except Exception as e:
-            print(f"[DEBUG] Error checking conflicting bookings: {str(e)}")
-            # If there's an error with the booking fields, return a generic message
-            return False, "Unable to check booking conflicts", []
-        
-        # Check if any staff is available
-        try:
-            # Get staff members - filter by service if provided
-            if service:
-                # Get staff members who are assigned to this service
-                staff_with_service = StaffServiceAssignment.objects.filter(
-                    service_offering=service
-                ).values_list('staff_member_id', flat=True)
-                
-                all_staff = StaffMember.objects.filter(
-                    business=business, 
-                    is_active=True,
-                    id__in=staff_with_service
-                )
-                print(f"[DEBUG] Filtering by service: {service.name}")
-            else:
-                all_staff = StaffMember.objects.filter(business=business, is_active=True)
-            
-            print(f"[DEBUG] Checking availability for {all_staff.count()} staff members")
-            
-            if not all_staff.exists():
-                if service:
-                    print(f"[DEBUG] No staff members assigned to service: {service.name}")
-                    return False, f"No staff members available for {service.name}", []
-                else:
-                    print(f"[DEBUG] No staff members found for this business")
-                    return False, "No staff members found for this business", []
-            
-            # For each staff member, check if they're available
-            available_staff = []
-            for staff in all_staff:
-                try:
-                    # First check if staff has any service assignments
-                    has_service_assignment = StaffServiceAssignment.objects.filter(
-                        staff_member=staff
-                    ).exists()
-                    
-                    if not has_service_assignment:
-                        print(f"[DEBUG] Staff {staff.id} has no service assignments - skipping")
-                        continue
-                    
-                    # Check if staff is available at this time
-                    if is_staff_available(staff, start_time.date(), start_time.time(), end_time.time()):
-                        available_staff.append(staff)
-                        print(f"[DEBUG] Staff {staff.id} is available")
-                except Exception as e:
-                    print(f"[DEBUG] Error checking availability for staff {staff.id}: {str(e)}")
-                    # Continue to the next staff member
-                    continue
-            
-            print(f"[DEBUG] Found {len(available_staff)} available staff members")
-            
-            if not available_staff:
-                return False, "No staff available at this time", []
-            
-            # Convert staff members to a serializable format
-            staff_data = []
-            for staff in available_staff:
-                staff_data.append({
-                    'id': str(staff.id),
-                    'name': staff.get_full_name(),
-                    'email': staff.email,
-                    'phone': staff.phone
-                })
-            
-            return True, "Available", staff_data
-            
-        except Exception as e:
-            import traceback
-            print(f"[DEBUG] Error in check_timeslot_availability: {str(e)}")
-            print(f"[DEBUG] Traceback: {traceback.format_exc()}")
-            return False, f"Error checking availability: {str(e)}", []
+            start_time = timezone.make_naive(start_time, business.tzinfo)
+
+        business_id = business.id if isinstance(business, Business) else business
+
+        def compute():
+            # The strategy name is cached with the result so a cache hit needs no query
+            strategy = get_strategy(business_id)
+            return _check_timeslot_availability(business, start_time, duration_minutes, service, strategy), strategy.name
+
+        if use_cache:
+            result, strategy_name = cached_lookup(
+                'ordered_timeslot', business_id, start_time.date(),
+                (start_time.time().isoformat(), duration_minutes, service.id if service else None),
+                compute
+            )
+        else:
+            result, strategy_name = compute()
+
+        strategy = STRATEGIES[strategy_name]
+        if not strategy.cacheable:
+            is_available, reason, staff_data = result
+            result = is_available, reason, strategy.rotate(business_id, staff_data)
+        return result
 
     except Exception as e:
-        import traceback
-        print(f"[DEBUG] Error in check_timeslot_availability: {str(e)}")
-        print(f"[DEBUG] Traceback: {traceback.format_exc()}")
+        trace.error("Error in check_timeslot_availability: {}", e, exc_info=True)
         return False, f"Error checking availability: {str(e)}", []
-    
+
+
+def _check_timeslot_availability(business, start_time, duration_minutes, service=None, strategy=None):
+    """
+    Uncached implementation of check_timeslot_availability.
+    Raises on database errors so that failures are never cached.
+    The available staff are ordered by strategy (an AssignmentStrategy) when given.
+    """
+    # Convert business ID to object if needed
+    if not isinstance(business, Business):
+        try:
+            business = Business.objects.get(id=business)
+        except Business.DoesNotExist:
+            return False, f"Business with ID {business} not found", []
+
+    # Note: We don't check business hours separately because staff availability IS the business hours
+
+    # Check if there are any conflicting bookings
+    start_at = timezone.make_aware(start_time, business.tzinfo)
+    end_at = start_at + timedelta(minutes=duration_minutes)
+    if Booking.overlapping(business, start_at, end_at).exists():
+        return False, "Time slot conflicts with existing bookings", []
+
+    # Check if any staff is available
+    engine = AvailabilityEngine(
+        business.id,
+        start_time.date(),
+        service_offering_id=service.id if service else None
+    )
+
+    if not engine.staff:
+        if service:
+            return False, f"No staff members available for {service.name}", []
+        return False, "No staff members found for this business", []
+
+    available_staff = engine.available_staff(start_time.date(), start_time.time(), duration_minutes)
+
+    if not available_staff:
+        return False, "No staff available at this time", []
+
+    if strategy is not None:
+        available_staff = strategy.order(
+            available_staff, engine, start_time.date(), service.id if service else None
+        )
+
+    # Convert staff members to a serializable format
+    staff_data = []
+    for staff in available_staff:
+        staff_data.append({
+            'id': str(staff.id),
+            'name': staff.get_full_name(),
+            'email': staff.email,
+            'phone': staff.phone
+        })
+
+    return True, "Available", staff_data
+
 
 # Business hours are determined by staff availability, not a separate setting
 
 
+@trace.traced()
 def get_alternate_timeslots(business_id, date, start_time, duration_minutes, service_offering_id=None, staff_member_id=None):
     """
     Find alternate available timeslots when the requested slot is unavailable.
-    
+    Checks the requested day and the two following days.
+
     Args:
         business_id (UUID): ID of the business
         date (date): Date to check
@@ -169,66 +816,41 @@ def get_alternate_timeslots(business_id, date, start_time, duration_minutes, ser
         duration_minutes (int): Duration of the appointment in minutes
         service_offering_id (UUID, optional): ID of the service offering
         staff_member_id (UUID, optional): ID of a specific staff member to check
-        
+
     Returns:
         list: List of dicts with alternate date/time options
     """
-    print(f"[DEBUG] get_alternate_timeslots called with: business_id={business_id}, date={date}, start_time={start_time}, duration_minutes={duration_minutes}, service_offering_id={service_offering_id}, staff_member_id={staff_member_id}")
-    
-    alternate_slots = []
-    current_date = date
-    
-    # Try same day, different times
-    same_day_slots = find_available_slots_on_date(
-        business_id, 
-        current_date, 
-        duration_minutes, 
-        None, 
-        staff_member_id,
-        max_slots=3
+    max_slots = 3
+    days_to_check = 3
+
+    # Load all three days at once instead of re-querying per day. The engine counts
+    # every booking of the business as busy, so alternates pass Booking.overlapping too
+    engine = AvailabilityEngine(
+        business_id,
+        date,
+        date + timedelta(days=days_to_check - 1),
+        service_offering_id=service_offering_id,
+        staff_member_id=staff_member_id
     )
-    
-    alternate_slots.extend(same_day_slots)
-    
-    print(f"[DEBUG] Found {len(alternate_slots)} alternate slots on same day")
-    
-    # If we don't have enough slots, try the next day
-    if len(alternate_slots) < 3:
-        next_day = current_date + timedelta(days=1)
-        next_day_slots = find_available_slots_on_date(
-            business_id, 
-            next_day, 
-            duration_minutes, 
-            None, 
-            staff_member_id,
-            max_slots=3 - len(alternate_slots)
-        )
-        alternate_slots.extend(next_day_slots)
-        
-        print(f"[DEBUG] Found {len(alternate_slots)} alternate slots on next day")
-    
-    # If we still don't have enough slots, try two days later
-    if len(alternate_slots) < 3:
-        two_days_later = current_date + timedelta(days=2)
-        two_days_later_slots = find_available_slots_on_date(
-            business_id, 
-            two_days_later, 
-            duration_minutes, 
-            None, 
-            staff_member_id,
-            max_slots=3 - len(alternate_slots)
-        )
-        alternate_slots.extend(two_days_later_slots)
-        
-        print(f"[DEBUG] Found {len(alternate_slots)} alternate slots on two days later")
-    
+
+    alternate_slots = []
+    for offset in range(days_to_check):
+        if len(alternate_slots) >= max_slots:
+            break
+        alternate_slots.extend(engine.find_slots(
+            date + timedelta(days=offset),
+            duration_minutes,
+            max_slots=max_slots - len(alternate_slots)
+        ))
+
     return alternate_slots
 
 
-def find_available_slots_on_date(business_id, date, duration_minutes, service_offering_id=None, staff_member_id=None, max_slots=3):
+@trace.traced()
+def find_available_slots_on_date(business_id, date, duration_minutes, service_offering_id=None, staff_member_id=None, max_slots=3, use_cache=True):
     """
     Find available time slots on a specific date.
-    
+
     Args:
         business_id (UUID): ID of the business
         date (date): Date to check
@@ -236,272 +858,188 @@ def find_available_slots_on_date(business_id, date, duration_minutes, service_of
         service_offering_id (UUID, optional): ID of the service offering
         staff_member_id (UUID, optional): ID of a specific staff member to check
         max_slots (int): Maximum number of slots to return
-        
+        use_cache (bool): Set to False to bypass the availability cache
+
     Returns:
         list: List of dicts with available time slots
     """
-    print(f"[DEBUG] find_available_slots_on_date called with: business_id={business_id}, date={date}, duration_minutes={duration_minutes}, service_offering_id={service_offering_id}, staff_member_id={staff_member_id}, max_slots={max_slots}")
-    
-    available_slots = []
-    
-    # Get qualified staff members
-    staff_query = Q(business_id=business_id, is_active=True, is_available=True)
-    
-    if staff_member_id:
-        staff_query &= Q(id=staff_member_id)
-    
-    # Filter by service if provided
-    if service_offering_id:
-        # Get staff members who are assigned to this service
-        staff_with_service = StaffServiceAssignment.objects.filter(
-            service_offering_id=service_offering_id
-        ).values_list('staff_member_id', flat=True)
-        
-        staff_query &= Q(id__in=staff_with_service)
-        print(f"[DEBUG] Filtering staff by service offering: {service_offering_id}")
-    
-    qualified_staff = StaffMember.objects.filter(staff_query).distinct()
-    
-    print(f"[DEBUG] Found {qualified_staff.count()} qualified staff members")
-    
-    if not qualified_staff.exists():
-        return []
-    
-    # Get all existing bookings for this date
-    existing_bookings = Booking.objects.filter(
-        business_id=business_id,
-        booking_date=date,
-        status__in=[BookingStatus.PENDING, BookingStatus.CONFIRMED, BookingStatus.RESCHEDULED]
-    ).order_by('start_time')
-    
-    print(f"[DEBUG] Found {existing_bookings.count()} existing bookings")
-    
-    # Get earliest and latest availability from all qualified staff
-    # This determines the "business hours" based on staff availability
-    earliest_start = time(9, 0)  # Default fallback
-    latest_end = time(17, 0)     # Default fallback
-    
-    # Get the actual range from staff availability
-    for staff in qualified_staff:
-        staff_avail = staff.availability.filter(
-            Q(availability_type=AVAILABILITY_TYPE.WEEKLY, weekday=date.weekday()) |
-            Q(availability_type=AVAILABILITY_TYPE.SPECIFIC, specific_date=date)
-        ).exclude(off_day=True)
-        
-        for avail in staff_avail:
-            if avail.start_time < earliest_start:
-                earliest_start = avail.start_time
-            if avail.end_time > latest_end:
-                latest_end = avail.end_time
-    
-    business_start = earliest_start
-    business_end = latest_end
-    
-    # If checking for today, start from current time
-    if date == timezone.now().date() and timezone.now().time() > business_start:
-        current_time = timezone.now().time()
-        # Round up to the nearest half hour
-        minutes = current_time.minute
-        if minutes < 30:
-            business_start = time(current_time.hour, 30)
-        else:
-            business_start = time(current_time.hour + 1, 0)
-    
-    # Generate potential time slots at 30-minute intervals
-    slot_interval = 30  # minutes
-    slot_start = datetime.combine(date, business_start)
-    slot_end = datetime.combine(date, business_end)
-    
-    print(f"[DEBUG] Generating potential time slots from {slot_start} to {slot_end}")
-    
-    # Track which staff members are booked at which times
-    staff_bookings = {}
-    for staff in qualified_staff:
-        staff_bookings[str(staff.id)] = []
-        
-    # Populate staff bookings
-    for booking in existing_bookings:
-        staff_assignments = BookingStaffAssignment.objects.filter(booking=booking)
-        for assignment in staff_assignments:
-            staff_id = str(assignment.staff_member.id)
-            if staff_id in staff_bookings:
-                staff_bookings[staff_id].append({
-                    'start': datetime.combine(date, booking.start_time),
-                    'end': datetime.combine(date, booking.end_time)
-                })
-    
-    print(f"[DEBUG] Populated staff bookings")
-    
-    # Track which slots we've already added to avoid duplicates
-    added_slots = set()
-    
-    current_slot = slot_start
-    while current_slot + timedelta(minutes=duration_minutes) <= slot_end and len(available_slots) < max_slots:
-        slot_start_time = current_slot.time()
-        slot_end_time = (current_slot + timedelta(minutes=duration_minutes)).time()
-        
-        slot_key = f"{slot_start_time.strftime('%H:%M')}-{slot_end_time.strftime('%H:%M')}"
-        
-        # Skip if we already added this slot
-        if slot_key in added_slots:
-            current_slot += timedelta(minutes=slot_interval)
+    def compute():
+        engine = AvailabilityEngine(
+            business_id,
+            date,
+            service_offering_id=service_offering_id,
+            staff_member_id=staff_member_id
+        )
+        return engine.find_slots(date, duration_minutes, max_slots=max_slots)
+
+    if not use_cache:
+        return compute()
+
+    return cached_lookup(
+        'slots', business_id, date,
+        (duration_minutes, service_offering_id, staff_member_id, max_slots, today_bucket(business_id, date)),
+        compute
+    )
+
+
+@trace.traced()
+def find_available_slots_in_range(business_id, start_date, end_date, duration_minutes, service_offering_id=None, staff_member_id=None):
+    """
+    Compute the open slots for every day in a date range in a single pass.
+
+    Args:
+        business_id (UUID): ID of the business
+        start_date (date): First date of the range
+        end_date (date): Last date of the range (inclusive)
+        duration_minutes (int): Duration of the appointment in minutes
+        service_offering_id (UUID, optional): ID of the service offering
+        staff_member_id (UUID, optional): ID of a specific staff member to check
+
+    Returns:
+        dict: 'days' with a per-day summary and 'slots' mapping each date string to its slot list
+    """
+    engine = AvailabilityEngine(
+        business_id,
+        start_date,
+        end_date,
+        service_offering_id=service_offering_id,
+        staff_member_id=staff_member_id
+    )
+
+    days = []
+    slots = {}
+    current_date = start_date
+    while current_date <= end_date:
+        date_str = current_date.strftime('%Y-%m-%d')
+        day_slots = [
+            {
+                'time': _minutes_to_time(slot_start).strftime('%H:%M'),
+                'end_time': _minutes_to_time(slot_end).strftime('%H:%M'),
+                'staff': [str(staff.id) for staff in free_staff]
+            }
+            for slot_start, slot_end, free_staff in engine.open_slots(current_date, duration_minutes)
+        ]
+
+        days.append({
+            'date': date_str,
+            'available': bool(day_slots),
+            'slot_count': len(day_slots),
+            'first_slot': day_slots[0]['time'] if day_slots else None,
+            'last_slot': day_slots[-1]['time'] if day_slots else None,
+        })
+        if day_slots:
+            slots[date_str] = day_slots
+
+        current_date += timedelta(days=1)
+
+    return {
+        'days': days,
+        'slots': slots,
+        'staff': {str(staff.id): staff.get_full_name() for staff in engine.staff}
+    }
+
+
+@trace.traced()
+def get_reschedule_timeslots(booking, staff_member, start_date, duration_minutes, days=1, slot_interval=None):
+    """
+    List the candidate slots of a booking's staff member for rescheduling.
+
+    The staff member's rules and every conflicting booking in the date range are
+    fetched once, then all candidate starts are checked against a minute grid in
+    memory. A slot is unavailable when it overlaps another active booking of the
+    business or of the staff member; the booking being rescheduled is ignored.
+
+    Args:
+        booking (Booking): Booking being rescheduled
+        staff_member (StaffMember): Staff member whose hours are offered
+        start_date (date): First date to list
+        duration_minutes (int): Length of the booking in minutes
+        days (int): Number of consecutive days to list
+        slot_interval (int, optional): Minutes between candidate start times,
+            defaults to the business's slot granularity
+
+    Returns:
+        dict: Date -> list of slot dicts ('start_time', 'end_time', 'display_time',
+            'available'), or None for dates without any staff hours
+    """
+    slot_interval = slot_interval or get_slot_interval(booking.business_id)
+    end_date = start_date + timedelta(days=days - 1)
+
+    rules = list(StaffAvailability.objects.filter(staff_member=staff_member).filter(
+        Q(availability_type=AVAILABILITY_TYPE.WEEKLY) |
+        Q(availability_type=AVAILABILITY_TYPE.SPECIFIC, specific_date__range=(start_date, end_date))
+    ).order_by())
+
+    # Conflicts are fetched by absolute range, so bookings running past midnight
+    # also block the start of the next day
+    tz = booking.business.tzinfo
+    range_start = datetime.combine(start_date, time.min, tzinfo=tz)
+    range_end = datetime.combine(end_date + timedelta(days=1), time.min, tzinfo=tz)
+    conflicts = Booking.objects.filter(
+        Q(business_id=booking.business_id) | Q(staff_assignments__staff_member=staff_member),
+        start_at__lt=range_end,
+        end_at__gt=range_start,
+        status__in=ACTIVE_BOOKING_STATUSES
+    ).exclude(id=booking.id).values_list('start_at', 'end_at').order_by().distinct()
+
+    busy = {}
+    for start_at, end_at in conflicts:
+        for day, start_minutes, end_minutes in day_intervals(start_at, end_at, tz):
+            busy.setdefault(day, []).append((start_minutes, end_minutes))
+
+    timeslots = {}
+    current_date = start_date
+    while current_date <= end_date:
+        windows = rule_intervals(rules, current_date)
+        if not windows:
+            timeslots[current_date] = None
+            current_date += timedelta(days=1)
             continue
-        
-        # Check if any staff member is available for this slot
-        for staff in qualified_staff:
-            staff_id = str(staff.id)
-            
-            # First check if staff has any service assignments
-            has_service_assignment = StaffServiceAssignment.objects.filter(
-                staff_member=staff
-            ).exists()
-            
-            if not has_service_assignment:
-                print(f"[DEBUG] Staff {staff_id} has no service assignments - skipping")
-                continue
-            
-            # Check if staff has an overlapping booking
-            has_overlap = False
-            slot_start_dt = datetime.combine(date, slot_start_time)
-            slot_end_dt = datetime.combine(date, slot_end_time)
-            
-            for booking in staff_bookings.get(staff_id, []):
-                if (slot_start_dt < booking['end'] and slot_end_dt > booking['start']):
-                    has_overlap = True
-                    break
-            
-            if has_overlap:
-                print(f"[DEBUG] Staff {staff_id} has overlapping booking")
-                continue
-                
-            # Check staff availability
-            if is_staff_available(staff, date, slot_start_time, slot_end_time):
-                print(f"[DEBUG] Staff {staff_id} is available")
-                # Add this slot to available slots
-                available_slots.append({
-                    'date': date.strftime('%Y-%m-%d'),
-                    'time': slot_start_time.strftime('%H:%M'),
-                    'end_time': slot_end_time.strftime('%H:%M'),
-                    'staff': {
-                        'id': str(staff.id),
-                        'name': staff.get_full_name()
-                    }
-                })
-                
-                # Mark this slot as added
-                added_slots.add(slot_key)
-                
-                # Also mark this time as booked for this staff member to avoid suggesting overlapping slots
-                staff_bookings[staff_id].append({
-                    'start': slot_start_dt,
-                    'end': slot_end_dt
-                })
-                
-                break  # Found an available staff for this slot
-        
-        # Move to next slot
-        current_slot += timedelta(minutes=slot_interval)
-    
-    print(f"[DEBUG] Found {len(available_slots)} available slots")
-    for slot in available_slots:
-        print(f"[DEBUG] Available slot: {slot['date']} {slot['time']}-{slot['end_time']} with {slot['staff']['name']}")
-    
-    return available_slots
-
-def is_staff_available(staff, booking_date, booking_start_time, booking_end_time):
-    """
-    Check if a staff member is available at the given date and time.
-    
+
+        # Candidate starts are laid out from the start of each window, as staff see them
+        starts = np.concatenate([
+            np.arange(window_start, window_end - duration_minutes + 1, slot_interval)
+            for window_start, window_end in windows
+        ]).astype(np.int64)
+        free = ~minute_grid([busy.get(current_date, [])])
+        fits = fitting_starts(free, starts, duration_minutes)[0] if len(starts) else []
+
+        timeslots[current_date] = [
+            {
+                'start_time': _minutes_to_time(int(start)).strftime('%H:%M'),
+                'end_time': _minutes_to_time(int(start) + duration_minutes).strftime('%H:%M'),
+                'display_time': _minutes_to_time(int(start)).strftime('%I:%M %p'),
+                'available': bool(available)
+            }
+            for start, available in zip(starts, fits)
+        ]
+        current_date += timedelta(days=1)
+
+    return timeslots
+
+
+def is_staff_available(staff, booking_date, booking_start_time, booking_end_time, eligibility=None):
+    """
+    Check if a staff member's availability rules allow the given date and time.
+    Existing bookings are not considered here.
+
     Args:
         staff (StaffMember): Staff member to check
         booking_date (date): Date of the booking
         booking_start_time (time): Start time of the booking
         booking_end_time (time): End time of the booking
-        
+        eligibility (StaffEligibility, optional): Evaluator with the staff member's
+            rules already loaded, to avoid a query per call
+
     Returns:
         bool: True if staff is available, False otherwise
     """
-    print(f"[DEBUG] is_staff_available called with: staff={staff.id}, booking_date={booking_date}, booking_start_time={booking_start_time}, booking_end_time={booking_end_time}")
-    
-    weekday = booking_date.weekday()
-    
-    # First check specific date availability/unavailability (higher priority)
     try:
-        specific_availabilities = staff.availability.filter(
-            availability_type=AVAILABILITY_TYPE.SPECIFIC,
-            specific_date=booking_date
-        )
-        
-        print(f"[DEBUG] Found {specific_availabilities.count()} specific date availabilities")
-        
-        if specific_availabilities.exists():
-            # Check if any specific date rule marks this time as unavailable
-            for avail in specific_availabilities:
-                if avail.off_day:
-                    # This is an "off day" record - check if time overlaps with the off period
-                    if (booking_start_time < avail.end_time and booking_end_time > avail.start_time):
-                        print(f"[DEBUG] Staff {staff.id} has off day record overlapping with booking time")
-                        return False
-                else:
-                    # This is an "available" record - check if time is fully contained in the available period
-                    # Handle case where booking crosses midnight
-                    if booking_end_time < booking_start_time:  # Crosses midnight
-                        # For bookings that cross midnight, check if the start time is within the available period
-                        # and the available period extends to midnight
-                        if (booking_start_time >= avail.start_time and avail.end_time >= time(23, 59)):
-                            print(f"[DEBUG] Staff {staff.id} has available record containing booking start time (crosses midnight)")
-                            return True
-                    else:  # Normal case: both start and end times are on the same day
-                        if (booking_start_time >= avail.start_time and booking_end_time <= avail.end_time):
-                            print(f"[DEBUG] Staff {staff.id} has available record containing booking time")
-                            return True
-            
-            # If we have specific date rules but none explicitly allow this time, staff is unavailable
-            print(f"[DEBUG] Staff {staff.id} has specific date rules but none allow this time")
-            return False
-        
-        # Check weekly availability if no specific date rules exist
-        weekly_availabilities = staff.availability.filter(
-            availability_type=AVAILABILITY_TYPE.WEEKLY,
-            weekday=weekday
-        )
-        
-        print(f"[DEBUG] Found {weekly_availabilities.count()} weekly availabilities")
-        
-        if weekly_availabilities.exists():
-            # Check if any weekly rule marks this time as unavailable
-            for avail in weekly_availabilities:
-                if avail.off_day:
-                    # This is an "off day" record - check if time overlaps with the off period
-                    if (booking_start_time < avail.end_time and booking_end_time > avail.start_time):
-                        print(f"[DEBUG] Staff {staff.id} has off day record overlapping with booking time")
-                        return False
-                else:
-                    # This is an "available" record - check if time is fully contained in the available period
-                    # Handle case where booking crosses midnight
-                    if booking_end_time < booking_start_time:  # Crosses midnight
-                        # For bookings that cross midnight, check if the start time is within the available period
-                        # and the available period extends to midnight
-                        if (booking_start_time >= avail.start_time and avail.end_time >= time(23, 59)):
-                            print(f"[DEBUG] Staff {staff.id} has available record containing booking start time (crosses midnight)")
-                            return True
-                    else:  # Normal case: both start and end times are on the same day
-                        if (booking_start_time >= avail.start_time and booking_end_time <= avail.end_time):
-                            print(f"[DEBUG] Staff {staff.id} has available record containing booking time")
-                            return True
-            
-            # If we have weekly rules but none explicitly allow this time, staff is unavailable
-            print(f"[DEBUG] Staff {staff.id} has weekly rules but none allow this time")
-            return False
-        
-        # If no availability rules exist for this day, staff is NOT available
-        # Staff must have explicit availability set to be bookable
-        print(f"[DEBUG] Staff {staff.id} has no availability rules for this day - NOT AVAILABLE")
-        return False
+        if eligibility is None:
+            eligibility = StaffEligibility([staff.id], [booking_date])
+        return eligibility.allows(staff.id, booking_date, booking_start_time, booking_end_time)
 
     except Exception as e:
-        import traceback
-        print(f"[DEBUG] Error checking staff availability: {str(e)}")
-        print(f"[DEBUG] Traceback: {traceback.format_exc()}")
+        trace.error("Error checking staff availability: {}", e, exc_info=True)
         # If there's an error, assume staff is available to avoid blocking bookings
         return True
@@ -0,0 +1,142 @@
+"""
+Cache for availability lookups.
+
+Entries are keyed by business, date and the lookup parameters. Each key also
+embeds two version stamps, one for the business and one for the (business,
+date) pair. Changing a booking or a specific-date rule bumps only the date
+stamp; changes that can affect every day (weekly rules, staff, service
+assignments) bump the business stamp. Old entries are never deleted, they just
+stop being read and expire with the cache timeout.
+
+Only get/set/get_many/set_many are used so the local-memory and database cache
+backends both work.
+"""
+import hashlib
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+from django.utils import timezone
+
+from business.models import Business
+
+CACHE_ALIAS = 'availability' if 'availability' in settings.CACHES else 'default'
+
+
+def _cache():
+    return caches[CACHE_ALIAS]
+
+
+def _business_version_key(business_id):
+    return f'availability:version:{business_id}'
+
+
+def _date_version_key(business_id, check_date):
+    return f'availability:version:{business_id}:{check_date.isoformat()}'
+
+
+def _new_version():
+    return time.time_ns()
+
+
+def _versions(business_id, check_date):
+    """Return the (business, date) version stamps, creating missing ones."""
+    cache = _cache()
+    keys = [_business_version_key(business_id), _date_version_key(business_id, check_date)]
+    found = cache.get_many(keys)
+
+    missing = {key: _new_version() for key in keys if key not in found}
+    if missing:
+        cache.set_many(missing, timeout=None)
+        found.update(missing)
+
+    return found[keys[0]], found[keys[1]]
+
+
+def cache_key(kind, business_id, check_date, *params):
+    """
+    Build the cache key for a lookup.
+
+    Args:
+        kind (str): Name of the cached lookup
+        business_id: ID of the business
+        check_date (date): Date the lookup is about
+        *params: Remaining lookup parameters (service, duration, ...)
+
+    Returns:
+        str: Cache key
+    """
+    business_version, date_version = _versions(business_id, check_date)
+    digest = hashlib.md5(repr(params).encode('utf-8')).hexdigest()
+    return f'availability:{kind}:{business_id}:{check_date.isoformat()}:{business_version}:{date_version}:{digest}'
+
+
+def business_now(business_id, check_date):
+    """
+    Return the current time in the business timezone if check_date is today
+    there, otherwise None. The business's today is at most a day away from the
+    UTC date, so other dates need no query.
+    """
+    if abs((check_date - timezone.now().date()).days) > 1:
+        return None
+    timezone_name = Business.objects.filter(id=business_id).values_list('timezone', flat=True).first()
+    now = timezone.localtime(timezone=Business(timezone=timezone_name or 'UTC').tzinfo)
+    return now if now.date() == check_date else None
+
+
+def today_bucket(business_id, check_date):
+    """
+    Slot searches for today skip times that have already passed, so their
+    results change at every slot boundary (as often as every 5 minutes).
+    Returns a value to add to the key for today in the business timezone.
+    """
+    now = business_now(business_id, check_date)
+    if now is None:
+        return None
+    return (now.hour * 60 + now.minute) // 5
+
+
+def cached_lookup(kind, business_id, check_date, params, compute):
+    """
+    Return a cached lookup result, computing and storing it on a miss.
+
+    Args:
+        kind (str): Name of the cached lookup
+        business_id: ID of the business
+        check_date (date): Date the lookup is about
+        params (tuple): Remaining lookup parameters
+        compute (callable): Produces the result on a miss
+
+    Returns:
+        The cached or freshly computed result
+    """
+    key = cache_key(kind, business_id, check_date, *params)
+    cache = _cache()
+
+    result = cache.get(key)
+    if result is None:
+        result = compute()
+        cache.set(key, result)
+    return result
+
+
+def invalidate_dates(business_id, dates):
+    """
+    Invalidate cached lookups for the given dates of a business.
+    """
+    dates = {check_date for check_date in dates if check_date}
+    if not business_id or not dates:
+        return
+    version = _new_version()
+    _cache().set_many(
+        {_date_version_key(business_id, check_date): version for check_date in dates},
+        timeout=None
+    )
+
+
+def invalidate_business(business_id):
+    """
+    Invalidate every cached lookup of a business.
+    """
+    if business_id:
+        _cache().set(_business_version_key(business_id), _new_version(), timeout=None)
@@ -0,0 +1,281 @@
+"""
+Availability benchmark suite.
+
+Builds synthetic businesses (staff, service assignments, weekly and
+specific-date availability rules, bookings at a chosen density), then times
+the availability entry points and counts their queries. Results are plain
+dicts so the benchmark_availability command can write them to JSON and
+compare them against a saved baseline.
+
+Fixtures are inserted with bulk_create so model signals (notifications,
+invoices, plugin events) don't run; callers are expected to roll the whole
+run back.
+"""
+import random
+import statistics
+import time as timer
+from datetime import date, datetime, time, timedelta
+
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test.client import RequestFactory
+from django.test.utils import CaptureQueriesContext
+
+from business.models import Business, BusinessConfiguration, Industry, ServiceOffering
+from bookings.models import (
+    Booking, BookingStatus, BookingStaffAssignment, StaffMember, StaffAvailability,
+    StaffServiceAssignment, AVAILABILITY_TYPE
+)
+
+# Service durations (minutes) created for every synthetic business
+SERVICE_DURATIONS = [30, 60, 90]
+
+
+def _first_monday_after(day):
+    return day + timedelta(days=7 - day.weekday())
+
+
+def build_synthetic_businesses(businesses=2, staff_per_business=10, days=14, booking_density=0.5,
+                               specific_rule_rate=0.1, seed=42, start_date=None):
+    """
+    Create synthetic tenants for benchmarking.
+
+    Args:
+        businesses (int): Number of businesses to create
+        staff_per_business (int): Active staff members per business
+        days (int): Number of days that get bookings and specific-date rules
+        booking_density (float): Share (0-1) of each staff member's open time that is booked
+        specific_rule_rate (float): Chance per staff member and day of a specific-date rule
+        seed (int): Random seed, so runs are comparable
+        start_date (date, optional): First day of the window, defaults to next Monday
+
+    Returns:
+        dict: 'start_date', 'end_date' and a 'businesses' list of dicts with the
+            business, its services, staff and bookings
+    """
+    rng = random.Random(seed)
+    User = get_user_model()
+    start_date = start_date or _first_monday_after(date.today())
+    end_date = start_date + timedelta(days=days - 1)
+    industry, _ = Industry.objects.get_or_create(name='Benchmark', defaults={'slug': 'benchmark'})
+
+    result = []
+    for b in range(businesses):
+        prefix = f'bench{seed}_{b}'
+        user = User.objects.create_user(username=f'{prefix}_owner', password=None)
+        business = Business.objects.create(
+            name=f'Benchmark Business {b}', user=user, industry=industry,
+            phone_number='+15550000000', email=f'{prefix}@example.com'
+        )
+        BusinessConfiguration.objects.create(business=business, invoice_enabled=False)
+        services = [
+            ServiceOffering.objects.create(business=business, name=f'Service {minutes}', price=100, duration=minutes)
+            for minutes in SERVICE_DURATIONS
+        ]
+
+        staff = [
+            StaffMember(
+                id=f'{prefix}_staff_{i}', business=business, first_name=f'Staff{i}', last_name='Bench',
+                email=f'{prefix}_staff_{i}@example.com', phone='+15550000001'
+            )
+            for i in range(staff_per_business)
+        ]
+        StaffMember.objects.bulk_create(staff)
+
+        assignments = []
+        for member in staff:
+            for service in rng.sample(services, rng.randint(1, len(services))):
+                assignments.append(StaffServiceAssignment(staff_member=member, service_offering=service))
+        StaffServiceAssignment.objects.bulk_create(assignments)
+
+        # Weekly hours: Monday-Friday, plus Saturday for some staff
+        rules = []
+        hours = {}
+        for member in staff:
+            start_hour, end_hour = rng.randint(7, 10), rng.randint(15, 19)
+            hours[member.id] = (start_hour * 60, end_hour * 60)
+            for weekday in range(6 if rng.random() < 0.3 else 5):
+                rules.append(StaffAvailability(
+                    staff_member=member, availability_type=AVAILABILITY_TYPE.WEEKLY, weekday=weekday,
+                    start_time=time(start_hour), end_time=time(end_hour)
+                ))
+
+        # Specific-date exceptions: days off or shortened hours
+        current = start_date
+        while current <= end_date:
+            for member in staff:
+                if rng.random() < specific_rule_rate:
+                    off_day = rng.random() < 0.5
+                    rules.append(StaffAvailability(
+                        staff_member=member, availability_type=AVAILABILITY_TYPE.SPECIFIC, specific_date=current,
+                        start_time=time(0) if off_day else time(12), end_time=time(23, 59) if off_day else time(16),
+                        off_day=off_day
+                    ))
+            current += timedelta(days=1)
+        StaffAvailability.objects.bulk_create(rules)
+
+        # Bookings: walk each staff member's day and book roughly booking_density of it
+        bookings = []
+        booking_assignments = []
+        current = start_date
+        while current <= end_date:
+            if current.weekday() < 5:
+                for member in staff:
+                    minute, day_end = hours[member.id]
+                    while True:
+                        service = rng.choice(services)
+                        if minute + service.duration > day_end:
+                            break
+                        if rng.random() < booking_density:
+                            booking = Booking(
+                                id=f'{prefix}_book_{len(bookings)}', business=business, service_offering=service,
+                                name='Bench Client', email='client@example.com', phone_number='+15550000002',
+                                booking_date=current, start_time=time(minute // 60, minute % 60),
+                                end_time=time((minute + service.duration) // 60, (minute + service.duration) % 60),
+                                status=BookingStatus.CONFIRMED
+                            )
+                            booking.set_time_range()
+                            bookings.append(booking)
+                            start_at, end_at = booking.blocked_range
+                            booking_assignments.append(BookingStaffAssignment(
+                                booking=booking, staff_member=member, is_primary=True,
+                                start_at=start_at, end_at=end_at
+                            ))
+                        minute += service.duration
+            current += timedelta(days=1)
+        Booking.objects.bulk_create(bookings)
+        BookingStaffAssignment.objects.bulk_create(booking_assignments)
+
+        result.append({
+            'business': business,
+            'services': services,
+            'staff': staff,
+            'bookings': bookings,
+        })
+
+    return {'start_date': start_date, 'end_date': end_date, 'businesses': result}
+
+
+def _measure(func, calls):
+    """
+    Run func(*args) for every args tuple in calls.
+
+    Returns:
+        dict: Call count, wall time stats in milliseconds and mean query count
+    """
+    durations = []
+    queries = []
+    for args in calls:
+        with CaptureQueriesContext(connection) as captured:
+            started = timer.perf_counter()
+            func(*args)
+            durations.append((timer.perf_counter() - started) * 1000)
+        queries.append(len(captured.captured_queries))
+
+    durations.sort()
+    return {
+        'calls': len(durations),
+        'mean_ms': round(statistics.mean(durations), 3),
+        'median_ms': round(statistics.median(durations), 3),
+        'p95_ms': round(durations[min(len(durations) - 1, int(len(durations) * 0.95))], 3),
+        'mean_queries': round(statistics.mean(queries), 2),
+        'max_queries': max(queries),
+    }
+
+
+def run_benchmarks(fixtures, samples=10, seed=42):
+    """
+    Time the availability entry points against synthetic fixtures.
+
+    Args:
+        fixtures (dict): Output of build_synthetic_businesses
+        samples (int): Calls per benchmark and business
+        seed (int): Random seed for picking dates, times and bookings
+
+    Returns:
+        dict: Benchmark name -> stats from _measure
+    """
+    from bookings.availability import (
+        check_timeslot_availability, find_available_slots_on_date, find_available_slots_in_range,
+        get_alternate_timeslots
+    )
+    from bookings.views import get_available_timeslots
+
+    rng = random.Random(seed)
+    factory = RequestFactory()
+    days = (fixtures['end_date'] - fixtures['start_date']).days + 1
+
+    def pick_day():
+        return fixtures['start_date'] + timedelta(days=rng.randrange(days))
+
+    def pick_time():
+        return time(rng.randint(8, 16), rng.choice([0, 30]))
+
+    calls = {
+        'check_timeslot_availability': [],
+        'find_available_slots_on_date': [],
+        'find_available_slots_in_range': [],
+        'get_alternate_timeslots': [],
+        'booking_get_available_staff': [],
+        'get_available_timeslots_view': [],
+    }
+    for tenant in fixtures['businesses']:
+        business = tenant['business']
+        for _ in range(samples):
+            service = rng.choice(tenant['services'])
+            day = pick_day()
+            calls['check_timeslot_availability'].append(
+                (business, datetime.combine(day, pick_time()), service.duration, service)
+            )
+            calls['find_available_slots_on_date'].append((business.id, day, service.duration, service.id))
+            calls['find_available_slots_in_range'].append((business.id, fixtures['start_date'], fixtures['end_date'], service.duration, service.id))
+            calls['get_alternate_timeslots'].append((business.id, day, pick_time(), service.duration, service.id))
+
+            if tenant['bookings']:
+                booking = rng.choice(tenant['bookings'])
+                calls['booking_get_available_staff'].append((booking,))
+
+                request = factory.get('/', {'date': pick_day().strftime('%Y-%m-%d')})
+                request.user = business.user
+                calls['get_available_timeslots_view'].append((request, booking.id))
+
+    targets = {
+        'check_timeslot_availability': lambda *args: check_timeslot_availability(*args, use_cache=False),
+        'find_available_slots_on_date': lambda *args: find_available_slots_on_date(*args, use_cache=False),
+        'find_available_slots_in_range': find_available_slots_in_range,
+        'get_alternate_timeslots': get_alternate_timeslots,
+        'booking_get_available_staff': lambda booking: booking.get_available_staff(),
+        'get_available_timeslots_view': get_available_timeslots,
+    }
+
+    return {
+        name: _measure(targets[name], calls[name])
+        for name in targets
+        if calls[name]
+    }
+
+
+def compare_to_baseline(results, baseline, time_tolerance=0.25):
+    """
+    Compare benchmark results with a saved baseline.
+
+    A benchmark regresses when it runs more queries than the baseline, or when its
+    median wall time grows by more than time_tolerance (0.25 = 25%).
+
+    Returns:
+        list: Human readable regression descriptions (empty when nothing regressed)
+    """
+    regressions = []
+    for name, stats in results.items():
+        previous = baseline.get(name)
+        if not previous:
+            continue
+        if stats['mean_queries'] > previous['mean_queries']:
+            regressions.append(
+                f"{name}: queries {previous['mean_queries']} -> {stats['mean_queries']}"
+            )
+        if stats['median_ms'] > previous['median_ms'] * (1 + time_tolerance):
+            regressions.append(
+                f"{name}: median {previous['median_ms']}ms -> {stats['median_ms']}ms"
+            )
+    return regressions
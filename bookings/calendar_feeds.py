@@ -0,0 +1,204 @@
+"""
+Subscribable iCalendar (ICS) feeds of bookings, per staff member and per business.
+
+Feeds are generated lazily from an iterator over BookingStaffAssignment, so a
+long schedule is streamed to the calendar client instead of being built in
+memory. Calendar clients poll every few minutes; feed_version gives a cheap
+ETag/Last-Modified from one aggregate query so unchanged feeds answer 304.
+
+Calendar clients can't log in, so feed URLs carry a signature of the staff
+member or business ID instead (see feed_token).
+"""
+from datetime import timedelta, timezone as dt_timezone
+from itertools import groupby
+
+from django.core import signing
+from django.db.models import Count, Max
+from django.utils import timezone
+from django.utils.crypto import constant_time_compare
+
+from bookings.models import BookingStaffAssignment, BookingStatus
+
+# How far back feeds reach; older bookings are dropped from calendars
+FEED_PAST_DAYS = 90
+
+FEED_TOKEN_SALT = 'bookings.calendar_feeds'
+
+# ICS lines are folded after 75 octets
+MAX_LINE_OCTETS = 75
+
+ICS_STATUS = {
+    BookingStatus.PENDING: 'TENTATIVE',
+    BookingStatus.CANCELLED: 'CANCELLED',
+}
+
+
+def feed_token(kind, object_id):
+    """
+    Return the URL token that grants read access to a feed.
+
+    Args:
+        kind (str): 'staff' or 'business'
+        object_id: ID of the staff member or business
+    """
+    return signing.Signer(salt=FEED_TOKEN_SALT).signature(f'{kind}:{object_id}')
+
+
+def check_feed_token(kind, object_id, token):
+    """Check a feed URL token in constant time."""
+    return constant_time_compare(feed_token(kind, object_id), token)
+
+
+def feed_assignments(business_id=None, staff_member_id=None):
+    """
+    Return the staff assignments a feed covers: bookings from FEED_PAST_DAYS ago onwards.
+    Cancelled bookings stay in the feed so clients remove them from their calendars.
+    """
+    assignments = BookingStaffAssignment.objects.filter(
+        booking__booking_date__gte=timezone.now().date() - timedelta(days=FEED_PAST_DAYS)
+    )
+    if staff_member_id:
+        assignments = assignments.filter(staff_member_id=staff_member_id)
+    if business_id:
+        assignments = assignments.filter(booking__business_id=business_id)
+    return assignments
+
+
+def feed_version(assignments):
+    """
+    Summarize a feed's contents for conditional GET in one query.
+
+    Returns:
+        tuple: (etag, last_modified) where last_modified is the latest booking or
+            assignment change, or (None, None) for an empty feed
+    """
+    summary = assignments.order_by().aggregate(
+        booking_updated=Max('booking__updated_at'),
+        assignment_updated=Max('updated_at'),
+        count=Count('id')
+    )
+    if not summary['count']:
+        return None, None
+
+    last_modified = max(summary['booking_updated'], summary['assignment_updated'])
+    # The count catches deleted bookings, which don't move updated_at
+    etag = f'"{last_modified.timestamp():.6f}-{summary["count"]}"'
+    return etag, last_modified
+
+
+def _escape(value):
+    """Escape a TEXT property value."""
+    return (
+        str(value)
+        .replace('\\', '\\\\')
+        .replace(';', '\\;')
+        .replace(',', '\\,')
+        .replace('\r\n', '\\n')
+        .replace('\n', '\\n')
+    )
+
+
+def _fold(line):
+    """Fold a content line into 75-octet chunks, never splitting a UTF-8 character."""
+    encoded = line.encode('utf-8')
+    if len(encoded) <= MAX_LINE_OCTETS:
+        return line + '\r\n'
+
+    chunks = []
+    current = ''
+    limit = MAX_LINE_OCTETS
+    for char in line:
+        if len((current + char).encode('utf-8')) > limit:
+            chunks.append(current)
+            current = ''
+            # Continuation lines start with a space
+            limit = MAX_LINE_OCTETS - 1
+        current += char
+    chunks.append(current)
+    return '\r\n '.join(chunks) + '\r\n'
+
+
+def _utc(value):
+    """Format an aware datetime as an ICS UTC date-time."""
+    return value.astimezone(dt_timezone.utc).strftime('%Y%m%dT%H%M%SZ')
+
+
+def _booking_range(booking):
+    """Absolute start/end of a booking, computing them for rows saved before they were stored."""
+    if booking.start_at is None or booking.end_at is None:
+        booking.set_time_range()
+    return booking.start_at, booking.end_at
+
+
+def booking_event(booking, staff_members, include_staff=False):
+    """
+    Build the VEVENT lines of a booking.
+
+    Args:
+        booking (Booking): Booking with business and service_offering loaded
+        staff_members (list): StaffMember objects assigned to the booking
+        include_staff (bool): Name the staff in the summary (business feeds)
+
+    Returns:
+        list: Unfolded content lines
+    """
+    start_at, end_at = _booking_range(booking)
+    service_name = booking.service_offering.name if booking.service_offering else 'Booking'
+    summary = f'{service_name} - {booking.name}'
+    if include_staff and staff_members:
+        summary += f" ({', '.join(staff.get_full_name() for staff in staff_members)})"
+
+    description = [f'Client: {booking.name}', f'Phone: {booking.phone_number}', f'Status: {booking.get_status_display()}']
+    if booking.notes:
+        description.append(f'Notes: {booking.notes}')
+    description = '\n'.join(description)
+
+    lines = [
+        'BEGIN:VEVENT',
+        f'UID:{booking.id}@services-ai',
+        f'DTSTAMP:{_utc(booking.updated_at)}',
+        f'LAST-MODIFIED:{_utc(booking.updated_at)}',
+        f'DTSTART:{_utc(start_at)}',
+        f'DTEND:{_utc(end_at)}',
+        f'SUMMARY:{_escape(summary)}',
+        f'DESCRIPTION:{_escape(description)}',
+        f'STATUS:{ICS_STATUS.get(booking.status, "CONFIRMED")}',
+    ]
+    if booking.location_details:
+        lines.append(f'LOCATION:{_escape(booking.location_details)}')
+    lines.append('END:VEVENT')
+    return lines
+
+
+def iter_calendar(name, assignments, include_staff=False, chunk_size=500):
+    """
+    Stream an ICS calendar, one event per booking.
+
+    Args:
+        name (str): Calendar name shown by clients
+        assignments: BookingStaffAssignment queryset, e.g. from feed_assignments
+        include_staff (bool): Name the staff in event summaries
+        chunk_size (int): Rows fetched per database round trip
+
+    Yields:
+        str: Folded content lines
+    """
+    yield _fold('BEGIN:VCALENDAR')
+    yield _fold('VERSION:2.0')
+    yield _fold('PRODID:-//Services AI//Bookings//EN')
+    yield _fold('CALSCALE:GREGORIAN')
+    yield _fold('METHOD:PUBLISH')
+    yield _fold(f'X-WR-CALNAME:{_escape(name)}')
+
+    rows = assignments.select_related(
+        'booking', 'booking__business', 'booking__service_offering', 'staff_member'
+    ).order_by('booking__booking_date', 'booking__start_time', 'booking_id').iterator(chunk_size=chunk_size)
+
+    # Rows of the same booking are adjacent, so each booking becomes one event
+    for booking_id, booking_rows in groupby(rows, key=lambda row: row.booking_id):
+        booking_rows = list(booking_rows)
+        staff_members = [row.staff_member for row in booking_rows]
+        for line in booking_event(booking_rows[0].booking, staff_members, include_staff):
+            yield _fold(line)
+
+    yield _fold('END:VCALENDAR')
@@ -0,0 +1,150 @@
+"""
+Materialized free/busy maintenance for staff members.
+
+StaffFreeBusy rows hold, per staff member and day, the intervals their
+availability rules open up and the intervals taken by active bookings.
+The availability engine reads these rows instead of re-deriving them, and
+the receivers in bookings.signals refresh the affected rows whenever a
+booking, staff assignment or availability rule changes.
+"""
+from datetime import timedelta
+
+from bookings.models import (
+    StaffMember,
+    StaffFreeBusy,
+)
+
+
+def _date_range(start_date, end_date):
+    """Yield every date from start_date to end_date inclusive."""
+    current = start_date
+    while current <= end_date:
+        yield current
+        current += timedelta(days=1)
+
+
+def booked_minutes(busy_intervals):
+    """Total minutes covered by [start, end, booking_id] intervals, counting overlaps once."""
+    # Imported here because bookings.availability reads StaffFreeBusy
+    from bookings.availability import merge_intervals
+
+    return sum(end - start for start, end in merge_intervals((start, end) for start, end, *_ in busy_intervals))
+
+
+def build_free_busy_rows(staff_ids, dates):
+    """
+    Compute unsaved StaffFreeBusy rows for every (staff, date) pair.
+
+    Args:
+        staff_ids: Iterable of StaffMember IDs
+        dates: Iterable of date objects
+
+    Returns:
+        list: Unsaved StaffFreeBusy instances
+    """
+    # Imported here because bookings.availability reads StaffFreeBusy
+    from bookings.availability import StaffEligibility, staff_busy_intervals
+
+    staff_ids = list(staff_ids)
+    dates = sorted(set(dates))
+    if not staff_ids or not dates:
+        return []
+
+    eligibility = StaffEligibility(staff_ids, dates)
+    # Bookings are loaded by range, so one running past midnight also takes the next morning
+    busy = staff_busy_intervals(staff_ids, dates)
+
+    rows = []
+    for staff_id in staff_ids:
+        for day in dates:
+            busy_intervals = sorted(list(interval) for interval in busy.get((staff_id, day), []))
+            rows.append(StaffFreeBusy(
+                staff_member_id=staff_id,
+                date=day,
+                open_intervals=[list(interval) for interval in eligibility.intervals(staff_id, day)],
+                busy_intervals=busy_intervals,
+                booked_minutes=booked_minutes(busy_intervals),
+            ))
+    return rows
+
+
+def refresh_free_busy(staff_ids, dates, create_missing=True):
+    """
+    Recompute and upsert the free/busy rows for the given staff members and dates.
+
+    Args:
+        staff_ids: Iterable of StaffMember IDs
+        dates: Iterable of date objects
+        create_missing (bool): When False, only rows that already exist are refreshed
+
+    Returns:
+        int: Number of rows written
+    """
+    staff_ids = list(staff_ids)
+    dates = set(dates)
+    if not staff_ids or not dates:
+        return 0
+
+    existing = None
+    if not create_missing:
+        existing = set(StaffFreeBusy.objects.filter(
+            staff_member_id__in=staff_ids,
+            date__in=dates
+        ).values_list('staff_member_id', 'date'))
+        if not existing:
+            return 0
+        staff_ids = {staff_id for staff_id, _ in existing}
+        dates = {day for _, day in existing}
+
+    rows = build_free_busy_rows(staff_ids, dates)
+    if existing is not None:
+        rows = [row for row in rows if (row.staff_member_id, row.date) in existing]
+
+    if rows:
+        StaffFreeBusy.objects.bulk_create(
+            rows,
+            update_conflicts=True,
+            unique_fields=['staff_member', 'date'],
+            update_fields=['open_intervals', 'busy_intervals', 'booked_minutes', 'updated_at'],
+        )
+    return len(rows)
+
+
+def refresh_weekday_rows(staff_id, weekdays):
+    """
+    Recompute the existing rows of a staff member that fall on the given weekdays.
+    Used when a weekly availability rule changes.
+    """
+    # iso_week_day runs 1 (Monday) to 7 (Sunday); date.weekday() runs 0 to 6
+    dates = StaffFreeBusy.objects.filter(
+        staff_member_id=staff_id,
+        date__iso_week_day__in=[weekday + 1 for weekday in weekdays if weekday is not None]
+    ).values_list('date', flat=True)
+    return refresh_free_busy([staff_id], list(dates), create_missing=False)
+
+
+def rebuild_free_busy(start_date, end_date, business_id=None, chunk_days=31):
+    """
+    Rebuild the free/busy table for a date window.
+
+    Args:
+        start_date (date): First date to rebuild
+        end_date (date): Last date to rebuild (inclusive)
+        business_id (optional): Limit the rebuild to one business
+        chunk_days (int): Number of days computed per batch
+
+    Returns:
+        int: Number of rows written
+    """
+    staff = StaffMember.objects.filter(is_active=True)
+    if business_id:
+        staff = staff.filter(business_id=business_id)
+    staff_ids = list(staff.values_list('id', flat=True))
+
+    written = 0
+    chunk_start = start_date
+    while chunk_start <= end_date:
+        chunk_end = min(chunk_start + timedelta(days=chunk_days - 1), end_date)
+        written += refresh_free_busy(staff_ids, _date_range(chunk_start, chunk_end))
+        chunk_start = chunk_end + timedelta(days=1)
+    return written
@@ -0,0 +1,138 @@
+import re
+from datetime import datetime, time, timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from bookings.availability import AvailabilityEngine, ACTIVE_BOOKING_STATUSES
+from bookings.models import (
+    Booking, BookingStaffAssignment, BookingServiceItem, StaffAvailability,
+    StaffFreeBusy, SlotHold, AVAILABILITY_TYPE
+)
+from business.models import Business
+from leads.models import Lead
+
+
+# SQLite: "SCAN bookings_booking" without "USING ... INDEX" reads the whole table
+SQLITE_SEQ_SCAN = re.compile(r'\bSCAN (\w+)(?! USING)(?:\s|$)')
+# PostgreSQL: "Seq Scan on bookings_booking"
+POSTGRES_SEQ_SCAN = re.compile(r'Seq Scan on (\w+)')
+
+
+def hot_queries(business_id, today):
+    """
+    The queries that run on every availability lookup, dashboard load or booking list.
+    Add new hot queries here so the audit covers them.
+
+    Returns:
+        list: (label, queryset, tables allowed to be scanned) tuples
+    """
+    staff_ids = ['audit_staff']
+    week_end = today + timedelta(days=6)
+    range_start = timezone.make_aware(datetime.combine(today, time(9)))
+    range_end = range_start + timedelta(hours=1)
+
+    return [
+        ('availability: booking conflicts', Booking.objects.filter(
+            business_id=business_id,
+            start_at__lt=range_end,
+            end_at__gt=range_start,
+            status__in=ACTIVE_BOOKING_STATUSES
+        ), set()),
+        ('availability: staff conflicts', BookingStaffAssignment.objects.filter(
+            staff_member_id__in=staff_ids,
+            start_at__lt=range_end,
+            end_at__gt=range_start
+        ), set()),
+        ('availability: qualified staff', AvailabilityEngine.qualified_staff(business_id, 'audit_service'), set()),
+        ('availability: free/busy rows', StaffFreeBusy.objects.filter(
+            staff_member_id__in=staff_ids,
+            date__range=(today, week_end)
+        ), set()),
+        ('availability: staff rules', StaffAvailability.objects.filter(staff_member_id__in=staff_ids).filter(
+            Q(availability_type=AVAILABILITY_TYPE.WEEKLY, weekday__in=[0, 1]) |
+            Q(availability_type=AVAILABILITY_TYPE.SPECIFIC, specific_date__range=(today, week_end))
+        ), set()),
+        ('availability: staff bookings', BookingStaffAssignment.objects.filter(
+            staff_member_id__in=staff_ids,
+            booking__booking_date__range=(today, week_end),
+            booking__status__in=ACTIVE_BOOKING_STATUSES
+        ).values_list('staff_member_id', 'booking_id', 'booking__start_time', 'booking__end_time'), set()),
+        ('availability: slot holds', SlotHold.objects.filter(
+            staff_member_id__in=staff_ids,
+            date__range=(today, week_end),
+            expires_at__gt=timezone.now()
+        ), set()),
+        ('dashboard: upcoming appointments', Booking.objects.filter(
+            business_id=business_id,
+            booking_date__gte=today
+        ).order_by('booking_date', 'start_time')[:5], set()),
+        ('dashboard: appointments created today', Booking.objects.filter(
+            business_id=business_id,
+            created_at__date=today
+        ), set()),
+        ('dashboard: new leads', Lead.objects.filter(
+            business_id=business_id,
+            created_at__gte=timezone.now() - timedelta(days=7)
+        ).order_by('-created_at')[:5], set()),
+        ('dashboard: weekly revenue', BookingServiceItem.objects.filter(
+            booking__business_id=business_id,
+            booking__created_at__date__range=(today, week_end)
+        ), set()),
+        ('list: bookings', Booking.objects.filter(business_id=business_id).order_by('-created_at'), set()),
+    ]
+
+
+class Command(BaseCommand):
+    help = 'Runs the hot booking queries through EXPLAIN and fails if any of them scans a whole table'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--business', help='Business ID to plan the queries for (defaults to the first business)')
+        parser.add_argument('--show-plans', action='store_true', help='Print the full plan of every query')
+
+    def handle(self, *args, **options):
+        if connection.vendor == 'sqlite':
+            pattern = SQLITE_SEQ_SCAN
+        elif connection.vendor == 'postgresql':
+            pattern = POSTGRES_SEQ_SCAN
+        else:
+            raise CommandError(f'Index audit is not supported on {connection.vendor}')
+
+        business_id = options['business'] or Business.objects.values_list('id', flat=True).first() or 'audit_business'
+        today = timezone.now().date()
+
+        failures = []
+        for label, queryset, allowed_tables in hot_queries(business_id, today):
+            plan = self._explain(queryset)
+            scanned = sorted(set(pattern.findall(plan)) - allowed_tables)
+
+            if scanned:
+                failures.append(label)
+                self.stdout.write(self.style.ERROR(f'SEQ SCAN  {label}: {", ".join(scanned)}'))
+            else:
+                self.stdout.write(self.style.SUCCESS(f'OK        {label}'))
+
+            if options['show_plans'] or scanned:
+                for line in plan.splitlines():
+                    self.stdout.write(f'            {line}')
+
+        if failures:
+            raise CommandError(f'{len(failures)} hot queries lack index coverage: {", ".join(failures)}')
+
+        self.stdout.write(self.style.SUCCESS('All hot queries are covered by indexes'))
+
+    def _explain(self, queryset):
+        """
+        Return the query plan. On PostgreSQL sequential scans are disabled for the
+        statement so small tables don't hide a missing index: the planner only
+        picks a Seq Scan if no index can serve the query at all.
+        """
+        if connection.vendor != 'postgresql':
+            return queryset.explain()
+
+        with transaction.atomic():
+            with connection.cursor() as cursor:
+                cursor.execute('SET LOCAL enable_seqscan = off')
+            return queryset.explain()
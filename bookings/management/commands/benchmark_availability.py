@@ -0,0 +1,86 @@
+import json
+import platform
+from datetime import datetime
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+
+from bookings.benchmarks import build_synthetic_businesses, run_benchmarks, compare_to_baseline
+from bookings.free_busy import rebuild_free_busy
+
+
+class Command(BaseCommand):
+    help = 'Benchmarks the availability functions on synthetic businesses and compares against a baseline'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--businesses', type=int, default=2, help='Number of synthetic businesses')
+        parser.add_argument('--staff', type=int, default=10, help='Staff members per business')
+        parser.add_argument('--days', type=int, default=14, help='Days of bookings and specific-date rules')
+        parser.add_argument('--density', type=float, default=0.5, help='Share of open staff time that is booked (0-1)')
+        parser.add_argument('--samples', type=int, default=10, help='Calls per benchmark and business')
+        parser.add_argument('--seed', type=int, default=42, help='Random seed')
+        parser.add_argument('--materialize', action='store_true', help='Build the staff free/busy table before timing')
+        parser.add_argument('--output', help='Write results to this JSON file')
+        parser.add_argument('--baseline', help='Compare against results saved by an earlier run')
+        parser.add_argument('--tolerance', type=float, default=0.25, help='Allowed median time growth over the baseline')
+
+    def handle(self, *args, **options):
+        config = {
+            'businesses': options['businesses'],
+            'staff': options['staff'],
+            'days': options['days'],
+            'density': options['density'],
+            'samples': options['samples'],
+            'seed': options['seed'],
+            'materialize': options['materialize'],
+        }
+
+        # Everything runs in one transaction that is rolled back, so no synthetic data is left behind
+        with transaction.atomic():
+            self.stdout.write('Building synthetic businesses...')
+            fixtures = build_synthetic_businesses(
+                businesses=options['businesses'],
+                staff_per_business=options['staff'],
+                days=options['days'],
+                booking_density=options['density'],
+                seed=options['seed'],
+            )
+            if options['materialize']:
+                rebuild_free_busy(fixtures['start_date'], fixtures['end_date'])
+
+            self.stdout.write('Running benchmarks...')
+            results = run_benchmarks(fixtures, samples=options['samples'], seed=options['seed'])
+            transaction.set_rollback(True)
+
+        for name, stats in results.items():
+            self.stdout.write(
+                f"{name:<32} median {stats['median_ms']:>9.2f}ms  p95 {stats['p95_ms']:>9.2f}ms  "
+                f"queries {stats['mean_queries']:>6}"
+            )
+
+        report = {
+            'meta': {
+                'created_at': datetime.now().isoformat(),
+                'database': connection.vendor,
+                'python': platform.python_version(),
+                'config': config,
+            },
+            'results': results,
+        }
+        if options['output']:
+            with open(options['output'], 'w') as f:
+                json.dump(report, f, indent=2)
+            self.stdout.write(self.style.SUCCESS(f"Results written to {options['output']}"))
+
+        if options['baseline']:
+            with open(options['baseline']) as f:
+                baseline = json.load(f)
+            if baseline.get('meta', {}).get('config') != config:
+                self.stdout.write(self.style.WARNING('Baseline was recorded with different settings'))
+
+            regressions = compare_to_baseline(results, baseline.get('results', {}), options['tolerance'])
+            if regressions:
+                for regression in regressions:
+                    self.stdout.write(self.style.ERROR(f'REGRESSION {regression}'))
+                raise CommandError(f'{len(regressions)} benchmark regressions against {options["baseline"]}')
+            self.stdout.write(self.style.SUCCESS('No regressions against the baseline'))
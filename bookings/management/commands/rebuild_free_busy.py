@@ -0,0 +1,35 @@
+from datetime import datetime, timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from bookings.free_busy import rebuild_free_busy
+
+
+class Command(BaseCommand):
+    help = 'Rebuilds the materialized staff free/busy table for a date window'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--start-date', help='First date to rebuild (YYYY-MM-DD, defaults to today)')
+        parser.add_argument('--end-date', help='Last date to rebuild (YYYY-MM-DD)')
+        parser.add_argument('--days', type=int, default=60, help='Number of days to rebuild when --end-date is not given')
+        parser.add_argument('--business', help='Only rebuild rows for this business ID')
+
+    def handle(self, *args, **options):
+        try:
+            start_date = self._parse_date(options['start_date']) or timezone.localdate()
+            end_date = self._parse_date(options['end_date']) or start_date + timedelta(days=options['days'] - 1)
+        except ValueError:
+            raise CommandError('Dates must be in YYYY-MM-DD format')
+
+        if end_date < start_date:
+            raise CommandError('--end-date must not be before --start-date')
+
+        self.stdout.write(f'Rebuilding free/busy rows from {start_date} to {end_date}...')
+        written = rebuild_free_busy(start_date, end_date, business_id=options['business'])
+        self.stdout.write(self.style.SUCCESS(f'Wrote {written} free/busy rows'))
+
+    def _parse_date(self, value):
+        if not value:
+            return None
+        return datetime.strptime(value, '%Y-%m-%d').date()
@@ -0,0 +1,31 @@
+# Generated by Django 5.2 on 2026-10-17 06:08
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bookings', '0008_bookingeventtype_allowed_roles'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StaffFreeBusy',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('open_intervals', models.JSONField(blank=True, default=list, help_text='[[start, end], ...] allowed by availability rules')),
+                ('busy_intervals', models.JSONField(blank=True, default=list, help_text='[[start, end, booking_id], ...] taken by active bookings')),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('staff_member', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='free_busy', to='bookings.staffmember')),
+            ],
+            options={
+                'verbose_name': 'Staff Free/Busy',
+                'verbose_name_plural': 'Staff Free/Busy',
+                'ordering': ['staff_member', 'date'],
+                'unique_together': {('staff_member', 'date')},
+            },
+        ),
+    ]
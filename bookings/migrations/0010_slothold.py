@@ -0,0 +1,35 @@
+# Generated by Django 5.2 on 2026-10-17 06:18
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bookings', '0009_stafffreebusy'),
+        ('business', '0012_businessconfiguration_ai_model_preference'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SlotHold',
+            fields=[
+                ('id', models.CharField(editable=False, primary_key=True, serialize=False)),
+                ('date', models.DateField()),
+                ('start_time', models.TimeField()),
+                ('end_time', models.TimeField()),
+                ('expires_at', models.DateTimeField(db_index=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('business', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='slot_holds', to='business.business')),
+                ('service_offering', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='slot_holds', to='business.serviceoffering')),
+                ('staff_member', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='slot_holds', to='bookings.staffmember')),
+            ],
+            options={
+                'verbose_name': 'Slot Hold',
+                'verbose_name_plural': 'Slot Holds',
+                'ordering': ['expires_at'],
+                'indexes': [models.Index(fields=['staff_member', 'date', 'expires_at'], name='bookings_sl_staff_m_069a2e_idx')],
+            },
+        ),
+    ]
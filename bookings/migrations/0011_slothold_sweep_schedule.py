@@ -0,0 +1,34 @@
+from django.db import migrations
+
+
+SWEEP_FUNC = 'bookings.reservations.sweep_expired_holds'
+
+
+def create_sweep_schedule(apps, schema_editor):
+    Schedule = apps.get_model('django_q', 'Schedule')
+    Schedule.objects.update_or_create(
+        func=SWEEP_FUNC,
+        defaults={
+            'name': 'Sweep expired slot holds',
+            'schedule_type': 'I',  # Schedule.MINUTES
+            'minutes': 1,
+            'repeats': -1,
+        }
+    )
+
+
+def delete_sweep_schedule(apps, schema_editor):
+    Schedule = apps.get_model('django_q', 'Schedule')
+    Schedule.objects.filter(func=SWEEP_FUNC).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bookings', '0010_slothold'),
+        ('django_q', '0018_task_success_index'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_sweep_schedule, delete_sweep_schedule),
+    ]
@@ -0,0 +1,35 @@
+# Generated by Django 5.2 on 2026-10-17 06:21
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bookings', '0011_slothold_sweep_schedule'),
+        ('business', '0012_businessconfiguration_ai_model_preference'),
+        ('leads', '0004_alter_lead_status'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='booking',
+            index=models.Index(fields=['business', 'booking_date', 'status', 'start_time', 'end_time'], name='booking_business_day_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='booking',
+            index=models.Index(fields=['business', 'created_at'], name='booking_business_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='bookingstaffassignment',
+            index=models.Index(fields=['staff_member', 'booking'], name='bookingstaff_staff_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='staffavailability',
+            index=models.Index(fields=['staff_member', 'availability_type', 'weekday'], name='staffavail_weekly_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='staffavailability',
+            index=models.Index(fields=['staff_member', 'availability_type', 'specific_date'], name='staffavail_specific_idx'),
+        ),
+    ]
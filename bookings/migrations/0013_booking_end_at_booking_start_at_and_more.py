@@ -0,0 +1,43 @@
+# Generated by Django 5.2 on 2026-10-17 06:39
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bookings', '0012_booking_booking_business_day_idx_and_more'),
+        ('business', '0014_business_timezone'),
+        ('leads', '0005_lead_lead_business_created_idx'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='booking',
+            name='end_at',
+            field=models.DateTimeField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='booking',
+            name='start_at',
+            field=models.DateTimeField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='bookingstaffassignment',
+            name='end_at',
+            field=models.DateTimeField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='bookingstaffassignment',
+            name='start_at',
+            field=models.DateTimeField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='booking',
+            index=models.Index(fields=['business', 'start_at', 'end_at'], name='booking_business_range_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='bookingstaffassignment',
+            index=models.Index(fields=['staff_member', 'start_at', 'end_at'], name='bookingstaff_range_idx'),
+        ),
+    ]
@@ -0,0 +1,101 @@
+import zoneinfo
+from datetime import datetime, timedelta
+
+from django.db import migrations, transaction, IntegrityError
+
+
+ACTIVE_STATUSES = ['pending', 'confirmed', 'rescheduled']
+
+EXCLUSION_CONSTRAINT = """
+ALTER TABLE bookings_bookingstaffassignment
+ADD CONSTRAINT bookingstaff_no_overlap
+EXCLUDE USING gist (staff_member_id WITH =, tstzrange(start_at, end_at, '[)') WITH &&)
+WHERE (start_at IS NOT NULL AND end_at IS NOT NULL)
+"""
+
+
+def backfill_ranges(apps, schema_editor):
+    Booking = apps.get_model('bookings', 'Booking')
+    BookingStaffAssignment = apps.get_model('bookings', 'BookingStaffAssignment')
+
+    bookings = Booking.objects.select_related('business').only(
+        'id', 'booking_date', 'start_time', 'end_time', 'status', 'business__timezone'
+    )
+    batch = []
+    for booking in bookings.iterator(chunk_size=1000):
+        try:
+            tz = zoneinfo.ZoneInfo(booking.business.timezone)
+        except (zoneinfo.ZoneInfoNotFoundError, ValueError):
+            tz = zoneinfo.ZoneInfo('UTC')
+        booking.start_at = datetime.combine(booking.booking_date, booking.start_time, tzinfo=tz)
+        booking.end_at = datetime.combine(booking.booking_date, booking.end_time, tzinfo=tz)
+        if booking.end_at <= booking.start_at:
+            booking.end_at += timedelta(days=1)
+        batch.append(booking)
+        if len(batch) >= 1000:
+            Booking.objects.bulk_update(batch, ['start_at', 'end_at'])
+            batch = []
+    if batch:
+        Booking.objects.bulk_update(batch, ['start_at', 'end_at'])
+
+    # Copy the range onto the staff assignments of active bookings
+    assignments = []
+    for assignment in BookingStaffAssignment.objects.filter(
+        booking__status__in=ACTIVE_STATUSES
+    ).select_related('booking').only('id', 'booking__start_at', 'booking__end_at').iterator(chunk_size=1000):
+        assignment.start_at = assignment.booking.start_at
+        assignment.end_at = assignment.booking.end_at
+        assignments.append(assignment)
+    BookingStaffAssignment.objects.bulk_update(assignments, ['start_at', 'end_at'], batch_size=1000)
+
+
+OVERLAPPING_ASSIGNMENTS = """
+SELECT a.staff_member_id, a.booking_id, b.booking_id
+FROM bookings_bookingstaffassignment a
+JOIN bookings_bookingstaffassignment b
+  ON a.staff_member_id = b.staff_member_id AND a.id < b.id
+ AND tstzrange(a.start_at, a.end_at, '[)') && tstzrange(b.start_at, b.end_at, '[)')
+WHERE a.start_at IS NOT NULL AND b.start_at IS NOT NULL
+LIMIT 20
+"""
+
+
+def add_exclusion_constraint(apps, schema_editor):
+    # Only PostgreSQL has exclusion constraints; other backends rely on the row locks in reservations.py
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute('CREATE EXTENSION IF NOT EXISTS btree_gist')
+    try:
+        with transaction.atomic(using=schema_editor.connection.alias):
+            schema_editor.execute(EXCLUSION_CONSTRAINT)
+    except IntegrityError as e:
+        # The migration must not succeed without the constraint: resolve the double
+        # bookings (cancel or reassign them), then run `manage.py migrate bookings` again
+        with schema_editor.connection.cursor() as cursor:
+            cursor.execute(OVERLAPPING_ASSIGNMENTS)
+            overlaps = cursor.fetchall()
+        details = '\n'.join(
+            f"  staff {staff_id}: bookings {first} and {second}" for staff_id, first, second in overlaps
+        )
+        raise IntegrityError(
+            "Can't add bookingstaff_no_overlap, staff members have overlapping active bookings "
+            f"(first {len(overlaps)} shown). Resolve them and migrate again.\n{details}"
+        ) from e
+
+
+def drop_exclusion_constraint(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute('ALTER TABLE bookings_bookingstaffassignment DROP CONSTRAINT IF EXISTS bookingstaff_no_overlap')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bookings', '0013_booking_end_at_booking_start_at_and_more'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_ranges, migrations.RunPython.noop),
+        migrations.RunPython(add_exclusion_constraint, drop_exclusion_constraint),
+    ]
@@ -0,0 +1,42 @@
+# Generated by Django 5.2 on 2026-10-17 06:53
+
+from django.db import migrations, models
+
+
+def backfill_booked_minutes(apps, schema_editor):
+    StaffFreeBusy = apps.get_model('bookings', 'StaffFreeBusy')
+
+    batch = []
+    for row in StaffFreeBusy.objects.only('id', 'busy_intervals').iterator(chunk_size=1000):
+        # Merge overlapping intervals so double-booked minutes count once
+        total = 0
+        current_start = current_end = None
+        for start, end, *_ in sorted(row.busy_intervals):
+            if current_end is None or start > current_end:
+                if current_end is not None:
+                    total += current_end - current_start
+                current_start, current_end = start, end
+            else:
+                current_end = max(current_end, end)
+        if current_end is not None:
+            total += current_end - current_start
+        if total:
+            row.booked_minutes = total
+            batch.append(row)
+    StaffFreeBusy.objects.bulk_update(batch, ['booked_minutes'], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bookings', '0014_backfill_booking_ranges'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='stafffreebusy',
+            name='booked_minutes',
+            field=models.PositiveIntegerField(default=0, help_text='Minutes taken by active bookings, used to balance staff load'),
+        ),
+        migrations.RunPython(backfill_booked_minutes, migrations.RunPython.noop),
+    ]
@@ -1,4 +1,4 @@
-from django.db import models
+from django.db import models, transaction
 from django.utils import timezone
 from business.models import Business, Industry, IndustryField, BusinessCustomField, ServiceOffering, ServiceItem, ServiceOfferingItem
 from leads.models import Lead, LeadStatus
@@ -6,6 +6,8 @@ from django.core.exceptions import ValidationError
 from django.utils.text import slugify
 from django.core.validators import MinValueValidator, MaxValueValidator
 from decimal import Decimal, InvalidOperation
+from datetime import datetime, timedelta
+from django.utils.dateparse import parse_date, parse_time
 from services_ai.utils import generate_id
 
 
@@ -18,6 +20,10 @@ class BookingStatus(models.TextChoices):
     NO_SHOW = 'no_show', 'No Show'
 
 
+# Booking statuses that occupy a staff member's time
+ACTIVE_BOOKING_STATUSES = [BookingStatus.PENDING, BookingStatus.CONFIRMED, BookingStatus.RESCHEDULED]
+
+
 class BookingEventType(models.Model):
     """
     Configurable event types that businesses can enable/disable for their booking workflow.
@@ -380,6 +386,11 @@ class StaffAvailability(models.Model):
         verbose_name = "Staff Availability"
         verbose_name_plural = "Staff Availabilities"
         ordering = ['staff_member', 'availability_type', 'weekday', 'specific_date', 'start_time']
+        indexes = [
+            # Weekly and specific-date rule lookups in the availability engine
+            models.Index(fields=['staff_member', 'availability_type', 'weekday'], name='staffavail_weekly_idx'),
+            models.Index(fields=['staff_member', 'availability_type', 'specific_date'], name='staffavail_specific_idx'),
+        ]
     
     def __str__(self):
         if self.availability_type == AVAILABILITY_TYPE.WEEKLY:
@@ -490,6 +501,9 @@ class Booking(models.Model):
     booking_date = models.DateField()
     start_time = models.TimeField()
     end_time = models.TimeField()
+    # Absolute start/end in the business timezone, derived from the fields above on save
+    start_at = models.DateTimeField(null=True, blank=True, editable=False)
+    end_at = models.DateTimeField(null=True, blank=True, editable=False)
     location_type = models.CharField(max_length=20, choices=(
         ('onsite', 'On-site (Client Location)'),
         ('business', 'Business Location'),
@@ -506,6 +520,14 @@ class Booking(models.Model):
         verbose_name = "Booking"
         verbose_name_plural = "Bookings"
         ordering = ['-start_time']
+        indexes = [
+            # Conflict checks and upcoming appointments: business + day, then status and times
+            models.Index(fields=['business', 'booking_date', 'status', 'start_time', 'end_time'], name='booking_business_day_idx'),
+            # Booking list and dashboard counts ordered/filtered by creation time
+            models.Index(fields=['business', 'created_at'], name='booking_business_created_idx'),
+            # Overlap checks: start_at < end AND end_at > start
+            models.Index(fields=['business', 'start_at', 'end_at'], name='booking_business_range_idx'),
+        ]
     
     def __str__(self):
         if self.lead:
@@ -517,18 +539,26 @@ class Booking(models.Model):
             raise ValidationError("Start time must be before end time")
         
         # Check for overlapping bookings
-        overlapping = Booking.objects.filter(
-            business=self.business,
-            booking_date=self.booking_date,
-            start_time__lt=self.end_time,
-            end_time__gt=self.start_time,
-            status__in=[BookingStatus.PENDING, BookingStatus.CONFIRMED, BookingStatus.RESCHEDULED]
-
-        ).exclude(pk=self.pk)
-        
-        if overlapping.exists():
+        self.set_time_range()
+        if Booking.overlapping(self.business, self.start_at, self.end_at).exclude(pk=self.pk).exists():
             raise ValidationError("This booking overlaps with an existing booking")
     
+    @classmethod
+    def overlapping(cls, business, start_at, end_at):
+        """
+        Active bookings of a business overlapping [start_at, end_at).
+        
+        A business takes one booking at a time, whichever staff member works it.
+        check_timeslot_availability, clean() and the reservations in
+        bookings.reservations all apply that rule through this query.
+        """
+        return cls.objects.filter(
+            business=business,
+            start_at__lt=end_at,
+            end_at__gt=start_at,
+            status__in=ACTIVE_BOOKING_STATUSES
+        )
+    
 
     def get_service_duration(self):
         duration = 0
@@ -552,7 +582,48 @@ class Booking(models.Model):
         if not self.id:
             self.id = generate_id('book_')
         
-        super().save(*args, **kwargs)
+        adding = self._state.adding
+        update_fields = kwargs.get('update_fields')
+        times_changed = update_fields is None or bool({'booking_date', 'start_time', 'end_time'} & set(update_fields))
+        if times_changed:
+            self.set_time_range()
+            if update_fields is not None:
+                kwargs['update_fields'] = list(update_fields) + ['start_at', 'end_at']
+        
+        if adding or not (times_changed or 'status' in update_fields):
+            super().save(*args, **kwargs)
+            return
+        
+        # Keep the staff assignments' copy of the booked range in step, before the
+        # post_save receivers refresh free/busy from it
+        with transaction.atomic():
+            start_at, end_at = self.blocked_range
+            BookingStaffAssignment.objects.filter(booking=self).update(start_at=start_at, end_at=end_at)
+            super().save(*args, **kwargs)
+    
+    def set_time_range(self):
+        """
+        Set start_at/end_at from booking_date, start_time and end_time in the
+        business timezone. Bookings ending at or before their start end the next day.
+        """
+        booking_date = parse_date(self.booking_date) if isinstance(self.booking_date, str) else self.booking_date
+        start_time = parse_time(self.start_time) if isinstance(self.start_time, str) else self.start_time
+        end_time = parse_time(self.end_time) if isinstance(self.end_time, str) else self.end_time
+        if not (booking_date and start_time and end_time):
+            return
+        
+        tz = self.business.tzinfo
+        self.start_at = datetime.combine(booking_date, start_time, tzinfo=tz)
+        self.end_at = datetime.combine(booking_date, end_time, tzinfo=tz)
+        if self.end_at <= self.start_at:
+            self.end_at += timedelta(days=1)
+    
+    @property
+    def blocked_range(self):
+        """(start_at, end_at) while the booking occupies staff time, otherwise (None, None)."""
+        if self.status in ACTIVE_BOOKING_STATUSES:
+            return self.start_at, self.end_at
+        return None, None
     
     def cancel(self, reason=None):
         """
@@ -593,70 +664,21 @@ class Booking(models.Model):
         if not self.service_offering:
             return []
         
-        # Get staff members who can perform this service
-        qualified_staff = StaffMember.objects.filter(
-            business=self.business,
-            is_active=True,
-            is_available=True,
-            service_assignments__service_offering=self.service_offering
-        ).distinct()
+        # Imported here to avoid a circular import with bookings.availability
+        from bookings.availability import AvailabilityEngine
         
-        # Filter by availability for the booking time
-        available_staff = []
-        booking_date = self.start_time.date()
-        booking_start_time = self.start_time.time()
-        booking_end_time = self.end_time.time()
+        # The absolute range, so bookings running past midnight get their real length
+        if self.start_at is None or self.end_at is None:
+            self.set_time_range()
+        duration_minutes = int((self.end_at - self.start_at).total_seconds() // 60)
         
-        for staff in qualified_staff:
-            # Check if staff has any conflicting bookings
-            conflicting_bookings = BookingStaffAssignment.objects.filter(
-                staff_member=staff,
-                booking__start_time__lt=self.end_time,
-                booking__end_time__gt=self.start_time,
-                booking__status__in=[BookingStatus.PENDING, BookingStatus.CONFIRMED, BookingStatus.RESCHEDULED]
-            ).exclude(booking=self)
-            
-            if conflicting_bookings.exists():
-                continue
-            
-            # Check staff availability
-            is_available = True
-            
-            # First check specific date availability/unavailability
-            specific_availabilities = staff.availability.filter(
-                availability_type=AVAILABILITY_TYPE.SPECIFIC,
-                specific_date=booking_date
-            )
-            
-            if specific_availabilities.exists():
-                # Specific date rules override weekly rules
-                for avail in specific_availabilities:
-                    if not avail.is_available_at(booking_date, booking_start_time, booking_end_time):
-                        is_available = False
-                        break
-            else:
-                # Check weekly availability if no specific date rules exist
-                weekday = booking_date.weekday()
-                weekly_availabilities = staff.availability.filter(
-                    availability_type=AVAILABILITY_TYPE.WEEKLY,
-                    weekday=weekday
-                )
-                
-                if weekly_availabilities.exists():
-                    # Staff has weekly availability rules for this day
-                    is_available = False  # Default to unavailable unless a rule explicitly allows
-                    for avail in weekly_availabilities:
-                        if avail.is_available_at(booking_date, booking_start_time, booking_end_time):
-                            is_available = True
-                            break
-                else:
-                    # No availability rules for this day, default to unavailable
-                    is_available = False
-            
-            if is_available:
-                available_staff.append(staff)
-        
-        return available_staff
+        engine = AvailabilityEngine(
+            self.business_id,
+            self.booking_date,
+            service_offering_id=self.service_offering_id,
+            exclude_booking_id=self.pk
+        )
+        return engine.available_staff(self.booking_date, self.start_time, duration_minutes)
 
 
 class BookingStaffAssignment(models.Model):
@@ -668,6 +690,11 @@ class BookingStaffAssignment(models.Model):
     staff_member = models.ForeignKey(StaffMember, on_delete=models.CASCADE, related_name='booking_assignments')
     is_primary = models.BooleanField(default=False, help_text="Whether this staff member is the primary provider for this booking")
     assignment_notes = models.TextField(blank=True, null=True)
+    # Copy of the booking's start_at/end_at while it is active, cleared otherwise.
+    # Staff conflict checks read these directly; on PostgreSQL an exclusion
+    # constraint (bookingstaff_no_overlap) rejects overlapping ranges per staff member.
+    start_at = models.DateTimeField(null=True, blank=True, editable=False)
+    end_at = models.DateTimeField(null=True, blank=True, editable=False)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     
@@ -676,11 +703,21 @@ class BookingStaffAssignment(models.Model):
         verbose_name_plural = "Booking Staff Assignments"
         unique_together = ['booking', 'staff_member']
         ordering = ['booking', '-is_primary', 'staff_member']
+        indexes = [
+            # Staff busy-time lookups start from the staff member and join to the booking
+            models.Index(fields=['staff_member', 'booking'], name='bookingstaff_staff_idx'),
+            # Staff overlap checks: start_at < end AND end_at > start
+            models.Index(fields=['staff_member', 'start_at', 'end_at'], name='bookingstaff_range_idx'),
+        ]
     
     def __str__(self):
         primary = " (Primary)" if self.is_primary else ""
         return f"{self.booking} - {self.staff_member.get_full_name()}{primary}"
     
+    def save(self, *args, **kwargs):
+        self.start_at, self.end_at = self.booking.blocked_range
+        super().save(*args, **kwargs)
+    
     def clean(self):
         # Ensure only one primary staff member per booking
         if self.is_primary:
@@ -692,58 +729,129 @@ class BookingStaffAssignment(models.Model):
             if existing_primary:
                 raise ValidationError("This booking already has a primary staff member assigned")
         
-        # Check if staff member is available for this booking time
-        booking_date = self.booking.start_time.date()
-        booking_start_time = self.booking.start_time.time()
-        booking_end_time = self.booking.end_time.time()
+        # Rules and bookings come from a shared evaluator when validated through clean_many
+        eligibility = getattr(self, '_eligibility', None)
+        start_at, end_at = self.booking.blocked_range
+        if eligibility is None:
+            # Imported here to avoid a circular import with bookings.availability
+            from bookings.availability import StaffEligibility
+            eligibility = StaffEligibility([self.staff_member_id], [self.booking.booking_date])
+            if start_at and end_at:
+                eligibility.load_bookings(start_at, end_at)
         
         # Check for conflicting bookings
-        conflicting_bookings = BookingStaffAssignment.objects.filter(
-            staff_member=self.staff_member,
-            booking__start_time__lt=self.booking.end_time,
-            booking__end_time__gt=self.booking.start_time,
-            booking__status__in=[BookingStatus.PENDING, BookingStatus.CONFIRMED, BookingStatus.RESCHEDULED]
-        ).exclude(booking=self.booking)
-        
-        if conflicting_bookings.exists():
+        if start_at and end_at and eligibility.has_conflict(
+            self.staff_member_id, start_at, end_at, exclude_booking_id=self.booking_id
+        ):
             raise ValidationError("Staff member has a conflicting booking during this time")
         
         # Check staff availability
-        is_available = True
+        if not eligibility.allows(
+            self.staff_member_id, self.booking.booking_date, self.booking.start_time, self.booking.end_time
+        ):
+            raise ValidationError("Staff member is not available during this time slot")
+    
+    @classmethod
+    def clean_many(cls, assignments):
+        """
+        Run clean() on many assignments, loading the staff rules and bookings once for all of them.
         
-        # First check specific date availability/unavailability
-        specific_availabilities = self.staff_member.availability.filter(
-            availability_type=AVAILABILITY_TYPE.SPECIFIC,
-            specific_date=booking_date
-        )
+        Args:
+            assignments: Iterable of BookingStaffAssignment objects with their booking set
         
-        if specific_availabilities.exists():
-            # Specific date rules override weekly rules
-            for avail in specific_availabilities:
-                if not avail.is_available_at(booking_date, booking_start_time, booking_end_time):
-                    is_available = False
-                    break
-        else:
-            # Check weekly availability if no specific date rules exist
-            weekday = booking_date.weekday()
-            weekly_availabilities = self.staff_member.availability.filter(
-                availability_type=AVAILABILITY_TYPE.WEEKLY,
-                weekday=weekday
+        Raises:
+            ValidationError: For the first invalid assignment
+        """
+        from bookings.availability import StaffEligibility
+        
+        assignments = list(assignments)
+        if not assignments:
+            return
+        
+        eligibility = StaffEligibility(
+            {assignment.staff_member_id for assignment in assignments},
+            {assignment.booking.booking_date for assignment in assignments}
+        )
+        ranges = [assignment.booking.blocked_range for assignment in assignments]
+        ranges = [(start_at, end_at) for start_at, end_at in ranges if start_at and end_at]
+        if ranges:
+            eligibility.load_bookings(
+                min(start_at for start_at, end_at in ranges),
+                max(end_at for start_at, end_at in ranges)
             )
-            
-            if weekly_availabilities.exists():
-                # Staff has weekly availability rules for this day
-                is_available = False  # Default to unavailable unless a rule explicitly allows
-                for avail in weekly_availabilities:
-                    if avail.is_available_at(booking_date, booking_start_time, booking_end_time):
-                        is_available = True
-                        break
-            else:
-                # No availability rules for this day, default to unavailable
-                is_available = False
         
-        if not is_available:
-            raise ValidationError("Staff member is not available during this time slot")
+        for assignment in assignments:
+            assignment._eligibility = eligibility
+            try:
+                assignment.clean()
+            finally:
+                del assignment._eligibility
+            # Later assignments in the batch must not overlap this one either
+            start_at, end_at = assignment.booking.blocked_range
+            if start_at and end_at:
+                eligibility.add_booking(assignment.staff_member_id, start_at, end_at, assignment.booking_id)
+
+
+class StaffFreeBusy(models.Model):
+    """
+    Precomputed free/busy snapshot for one staff member on one day.
+    Intervals are stored as minutes since midnight so availability lookups
+    can skip re-deriving them from StaffAvailability rules and bookings.
+    Rows are created by the rebuild_free_busy command and kept current by signals,
+    which also keeps booked_minutes current as the staff member's daily utilization.
+    """
+    staff_member = models.ForeignKey(StaffMember, on_delete=models.CASCADE, related_name='free_busy')
+    date = models.DateField()
+    open_intervals = models.JSONField(default=list, blank=True, help_text="[[start, end], ...] allowed by availability rules")
+    busy_intervals = models.JSONField(default=list, blank=True, help_text="[[start, end, booking_id], ...] taken by active bookings")
+    booked_minutes = models.PositiveIntegerField(default=0, help_text="Minutes taken by active bookings, used to balance staff load")
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        verbose_name = "Staff Free/Busy"
+        verbose_name_plural = "Staff Free/Busy"
+        unique_together = ['staff_member', 'date']
+        ordering = ['staff_member', 'date']
+    
+    def __str__(self):
+        return f"{self.staff_member.get_full_name()} - {self.date}"
+
+
+class SlotHold(models.Model):
+    """
+    Temporary reservation of a staff member's time while a widget client checks out.
+    Active holds count as busy time in availability lookups until they expire or
+    are converted into a booking. Expired holds are removed by a scheduled sweep.
+    """
+    id = models.CharField(primary_key=True, editable=False)
+    business = models.ForeignKey(Business, on_delete=models.CASCADE, related_name='slot_holds')
+    staff_member = models.ForeignKey(StaffMember, on_delete=models.CASCADE, related_name='slot_holds')
+    service_offering = models.ForeignKey(ServiceOffering, on_delete=models.SET_NULL, null=True, blank=True, related_name='slot_holds')
+    date = models.DateField()
+    start_time = models.TimeField()
+    end_time = models.TimeField()
+    expires_at = models.DateTimeField(db_index=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    
+    class Meta:
+        verbose_name = "Slot Hold"
+        verbose_name_plural = "Slot Holds"
+        ordering = ['expires_at']
+        indexes = [
+            models.Index(fields=['staff_member', 'date', 'expires_at']),
+        ]
+    
+    def __str__(self):
+        return f"{self.staff_member.get_full_name()} - {self.date} {self.start_time}-{self.end_time}"
+    
+    @property
+    def is_expired(self):
+        return self.expires_at <= timezone.now()
+    
+    def save(self, *args, **kwargs):
+        if not self.id:
+            self.id = generate_id('hold_')
+        super().save(*args, **kwargs)
 
 
 class BookingField(models.Model):
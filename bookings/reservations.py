@@ -0,0 +1,646 @@
+"""
+Atomic booking reservation.
+
+Every entry point that creates a booking for a time slot (dashboard, widget,
+AI agent) goes through reserve_booking so the availability check and the
+inserts happen in one transaction while the affected staff members are locked
+for that day.
+
+The lock rows are the StaffFreeBusy rows of the candidate staff members on the
+booking date. Bookings of a business may not overlap at all, whichever staff
+member works them (see Booking.overlapping), so the business row is locked as
+well while that rule is checked against the committed bookings.
+
+A request waits at most RESERVATION_LOCK_TIMEOUT_MS for those locks and then
+re-reads the free/busy rows, so a slot is only reported as taken when it
+really is. When another reservation holds them longer, the request fails fast
+with SlotUnavailable and alternates instead of queueing behind it. Backends
+without SELECT ... FOR UPDATE (SQLite) serialize writers on their own and
+ignore it.
+
+Slot holds go through the same locking path, so a slot can't be held and
+booked (or held twice) at the same time.
+
+On PostgreSQL the bookingstaff_no_overlap exclusion constraint is the last line
+of defence: an overlapping staff assignment that slips past the checks fails
+the insert, and is reported as SlotUnavailable like any other conflict.
+
+Recurring and bulk bookings go through reserve_bookings, which validates every
+occurrence against one availability engine, inserts everything with bulk_create
+and sends a single bookings_bulk_created signal once the transaction commits
+instead of running the per-booking post_save chain for each occurrence.
+"""
+import calendar
+from datetime import date, datetime, time, timedelta
+
+from django.conf import settings
+from django.core import signing
+from django.db import connection, transaction, IntegrityError, OperationalError
+from django.utils import timezone
+from django.utils.crypto import constant_time_compare
+from django.utils.dateparse import parse_date, parse_time
+
+from bookings.models import (
+    Booking, BookingStatus, BookingStaffAssignment, BookingServiceItem, StaffFreeBusy, SlotHold
+)
+from bookings.availability import (
+    AvailabilityEngine, booking_interval, get_alternate_timeslots
+)
+from bookings.availability_cache import invalidate_dates
+from bookings.assignment import get_strategy
+from bookings.free_busy import build_free_busy_rows, refresh_free_busy
+from bookings.signals import bookings_bulk_created
+from business.models import Business, BusinessConfiguration
+from core.tracing import get_tracer
+from invoices.models import Invoice, InvoiceStatus
+from leads.models import LeadStatus
+from services_ai.utils import generate_id
+
+trace = get_tracer('bookings')
+
+# How long a widget slot hold lasts before it is released
+SLOT_HOLD_MINUTES = getattr(settings, 'SLOT_HOLD_MINUTES', 10)
+
+# Longest a reservation waits for another one's row locks before giving up (PostgreSQL)
+RESERVATION_LOCK_TIMEOUT_MS = getattr(settings, 'RESERVATION_LOCK_TIMEOUT_MS', 2000)
+
+# Most bookings a single bulk or recurring request may create
+MAX_BULK_BOOKINGS = getattr(settings, 'MAX_BULK_BOOKINGS', 52)
+
+RECURRENCE_FREQUENCIES = ('daily', 'weekly', 'biweekly', 'monthly')
+
+HOLD_TOKEN_SALT = 'bookings.slot-hold'
+
+
+class SlotUnavailable(Exception):
+    """Raised when a slot can't be reserved. Carries alternates for the caller to offer."""
+
+    def __init__(self, reason, alternate_slots=None):
+        super().__init__(reason)
+        self.reason = reason
+        self.alternate_slots = alternate_slots or []
+
+
+class BulkSlotUnavailable(SlotUnavailable):
+    """
+    Raised when some occurrences of a bulk booking can't be reserved. Nothing is created.
+    Each conflict is a dict with date, start_time, reason and alternate_slots.
+    """
+
+    def __init__(self, conflicts):
+        super().__init__(f"{len(conflicts)} of the requested bookings are not available")
+        self.conflicts = conflicts
+
+
+def _lock_staff_days(staff_ids, booking_date):
+    """
+    Lock the free/busy rows of the given staff members on a date, creating missing rows first.
+
+    Returns:
+        set: IDs of the staff members that were locked
+    """
+    return {staff_id for staff_id, day in _lock_staff_dates(staff_ids, [booking_date])}
+
+
+def _lock_staff_dates(staff_ids, dates):
+    """
+    Lock the free/busy rows of the given staff members on several dates at once.
+
+    Returns:
+        set: (staff_id, date) pairs that were locked
+    """
+    dates = set(dates)
+    existing = set(StaffFreeBusy.objects.filter(
+        staff_member_id__in=staff_ids,
+        date__in=dates
+    ).values_list('staff_member_id', 'date'))
+
+    missing_staff = {staff_id for staff_id in staff_ids for day in dates if (staff_id, day) not in existing}
+    if missing_staff:
+        StaffFreeBusy.objects.bulk_create(
+            [row for row in build_free_busy_rows(missing_staff, dates) if (row.staff_member_id, row.date) not in existing],
+            ignore_conflicts=True
+        )
+
+    # Always lock in the same order, so two requests can't wait on each other
+    return set(StaffFreeBusy.objects.select_for_update().filter(
+        staff_member_id__in=staff_ids,
+        date__in=dates
+    ).order_by('staff_member_id', 'date').values_list('staff_member_id', 'date'))
+
+
+def _lock_business(business):
+    """
+    Lock the business row, so only one reservation at a time checks its bookings for overlaps.
+    Taken first, it also bounds how long the transaction waits for this and later locks.
+    """
+    if connection.vendor == 'postgresql':
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT set_config('lock_timeout', %s, true)", [f'{RESERVATION_LOCK_TIMEOUT_MS}ms'])
+    list(Business.objects.select_for_update().filter(pk=business.pk).values_list('pk', flat=True))
+
+
+def _is_lock_timeout(error):
+    """Check whether a database error is PostgreSQL giving up on a row lock (lock_not_available)."""
+    cause = error.__cause__
+    return (getattr(cause, 'pgcode', None) or getattr(cause, 'sqlstate', None)) == '55P03'
+
+
+def _slot_range(business, booking_date, start_minutes, end_minutes):
+    """Return the aware (start_at, end_at) of a slot given in minutes from the start of its date."""
+    day_start = datetime.combine(booking_date, time.min, tzinfo=business.tzinfo)
+    return day_start + timedelta(minutes=start_minutes), day_start + timedelta(minutes=end_minutes)
+
+
+def _claim_staff(business, booking_date, start_minutes, end_minutes, service_offering_id=None,
+                 staff_member_id=None, exclude_hold_id=None):
+    """
+    Lock the candidate staff members for a day and return the one to book for the slot:
+    the requested staff member, or the best free one under the business's assignment strategy.
+    Must be called inside transaction.atomic().
+
+    Raises:
+        SlotUnavailable: If no staff member can take the slot
+    """
+    candidate_ids = list(AvailabilityEngine.qualified_staff(
+        business.id, service_offering_id, staff_member_id
+    ).values_list('id', flat=True))
+    if not candidate_ids:
+        raise SlotUnavailable("Selected staff member is not available for this service" if staff_member_id
+                              else "No staff members available for this service")
+
+    _lock_business(business)
+    if Booking.overlapping(business, *_slot_range(business, booking_date, start_minutes, end_minutes)).exists():
+        raise SlotUnavailable("Time slot conflicts with existing bookings")
+
+    locked_ids = _lock_staff_days(candidate_ids, booking_date)
+
+    # Read free/busy only after the rows are locked
+    engine = AvailabilityEngine(
+        business.id,
+        booking_date,
+        service_offering_id=service_offering_id,
+        staff_member_id=staff_member_id,
+        exclude_hold_id=exclude_hold_id
+    )
+    free = [
+        staff for staff in engine.staff
+        if staff.id in locked_ids and engine.is_available(staff.id, booking_date, start_minutes, end_minutes)
+    ]
+    if not free:
+        raise SlotUnavailable("This time slot was just booked or is outside staff hours")
+    if staff_member_id:
+        return free[0]
+
+    strategy = get_strategy(business.id)
+    staff = strategy.order(free, engine, booking_date, service_offering_id)[0]
+    transaction.on_commit(lambda: strategy.assigned(business.id, staff.id))
+    return staff
+
+
+def _parse_slot(booking_date, start_time, end_time):
+    """Parse string dates/times and return (date, start, end, start_minutes, end_minutes)."""
+    try:
+        if isinstance(booking_date, str):
+            booking_date = parse_date(booking_date)
+        if isinstance(start_time, str):
+            start_time = parse_time(start_time)
+        if isinstance(end_time, str):
+            end_time = parse_time(end_time)
+    except ValueError:
+        # Well formed but out of range, e.g. 2030-02-30 or 25:00
+        booking_date = None
+    if booking_date is None or start_time is None or end_time is None:
+        raise SlotUnavailable("Invalid date or time")
+
+    start_minutes, end_minutes = booking_interval(start_time, end_time)
+    if end_minutes <= start_minutes:
+        raise SlotUnavailable("End time must be after start time")
+    return booking_date, start_time, end_time, start_minutes, end_minutes
+
+
+def _add_alternates(error, business, booking_date, start_time, duration_minutes,
+                    service_offering_id=None, staff_member_id=None):
+    """Attach alternate slots to a SlotUnavailable error."""
+    error.alternate_slots = get_alternate_timeslots(
+        business.id,
+        booking_date,
+        start_time,
+        duration_minutes,
+        service_offering_id,
+        staff_member_id
+    )
+    return error
+
+
+def reserve_booking(business, booking_date, start_time, end_time, staff_member=None,
+                    service_offering=None, is_primary=True, hold=None, **booking_fields):
+    """
+    Re-check a slot and create the booking and its staff assignment in one transaction.
+
+    Args:
+        business (Business): Business the booking belongs to
+        booking_date (date or str): Date of the booking
+        start_time (time or str): Start time of the booking
+        end_time (time or str): End time of the booking
+        staff_member (StaffMember, optional): Staff member to book, otherwise the
+            first free staff member qualified for the service is assigned
+        service_offering (ServiceOffering, optional): Service being booked
+        is_primary (bool): Mark the staff assignment as primary
+        hold (SlotHold, optional): Hold to convert; its staff member and time are used
+            and it is deleted together with the booking insert
+        **booking_fields: Remaining Booking fields (name, email, lead, status, ...)
+
+    Returns:
+        tuple: (booking, staff_member)
+
+    Raises:
+        SlotUnavailable: If no staff member can take the slot
+    """
+    if hold is not None:
+        booking_date, start_time, end_time = hold.date, hold.start_time, hold.end_time
+        staff_member = hold.staff_member
+
+    booking_date, start_time, end_time, start_minutes, end_minutes = _parse_slot(booking_date, start_time, end_time)
+    service_offering_id = service_offering.id if service_offering else None
+    staff_member_id = staff_member.id if staff_member else None
+
+    try:
+        with transaction.atomic():
+            if hold is not None and not SlotHold.objects.filter(pk=hold.pk, expires_at__gt=timezone.now()).exists():
+                raise SlotUnavailable("Your hold on this time slot has expired")
+
+            assigned_staff = _claim_staff(
+                business, booking_date, start_minutes, end_minutes,
+                service_offering_id, staff_member_id,
+                exclude_hold_id=hold.pk if hold is not None else None
+            )
+
+            booking = Booking.objects.create(
+                business=business,
+                service_offering=service_offering,
+                booking_date=booking_date,
+                start_time=start_time,
+                end_time=end_time,
+                **booking_fields
+            )
+            BookingStaffAssignment.objects.create(
+                booking=booking,
+                staff_member=assigned_staff,
+                is_primary=is_primary
+            )
+            if hold is not None:
+                hold.delete()
+    except IntegrityError as e:
+        if 'bookingstaff_no_overlap' not in str(e):
+            raise
+        raise _add_alternates(
+            SlotUnavailable("This time slot was just booked"), business, booking_date, start_time,
+            end_minutes - start_minutes, service_offering_id, staff_member_id
+        )
+    except OperationalError as e:
+        if not _is_lock_timeout(e):
+            raise
+        raise _add_alternates(
+            SlotUnavailable("This time slot is being booked by someone else"), business, booking_date,
+            start_time, end_minutes - start_minutes, service_offering_id, staff_member_id
+        )
+    except SlotUnavailable as e:
+        raise _add_alternates(
+            e, business, booking_date, start_time, end_minutes - start_minutes,
+            service_offering_id, staff_member_id
+        )
+
+    return booking, assigned_staff
+
+
+def place_hold(business, booking_date, start_time, end_time, staff_member=None,
+               service_offering=None, minutes=None):
+    """
+    Hold a slot for a few minutes while the client finishes checking out.
+
+    Args:
+        business (Business): Business the hold belongs to
+        booking_date (date or str): Date of the slot
+        start_time (time or str): Start time of the slot
+        end_time (time or str): End time of the slot
+        staff_member (StaffMember, optional): Staff member to hold, otherwise the
+            first free staff member qualified for the service is used
+        service_offering (ServiceOffering, optional): Service being booked
+        minutes (int, optional): Hold length, defaults to SLOT_HOLD_MINUTES
+
+    Returns:
+        SlotHold: The new hold
+
+    Raises:
+        SlotUnavailable: If no staff member can take the slot
+    """
+    booking_date, start_time, end_time, start_minutes, end_minutes = _parse_slot(booking_date, start_time, end_time)
+    service_offering_id = service_offering.id if service_offering else None
+    staff_member_id = staff_member.id if staff_member else None
+
+    try:
+        with transaction.atomic():
+            staff = _claim_staff(
+                business, booking_date, start_minutes, end_minutes,
+                service_offering_id, staff_member_id
+            )
+            return SlotHold.objects.create(
+                business=business,
+                staff_member=staff,
+                service_offering=service_offering,
+                date=booking_date,
+                start_time=start_time,
+                end_time=end_time,
+                expires_at=timezone.now() + timedelta(minutes=minutes or SLOT_HOLD_MINUTES)
+            )
+    except OperationalError as e:
+        if not _is_lock_timeout(e):
+            raise
+        raise _add_alternates(
+            SlotUnavailable("This time slot is being booked by someone else"), business, booking_date,
+            start_time, end_minutes - start_minutes, service_offering_id, staff_member_id
+        )
+    except SlotUnavailable as e:
+        raise _add_alternates(
+            e, business, booking_date, start_time, end_minutes - start_minutes,
+            service_offering_id, staff_member_id
+        )
+
+
+def hold_token(hold):
+    """
+    Return the token given to the client that placed a hold. Tokens are signed,
+    so only that client can convert or release the hold.
+    """
+    return signing.Signer(salt=HOLD_TOKEN_SALT).signature(f'{hold.business_id}:{hold.pk}')
+
+
+def valid_hold_token(business_id, hold_id, token):
+    """Check a token returned by hold_token."""
+    expected = signing.Signer(salt=HOLD_TOKEN_SALT).signature(f'{business_id}:{hold_id}')
+    return bool(token) and constant_time_compare(expected, token)
+
+
+def sweep_expired_holds():
+    """
+    Delete every expired slot hold in one statement.
+    Run every minute by the django-q schedule created in the bookings migrations.
+
+    Returns:
+        int: Number of holds deleted
+    """
+    deleted, _ = SlotHold.objects.filter(expires_at__lte=timezone.now()).delete()
+    if deleted:
+        trace.info("Swept {} expired slot holds", deleted)
+    return deleted
+
+
+def recurring_dates(start_date, frequency, count=None, until=None):
+    """
+    List the dates of a recurring booking.
+    Monthly occurrences skip months that don't have the start date's day.
+
+    Args:
+        start_date (date): Date of the first occurrence
+        frequency (str): One of RECURRENCE_FREQUENCIES
+        count (int, optional): Number of occurrences
+        until (date, optional): Last date an occurrence may fall on
+
+    Returns:
+        list: Dates in order, never more than MAX_BULK_BOOKINGS
+
+    Raises:
+        ValueError: For an unknown frequency or when neither count nor until is given
+    """
+    if frequency not in RECURRENCE_FREQUENCIES:
+        raise ValueError(f"Unknown frequency '{frequency}'")
+    if not count and not until:
+        raise ValueError("Either count or until is required")
+
+    limit = min(count or MAX_BULK_BOOKINGS, MAX_BULK_BOOKINGS)
+    dates = []
+    step = 0
+    while len(dates) < limit:
+        if frequency == 'monthly':
+            month_index = start_date.month - 1 + step
+            year, month = start_date.year + month_index // 12, month_index % 12 + 1
+            if until and date(year, month, 1) > until:
+                break
+            step += 1
+            if start_date.day > calendar.monthrange(year, month)[1]:
+                continue
+            current = date(year, month, start_date.day)
+        else:
+            days = {'daily': 1, 'weekly': 7, 'biweekly': 14}[frequency]
+            current = start_date + timedelta(days=days * step)
+            step += 1
+        if until and current > until:
+            break
+        dates.append(current)
+    return dates
+
+
+def reserve_bookings(business, occurrences, staff_member=None, service_offering=None,
+                     service_items=None, is_primary=True, **booking_fields):
+    """
+    Check and create many bookings for one client in a single transaction.
+
+    Every occurrence is checked against one availability engine while the staff
+    members' days are locked. The bookings, staff assignments, service items and
+    invoices are then inserted with bulk_create, so the per-booking post_save
+    receivers don't run. One bookings_bulk_created signal is sent after commit
+    instead. Either every occurrence is booked or none is.
+
+    Args:
+        business (Business): Business the bookings belong to
+        occurrences: Iterable of (booking_date, start_time, end_time); dates and times
+            may be objects or strings
+        staff_member (StaffMember, optional): Staff member for every occurrence, otherwise
+            each occurrence keeps the previous staff member whenever they are free and
+            otherwise gets the best free one under the business's assignment strategy
+        service_offering (ServiceOffering, optional): Service being booked
+        service_items (list, optional): (ServiceItem, quantity, value) tuples added to every booking
+        is_primary (bool): Mark the staff assignments as primary
+        **booking_fields: Remaining Booking fields shared by all occurrences (name, email, lead, ...)
+
+    Returns:
+        list: (booking, staff_member) tuples in occurrence order
+
+    Raises:
+        BulkSlotUnavailable: If any occurrence can't be booked
+        SlotUnavailable: If the request itself is invalid
+    """
+    slots = [_parse_slot(*occurrence) for occurrence in occurrences]
+    if not slots:
+        return []
+    if len(slots) > MAX_BULK_BOOKINGS:
+        raise SlotUnavailable(f"At most {MAX_BULK_BOOKINGS} bookings can be created at once")
+
+    dates = sorted({slot[0] for slot in slots})
+    service_offering_id = service_offering.id if service_offering else None
+    staff_member_id = staff_member.id if staff_member else None
+
+    try:
+        with transaction.atomic():
+            candidate_ids = list(AvailabilityEngine.qualified_staff(
+                business.id, service_offering_id, staff_member_id
+            ).values_list('id', flat=True))
+            if not candidate_ids:
+                raise SlotUnavailable("Selected staff member is not available for this service" if staff_member_id
+                                      else "No staff members available for this service")
+
+            _lock_business(business)
+            locked = _lock_staff_dates(candidate_ids, dates)
+
+            # Read free/busy only after the rows are locked
+            engine = AvailabilityEngine(
+                business.id,
+                dates[0],
+                dates[-1],
+                service_offering_id=service_offering_id,
+                staff_member_id=staff_member_id
+            )
+
+            strategy = get_strategy(business.id)
+            assigned = []
+            conflicts = []
+            previous = None
+            # Ranges of the occurrences accepted so far, which the later ones must not overlap either
+            ranges = []
+            for booking_date, start_time, end_time, start_minutes, end_minutes in slots:
+                start_at, end_at = _slot_range(business, booking_date, start_minutes, end_minutes)
+                if (Booking.overlapping(business, start_at, end_at).exists()
+                        or any(start_at < other_end and other_start < end_at for other_start, other_end in ranges)):
+                    conflicts.append({
+                        'date': booking_date,
+                        'start_time': start_time,
+                        'duration_minutes': end_minutes - start_minutes,
+                        'reason': "Time slot conflicts with existing bookings"
+                    })
+                    continue
+                free = [
+                    staff for staff in engine.staff
+                    if (staff.id, booking_date) in locked
+                    and engine.is_available(staff.id, booking_date, start_minutes, end_minutes)
+                ]
+                if not free:
+                    conflicts.append({
+                        'date': booking_date,
+                        'start_time': start_time,
+                        'duration_minutes': end_minutes - start_minutes,
+                        'reason': "This time slot is already booked or outside staff hours"
+                    })
+                    continue
+                staff = previous if previous in free else strategy.order(
+                    free, engine, booking_date, service_offering_id
+                )[0]
+                # Later occurrences on the same day must not overlap this one
+                engine.mark_busy(staff.id, booking_date, start_minutes, end_minutes)
+                ranges.append((start_at, end_at))
+                assigned.append(staff)
+                previous = staff
+
+            if conflicts:
+                raise BulkSlotUnavailable(conflicts)
+
+            bookings = _insert_bookings(
+                business, slots, assigned, service_offering, service_items or [], is_primary, booking_fields
+            )
+            if not staff_member_id:
+                transaction.on_commit(lambda: strategy.assigned(business.id, assigned[-1].id))
+    except IntegrityError as e:
+        if 'bookingstaff_no_overlap' not in str(e):
+            raise
+        raise SlotUnavailable("One of these time slots was just booked")
+    except OperationalError as e:
+        if not _is_lock_timeout(e):
+            raise
+        raise SlotUnavailable("These time slots are being booked by someone else")
+    except BulkSlotUnavailable as e:
+        for conflict in e.conflicts:
+            conflict['alternate_slots'] = get_alternate_timeslots(
+                business.id, conflict['date'], conflict['start_time'], conflict['duration_minutes'],
+                service_offering_id, staff_member_id
+            )
+        raise
+
+    return list(zip(bookings, assigned))
+
+
+def _insert_bookings(business, slots, staff_members, service_offering, service_items, is_primary, booking_fields):
+    """
+    Bulk insert the bookings of reserve_bookings with everything their post_save receivers would create.
+    Must be called inside transaction.atomic().
+    """
+    invoice_enabled = BusinessConfiguration.objects.filter(
+        business=business
+    ).values_list('invoice_enabled', flat=True).first()
+    if invoice_enabled:
+        # Same as create_invoice_for_booking: invoiced bookings wait for payment
+        booking_fields['status'] = BookingStatus.PENDING
+
+    bookings = []
+    for booking_date, start_time, end_time, start_minutes, end_minutes in slots:
+        booking = Booking(
+            id=generate_id('book_'),
+            business=business,
+            service_offering=service_offering,
+            booking_date=booking_date,
+            start_time=start_time,
+            end_time=end_time,
+            **booking_fields
+        )
+        booking.set_time_range()
+        bookings.append(booking)
+    Booking.objects.bulk_create(bookings)
+
+    assignments = []
+    for booking, staff in zip(bookings, staff_members):
+        start_at, end_at = booking.blocked_range
+        assignments.append(BookingStaffAssignment(
+            booking=booking, staff_member=staff, is_primary=is_primary, start_at=start_at, end_at=end_at
+        ))
+    BookingStaffAssignment.objects.bulk_create(assignments)
+
+    if service_items:
+        base_price = service_offering.price if service_offering else None
+        items = []
+        for service_item, quantity, value in service_items:
+            price = service_item.calculate_price(
+                base_price=base_price,
+                quantity=quantity,
+                selected_value=value if service_item.field_type in ['select', 'boolean'] else None
+            )
+            for booking in bookings:
+                item = BookingServiceItem(
+                    booking=booking, service_item=service_item, quantity=quantity, price_at_booking=price
+                )
+                item.set_response_value(value)
+                items.append(item)
+        BookingServiceItem.objects.bulk_create(items)
+
+    if invoice_enabled:
+        Invoice.objects.bulk_create([
+            Invoice(
+                id=generate_id('inv_'),
+                invoice_number=generate_id('inv_no_'),
+                booking=booking,
+                status=InvoiceStatus.PENDING,
+                due_date=booking.booking_date + timedelta(days=7)
+            )
+            for booking in bookings
+        ])
+
+    lead = booking_fields.get('lead')
+    if lead and booking_fields.get('status') == BookingStatus.CONFIRMED:
+        lead.status = LeadStatus.APPOINTMENT_SCHEDULED
+        lead.save(update_fields=['status', 'updated_at'])
+
+    staff_ids = {staff.id for staff in staff_members}
+    dates = {booking.booking_date for booking in bookings}
+    refresh_free_busy(staff_ids, dates, create_missing=False)
+    invalidate_dates(business.id, dates)
+
+    transaction.on_commit(lambda: bookings_bulk_created.send(sender=Booking, business=business, bookings=bookings))
+    return bookings
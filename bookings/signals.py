@@ -1,16 +1,30 @@
-from django.db.models.signals import post_save
-from django.dispatch import receiver
+from django.db.models.signals import post_save, pre_save, post_delete
+from django.dispatch import receiver, Signal
 from django.utils import timezone
+from django.utils.dateparse import parse_date
 from datetime import timedelta, date, datetime
 from decimal import Decimal
 import json
-from .models import Booking, BookingStatus
+from .models import (
+    Booking, BookingStatus, BookingStaffAssignment, StaffAvailability, StaffMember,
+    StaffServiceAssignment, SlotHold, AVAILABILITY_TYPE
+)
+from .free_busy import refresh_free_busy, refresh_weekday_rows
+from .availability_cache import invalidate_dates, invalidate_business
+from core.tracing import get_tracer
+from business.models import Business, BusinessConfiguration
 from invoices.models import Invoice, InvoiceStatus
 
 # Import for integration
 from integration.views import send_booking_data_to_integration
 from integration.models import PlatformIntegration
 
+trace = get_tracer('bookings')
+
+# Sent once after reserve_bookings commits, with business and bookings kwargs.
+# Bulk inserts skip post_save, so receivers here replace the per-booking chain.
+bookings_bulk_created = Signal()
+
 
 @receiver(post_save, sender=Booking)
 def create_invoice_for_booking(sender, instance, created, **kwargs):
@@ -183,3 +197,256 @@ def notify_plugins_booking_created(sender, instance, created, **kwargs):
             print(f"Error notifying plugins about booking creation: {str(e)}")
             import traceback
             print(traceback.format_exc())
+
+
+@receiver(bookings_bulk_created)
+def schedule_bulk_booking_processing(sender, business, bookings, **kwargs):
+    """
+    Hand a batch of bulk-created bookings to one background task for integrations and plugins.
+    """
+    booking_ids = [booking.id for booking in bookings]
+    try:
+        from django_q.tasks import async_task
+        async_task('bookings.signals.process_bulk_bookings', booking_ids)
+        trace.info("Scheduled processing of {} bulk-created bookings", len(booking_ids))
+    except ImportError:
+        process_bulk_bookings(booking_ids)
+
+
+def process_bulk_bookings(booking_ids):
+    """
+    Run the downstream work of bulk-created bookings: one plugin event for the whole
+    batch, and the integration push for each booking since integrations take one booking per request.
+    """
+    bookings = list(Booking.objects.filter(id__in=booking_ids).select_related(
+        'business', 'service_offering', 'lead'
+    ).order_by('booking_date', 'start_time'))
+    if not bookings:
+        return
+
+    for booking in bookings:
+        send_booking_to_integrations(Booking, booking, created=True)
+
+    try:
+        from plugins.events import notify_bookings_created
+        results = notify_bookings_created(bookings)
+        trace.info("Notified plugins about {} bulk-created bookings: {}", len(bookings), results)
+    except Exception as e:
+        trace.error("Error notifying plugins about bulk booking creation: {}", e, exc_info=True)
+
+
+# Booking fields that change which staff time is taken
+FREE_BUSY_BOOKING_FIELDS = {'booking_date', 'start_time', 'end_time', 'status'}
+
+
+def _as_date(value):
+    """Booking dates assigned from request data may still be strings before a refresh from the DB."""
+    if isinstance(value, str):
+        return parse_date(value)
+    return value
+
+
+def _booking_days(*booking_dates):
+    """Dates bookings on the given dates can take time on; a booking runs past midnight at most once."""
+    days = set()
+    for booking_date in booking_dates:
+        booking_date = _as_date(booking_date)
+        if booking_date is not None:
+            days.update((booking_date, booking_date + timedelta(days=1)))
+    return days
+
+
+@receiver(pre_save, sender=Booking)
+def remember_previous_booking_date(sender, instance, update_fields=None, **kwargs):
+    """
+    Remember the stored booking date so a reschedule refreshes the old day as well.
+    """
+    instance._previous_booking_date = None
+    if instance._state.adding:
+        return
+    if update_fields is not None and 'booking_date' not in update_fields:
+        return
+    instance._previous_booking_date = Booking.objects.filter(pk=instance.pk).values_list('booking_date', flat=True).first()
+
+
+@receiver(post_save, sender=Booking)
+def refresh_free_busy_for_booking(sender, instance, created, update_fields=None, **kwargs):
+    """
+    Refresh materialized free/busy rows when a booking's time or status changes.
+    New bookings are picked up when their staff assignment is saved.
+    """
+    if created:
+        return
+    if update_fields is not None and not FREE_BUSY_BOOKING_FIELDS.intersection(update_fields):
+        return
+
+    try:
+        staff_ids = list(instance.staff_assignments.values_list('staff_member_id', flat=True))
+        dates = _booking_days(instance.booking_date, getattr(instance, '_previous_booking_date', None))
+        refresh_free_busy(staff_ids, dates, create_missing=False)
+    except Exception as e:
+        trace.error("Error refreshing free/busy for booking {}: {}", instance.id, e, exc_info=True)
+
+
+@receiver(post_save, sender=BookingStaffAssignment)
+@receiver(post_delete, sender=BookingStaffAssignment)
+def refresh_free_busy_for_assignment(sender, instance, **kwargs):
+    """
+    Refresh the assigned staff member's free/busy rows when an assignment is added or removed.
+    """
+    try:
+        dates = _booking_days(instance.booking.booking_date)
+    except Booking.DoesNotExist:
+        # Booking is being deleted - its rows were refreshed by the assignment cascade
+        return
+
+    try:
+        refresh_free_busy([instance.staff_member_id], dates, create_missing=False)
+    except Exception as e:
+        trace.error("Error refreshing free/busy for assignment {}: {}", instance.pk, e, exc_info=True)
+
+
+@receiver(pre_save, sender=StaffAvailability)
+def remember_previous_availability(sender, instance, **kwargs):
+    """
+    Remember the stored weekday/date of an availability rule so moving it refreshes both days.
+    """
+    instance._previous_availability = None
+    if instance.pk:
+        instance._previous_availability = StaffAvailability.objects.filter(pk=instance.pk).values(
+            'availability_type', 'weekday', 'specific_date'
+        ).first()
+
+
+@receiver(post_save, sender=StaffAvailability)
+@receiver(post_delete, sender=StaffAvailability)
+def refresh_free_busy_for_availability(sender, instance, **kwargs):
+    """
+    Refresh materialized free/busy rows affected by an availability rule change.
+    Weekly rules touch every stored day with the same weekday.
+    """
+    rules = [{
+        'availability_type': instance.availability_type,
+        'weekday': instance.weekday,
+        'specific_date': instance.specific_date,
+    }]
+    previous = getattr(instance, '_previous_availability', None)
+    if previous:
+        rules.append(previous)
+
+    try:
+        weekdays = {rule['weekday'] for rule in rules if rule['availability_type'] == AVAILABILITY_TYPE.WEEKLY}
+        dates = {_as_date(rule['specific_date']) for rule in rules if rule['availability_type'] == AVAILABILITY_TYPE.SPECIFIC}
+
+        if weekdays:
+            refresh_weekday_rows(instance.staff_member_id, weekdays)
+        if dates - {None}:
+            refresh_free_busy([instance.staff_member_id], dates - {None}, create_missing=False)
+    except Exception as e:
+        trace.error("Error refreshing free/busy for availability {}: {}", instance.pk, e, exc_info=True)
+
+
+@receiver(post_save, sender=Booking)
+@receiver(post_delete, sender=Booking)
+def invalidate_availability_for_booking(sender, instance, **kwargs):
+    """
+    Drop cached availability for the booking's days (and its previous ones when rescheduled).
+    """
+    invalidate_dates(
+        instance.business_id,
+        _booking_days(instance.booking_date, getattr(instance, '_previous_booking_date', None))
+    )
+
+
+@receiver(post_save, sender=BookingStaffAssignment)
+@receiver(post_delete, sender=BookingStaffAssignment)
+def invalidate_availability_for_assignment(sender, instance, **kwargs):
+    """
+    Drop cached availability for the day of a booking whose staff changed.
+    """
+    try:
+        booking = instance.booking
+    except Booking.DoesNotExist:
+        return
+    invalidate_dates(booking.business_id, _booking_days(booking.booking_date))
+
+
+@receiver(post_save, sender=StaffAvailability)
+@receiver(post_delete, sender=StaffAvailability)
+def invalidate_availability_for_rule(sender, instance, **kwargs):
+    """
+    Specific-date rules only affect their own dates; weekly rules affect every day of the business.
+    """
+    business_id = StaffMember.objects.filter(pk=instance.staff_member_id).values_list('business_id', flat=True).first()
+    previous = getattr(instance, '_previous_availability', None) or {}
+    if AVAILABILITY_TYPE.WEEKLY in (instance.availability_type, previous.get('availability_type')):
+        invalidate_business(business_id)
+    else:
+        invalidate_dates(business_id, {_as_date(instance.specific_date), previous.get('specific_date')})
+
+
+@receiver(post_save, sender=StaffMember)
+@receiver(post_delete, sender=StaffMember)
+def invalidate_availability_for_staff(sender, instance, **kwargs):
+    """
+    Staff being added, deactivated or removed changes availability on every day.
+    """
+    invalidate_business(instance.business_id)
+
+
+@receiver(post_save, sender=StaffServiceAssignment)
+@receiver(post_delete, sender=StaffServiceAssignment)
+def invalidate_availability_for_service_assignment(sender, instance, **kwargs):
+    """
+    Changing which services a staff member offers changes availability on every day.
+    """
+    business_id = StaffMember.objects.filter(pk=instance.staff_member_id).values_list('business_id', flat=True).first()
+    invalidate_business(business_id)
+
+
+@receiver(post_save, sender=SlotHold)
+@receiver(post_delete, sender=SlotHold)
+def invalidate_availability_for_hold(sender, instance, **kwargs):
+    """
+    Holds count as busy time, so placing, converting or sweeping one changes its day.
+    """
+    invalidate_dates(instance.business_id, [_as_date(instance.date)])
+
+
+@receiver(post_save, sender=BusinessConfiguration)
+def invalidate_availability_for_configuration(sender, instance, **kwargs):
+    """
+    The slot granularity and staff assignment strategy live on the business configuration.
+    """
+    invalidate_business(instance.business_id)
+
+
+@receiver(pre_save, sender=Business)
+def remember_previous_timezone(sender, instance, **kwargs):
+    if instance.pk:
+        instance._previous_timezone = Business.objects.filter(pk=instance.pk).values_list('timezone', flat=True).first()
+
+
+@receiver(post_save, sender=Business)
+def recompute_booking_ranges(sender, instance, created, **kwargs):
+    """
+    Booking start_at/end_at are absolute times in the business timezone,
+    so they move when the timezone changes.
+    """
+    previous = getattr(instance, '_previous_timezone', None)
+    if created or previous is None or previous == instance.timezone:
+        return
+
+    bookings = list(instance.bookings.all())
+    for booking in bookings:
+        booking.business = instance
+        booking.set_time_range()
+    Booking.objects.bulk_update(bookings, ['start_at', 'end_at'], batch_size=500)
+
+    ranges = {booking.id: booking.blocked_range for booking in bookings}
+    assignments = list(BookingStaffAssignment.objects.filter(booking__business=instance))
+    for assignment in assignments:
+        assignment.start_at, assignment.end_at = ranges[assignment.booking_id]
+    BookingStaffAssignment.objects.bulk_update(assignments, ['start_at', 'end_at'], batch_size=500)
+
+    invalidate_business(instance.id)
@@ -1,3 +1,713 @@
-from django.test import TestCase
+import json
+import os
+import tempfile
+from datetime import date, time, timedelta, datetime, timezone as dt_timezone
+from io import StringIO
+from unittest import mock
 
-# Create your tests here.
+import numpy as np
+
+from django.core.cache import caches
+from django.core.exceptions import ValidationError
+from django.core.management import call_command
+from django.db import OperationalError
+from django.test import TestCase, RequestFactory
+from django.utils import timezone
+from django.contrib.auth import get_user_model
+from django.urls import reverse
+
+from business.models import Business, BusinessConfiguration, Industry, ServiceItem, ServiceOffering
+from leads.models import Lead, LeadStatus
+from .models import (
+    Booking, BookingStatus, BookingStaffAssignment, StaffMember, StaffAvailability,
+    StaffServiceAssignment, StaffFreeBusy, SlotHold, AVAILABILITY_TYPE
+)
+from .availability import (
+    AvailabilityEngine, StaffEligibility, check_timeslot_availability, find_available_slots_on_date,
+    find_available_slots_in_range, merge_intervals, subtract_intervals, minute_grid, fitting_starts
+)
+from .availability_cache import CACHE_ALIAS
+from .benchmarks import compare_to_baseline
+from .calendar_feeds import feed_token
+from .free_busy import rebuild_free_busy
+from .management.commands.audit_query_indexes import SQLITE_SEQ_SCAN
+from .views import create_recurring_bookings, get_available_timeslots
+from .reservations import (
+    reserve_booking, reserve_bookings, recurring_dates, place_hold, sweep_expired_holds,
+    SlotUnavailable, BulkSlotUnavailable
+)
+from .signals import bookings_bulk_created
+
+User = get_user_model()
+
+
+class AvailabilityTestMixin:
+    """Shared fixtures for availability tests."""
+
+    # A Monday far enough in the future to never be "today"
+    day = date(2030, 1, 7)
+
+    def create_business(self):
+        caches[CACHE_ALIAS].clear()
+        user = User.objects.create_user(username='owner', password='testpassword')
+        industry = Industry.objects.create(name='Cleaning')
+        self.business = Business.objects.create(
+            name='Test Cleaning', user=user, industry=industry,
+            phone_number='+15550000000', email='owner@example.com'
+        )
+        BusinessConfiguration.objects.create(business=self.business, invoice_enabled=False)
+        self.service = ServiceOffering.objects.create(
+            business=self.business, name='Standard Cleaning', price=100, duration=60
+        )
+
+    def create_staff(self, first_name, weekday_hours=(time(9, 0), time(17, 0))):
+        # bulk_create skips the notification signal, which expects a linked user
+        staff = StaffMember(
+            id=f'staff_{first_name.lower()}', business=self.business,
+            first_name=first_name, last_name='Test', email=f'{first_name.lower()}@example.com', phone='+15550000001'
+        )
+        StaffMember.objects.bulk_create([staff])
+        StaffServiceAssignment.objects.create(staff_member=staff, service_offering=self.service)
+        if weekday_hours:
+            StaffAvailability.objects.create(
+                staff_member=staff, availability_type=AVAILABILITY_TYPE.WEEKLY,
+                weekday=self.day.weekday(), start_time=weekday_hours[0], end_time=weekday_hours[1]
+            )
+        return staff
+
+    def create_booking(self, staff, start, end, booking_date=None):
+        booking = Booking.objects.create(
+            business=self.business, service_offering=self.service, name='Client',
+            email='client@example.com', phone_number='+15550000002',
+            booking_date=booking_date or self.day, start_time=start, end_time=end,
+            status=BookingStatus.CONFIRMED
+        )
+        BookingStaffAssignment.objects.create(booking=booking, staff_member=staff, is_primary=True)
+        return booking
+
+
+class IntervalTests(TestCase):
+    def test_merge_intervals(self):
+        self.assertEqual(merge_intervals([(60, 120), (0, 30), (30, 45), (100, 200)]), [(0, 45), (60, 200)])
+
+    def test_subtract_intervals(self):
+        self.assertEqual(
+            subtract_intervals([(0, 100), (200, 300)], [(50, 60), (90, 210), (290, 400)]),
+            [(0, 50), (60, 90), (210, 290)]
+        )
+
+    def test_fitting_starts(self):
+        grid = minute_grid([[(0, 60), (90, 120)], [(30, 120)]])
+        fits = fitting_starts(grid, np.array([0, 30, 60, 90]), 30)
+
+        self.assertEqual(fits.tolist(), [[True, True, False, True], [False, True, True, True]])
+
+
+class AvailabilityEngineTests(AvailabilityTestMixin, TestCase):
+    def setUp(self):
+        self.create_business()
+        self.alice = self.create_staff('Alice')
+        self.bob = self.create_staff('Bob', weekday_hours=(time(12, 0), time(17, 0)))
+
+    def test_slots_skip_booked_time(self):
+        self.create_booking(self.alice, time(9, 0), time(11, 0))
+
+        slots = find_available_slots_on_date(self.business.id, self.day, 60, max_slots=3)
+
+        # Suggested slots don't overlap for the same staff member, so 11:30 is skipped
+        self.assertEqual([slot['time'] for slot in slots], ['11:00', '12:00', '12:30'])
+        self.assertEqual(
+            [slot['staff']['id'] for slot in slots],
+            [self.alice.id, self.alice.id, self.bob.id]
+        )
+
+    def test_specific_off_day_overrides_weekly_rules(self):
+        StaffAvailability.objects.create(
+            staff_member=self.alice, availability_type=AVAILABILITY_TYPE.SPECIFIC,
+            specific_date=self.day, start_time=time(0, 0), end_time=time(23, 59), off_day=True
+        )
+        engine = AvailabilityEngine(self.business.id, self.day)
+
+        self.assertEqual(engine.free_intervals(self.alice.id, self.day), [])
+        self.assertEqual(engine.available_staff(self.day, time(13, 0), 60), [self.bob])
+
+    def test_query_count_is_independent_of_staff_count(self):
+        for name in ('Carol', 'Dave', 'Erin', 'Frank'):
+            staff = self.create_staff(name)
+            self.create_booking(staff, time(10, 0), time(11, 0))
+
+        with self.assertNumQueries(7):
+            find_available_slots_on_date(self.business.id, self.day, 60, max_slots=10, use_cache=False)
+
+    def test_check_timeslot_availability_lists_free_staff(self):
+        is_available, reason, staff = check_timeslot_availability(
+            self.business, datetime.combine(self.day, time(9, 0)), 60, self.service
+        )
+
+        self.assertTrue(is_available)
+        self.assertEqual([s['id'] for s in staff], [self.alice.id])
+
+    def test_slot_granularity_comes_from_business(self):
+        self.business.configuration.slot_granularity_minutes = 15
+        self.business.configuration.save()
+        self.create_booking(self.alice, time(9, 0), time(10, 10))
+
+        slots = find_available_slots_on_date(self.business.id, self.day, 60, max_slots=2)
+
+        self.assertEqual([slot['time'] for slot in slots], ['10:15', '11:15'])
+
+    def test_eligibility_answers_from_memory(self):
+        StaffAvailability.objects.create(
+            staff_member=self.alice, availability_type=AVAILABILITY_TYPE.SPECIFIC,
+            specific_date=self.day, start_time=time(12, 0), end_time=time(13, 0), off_day=True
+        )
+
+        with self.assertNumQueries(1):
+            eligibility = StaffEligibility([self.alice.id, self.bob.id], [self.day])
+        with self.assertNumQueries(0):
+            # The specific off-day rule replaces Alice's weekly hours for the day
+            self.assertFalse(eligibility.allows(self.alice.id, self.day, time(9, 0), time(10, 0)))
+            self.assertTrue(eligibility.allows(self.bob.id, self.day, time(13, 0), time(14, 0)))
+            self.assertFalse(eligibility.allows(self.bob.id, self.day, time(11, 0), time(13, 0)))
+
+    def test_clean_many_validates_batch_with_shared_queries(self):
+        bookings = [self.create_booking(self.alice, time(hour, 0), time(hour + 1, 0)) for hour in (9, 10, 11)]
+        assignments = [
+            BookingStaffAssignment(booking=booking, staff_member=self.bob) for booking in bookings
+        ]
+
+        with self.assertNumQueries(2):
+            with self.assertRaisesMessage(ValidationError, 'not available'):
+                BookingStaffAssignment.clean_many(assignments)
+
+        # Overlapping assignments within the batch conflict with each other
+        first = self.create_booking(self.bob, time(14, 0), time(15, 0))
+        second = self.create_booking(self.bob, time(14, 30), time(15, 30))
+        with self.assertRaisesMessage(ValidationError, 'conflicting booking'):
+            BookingStaffAssignment.clean_many([
+                BookingStaffAssignment(booking=first, staff_member=self.alice),
+                BookingStaffAssignment(booking=second, staff_member=self.alice),
+            ])
+
+    def test_get_available_staff_ignores_own_booking(self):
+        booking = self.create_booking(self.bob, time(13, 0), time(14, 0))
+
+        self.assertEqual(booking.get_available_staff(), [self.alice, self.bob])
+
+
+class AvailabilityCacheTests(AvailabilityTestMixin, TestCase):
+    def setUp(self):
+        self.create_business()
+        self.alice = self.create_staff('Alice', weekday_hours=(time(9, 0), time(11, 0)))
+
+    def test_repeat_lookups_hit_the_cache(self):
+        find_available_slots_on_date(self.business.id, self.day, 60)
+
+        with self.assertNumQueries(0):
+            slots = find_available_slots_on_date(self.business.id, self.day, 60)
+        self.assertEqual([slot['time'] for slot in slots], ['09:00', '10:00'])
+
+    def test_booking_invalidates_only_its_date(self):
+        next_week = self.day + timedelta(days=7)
+        find_available_slots_on_date(self.business.id, self.day, 60)
+        find_available_slots_on_date(self.business.id, next_week, 60)
+
+        self.create_booking(self.alice, time(9, 0), time(10, 0))
+
+        with self.assertNumQueries(0):
+            find_available_slots_on_date(self.business.id, next_week, 60)
+        slots = find_available_slots_on_date(self.business.id, self.day, 60)
+        self.assertEqual([slot['time'] for slot in slots], ['10:00'])
+
+    def test_weekly_rule_change_invalidates_every_date(self):
+        find_available_slots_on_date(self.business.id, self.day, 60)
+
+        StaffAvailability.objects.filter(staff_member=self.alice).delete()
+        StaffAvailability.objects.create(
+            staff_member=self.alice, availability_type=AVAILABILITY_TYPE.WEEKLY,
+            weekday=self.day.weekday(), start_time=time(9, 0), end_time=time(10, 0)
+        )
+
+        slots = find_available_slots_on_date(self.business.id, self.day, 60)
+        self.assertEqual([slot['time'] for slot in slots], ['09:00'])
+
+
+class AvailabilityRangeTests(AvailabilityTestMixin, TestCase):
+    def setUp(self):
+        self.create_business()
+        self.alice = self.create_staff('Alice', weekday_hours=(time(9, 0), time(11, 0)))
+
+    def test_range_summarises_each_day(self):
+        self.create_booking(self.alice, time(9, 0), time(10, 0))
+
+        result = find_available_slots_in_range(self.business.id, self.day, self.day + timedelta(days=7), 60)
+
+        self.assertEqual(len(result['days']), 8)
+        self.assertEqual(result['days'][0], {
+            'date': '2030-01-07', 'available': True, 'slot_count': 1, 'first_slot': '10:00', 'last_slot': '10:00'
+        })
+        # Only Mondays have hours
+        self.assertEqual([day['date'] for day in result['days'] if day['available']], ['2030-01-07', '2030-01-14'])
+        self.assertEqual(result['slots']['2030-01-14'][0]['staff'], [self.alice.id])
+
+    def test_reschedule_timeslots_ignore_own_booking(self):
+        booking = self.create_booking(self.alice, time(9, 0), time(10, 0))
+        self.create_booking(self.alice, time(10, 0), time(11, 0))
+        # Call the view directly: the licence middleware isn't under test here
+        request = RequestFactory().get('/', {'date': '2030-01-07', 'days': 8})
+        request.user = self.business.user
+
+        with self.assertNumQueries(7):
+            response = get_available_timeslots(request, booking.id)
+
+        data = json.loads(response.content)
+        self.assertEqual(
+            [(slot['start_time'], slot['available']) for slot in data['timeslots']],
+            [('09:00', True), ('09:30', False), ('10:00', False)]
+        )
+        self.assertEqual([day['date'] for day in data['days']], ['2030-01-07', '2030-01-14'])
+
+        request = RequestFactory().get('/', {'date': '2030-01-07', 'days': 'week'})
+        request.user = self.business.user
+        self.assertEqual(get_available_timeslots(request, booking.id).status_code, 400)
+
+    def test_widget_endpoint(self):
+        response = self.client.get(
+            reverse('bookings:widget_availability_range', args=[self.business.id]),
+            {'start_date': '2030-01-07', 'end_date': '2030-01-13', 'service_offering_id': self.service.id}
+        )
+
+        data = response.json()
+        self.assertTrue(data['success'])
+        self.assertEqual(data['duration_minutes'], 60)
+        self.assertEqual(data['days'][0]['slot_count'], 3)
+
+    def test_widget_endpoint_rejects_long_ranges(self):
+        response = self.client.get(
+            reverse('bookings:widget_availability_range', args=[self.business.id]),
+            {'start_date': '2030-01-01', 'end_date': '2030-06-01'}
+        )
+
+        self.assertEqual(response.status_code, 400)
+
+
+class MaterializedFreeBusyTests(AvailabilityTestMixin, TestCase):
+    def setUp(self):
+        self.create_business()
+        self.alice = self.create_staff('Alice')
+        self.bob = self.create_staff('Bob', weekday_hours=(time(12, 0), time(17, 0)))
+        self.create_booking(self.alice, time(9, 0), time(11, 0))
+
+    def test_engine_reads_materialized_rows(self):
+        expected = find_available_slots_on_date(self.business.id, self.day, 60, max_slots=3, use_cache=False)
+        rebuild_free_busy(self.day, self.day, business_id=self.business.id)
+
+        # Staff, materialized rows, live slot holds, the business's bookings and the slot granularity
+        with self.assertNumQueries(5):
+            slots = find_available_slots_on_date(self.business.id, self.day, 60, max_slots=3, use_cache=False)
+        self.assertEqual(slots, expected)
+
+    def test_signals_keep_rows_current(self):
+        rebuild_free_busy(self.day, self.day + timedelta(days=7))
+
+        booking = self.create_booking(self.bob, time(13, 0), time(14, 0))
+        row = StaffFreeBusy.objects.get(staff_member=self.bob, date=self.day)
+        self.assertEqual(row.busy_intervals, [[780, 840, booking.id]])
+        self.assertEqual(row.booked_minutes, 60)
+
+        # Rescheduling refreshes both the old and the new day
+        booking.booking_date = self.day + timedelta(days=7)
+        booking.save()
+        self.assertEqual(StaffFreeBusy.objects.get(staff_member=self.bob, date=self.day).busy_intervals, [])
+        self.assertEqual(
+            StaffFreeBusy.objects.get(staff_member=self.bob, date=booking.booking_date).busy_intervals,
+            [[780, 840, booking.id]]
+        )
+
+        # Weekly rule changes refresh every stored day on that weekday
+        StaffAvailability.objects.filter(staff_member=self.bob).first().delete()
+        self.assertEqual(StaffFreeBusy.objects.get(staff_member=self.bob, date=self.day).open_intervals, [])
+
+
+class ReservationTests(AvailabilityTestMixin, TestCase):
+    def setUp(self):
+        self.create_business()
+        self.alice = self.create_staff('Alice', weekday_hours=(time(9, 0), time(12, 0)))
+
+    def reserve(self, start, end, **kwargs):
+        return reserve_booking(
+            self.business, self.day, start, end, service_offering=self.service,
+            name='Client', email='client@example.com', phone_number='+15550000002', **kwargs
+        )
+
+    def test_reservation_assigns_free_staff(self):
+        booking, staff = self.reserve(time(9, 0), time(10, 0))
+
+        self.assertEqual(staff, self.alice)
+        self.assertEqual(list(booking.staff_members.all()), [self.alice])
+        self.assertTrue(StaffFreeBusy.objects.filter(staff_member=self.alice, date=self.day).exists())
+
+    def test_taken_slot_fails_with_alternates(self):
+        self.reserve(time(9, 0), time(10, 0))
+
+        with self.assertRaises(SlotUnavailable) as ctx:
+            self.reserve('09:30', '10:30', staff_member=self.alice)
+
+        self.assertEqual(Booking.objects.count(), 1)
+        self.assertEqual(ctx.exception.alternate_slots[0]['time'], '10:00')
+
+    def test_recurring_bookings_are_created_together(self):
+        dates = recurring_dates(self.day, 'weekly', count=4)
+        received = []
+        receiver = lambda sender, bookings, **kwargs: received.append(len(bookings))
+        bookings_bulk_created.connect(receiver)
+        self.addCleanup(bookings_bulk_created.disconnect, receiver)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            created = reserve_bookings(
+                self.business, [(day, '09:00', '10:00') for day in dates], service_offering=self.service,
+                name='Client', email='client@example.com', phone_number='+15550000002'
+            )
+
+        self.assertEqual([booking.booking_date for booking, staff in created], dates)
+        self.assertEqual(BookingStaffAssignment.objects.filter(staff_member=self.alice, start_at__isnull=False).count(), 4)
+        self.assertEqual(StaffFreeBusy.objects.get(staff_member=self.alice, date=dates[-1]).busy_intervals[0][:2], [540, 600])
+        self.assertEqual(received, [4])
+
+    def test_recurring_conflict_creates_nothing(self):
+        next_week = self.day + timedelta(days=7)
+        self.create_booking(self.alice, time(9, 0), time(10, 0), booking_date=next_week)
+
+        with self.assertRaises(BulkSlotUnavailable) as ctx:
+            reserve_bookings(
+                self.business, [(day, '09:00', '10:00') for day in recurring_dates(self.day, 'weekly', count=3)],
+                staff_member=self.alice, service_offering=self.service,
+                name='Client', email='client@example.com', phone_number='+15550000002'
+            )
+
+        self.assertEqual(Booking.objects.count(), 1)
+        self.assertEqual([conflict['date'] for conflict in ctx.exception.conflicts], [next_week])
+        self.assertEqual(ctx.exception.conflicts[0]['alternate_slots'][0]['time'], '10:00')
+
+    def test_recurring_bookings_with_service_items(self):
+        item = ServiceItem.objects.create(business=self.business, name='Windows', field_type='number')
+        body = {
+            'service_type': self.service.id, 'start_date': '2030-01-07', 'start_time': '09:00', 'end_time': '10:00',
+            'frequency': 'weekly', 'occurrences': 2, 'client_name': 'Client', 'client_email': 'client@example.com',
+            'client_phone': '+15550000002', 'service_items': {str(item.id): {'quantity': 2, 'value': '4'}}
+        }
+        # Call the view directly: the licence middleware isn't under test here
+        request = RequestFactory().post('/', data=json.dumps(body), content_type='application/json')
+        request.user = self.business.user
+
+        response = create_recurring_bookings(request)
+
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(
+            list(Booking.objects.filter(service_items__service_item=item).values_list('service_items__quantity', flat=True)),
+            [2, 2]
+        )
+
+        request = RequestFactory().post(
+            '/', data=json.dumps({**body, 'service_items': [item.id]}), content_type='application/json'
+        )
+        request.user = self.business.user
+        self.assertEqual(create_recurring_bookings(request).status_code, 400)
+
+    def test_monthly_recurrence_skips_short_months(self):
+        self.assertEqual(
+            recurring_dates(date(2030, 1, 31), 'monthly', until=date(2030, 5, 31)),
+            [date(2030, 1, 31), date(2030, 3, 31), date(2030, 5, 31)]
+        )
+
+    def test_widget_booking_conflict_returns_409(self):
+        self.reserve(time(9, 0), time(10, 0))
+        lead = Lead.objects.create(
+            business=self.business, first_name='Other', email='other@example.com', phone='+15550000003'
+        )
+
+        response = self.client.post(
+            reverse('bookings:widget_create_booking', args=[self.business.id]),
+            data={
+                'service_type': self.service.id, 'booking_date': '2030-01-07', 'start_time': '09:00',
+                'end_time': '10:00', 'client_name': 'Other Client', 'client_email': 'other@example.com',
+                'client_phone': '+15550000003', 'staff_member_id': self.alice.id
+            },
+            content_type='application/json'
+        )
+
+        self.assertEqual(response.status_code, 409)
+        self.assertTrue(response.json()['alternate_slots'])
+        # The lead isn't marked scheduled for a booking that wasn't made
+        lead.refresh_from_db()
+        self.assertEqual(lead.status, LeadStatus.NEW)
+
+
+class StaffAssignmentTests(AvailabilityTestMixin, TestCase):
+    def setUp(self):
+        self.create_business()
+        self.alice = self.create_staff('Alice')
+        self.bob = self.create_staff('Bob')
+        self.create_booking(self.alice, time(9, 0), time(11, 0))
+        rebuild_free_busy(self.day, self.day, business_id=self.business.id)
+
+    def reserve(self, start, end):
+        return reserve_booking(
+            self.business, self.day, start, end, service_offering=self.service,
+            name='Client', email='client@example.com', phone_number='+15550000002'
+        )[1]
+
+    def test_least_booked_staff_comes_first(self):
+        BusinessConfiguration.objects.filter(business=self.business).update(staff_assignment_strategy='least_booked')
+        _, _, staff = check_timeslot_availability(self.business, datetime.combine(self.day, time(14, 0)), 60, self.service)
+        self.assertEqual([member['id'] for member in staff], [self.bob.id, self.alice.id])
+
+        # Bob takes bookings until he is busier than Alice
+        self.assertEqual(self.reserve(time(12, 0), time(13, 0)), self.bob)
+        self.assertEqual(self.reserve(time(13, 0), time(15, 0)), self.bob)
+        self.assertEqual(self.reserve(time(15, 0), time(16, 0)), self.alice)
+        self.assertEqual(StaffFreeBusy.objects.get(staff_member=self.bob, date=self.day).booked_minutes, 180)
+
+    def test_business_wide_conflicts_block_reservations_too(self):
+        # Bob is free at 10:00, but Alice's booking overlaps it and the business takes one booking at a time
+        available, reason, _ = check_timeslot_availability(
+            self.business, datetime.combine(self.day, time(10, 0)), 60, self.service, use_cache=False
+        )
+        self.assertFalse(available)
+
+        with self.assertRaises(SlotUnavailable) as ctx:
+            self.reserve(time(10, 0), time(11, 0))
+        self.assertEqual(ctx.exception.reason, reason)
+        # Alternates are bookable, i.e. clear of Alice's booking as well
+        self.assertEqual(ctx.exception.alternate_slots[0]['time'], '11:00')
+
+        # Slot listings don't offer it either
+        listed = find_available_slots_in_range(self.business.id, self.day, self.day, 60, service_offering_id=self.service.id)
+        self.assertEqual(listed['days'][0]['first_slot'], '11:00')
+
+        with self.assertRaises(BulkSlotUnavailable):
+            reserve_bookings(
+                self.business, [(self.day, '12:00', '13:00'), (self.day, '12:30', '13:30')],
+                service_offering=self.service, name='Client', email='client@example.com',
+                phone_number='+15550000002'
+            )
+        self.assertEqual(Booking.objects.count(), 1)
+
+    def test_bad_or_contended_slots_fail_fast(self):
+        for slot in (('2030-02-30', '10:00', '11:00'), ('2030-01-07', 'noon', '13:00')):
+            with self.assertRaisesMessage(SlotUnavailable, 'Invalid date or time'):
+                reserve_booking(self.business, *slot, service_offering=self.service, name='Client')
+
+        # PostgreSQL gave up waiting for another reservation's locks
+        lock_timeout = OperationalError('canceling statement due to lock timeout')
+        lock_timeout.__cause__ = Exception('lock timeout')
+        lock_timeout.__cause__.pgcode = '55P03'
+        with mock.patch('bookings.reservations._claim_staff', side_effect=lock_timeout):
+            with self.assertRaises(SlotUnavailable) as ctx:
+                self.reserve(time(12, 0), time(13, 0))
+        self.assertEqual(ctx.exception.reason, 'This time slot is being booked by someone else')
+        self.assertEqual(ctx.exception.alternate_slots[0]['time'], '11:00')
+
+    def test_round_robin_alternates(self):
+        BusinessConfiguration.objects.filter(business=self.business).update(staff_assignment_strategy='round_robin')
+
+        with self.captureOnCommitCallbacks(execute=True):
+            first = self.reserve(time(12, 0), time(13, 0))
+        with self.captureOnCommitCallbacks(execute=True):
+            second = self.reserve(time(13, 0), time(14, 0))
+        self.assertNotEqual(first, second)
+
+        _, _, staff = check_timeslot_availability(self.business, datetime.combine(self.day, time(15, 0)), 60, self.service)
+        self.assertEqual(staff[0]['id'], first.id)
+
+
+class BookingRangeTests(AvailabilityTestMixin, TestCase):
+    def setUp(self):
+        self.create_business()
+        self.business.timezone = 'America/Chicago'
+        self.business.save()
+        self.alice = self.create_staff('Alice')
+
+    def test_range_uses_business_timezone(self):
+        booking = self.create_booking(self.alice, time(9, 0), time(10, 0))
+        late = self.create_booking(self.alice, time(23, 0), time(1, 0))
+
+        self.assertEqual(booking.start_at, datetime(2030, 1, 7, 15, 0, tzinfo=dt_timezone.utc))
+        self.assertEqual(late.end_at, datetime(2030, 1, 8, 7, 0, tzinfo=dt_timezone.utc))
+        assignment = BookingStaffAssignment.objects.get(booking=booking)
+        self.assertEqual((assignment.start_at, assignment.end_at), (booking.start_at, booking.end_at))
+
+        booking.cancel()
+        assignment.refresh_from_db()
+        self.assertIsNone(assignment.start_at)
+
+    def test_timezone_change_recomputes_ranges(self):
+        booking = self.create_booking(self.alice, time(9, 0), time(10, 0))
+
+        self.business.timezone = 'UTC'
+        self.business.save()
+
+        booking.refresh_from_db()
+        self.assertEqual(booking.start_at, datetime(2030, 1, 7, 9, 0, tzinfo=dt_timezone.utc))
+        self.assertEqual(BookingStaffAssignment.objects.get(booking=booking).start_at, booking.start_at)
+
+    def test_available_staff_for_booking_past_midnight(self):
+        self.create_staff('Night', weekday_hours=(time(0, 0), time(23, 59)))
+        late = Booking(
+            business=self.business, service_offering=self.service,
+            booking_date=self.day, start_time=time(23, 0), end_time=time(1, 0)
+        )
+        early = Booking(
+            business=self.business, service_offering=self.service,
+            booking_date=self.day, start_time=time(22, 0), end_time=time(23, 0)
+        )
+
+        # Two hours, running past the end of every staff member's day
+        self.assertEqual(late.get_available_staff(), [])
+        self.assertEqual([staff.first_name for staff in early.get_available_staff()], ['Night'])
+
+    def test_booking_past_midnight_blocks_the_next_morning(self):
+        night = self.create_staff('Night', weekday_hours=(time(0, 0), time(23, 59)))
+        next_day = self.day + timedelta(days=1)
+        StaffAvailability.objects.create(
+            staff_member=night, availability_type=AVAILABILITY_TYPE.WEEKLY,
+            weekday=next_day.weekday(), start_time=time(0, 0), end_time=time(23, 59)
+        )
+        rebuild_free_busy(self.day, next_day, business_id=self.business.id)
+        late = self.create_booking(night, time(23, 0), time(1, 0))
+
+        # Both the rows kept by the signals and the rules path see the hour after midnight
+        self.assertEqual(StaffFreeBusy.objects.get(staff_member=night, date=next_day).busy_intervals, [[0, 60, late.id]])
+        for use_materialized in (True, False):
+            engine = AvailabilityEngine(self.business.id, self.day, next_day, use_materialized=use_materialized)
+            self.assertEqual(engine.free_intervals(night.id, self.day), [(0, 1380)])
+            self.assertEqual(engine.free_intervals(night.id, next_day), [(60, 1440)])
+
+    def test_adjacent_slot_does_not_conflict(self):
+        self.create_booking(self.alice, time(9, 0), time(10, 0))
+
+        available, _, staff = check_timeslot_availability(
+            self.business, datetime.combine(self.day, time(10, 0)), 60, self.service, use_cache=False
+        )
+        aware_start = timezone.make_aware(datetime.combine(self.day, time(9, 30)), self.business.tzinfo)
+        taken, _, _ = check_timeslot_availability(self.business, aware_start, 60, self.service, use_cache=False)
+
+        self.assertTrue(available)
+        self.assertEqual([member['id'] for member in staff], [self.alice.id])
+        self.assertFalse(taken)
+
+
+    def test_today_is_the_business_date(self):
+        # 02:00 UTC on the 8th is still the evening of the 7th in Chicago
+        with mock.patch('django.utils.timezone.now', return_value=datetime(2030, 1, 8, 2, 0, tzinfo=dt_timezone.utc)):
+            evening = find_available_slots_on_date(self.business.id, self.day, 60, use_cache=False)
+            tomorrow = find_available_slots_on_date(self.business.id, self.day + timedelta(days=1), 60, use_cache=False)
+
+        self.assertEqual(evening, [])
+        self.assertEqual(tomorrow, [])  # Alice only works Mondays
+        with mock.patch('django.utils.timezone.now', return_value=datetime(2030, 1, 7, 16, 0, tzinfo=dt_timezone.utc)):
+            self.assertEqual(find_available_slots_on_date(self.business.id, self.day, 60, use_cache=False)[0]['time'], '10:30')
+
+
+class CalendarFeedTests(AvailabilityTestMixin, TestCase):
+    def setUp(self):
+        self.create_business()
+        self.alice = self.create_staff('Alice')
+        self.booking = self.create_booking(self.alice, time(9, 0), time(10, 0))
+        self.url = reverse('bookings:staff_calendar_feed', args=[self.alice.id, feed_token('staff', self.alice.id)])
+
+    def test_feed_streams_events_and_revalidates(self):
+        response = self.client.get(self.url)
+        body = b''.join(response.streaming_content).decode()
+
+        self.assertEqual(response['Content-Type'], 'text/calendar; charset=utf-8')
+        self.assertIn(f'UID:{self.booking.id}@services-ai', body)
+        self.assertIn('DTSTART:20300107T090000Z', body)
+
+        with self.assertNumQueries(1):
+            cached = self.client.get(self.url, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(cached.status_code, 304)
+
+        self.booking.cancel()
+        self.assertEqual(self.client.get(self.url, HTTP_IF_NONE_MATCH=response['ETag']).status_code, 200)
+
+    def test_feed_requires_valid_token(self):
+        business_url = reverse('bookings:business_calendar_feed', args=[self.business.id, feed_token('staff', self.alice.id)])
+
+        self.assertEqual(self.client.get(business_url).status_code, 404)
+
+
+class SlotHoldTests(AvailabilityTestMixin, TestCase):
+    def setUp(self):
+        self.create_business()
+        self.alice = self.create_staff('Alice', weekday_hours=(time(9, 0), time(11, 0)))
+
+    def test_hold_blocks_slot_until_converted(self):
+        hold = place_hold(self.business, self.day, time(9, 0), time(10, 0), service_offering=self.service)
+
+        slots = find_available_slots_on_date(self.business.id, self.day, 60)
+        self.assertEqual([slot['time'] for slot in slots], ['10:00'])
+        with self.assertRaises(SlotUnavailable):
+            place_hold(self.business, self.day, time(9, 0), time(10, 0), service_offering=self.service)
+
+        booking, staff = reserve_booking(
+            self.business, None, None, None, service_offering=self.service, hold=hold,
+            name='Client', email='client@example.com', phone_number='+15550000002'
+        )
+        self.assertEqual((booking.start_time, staff), (time(9, 0), self.alice))
+        self.assertFalse(SlotHold.objects.exists())
+
+    def test_widget_hold_is_released_only_with_its_token(self):
+        response = self.client.post(
+            reverse('bookings:widget_create_hold', args=[self.business.id]),
+            data={'service_type': self.service.id, 'booking_date': '2030-01-07', 'start_time': '09:00', 'end_time': '10:00'},
+            content_type='application/json'
+        )
+        hold_id, token = response.json()['hold_id'], response.json()['hold_token']
+        release_url = reverse('bookings:widget_release_hold', args=[self.business.id, hold_id])
+
+        self.assertEqual(self.client.post(release_url).status_code, 403)
+        self.assertEqual(self.client.post(release_url, data={'hold_token': 'forged'}, content_type='application/json').status_code, 403)
+        self.assertTrue(SlotHold.objects.exists())
+
+        self.assertEqual(self.client.post(release_url, data={'hold_token': token}, content_type='application/json').status_code, 200)
+        self.assertFalse(SlotHold.objects.exists())
+
+    def test_sweep_releases_expired_holds(self):
+        hold = place_hold(self.business, self.day, time(9, 0), time(10, 0), service_offering=self.service)
+        SlotHold.objects.filter(pk=hold.pk).update(expires_at=timezone.now())
+
+        self.assertEqual(sweep_expired_holds(), 1)
+        slots = find_available_slots_on_date(self.business.id, self.day, 60)
+        self.assertEqual([slot['time'] for slot in slots], ['09:00', '10:00'])
+
+
+class IndexAuditTests(TestCase):
+    def test_hot_queries_use_indexes(self):
+        call_command('audit_query_indexes', stdout=StringIO())
+
+    def test_sqlite_plan_parsing(self):
+        plan = "2 0 0 SCAN bookings_booking\n5 0 0 SCAN leads_lead USING INDEX lead_business_created_idx"
+        self.assertEqual(SQLITE_SEQ_SCAN.findall(plan), ['bookings_booking'])
+
+
+class BenchmarkTests(TestCase):
+    def test_command_writes_results_and_rolls_back(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            output = os.path.join(tmp, 'bench.json')
+            call_command(
+                'benchmark_availability', businesses=1, staff=2, days=2, samples=2,
+                output=output, stdout=StringIO()
+            )
+            with open(output) as f:
+                report = json.load(f)
+
+        self.assertIn('find_available_slots_on_date', report['results'])
+        self.assertIn('get_available_timeslots_view', report['results'])
+        self.assertFalse(Business.objects.exists())
+
+    def test_compare_to_baseline(self):
+        baseline = {'lookup': {'median_ms': 10.0, 'mean_queries': 4}}
+
+        self.assertEqual(compare_to_baseline({'lookup': {'median_ms': 12.0, 'mean_queries': 4}}, baseline), [])
+        self.assertEqual(len(compare_to_baseline({'lookup': {'median_ms': 13.0, 'mean_queries': 5}}, baseline)), 2)
@@ -14,13 +14,21 @@ urlpatterns = [
     path('api/service-items/<str:service_id>/', views.get_service_items, name='get_service_items'),
     path('api/leads/', views.get_leads, name='get_leads'),
     path('api/check-availability/', views.check_availability, name='check_availability'),
+    path('api/recurring/', views.create_recurring_bookings, name='create_recurring_bookings'),
     
     # Widget API endpoints (public, no auth required)
     path('widget/<str:business_id>/config/', widget_views.get_widget_config, name='widget_config'),
     path('widget/<str:business_id>/service-items/<str:service_id>/', widget_views.get_widget_service_items, name='widget_service_items'),
     path('widget/<str:business_id>/check-availability/', widget_views.check_widget_availability, name='widget_check_availability'),
+    path('widget/<str:business_id>/availability-range/', widget_views.get_widget_availability_range, name='widget_availability_range'),
+    path('widget/<str:business_id>/holds/', widget_views.create_widget_hold, name='widget_create_hold'),
+    path('widget/<str:business_id>/holds/<str:hold_id>/release/', widget_views.release_widget_hold, name='widget_release_hold'),
     path('widget/<str:business_id>/create/', widget_views.create_widget_booking, name='widget_create_booking'),
     
+    # Calendar feeds (public, access via signed token)
+    path('calendar/staff/<str:staff_id>/<str:token>.ics', views.staff_calendar_feed, name='staff_calendar_feed'),
+    path('calendar/business/<str:business_id>/<str:token>.ics', views.business_calendar_feed, name='business_calendar_feed'),
+    
     # Widget pages
     path('widget-showcase/', widget_showcase, name='widget_showcase'),
     
@@ -3,9 +3,11 @@ from django.contrib import messages
 from django.urls import reverse
 from django.contrib.auth.decorators import login_required
 from django.views.decorators.http import require_http_methods
-from django.http import JsonResponse
+from django.http import JsonResponse, StreamingHttpResponse, Http404
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date
 from django.db import models
-from business.models import ServiceOffering, BusinessCustomField, ServiceItem, ServiceOfferingItem, Industry, IndustryField
+from business.models import Business, ServiceOffering, BusinessCustomField, ServiceItem, ServiceOfferingItem, Industry, IndustryField
 from .models import Booking, BookingField, BookingServiceItem, BookingStatus, StaffMember, BookingStaffAssignment
 from leads.models import Lead
 from django.utils import timezone
@@ -13,7 +15,14 @@ import json
 import datetime
 from decimal import Decimal
 from .availability import check_timeslot_availability
+from .reservations import (
+    reserve_booking, reserve_bookings, recurring_dates, SlotUnavailable, BulkSlotUnavailable
+)
 from business.utils import get_user_business
+from .calendar_feeds import check_feed_token, feed_assignments, feed_token, feed_version, iter_calendar
+
+# Most days get_available_timeslots lists when asked for the next N days
+MAX_RESCHEDULE_DAYS = 14
 
 # Create your views here.
 @login_required
@@ -63,7 +72,10 @@ def index(request):
         'current_status': status_filter,
         'date_from': date_from,
         'date_to': date_to,
-        'search_query': search_query
+        'search_query': search_query,
+        'calendar_feed_url': request.build_absolute_uri(reverse(
+            'bookings:business_calendar_feed', args=[business.id, feed_token('business', business.id)]
+        ))
     })
 
 @login_required
@@ -148,40 +160,43 @@ def create_booking(request):
             except Lead.DoesNotExist:
                 pass
         
-        # Create Booking
-        booking = Booking.objects.create(
-            business=business,
-            lead=lead,  # This can be None if no lead was selected
-            service_offering=service_offering,
-            booking_date=booking_date,
-            start_time=start_time,
-            end_time=end_time,
-            location_type=location_type,
-            location_details=location_details,
-            notes=notes,
-            status='pending',
-            name=client_name,
-            email=client_email,
-            phone_number=client_phone
-        )
-
-        # Create staff assignment
         try:
             staff_member = StaffMember.objects.get(id=staff_member_id, business=business)
-            BookingStaffAssignment.objects.create(
-                booking=booking,
-                staff_member=staff_member,
-                is_primary=True
-            )
         except StaffMember.DoesNotExist:
-            # If staff member doesn't exist, delete the booking and show error
-            booking.delete()
             messages.error(request, 'Selected staff member not found.')
             return render(request, 'bookings/create_booking.html', {
                 'service_offerings': service_offerings,
                 'custom_fields': custom_fields,
             })
 
+        # Create Booking and staff assignment together once the slot is re-checked under lock
+        try:
+            booking, staff_member = reserve_booking(
+                business,
+                booking_date,
+                start_time,
+                end_time,
+                staff_member=staff_member,
+                service_offering=service_offering,
+                lead=lead,  # This can be None if no lead was selected
+                location_type=location_type,
+                location_details=location_details,
+                notes=notes,
+                status='pending',
+                name=client_name,
+                email=client_email,
+                phone_number=client_phone
+            )
+        except SlotUnavailable as e:
+            messages.error(request, f'Selected time is no longer available: {e.reason}')
+            if e.alternate_slots:
+                alternates = ', '.join(f"{slot['date']} {slot['time']}" for slot in e.alternate_slots)
+                messages.info(request, f'Available alternatives: {alternates}')
+            return render(request, 'bookings/create_booking.html', {
+                'service_offerings': service_offerings,
+                'custom_fields': custom_fields,
+            })
+
         # Save custom fields
         for field in custom_fields:
             val = request.POST.get(f'custom_{field.slug}', '')
@@ -960,7 +975,7 @@ def check_availability(request):
     
     # Check availability
     is_available, reason, available_staff = check_timeslot_availability(
-        business.id,
+        business,
         start_time,
         duration_minutes,
         service
@@ -1065,113 +1080,50 @@ def get_available_timeslots(request, booking_id):
         return JsonResponse({'success': False, 'message': 'Business not found'}, status=404)
     
     try:
-        booking = Booking.objects.get(id=booking_id, business=business)
+        booking = Booking.objects.select_related('business').get(id=booking_id, business=business)
         
         # Get date from request
         date_str = request.GET.get('date')
         if not date_str:
             return JsonResponse({'success': False, 'message': 'Date is required'}, status=400)
         
-        from datetime import datetime, timedelta
-        date_obj = datetime.strptime(date_str, '%Y-%m-%d').date()
+        from datetime import datetime
+        try:
+            date_obj = datetime.strptime(date_str, '%Y-%m-%d').date()
+            # Optionally list the following days with openings as well
+            days = min(max(int(request.GET.get('days', 1)), 1), MAX_RESCHEDULE_DAYS)
+        except ValueError:
+            return JsonResponse({'success': False, 'message': 'Invalid date or days'}, status=400)
         
         # Get booking duration
         duration_minutes = booking.get_service_duration()
         
         # Get assigned staff member
-        staff_assignment = booking.staff_assignments.first()
+        staff_assignment = booking.staff_assignments.select_related('staff_member').first()
         if not staff_assignment:
             return JsonResponse({'success': False, 'message': 'No staff assigned to booking'}, status=400)
         
-        staff_member = staff_assignment.staff_member
-        
-        # Get staff availability for the selected date
-        from .models import StaffAvailability, AVAILABILITY_TYPE, WEEKDAY_CHOICES
-        
-        weekday = date_obj.weekday()
-        
-        # Check for specific date availability/unavailability first
-        specific_availabilities = StaffAvailability.objects.filter(
-            staff_member=staff_member,
-            availability_type=AVAILABILITY_TYPE.SPECIFIC,
-            specific_date=date_obj
+        from .availability import get_reschedule_timeslots
+        timeslots_by_date = get_reschedule_timeslots(
+            booking, staff_assignment.staff_member, date_obj, duration_minutes, days=days
         )
         
-        if specific_availabilities.exists():
-            # Check if it's an off day
-            if specific_availabilities.filter(off_day=True).exists():
-                return JsonResponse({
-                    'success': True,
-                    'timeslots': [],
-                    'message': 'Staff member is not available on this date'
-                })
-            # Use specific availability
-            availabilities = specific_availabilities.filter(off_day=False)
-        else:
-            # Use weekly availability
-            availabilities = StaffAvailability.objects.filter(
-                staff_member=staff_member,
-                availability_type=AVAILABILITY_TYPE.WEEKLY,
-                weekday=weekday,
-                off_day=False
-            )
-        
-        if not availabilities.exists():
-            return JsonResponse({
-                'success': True,
-                'timeslots': [],
-                'message': 'No availability set for this day'
-            })
-        
-        # Generate timeslots
-        timeslots = []
-        for availability in availabilities:
-            start_time = availability.start_time
-            end_time = availability.end_time
-            
-            # Generate 30-minute intervals
-            current_time = datetime.combine(date_obj, start_time)
-            end_datetime = datetime.combine(date_obj, end_time)
-            
-            while current_time + timedelta(minutes=duration_minutes) <= end_datetime:
-                slot_start = current_time.time()
-                slot_end = (current_time + timedelta(minutes=duration_minutes)).time()
-                
-                # Check if this slot conflicts with existing bookings
-                conflicting_bookings = Booking.objects.filter(
-                    business=business,
-                    booking_date=date_obj,
-                    start_time__lt=slot_end,
-                    end_time__gt=slot_start,
-                    status__in=[BookingStatus.PENDING, BookingStatus.CONFIRMED, BookingStatus.RESCHEDULED]
-                ).exclude(id=booking_id)
-                
-                # Check if staff has conflicting bookings
-                from .models import BookingStaffAssignment
-                staff_conflicts = BookingStaffAssignment.objects.filter(
-                    staff_member=staff_member,
-                    booking__booking_date=date_obj,
-                    booking__start_time__lt=slot_end,
-                    booking__end_time__gt=slot_start,
-                    booking__status__in=[BookingStatus.PENDING, BookingStatus.CONFIRMED, BookingStatus.RESCHEDULED]
-                ).exclude(booking_id=booking_id)
-                
-                is_available = not conflicting_bookings.exists() and not staff_conflicts.exists()
-                
-                timeslots.append({
-                    'start_time': slot_start.strftime('%H:%M'),
-                    'end_time': slot_end.strftime('%H:%M'),
-                    'display_time': slot_start.strftime('%I:%M %p'),
-                    'available': is_available
-                })
-                
-                current_time += timedelta(minutes=30)
-        
-        return JsonResponse({
+        response = {
             'success': True,
-            'timeslots': timeslots,
+            'timeslots': timeslots_by_date[date_obj] or [],
             'duration': duration_minutes
-        })
+        }
+        if timeslots_by_date[date_obj] is None:
+            response['message'] = 'Staff member is not available on this date'
+        
+        if days > 1:
+            response['days'] = [
+                {'date': day.strftime('%Y-%m-%d'), 'timeslots': timeslots}
+                for day, timeslots in timeslots_by_date.items()
+                if timeslots and any(slot['available'] for slot in timeslots)
+            ]
+        
+        return JsonResponse(response)
         
     except Booking.DoesNotExist:
         return JsonResponse({'success': False, 'message': 'Booking not found'}, status=404)
@@ -1323,3 +1275,178 @@ def trigger_booking_event(request, booking_id):
         return JsonResponse({'success': False, 'message': 'Event type not found or disabled'}, status=404)
     except Exception as e:
         return JsonResponse({'success': False, 'message': str(e)}, status=500)
+
+
+@login_required
+@require_http_methods(["POST"])
+def create_recurring_bookings(request):
+    """
+    Create a series of bookings for one client in a single request.
+    
+    JSON body:
+    - service_type: ID of the service offering (required)
+    - start_date: Date of the first occurrence, 'YYYY-MM-DD' (required)
+    - start_time / end_time: 'HH:MM' (required)
+    - frequency: 'daily', 'weekly', 'biweekly' or 'monthly' with occurrences and/or until,
+      or dates: an explicit list of 'YYYY-MM-DD' dates instead
+    - client_name, client_email, client_phone (required)
+    - staff_member_id, lead_id, location_type, location_details, notes (optional)
+    - service_items: {item_id: {quantity, value}} added to every booking (optional)
+    
+    Either every occurrence is booked or none is; conflicts are returned with status 409.
+    """
+    business = get_user_business(request.user)
+    if not business:
+        return JsonResponse({'success': False, 'message': 'Business not found'}, status=404)
+    
+    try:
+        data = json.loads(request.body)
+    except json.JSONDecodeError:
+        return JsonResponse({'success': False, 'message': 'Invalid JSON'}, status=400)
+    
+    required = ['service_type', 'start_date', 'start_time', 'end_time', 'client_name', 'client_email', 'client_phone']
+    missing = [field for field in required if not data.get(field)]
+    if missing:
+        return JsonResponse({'success': False, 'message': f"Missing fields: {', '.join(missing)}"}, status=400)
+    
+    try:
+        start_date = datetime.datetime.strptime(data['start_date'], '%Y-%m-%d').date()
+        start_time = datetime.datetime.strptime(data['start_time'], '%H:%M').time()
+        end_time = datetime.datetime.strptime(data['end_time'], '%H:%M').time()
+        if data.get('dates'):
+            dates = sorted({datetime.datetime.strptime(value, '%Y-%m-%d').date() for value in data['dates']} | {start_date})
+        else:
+            until = datetime.datetime.strptime(data['until'], '%Y-%m-%d').date() if data.get('until') else None
+            count = int(data['occurrences']) if data.get('occurrences') else None
+            dates = recurring_dates(start_date, data.get('frequency', 'weekly'), count=count, until=until)
+    except (ValueError, TypeError) as e:
+        return JsonResponse({'success': False, 'message': f'Invalid recurrence: {str(e)}'}, status=400)
+    
+    try:
+        service_offering = ServiceOffering.objects.get(id=data['service_type'], business=business)
+        staff_member = None
+        if data.get('staff_member_id'):
+            staff_member = StaffMember.objects.get(id=data['staff_member_id'], business=business)
+    except (ServiceOffering.DoesNotExist, StaffMember.DoesNotExist):
+        return JsonResponse({'success': False, 'message': 'Service or staff member not found'}, status=404)
+    
+    lead = Lead.objects.filter(id=data['lead_id'], business=business).first() if data.get('lead_id') else None
+    
+    selected_items = data.get('service_items') or {}
+    if not isinstance(selected_items, dict):
+        return JsonResponse({'success': False, 'message': 'service_items must be an object of item IDs'}, status=400)
+    service_items = []
+    for item in ServiceItem.objects.filter(id__in=list(selected_items.keys()), business=business):
+        # JSON object keys are strings, item IDs are integers
+        item_data = selected_items.get(str(item.id)) or {}
+        try:
+            quantity = int(item_data.get('quantity', 1))
+        except (ValueError, TypeError):
+            quantity = 1
+        service_items.append((item, quantity, item_data.get('value', '')))
+    
+    try:
+        created = reserve_bookings(
+            business,
+            [(booking_date, start_time, end_time) for booking_date in dates],
+            staff_member=staff_member,
+            service_offering=service_offering,
+            service_items=service_items,
+            lead=lead,
+            location_type=data.get('location_type') or 'business',
+            location_details=data.get('location_details'),
+            notes=data.get('notes'),
+            status=BookingStatus.PENDING,
+            name=data['client_name'],
+            email=data['client_email'],
+            phone_number=data['client_phone']
+        )
+    except BulkSlotUnavailable as e:
+        return JsonResponse({
+            'success': False,
+            'message': e.reason,
+            'conflicts': [
+                {
+                    'date': conflict['date'].strftime('%Y-%m-%d'),
+                    'start_time': conflict['start_time'].strftime('%H:%M'),
+                    'reason': conflict['reason'],
+                    'alternate_slots': conflict['alternate_slots'],
+                }
+                for conflict in e.conflicts
+            ]
+        }, status=409)
+    except SlotUnavailable as e:
+        return JsonResponse({'success': False, 'message': e.reason}, status=400)
+    
+    return JsonResponse({
+        'success': True,
+        'message': f'{len(created)} bookings created',
+        'bookings': [
+            {
+                'id': booking.id,
+                'date': booking.booking_date.strftime('%Y-%m-%d'),
+                'start_time': booking.start_time.strftime('%H:%M'),
+                'end_time': booking.end_time.strftime('%H:%M'),
+                'staff_member': {'id': staff.id, 'name': staff.get_full_name()},
+            }
+            for booking, staff in created
+        ]
+    }, status=201)
+
+
+def _calendar_feed_response(request, get_name, assignments, include_staff=False):
+    """
+    Stream an ICS feed, or answer 304 when the client's ETag/Last-Modified is still current.
+    get_name is only called when the feed is streamed, so a 304 costs a single query.
+    """
+    etag, last_modified = feed_version(assignments)
+    last_modified = int(last_modified.timestamp()) if last_modified else None
+    
+    response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+    if response is None:
+        response = StreamingHttpResponse(
+            iter_calendar(get_name(), assignments, include_staff=include_staff),
+            content_type='text/calendar; charset=utf-8'
+        )
+        response['Content-Disposition'] = 'inline; filename="bookings.ics"'
+    
+    if etag:
+        response['ETag'] = etag
+    if last_modified:
+        response['Last-Modified'] = http_date(last_modified)
+    # Clients must revalidate, which is cheap thanks to the conditional GET
+    response['Cache-Control'] = 'private, no-cache'
+    return response
+
+
+@require_http_methods(["GET", "HEAD"])
+def staff_calendar_feed(request, staff_id, token):
+    """
+    Subscribable ICS feed of a staff member's bookings.
+    Access is granted by the signed token in the URL, see calendar_feeds.feed_token.
+    """
+    if not check_feed_token('staff', staff_id, token):
+        raise Http404
+    
+    def get_name():
+        staff_member = get_object_or_404(StaffMember.objects.select_related('business'), id=staff_id)
+        return f'{staff_member.get_full_name()} - {staff_member.business.name}'
+    
+    return _calendar_feed_response(request, get_name, feed_assignments(staff_member_id=staff_id))
+
+
+@require_http_methods(["GET", "HEAD"])
+def business_calendar_feed(request, business_id, token):
+    """
+    Subscribable ICS feed of every booking of a business, with the assigned staff in each event.
+    Access is granted by the signed token in the URL, see calendar_feeds.feed_token.
+    """
+    if not check_feed_token('business', business_id, token):
+        raise Http404
+    
+    def get_name():
+        return get_object_or_404(Business, id=business_id).name
+    
+    return _calendar_feed_response(
+        request, get_name, feed_assignments(business_id=business_id), include_staff=True
+    )
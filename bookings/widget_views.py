@@ -2,17 +2,23 @@
 Widget API views for public booking widget
 These endpoints don't require authentication and use business_slug for identification
 """
+from django.db import transaction
 from django.http import JsonResponse
 from django.views.decorators.http import require_http_methods
 from django.views.decorators.csrf import csrf_exempt
 from django.utils import timezone
 from business.models import Business, ServiceOffering, BusinessCustomField, ServiceItem, ServiceOfferingItem
-from .models import Booking, BookingField, BookingServiceItem, StaffMember, BookingStaffAssignment
+from .models import Booking, BookingField, BookingServiceItem, StaffMember, BookingStaffAssignment, SlotHold
 from leads.models import Lead
-from .availability import check_timeslot_availability
+from .availability import check_timeslot_availability, find_available_slots_in_range
+from .reservations import reserve_booking, place_hold, hold_token, valid_hold_token, SlotUnavailable
 import json
 from decimal import Decimal
-from datetime import datetime
+from datetime import datetime, timedelta
+
+
+# Longest date range the widget calendar may request in one call
+MAX_AVAILABILITY_RANGE_DAYS = 62
 
 
 def get_widget_config(request, business_id):
@@ -167,7 +173,7 @@ def check_widget_availability(request, business_id):
         
         # Check availability
         is_available, reason, available_staff = check_timeslot_availability(
-            business.id,
+            business,
             start_time,
             duration_minutes,
             service
@@ -207,6 +213,178 @@ def check_widget_availability(request, business_id):
         }, status=400)
 
 
+def get_widget_availability_range(request, business_id):
+    """
+    Get open slots for every day in a date range so the widget can paint a calendar
+    Query params: start_date, end_date (YYYY-MM-DD), service_offering_id, duration_minutes
+    """
+    try:
+        business = Business.objects.get(id=business_id, is_active=True)
+        
+        start_date_str = request.GET.get('start_date')
+        end_date_str = request.GET.get('end_date')
+        service_offering_id = request.GET.get('service_offering_id')
+        duration_minutes = request.GET.get('duration_minutes')
+        
+        today = timezone.localdate(timezone=business.tzinfo)
+        start_date = datetime.strptime(start_date_str, '%Y-%m-%d').date() if start_date_str else today
+        end_date = datetime.strptime(end_date_str, '%Y-%m-%d').date() if end_date_str else start_date + timedelta(days=29)
+        
+        # Past days can never be booked
+        start_date = max(start_date, today)
+        
+        if end_date < start_date:
+            return JsonResponse({
+                'success': False,
+                'error': 'End date must be on or after start date'
+            }, status=400)
+        
+        if (end_date - start_date).days + 1 > MAX_AVAILABILITY_RANGE_DAYS:
+            return JsonResponse({
+                'success': False,
+                'error': f'Date range cannot exceed {MAX_AVAILABILITY_RANGE_DAYS} days'
+            }, status=400)
+        
+        # Get service if provided
+        service = None
+        if service_offering_id:
+            try:
+                service = ServiceOffering.objects.get(
+                    id=service_offering_id,
+                    business=business
+                )
+            except ServiceOffering.DoesNotExist:
+                return JsonResponse({
+                    'success': False,
+                    'error': 'Service not found'
+                }, status=404)
+        
+        if duration_minutes:
+            duration_minutes = int(duration_minutes)
+        else:
+            duration_minutes = service.duration if service else 60
+        
+        availability = find_available_slots_in_range(
+            business.id,
+            start_date,
+            end_date,
+            duration_minutes,
+            service_offering_id=service.id if service else None
+        )
+        
+        return JsonResponse({
+            'success': True,
+            'start_date': start_date.strftime('%Y-%m-%d'),
+            'end_date': end_date.strftime('%Y-%m-%d'),
+            'duration_minutes': duration_minutes,
+            **availability
+        })
+        
+    except Business.DoesNotExist:
+        return JsonResponse({
+            'success': False,
+            'error': 'Business not found'
+        }, status=404)
+    except ValueError as e:
+        return JsonResponse({
+            'success': False,
+            'error': f'Invalid parameters: {str(e)}'
+        }, status=400)
+
+
+@csrf_exempt
+@require_http_methods(["POST"])
+def create_widget_hold(request, business_id):
+    """
+    Hold a slot while the client fills in their details
+    Body: service_type, booking_date, start_time, end_time, optional staff_member_id
+    """
+    try:
+        business = Business.objects.get(id=business_id, is_active=True)
+        data = json.loads(request.body)
+        
+        service_type_id = data.get('service_type')
+        booking_date = data.get('booking_date')
+        start_time = data.get('start_time')
+        end_time = data.get('end_time')
+        staff_member_id = data.get('staff_member_id')
+        
+        if not service_type_id or not booking_date or not start_time or not end_time:
+            return JsonResponse({
+                'success': False,
+                'error': 'Service, date, start time and end time are required'
+            }, status=400)
+        
+        try:
+            service_offering = ServiceOffering.objects.get(id=service_type_id, business=business)
+            staff_member = StaffMember.objects.get(id=staff_member_id, business=business) if staff_member_id else None
+        except (ServiceOffering.DoesNotExist, StaffMember.DoesNotExist):
+            return JsonResponse({
+                'success': False,
+                'error': 'Invalid service or staff member selected.'
+            }, status=400)
+        
+        try:
+            hold = place_hold(
+                business,
+                booking_date,
+                start_time,
+                end_time,
+                staff_member=staff_member,
+                service_offering=service_offering
+            )
+        except SlotUnavailable as e:
+            return JsonResponse({
+                'success': False,
+                'error': e.reason,
+                'alternate_slots': e.alternate_slots
+            }, status=409)
+        
+        return JsonResponse({
+            'success': True,
+            'hold_id': hold.id,
+            'hold_token': hold_token(hold),
+            'expires_at': hold.expires_at.isoformat(),
+            'staff': {
+                'id': str(hold.staff_member.id),
+                'name': hold.staff_member.get_full_name()
+            }
+        })
+        
+    except Business.DoesNotExist:
+        return JsonResponse({
+            'success': False,
+            'error': 'Business not found'
+        }, status=404)
+    except json.JSONDecodeError:
+        return JsonResponse({
+            'success': False,
+            'error': 'Invalid JSON data'
+        }, status=400)
+
+
+@csrf_exempt
+@require_http_methods(["POST", "DELETE"])
+def release_widget_hold(request, business_id, hold_id):
+    """
+    Release a hold when the client backs out of checkout
+    Body or query string: hold_token returned when the hold was placed
+    """
+    try:
+        data = json.loads(request.body) if request.body else {}
+    except json.JSONDecodeError:
+        data = {}
+    token = request.GET.get('hold_token') or data.get('hold_token')
+    if not valid_hold_token(business_id, hold_id, token):
+        return JsonResponse({
+            'success': False,
+            'error': 'Invalid hold token'
+        }, status=403)
+    
+    SlotHold.objects.filter(id=hold_id, business_id=business_id).delete()
+    return JsonResponse({'success': True})
+
+
 @csrf_exempt
 @require_http_methods(["POST"])
 def create_widget_booking(request, business_id):
@@ -229,6 +407,7 @@ def create_widget_booking(request, business_id):
         location_details = data.get('location_details', '')
         notes = data.get('notes', '')
         staff_member_id = data.get('staff_member_id')
+        hold_id = data.get('hold_id')
         
         # Client information
         client_name = data.get('client_name')
@@ -255,7 +434,7 @@ def create_widget_booking(request, business_id):
             errors.append('Client email is required.')
         if not client_phone:
             errors.append('Client phone is required.')
-        if not staff_member_id:
+        if not staff_member_id and not hold_id:
             errors.append('Staff member selection is required.')
         
         if errors:
@@ -276,68 +455,86 @@ def create_widget_booking(request, business_id):
                 'error': 'Invalid service selected.'
             }, status=400)
         
-        # Get staff member
+        # A hold fixes the staff member and time; otherwise use the selected staff member
+        hold = None
+        staff_member = None
+        if hold_id:
+            if not valid_hold_token(business.id, hold_id, data.get('hold_token')):
+                return JsonResponse({
+                    'success': False,
+                    'error': 'Invalid hold token'
+                }, status=403)
+            hold = SlotHold.objects.select_related('staff_member').filter(id=hold_id, business=business).first()
+            if not hold:
+                return JsonResponse({
+                    'success': False,
+                    'error': 'Your hold on this time slot has expired. Please choose a time again.'
+                }, status=409)
+        else:
+            try:
+                staff_member = StaffMember.objects.get(
+                    id=staff_member_id, 
+                    business=business
+                )
+            except StaffMember.DoesNotExist:
+                return JsonResponse({
+                    'success': False,
+                    'error': 'Selected staff member not found.'
+                }, status=400)
+        
+        # The lead is only marked scheduled together with a reserved slot
         try:
-            staff_member = StaffMember.objects.get(
-                id=staff_member_id, 
-                business=business
-            )
-        except StaffMember.DoesNotExist:
+            with transaction.atomic():
+                # Check if lead exists with this email
+                lead = Lead.objects.filter(
+                    business=business, 
+                    email=client_email
+                ).first()
+                
+                if not lead:
+                    # Extract first and last name from full name
+                    name_parts = client_name.strip().split(' ', 1)
+                    first_name = name_parts[0]
+                    last_name = name_parts[1] if len(name_parts) > 1 else ''
+                    
+                    lead = Lead.objects.create(
+                        business=business,
+                        first_name=first_name,
+                        last_name=last_name,
+                        email=client_email,
+                        phone=client_phone,
+                        source='widget',
+                        status='appointment_scheduled'
+                    )
+                
+                # Create booking and staff assignment together once the slot is re-checked under lock
+                booking, staff_member = reserve_booking(
+                    business,
+                    booking_date,
+                    start_time,
+                    end_time,
+                    staff_member=staff_member,
+                    service_offering=service_offering,
+                    hold=hold,
+                    lead=lead,
+                    location_type=location_type,
+                    location_details=location_details,
+                    notes=notes,
+                    status='pending',
+                    name=client_name,
+                    email=client_email,
+                    phone_number=client_phone
+                )
+                
+                if lead.status != 'appointment_scheduled':
+                    lead.status = 'appointment_scheduled'
+                    lead.save()
+        except SlotUnavailable as e:
             return JsonResponse({
                 'success': False,
-                'error': 'Selected staff member not found.'
-            }, status=400)
-        
-        # Check if lead exists with this email
-        lead = Lead.objects.filter(
-            business=business, 
-            email=client_email
-        ).first()
-        
-        # Create or update lead
-        if not lead:
-            # Extract first and last name from full name
-            name_parts = client_name.strip().split(' ', 1)
-            first_name = name_parts[0]
-            last_name = name_parts[1] if len(name_parts) > 1 else ''
-            
-            lead = Lead.objects.create(
-                business=business,
-                first_name=first_name,
-                last_name=last_name,
-                email=client_email,
-                phone=client_phone,
-                source='widget',
-                status='appointment_scheduled'
-            )
-        else:
-            # Update lead status
-            lead.status = 'appointment_scheduled'
-            lead.save()
-        
-        # Create booking
-        booking = Booking.objects.create(
-            business=business,
-            lead=lead,
-            service_offering=service_offering,
-            booking_date=booking_date,
-            start_time=start_time,
-            end_time=end_time,
-            location_type=location_type,
-            location_details=location_details,
-            notes=notes,
-            status='pending',
-            name=client_name,
-            email=client_email,
-            phone_number=client_phone
-        )
-        
-        # Create staff assignment
-        BookingStaffAssignment.objects.create(
-            booking=booking,
-            staff_member=staff_member,
-            is_primary=True
-        )
+                'error': f'Selected time is no longer available: {e.reason}',
+                'alternate_slots': e.alternate_slots
+            }, status=409)
         
         # Save custom fields
         custom_fields = BusinessCustomField.objects.filter(
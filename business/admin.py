@@ -104,6 +104,9 @@ class BusinessConfigurationAdmin(admin.ModelAdmin):
         ('Follow-up Configuration', {
             'fields': ('initial_response_delay',)
         }),
+        ('Booking Configuration', {
+            'fields': ('slot_granularity_minutes', 'staff_assignment_strategy')
+        }),
         ('Timestamps', {
             'fields': ('created_at', 'updated_at'),
             'classes': ('collapse',)
@@ -0,0 +1,18 @@
+# Generated by Django 5.2 on 2026-10-17 06:23
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('business', '0012_businessconfiguration_ai_model_preference'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='businessconfiguration',
+            name='slot_granularity_minutes',
+            field=models.PositiveSmallIntegerField(choices=[(5, 'Every 5 minutes'), (10, 'Every 10 minutes'), (15, 'Every 15 minutes'), (30, 'Every 30 minutes')], default=30, help_text='Minutes between offered appointment start times'),
+        ),
+    ]
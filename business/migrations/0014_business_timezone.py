@@ -0,0 +1,19 @@
+# Generated by Django 5.2 on 2026-10-17 06:39
+
+import business.models
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('business', '0013_businessconfiguration_slot_granularity_minutes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='business',
+            name='timezone',
+            field=models.CharField(default='UTC', help_text='IANA timezone the business works in, e.g. America/Chicago', max_length=64, validators=[business.models.validate_timezone]),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2 on 2026-10-17 06:53
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('business', '0014_business_timezone'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='businessconfiguration',
+            name='staff_assignment_strategy',
+            field=models.CharField(choices=[('least_booked', 'Least booked minutes that day'), ('round_robin', 'Round robin'), ('skill_weighted', 'Least booked, weighted by skill'), ('first_available', 'First available')], default='first_available', help_text="How a staff member is picked when a booking doesn't name one", max_length=20),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2 on 2026-10-17 07:01
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('business', '0015_businessconfiguration_staff_assignment_strategy'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='business',
+            name='catalog_version',
+            field=models.BigIntegerField(default=0, editable=False, help_text='Changes whenever the business, its services or its agent config change'),
+        ),
+    ]
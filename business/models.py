@@ -1,9 +1,12 @@
 from django.db import models
 from django.contrib.auth.models import User
 from django.utils.text import slugify
+import time
 import uuid
 from django.conf import settings
 from decimal import Decimal
+import zoneinfo
+from django.core.exceptions import ValidationError
 from services_ai.utils import generate_id
 
 
@@ -49,6 +52,11 @@ class Industry(models.Model):
         super().save(*args, **kwargs)
 
 
+def validate_timezone(value):
+    if value not in zoneinfo.available_timezones():
+        raise ValidationError(f"'{value}' is not a valid timezone")
+
+
 class Business(models.Model):
     """
     Represents a business entity that belongs to a specific industry.
@@ -65,9 +73,13 @@ class Business(models.Model):
     city = models.CharField(max_length=100, blank=True, null=True)
     state = models.CharField(max_length=100, blank=True, null=True)
     zip_code = models.CharField(max_length=20, blank=True, null=True)
+    timezone = models.CharField(max_length=64, default='UTC', validators=[validate_timezone],
+                                help_text='IANA timezone the business works in, e.g. America/Chicago')
     logo = models.ImageField(upload_to='business_logos/', blank=True, null=True)
     description = models.TextField(blank=True, null=True)
     is_active = models.BooleanField(default=True)
+    catalog_version = models.BigIntegerField(default=0, editable=False,
+                                             help_text='Changes whenever the business, its services or its agent config change')
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
@@ -83,10 +95,58 @@ class Business(models.Model):
     def __str__(self):
         return self.name
     
+    # Business details baked into AI agent prompts and pooled agents
+    PROMPT_FIELDS = ('name', 'description', 'timezone')
+    
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Remember the loaded prompt fields, so save() can tell whether they changed
+        instance._loaded_prompt_fields = {
+            name: value for name, value in zip(field_names, values) if name in cls.PROMPT_FIELDS
+        }
+        return instance
+    
+    def _prompt_fields_changed(self, update_fields=None):
+        loaded = getattr(self, '_loaded_prompt_fields', None)
+        if self._state.adding or loaded is None:
+            return True
+        names = [name for name in self.PROMPT_FIELDS if update_fields is None or name in update_fields]
+        # Fields that weren't loaded can't be compared, count them as changed
+        return any(name not in loaded or loaded[name] != getattr(self, name) for name in names)
+    
     def save(self, *args, **kwargs):
         if not self.id:
             self.id = generate_id('bus_')
+        # Only details that are part of the AI agent prompts give a new catalog version
+        update_fields = kwargs.get('update_fields')
+        if self._prompt_fields_changed(update_fields):
+            self.catalog_version = time.time_ns()
+            if update_fields is not None:
+                kwargs['update_fields'] = {*update_fields, 'catalog_version'}
         super().save(*args, **kwargs)
+        deferred = self.get_deferred_fields()
+        self._loaded_prompt_fields = {
+            name: getattr(self, name) for name in self.PROMPT_FIELDS if name not in deferred
+        }
+    
+    @classmethod
+    def bump_catalog_version(cls, business_id):
+        """
+        Give a business a new catalog version, e.g. after a service changes.
+        Versions are timestamps rather than counters so a stale instance saved
+        later can never bring back an old version.
+        """
+        if business_id:
+            cls.objects.filter(id=business_id).update(catalog_version=time.time_ns())
+    
+    @property
+    def tzinfo(self):
+        """The business timezone, falling back to UTC for unknown names."""
+        try:
+            return zoneinfo.ZoneInfo(self.timezone)
+        except (zoneinfo.ZoneInfoNotFoundError, ValueError):
+            return zoneinfo.ZoneInfo('UTC')
     
 
     def get_lead_webhook_url(self):
@@ -195,6 +255,20 @@ class BusinessConfiguration(models.Model):
         ('openai', 'OpenAI GPT-4o'),
         ('gemini', 'Google Gemini 2.5 Pro'),
     )
+
+    SLOT_GRANULARITY_CHOICES = (
+        (5, 'Every 5 minutes'),
+        (10, 'Every 10 minutes'),
+        (15, 'Every 15 minutes'),
+        (30, 'Every 30 minutes'),
+    )
+    
+    STAFF_ASSIGNMENT_STRATEGY_CHOICES = (
+        ('least_booked', 'Least booked minutes that day'),
+        ('round_robin', 'Round robin'),
+        ('skill_weighted', 'Least booked, weighted by skill'),
+        ('first_available', 'First available'),
+    )
     
     business = models.OneToOneField(Business, on_delete=models.CASCADE, related_name='configuration')
 
@@ -204,6 +278,19 @@ class BusinessConfiguration(models.Model):
 
     invoice_enabled = models.BooleanField(default=True)
 
+    # Booking Configuration
+    slot_granularity_minutes = models.PositiveSmallIntegerField(
+        choices=SLOT_GRANULARITY_CHOICES,
+        default=30,
+        help_text="Minutes between offered appointment start times"
+    )
+    staff_assignment_strategy = models.CharField(
+        max_length=20,
+        choices=STAFF_ASSIGNMENT_STRATEGY_CHOICES,
+        default='first_available',
+        help_text="How a staff member is picked when a booking doesn't name one"
+    )
+
     # Twilio Configuration for SMS
     twilio_phone_number = models.CharField(max_length=20, blank=True, null=True)
     twilio_sid = models.CharField(max_length=255, blank=True, null=True)
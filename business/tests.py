@@ -1,3 +1,38 @@
-from django.test import TestCase
+from django.contrib.auth import get_user_model
+from django.contrib.messages import get_messages
+from django.contrib.messages.storage.fallback import FallbackStorage
+from django.test import RequestFactory, TestCase
 
-# Create your tests here.
+from .models import Business, BusinessConfiguration, Industry
+from .views import update_business_configuration
+
+User = get_user_model()
+
+
+class BusinessConfigurationViewTests(TestCase):
+    def setUp(self):
+        user = User.objects.create_user(username='owner', password='testpassword')
+        self.business = Business.objects.create(
+            name='Test Cleaning', user=user, industry=Industry.objects.create(name='Cleaning'),
+            phone_number='+15550000000', email='owner@example.com'
+        )
+
+    def post(self, data):
+        # Call the view directly: the licence middleware isn't under test here
+        request = RequestFactory().post('/', data)
+        request.user = self.business.user
+        request.session = {}
+        request._messages = FallbackStorage(request)
+        response = update_business_configuration(request)
+        return response, [str(message) for message in get_messages(request)]
+
+    def test_slot_granularity_must_be_an_allowed_value(self):
+        for value in ('abc', '7', '0'):
+            response, messages = self.post({'slot_granularity_minutes': value, 'twilio_sid': 'AC123'})
+            self.assertEqual(response.status_code, 302)
+            self.assertEqual(messages, ['Slot granularity must be one of 5, 10, 15, 30 minutes.'])
+        # Nothing was saved
+        self.assertFalse(BusinessConfiguration.objects.filter(business=self.business, twilio_sid='AC123').exists())
+
+        self.post({'slot_granularity_minutes': '15'})
+        self.assertEqual(BusinessConfiguration.objects.get(business=self.business).slot_granularity_minutes, 15)
@@ -12,6 +12,7 @@ import smtplib
 from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
 import datetime
+import zoneinfo
 
 from .models import Business, Industry, IndustryField, BusinessConfiguration, ServiceOffering, ServiceItem, CRM_CHOICES, SMTPConfig, StripeCredentials, SquareCredentials
 
@@ -146,6 +147,7 @@ def business_profile(request):
     
     context = {
         'business': business,
+        'timezones': sorted(zoneinfo.available_timezones()),
     }
     
     return render(request, 'business/profile.html', context)
@@ -178,6 +180,13 @@ def update_profile(request):
         business.zip_code = request.POST.get('zip_code', business.zip_code)
         business.description = request.POST.get('description', business.description)
         
+        # Only accept timezones the zoneinfo database knows about
+        timezone_name = request.POST.get('timezone', business.timezone)
+        if timezone_name in zoneinfo.available_timezones():
+            business.timezone = timezone_name
+        else:
+            messages.warning(request, f'Unknown timezone "{timezone_name}", keeping {business.timezone}.')
+        
         # Handle logo upload if provided
         if 'logo' in request.FILES:
             business.logo = request.FILES['logo']
@@ -888,6 +897,21 @@ def update_business_configuration(request):
         config.voice_enabled = 'voice_enabled' in request.POST
         config.initial_response_delay = int(request.POST.get('initial_response_delay', 5))
         
+        # Update booking settings, slot starts must divide the hour
+        allowed_granularities = dict(BusinessConfiguration.SLOT_GRANULARITY_CHOICES)
+        try:
+            slot_granularity = int(request.POST.get('slot_granularity_minutes', config.slot_granularity_minutes))
+        except (TypeError, ValueError):
+            slot_granularity = None
+        if slot_granularity not in allowed_granularities or 60 % slot_granularity:
+            allowed = ', '.join(str(minutes) for minutes in allowed_granularities)
+            messages.error(request, f'Slot granularity must be one of {allowed} minutes.')
+            return redirect('business:configuration')
+        config.slot_granularity_minutes = slot_granularity
+        assignment_strategy = request.POST.get('staff_assignment_strategy', config.staff_assignment_strategy)
+        if assignment_strategy in dict(BusinessConfiguration.STAFF_ASSIGNMENT_STRATEGY_CHOICES):
+            config.staff_assignment_strategy = assignment_strategy
+        
         # Update Twilio settings
         config.twilio_phone_number = request.POST.get('twilio_phone_number', '')
         config.twilio_sid = request.POST.get('twilio_sid', '')
@@ -1,3 +1,10 @@
 from django.contrib import admin
 
-# Register your models here.
+from .models import TraceOverride
+
+
+@admin.register(TraceOverride)
+class TraceOverrideAdmin(admin.ModelAdmin):
+    list_display = ('business', 'subsystem', 'level', 'expires_at', 'created_at')
+    list_filter = ('level', 'subsystem')
+    search_fields = ('business__name',)
@@ -0,0 +1,48 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from business.models import Business
+from core.models import TraceOverride
+
+
+class Command(BaseCommand):
+    help = 'Switches tracing detail on or off for one business without a redeploy'
+
+    def add_arguments(self, parser):
+        parser.add_argument('business', nargs='?', help='Business ID')
+        parser.add_argument('--subsystem', default='', help='availability, plugins, agent, agent.tools (default: all)')
+        parser.add_argument('--level', default='debug', choices=[choice for choice, _ in TraceOverride.LEVEL_CHOICES])
+        parser.add_argument('--minutes', type=int, default=60, help='Expire the override after this many minutes (0 = never)')
+        parser.add_argument('--off', action='store_true', help='Remove the override instead')
+        parser.add_argument('--list', action='store_true', help='List active overrides')
+
+    def handle(self, *args, **options):
+        if options['list']:
+            for override in TraceOverride.objects.select_related('business'):
+                expires = override.expires_at.isoformat() if override.expires_at else 'never'
+                self.stdout.write(f"{override.business_id}  {override.subsystem or 'all':<14} {override.level:<8} expires {expires}")
+            return
+
+        if not options['business']:
+            raise CommandError('Business ID is required')
+        try:
+            business = Business.objects.get(id=options['business'])
+        except Business.DoesNotExist:
+            raise CommandError(f"Business {options['business']} not found")
+
+        if options['off']:
+            TraceOverride.objects.filter(business=business, subsystem=options['subsystem']).delete()
+            self.stdout.write(self.style.SUCCESS(f"Tracing override removed for {business.name}"))
+            return
+
+        expires_at = timezone.now() + timedelta(minutes=options['minutes']) if options['minutes'] else None
+        TraceOverride.objects.update_or_create(
+            business=business,
+            subsystem=options['subsystem'],
+            defaults={'level': options['level'], 'expires_at': expires_at}
+        )
+        self.stdout.write(self.style.SUCCESS(
+            f"Tracing {options['subsystem'] or 'all subsystems'} at {options['level']} for {business.name}"
+        ))
@@ -0,0 +1,33 @@
+from core.tracing import refresh_overrides, has_overrides, trace_context, set_business
+
+
+class TracingMiddleware:
+    """
+    Sets the tracing business for each request so per-business TraceOverrides apply.
+    Does nothing beyond a timestamp check while no override is active.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        refresh_overrides()
+        if not has_overrides():
+            return self.get_response(request)
+
+        request._trace_context = True
+        with trace_context(self._business_id(request)):
+            return self.get_response(request)
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        # Public widget endpoints carry the business in the URL
+        if getattr(request, '_trace_context', False) and view_kwargs.get('business_id'):
+            set_business(view_kwargs['business_id'])
+        return None
+
+    def _business_id(self, request):
+        user = getattr(request, 'user', None)
+        if user is None or not user.is_authenticated:
+            return None
+        business = getattr(user, 'business', None)
+        return business.id if business else None
@@ -0,0 +1,30 @@
+# Generated by Django 5.2 on 2026-10-17 06:30
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        ('business', '0013_businessconfiguration_slot_granularity_minutes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TraceOverride',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('subsystem', models.CharField(blank=True, default='', help_text='e.g. availability, plugins, agent, agent.tools. Leave blank for all.', max_length=50)),
+                ('level', models.CharField(choices=[('debug', 'Debug'), ('info', 'Info (spans)'), ('warning', 'Warning'), ('error', 'Error')], default='debug', max_length=10)),
+                ('expires_at', models.DateTimeField(blank=True, help_text='Leave blank to keep the override until deleted', null=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('business', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='trace_overrides', to='business.business')),
+            ],
+            options={
+                'unique_together': {('business', 'subsystem')},
+            },
+        ),
+    ]
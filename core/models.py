@@ -1,3 +1,29 @@
 from django.db import models
 
-# Create your models here.
+from business.models import Business
+
+
+class TraceOverride(models.Model):
+    """
+    Raises tracing detail for one business without a redeploy.
+    Running processes pick changes up within TRACING['OVERRIDE_REFRESH_SECONDS'].
+    """
+    LEVEL_CHOICES = (
+        ('debug', 'Debug'),
+        ('info', 'Info (spans)'),
+        ('warning', 'Warning'),
+        ('error', 'Error'),
+    )
+
+    business = models.ForeignKey(Business, on_delete=models.CASCADE, related_name='trace_overrides')
+    subsystem = models.CharField(max_length=50, blank=True, default='',
+                                 help_text='e.g. availability, plugins, agent, agent.tools. Leave blank for all.')
+    level = models.CharField(max_length=10, choices=LEVEL_CHOICES, default='debug')
+    expires_at = models.DateTimeField(blank=True, null=True, help_text='Leave blank to keep the override until deleted')
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        unique_together = ['business', 'subsystem']
+
+    def __str__(self):
+        return f"{self.business.name} - {self.subsystem or 'all'}: {self.level}"
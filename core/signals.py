@@ -0,0 +1,12 @@
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+
+from .models import TraceOverride
+from .tracing import invalidate_overrides
+
+
+@receiver(post_save, sender=TraceOverride)
+@receiver(post_delete, sender=TraceOverride)
+def trace_override_changed(sender, instance, **kwargs):
+    """Pick the change up at the next entry point in this process."""
+    invalidate_overrides()
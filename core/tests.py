@@ -1,3 +1,54 @@
+from django.contrib.auth import get_user_model
 from django.test import TestCase
 
-# Create your tests here.
+from business.models import Business, Industry
+from .models import TraceOverride
+from .tracing import get_tracer, configure, reset, trace_context, Lazy
+
+
+class TracingTests(TestCase):
+    def setUp(self):
+        reset()
+        configure(levels={}, default='warning')
+        self.addCleanup(reset)
+        self.trace = get_tracer('availability')
+
+    def test_disabled_levels_skip_formatting(self):
+        calls = []
+        self.trace.debug("Qualified staff: {}", Lazy(lambda: calls.append(1)))
+
+        self.assertEqual(calls, [])
+        with self.assertLogs('trace.availability', 'ERROR'):
+            self.trace.error("Failed: {}", 'boom')
+
+    def test_span_counts_queries(self):
+        configure(levels='availability=info')
+
+        with self.assertLogs('trace.availability', 'INFO') as logs:
+            with self.trace.span('lookup', date='2030-01-07') as span:
+                list(Business.objects.all())
+                list(Business.objects.all())
+                span.set(slots=2)
+
+        self.assertIn('span lookup', logs.output[0])
+        self.assertIn('queries=2 date=2030-01-07 slots=2', logs.output[0])
+
+    def test_child_tracer_inherits_parent_level(self):
+        configure(levels='agent=debug')
+
+        self.assertTrue(get_tracer('agent.tools').enabled())
+        self.assertFalse(get_tracer('plugins').enabled())
+
+    def test_business_override(self):
+        user = get_user_model().objects.create_user(username='owner', password='pass')
+        industry = Industry.objects.create(name='Cleaning', slug='cleaning')
+        business = Business.objects.create(
+            name='Traced', user=user, industry=industry, phone_number='+15550000000', email='t@example.com'
+        )
+        TraceOverride.objects.create(business=business, subsystem='availability', level='debug')
+
+        with trace_context(business.id):
+            self.assertTrue(self.trace.enabled())
+            self.assertFalse(get_tracer('plugins').enabled())
+        with trace_context('bus_other'):
+            self.assertFalse(self.trace.enabled())
@@ -0,0 +1,395 @@
+"""
+Structured tracing for hot paths.
+
+Replaces unconditional print() debugging in availability, plugins and the AI
+agent. Each subsystem gets a Tracer with its own level:
+
+    trace = get_tracer('availability')
+    trace.debug("Qualified staff: {}", Lazy(lambda: qualified_staff.count()))
+
+    with trace.span('find_slots', date=date) as span:
+        ...
+        span.set(slots=len(slots))
+
+Messages use str.format placeholders and are only formatted when the level is
+enabled, so a disabled trace line costs one level comparison. Wrap values that
+are expensive to compute (queries, tracebacks, large reprs) in Lazy.
+
+Spans are logged at INFO with their wall time and the number of database
+queries run inside them. Root spans are sampled with TRACING['SAMPLE_RATE'];
+nested spans follow the decision of their root.
+
+Levels come from settings.TRACING and can be raised at runtime for a single
+business with a TraceOverride row (admin or `manage.py trace`). Overrides are
+re-read at request/turn entry points at most every OVERRIDE_REFRESH_SECONDS,
+never from inside a traced function, so hot paths never run extra queries.
+"""
+import contextvars
+import logging
+import random
+import threading
+import time as timer
+from contextlib import contextmanager
+from functools import wraps
+
+from django.conf import settings
+from django.db import connection, transaction, DatabaseError
+from django.db.models import Q
+from django.utils import timezone
+
+LEVELS = {
+    'debug': logging.DEBUG,
+    'info': logging.INFO,
+    'warning': logging.WARNING,
+    'error': logging.ERROR,
+    'off': logging.CRITICAL + 10,
+}
+OFF = LEVELS['off']
+
+# Business the current request, agent turn or task is working for
+_business_id = contextvars.ContextVar('trace_business_id', default=None)
+# Sampling decision of the enclosing root span (None outside of spans)
+_sampled = contextvars.ContextVar('trace_sampled', default=None)
+
+
+def parse_level(value):
+    """Return the numeric level for a level name or number."""
+    if isinstance(value, int):
+        return value
+    return LEVELS[str(value).strip().lower()]
+
+
+def parse_levels(value):
+    """
+    Parse per-subsystem levels from a dict or an "availability=info,plugins=debug" string.
+
+    Returns:
+        dict: Subsystem name -> numeric level
+    """
+    if not value:
+        return {}
+    if isinstance(value, dict):
+        return {name: parse_level(level) for name, level in value.items()}
+
+    levels = {}
+    for item in value.split(','):
+        if '=' in item:
+            name, level = item.split('=', 1)
+            levels[name.strip()] = parse_level(level)
+    return levels
+
+
+def _subsystem_chain(subsystem):
+    """'agent.tools' -> ['agent.tools', 'agent']"""
+    parts = subsystem.split('.')
+    return ['.'.join(parts[:i]) for i in range(len(parts), 0, -1)]
+
+
+class _Config:
+    """Process-wide tracing configuration, shared by all tracers."""
+
+    def __init__(self):
+        self.version = 0
+        self.default = OFF
+        self.levels = {}
+        self.sample_rate = 1.0
+        self.refresh_seconds = 30
+        # business_id -> {subsystem ('' for all) -> level}
+        self.overrides = {}
+        self.next_refresh = 0
+        self.lock = threading.Lock()
+        self.load()
+
+    def load(self):
+        options = getattr(settings, 'TRACING', {})
+        self.default = parse_level(options.get('DEFAULT_LEVEL', 'warning'))
+        self.levels = parse_levels(options.get('LEVELS'))
+        self.sample_rate = float(options.get('SAMPLE_RATE', 1.0))
+        self.refresh_seconds = options.get('OVERRIDE_REFRESH_SECONDS', 30)
+        self.version += 1
+
+    def level_for(self, subsystem):
+        for name in _subsystem_chain(subsystem):
+            if name in self.levels:
+                return self.levels[name]
+        return self.default
+
+    def override_for(self, business_id, subsystem):
+        business_overrides = self.overrides.get(business_id)
+        if not business_overrides:
+            return None
+        for name in _subsystem_chain(subsystem) + ['']:
+            if name in business_overrides:
+                return business_overrides[name]
+        return None
+
+
+_config = _Config()
+
+
+def configure(levels=None, default=None, sample_rate=None):
+    """
+    Change tracing levels at runtime (tests, shells, management commands).
+
+    Args:
+        levels (dict or str, optional): Subsystem levels, replaces the current ones
+        default (str, optional): Level for subsystems without their own level
+        sample_rate (float, optional): Share of root spans that are recorded
+    """
+    if levels is not None:
+        _config.levels = parse_levels(levels)
+    if default is not None:
+        _config.default = parse_level(default)
+    if sample_rate is not None:
+        _config.sample_rate = float(sample_rate)
+    _config.version += 1
+
+
+def reset():
+    """Reload the configuration from settings and drop all overrides."""
+    _config.load()
+    _config.overrides = {}
+    _config.next_refresh = 0
+
+
+def refresh_overrides(force=False):
+    """
+    Re-read active TraceOverride rows if the cached copy is stale.
+    Called from entry points (middleware, agent turns), never from hot paths.
+    """
+    if not force and timer.monotonic() < _config.next_refresh:
+        return
+
+    with _config.lock:
+        if not force and timer.monotonic() < _config.next_refresh:
+            return
+        _config.next_refresh = timer.monotonic() + _config.refresh_seconds
+
+        from core.models import TraceOverride
+
+        overrides = {}
+        try:
+            with transaction.atomic():
+                rows = list(TraceOverride.objects.filter(
+                    Q(expires_at__isnull=True) | Q(expires_at__gt=timezone.now())
+                ).values_list('business_id', 'subsystem', 'level'))
+        except DatabaseError:
+            # Table not migrated yet
+            rows = []
+
+        for business_id, subsystem, level in rows:
+            overrides.setdefault(business_id, {})[subsystem] = parse_level(level)
+        _config.overrides = overrides
+
+
+def invalidate_overrides():
+    """Make the next entry point re-read the overrides."""
+    _config.next_refresh = 0
+
+
+def has_overrides():
+    return bool(_config.overrides)
+
+
+def current_business_id():
+    return _business_id.get()
+
+
+def set_business(business_id):
+    """Switch the business inside an enclosing trace_context()."""
+    _business_id.set(business_id)
+
+
+@contextmanager
+def trace_context(business_id=None):
+    """
+    Mark the code inside as working for a business, so per-business overrides apply.
+
+    Args:
+        business_id (str, optional): Business being served
+    """
+    refresh_overrides()
+    token = _business_id.set(business_id)
+    try:
+        yield
+    finally:
+        _business_id.reset(token)
+
+
+class Lazy:
+    """Defer an expensive debug-only value until the trace line is actually formatted."""
+
+    __slots__ = ('func',)
+
+    def __init__(self, func):
+        self.func = func
+
+    def __str__(self):
+        return str(self.func())
+
+    def __format__(self, spec):
+        return format(self.func(), spec)
+
+
+class _NullSpan:
+    """Returned when a span is disabled or sampled out. Does nothing."""
+
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+    def set(self, **fields):
+        pass
+
+
+NULL_SPAN = _NullSpan()
+
+
+class Span:
+    """Times a block and counts the queries it runs, then logs one line for it."""
+
+    __slots__ = ('tracer', 'name', 'fields', 'sampled', 'started', 'queries', '_wrapper', '_token')
+
+    def __init__(self, tracer, name, fields, sampled=True):
+        self.tracer = tracer
+        self.name = name
+        self.fields = fields
+        self.sampled = sampled
+        self.queries = 0
+        self._wrapper = None
+        self._token = None
+
+    def _count_query(self, execute, sql, params, many, context):
+        self.queries += 1
+        return execute(sql, params, many, context)
+
+    def set(self, **fields):
+        """Attach result fields (counts, ids) to the span line."""
+        self.fields.update(fields)
+
+    def __enter__(self):
+        if _sampled.get() is None:
+            self._token = _sampled.set(self.sampled)
+        if self.sampled:
+            self._wrapper = connection.execute_wrapper(self._count_query)
+            self._wrapper.__enter__()
+            self.started = timer.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if self.sampled:
+            duration_ms = (timer.perf_counter() - self.started) * 1000
+            self._wrapper.__exit__(exc_type, exc, tb)
+            if exc_type is not None:
+                self.fields['error'] = exc_type.__name__
+            self.tracer.emit_span(self.name, duration_ms, self.queries, self.fields)
+        if self._token is not None:
+            _sampled.reset(self._token)
+        return False
+
+
+class Tracer:
+    """Level-gated tracing for one subsystem. Get instances with get_tracer()."""
+
+    def __init__(self, subsystem):
+        self.subsystem = subsystem
+        self.logger = logging.getLogger(f'trace.{subsystem}')
+        self._version = -1
+        self._level = OFF
+
+    def level(self):
+        """Effective level for the current business."""
+        if self._version != _config.version:
+            self._level = _config.level_for(self.subsystem)
+            self._version = _config.version
+        if _config.overrides:
+            override = _config.override_for(_business_id.get(), self.subsystem)
+            if override is not None:
+                return min(override, self._level)
+        return self._level
+
+    def enabled(self, level=logging.DEBUG):
+        return level >= self.level()
+
+    def _emit(self, level, message, args, exc_info=False):
+        if args:
+            message = message.format(*args)
+        business_id = _business_id.get()
+        if business_id:
+            message = f"[{business_id}] {message}"
+        self.logger.log(level, message, exc_info=exc_info)
+
+    def debug(self, message, *args):
+        if logging.DEBUG >= self.level():
+            self._emit(logging.DEBUG, message, args)
+
+    def info(self, message, *args):
+        if logging.INFO >= self.level():
+            self._emit(logging.INFO, message, args)
+
+    def warning(self, message, *args):
+        if logging.WARNING >= self.level():
+            self._emit(logging.WARNING, message, args)
+
+    def error(self, message, *args, exc_info=False):
+        if logging.ERROR >= self.level():
+            self._emit(logging.ERROR, message, args, exc_info=exc_info)
+
+    def emit_span(self, name, duration_ms, queries, fields):
+        details = ''.join(f" {key}={value}" for key, value in fields.items())
+        self._emit(logging.INFO, "span {} {:.2f}ms queries={}{}", (name, duration_ms, queries, details))
+
+    def _sample(self):
+        if _config.override_for(_business_id.get(), self.subsystem) is not None:
+            return True
+        rate = _config.sample_rate
+        return rate >= 1 or random.random() < rate
+
+    def span(self, name, **fields):
+        """
+        Time a block. Returns a no-op span when INFO is disabled or the root span was sampled out.
+
+        Args:
+            name (str): Span name
+            **fields: Values to include in the span line
+        """
+        if logging.INFO < self.level():
+            return NULL_SPAN
+        sampled = _sampled.get()
+        if sampled is None:
+            return Span(self, name, fields, sampled=self._sample())
+        if not sampled:
+            return NULL_SPAN
+        return Span(self, name, fields)
+
+    def traced(self, name=None):
+        """Decorator that runs the function inside a span named after it."""
+        def decorator(func):
+            span_name = name or func.__name__
+
+            @wraps(func)
+            def wrapper(*args, **kwargs):
+                if logging.INFO < self.level():
+                    return func(*args, **kwargs)
+                with self.span(span_name):
+                    return func(*args, **kwargs)
+            return wrapper
+        return decorator
+
+
+_tracers = {}
+
+
+def get_tracer(subsystem):
+    """
+    Return the tracer for a subsystem. Dotted names inherit levels from their
+    parent, e.g. 'agent.tools' uses the 'agent' level unless it has its own.
+    """
+    tracer = _tracers.get(subsystem)
+    if tracer is None:
+        tracer = _tracers.setdefault(subsystem, Tracer(subsystem))
+    return tracer
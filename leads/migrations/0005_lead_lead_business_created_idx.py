@@ -0,0 +1,18 @@
+# Generated by Django 5.2 on 2026-10-17 06:21
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('business', '0012_businessconfiguration_ai_model_preference'),
+        ('leads', '0004_alter_lead_status'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='lead',
+            index=models.Index(fields=['business', 'created_at'], name='lead_business_created_idx'),
+        ),
+    ]
@@ -45,6 +45,10 @@ class Lead(models.Model):
     
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            # Dashboard "new leads" lists and weekly counts
+            models.Index(fields=['business', 'created_at'], name='lead_business_created_idx'),
+        ]
     
     def __str__(self):
         return f"{self.first_name} {self.last_name} - {self.business.name}"
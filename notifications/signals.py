@@ -5,6 +5,7 @@ from django.db.models import Q
 
 from leads.models import Lead
 from bookings.models import Booking, StaffMember, StaffAvailability
+from bookings.signals import bookings_bulk_created
 from invoices.models import Invoice
 from .models import Notification
 
@@ -64,6 +65,19 @@ def booking_notification(sender, instance, created, update_fields, **kwargs):
             related_object_type='booking'
         )
 
+@receiver(bookings_bulk_created)
+def bulk_booking_notification(sender, business, bookings, **kwargs):
+    """Create one notification for a batch of bookings created together"""
+    first = bookings[0]
+    create_notification(
+        user=business.user,
+        notification_type='booking_created',
+        title='Recurring Bookings Created',
+        message=f'{len(bookings)} bookings for {first.name} have been created, starting {first.booking_date}.',
+        related_object_id=first.id,
+        related_object_type='booking'
+    )
+
 @receiver(post_save, sender=Invoice)
 def invoice_paid_notification(sender, instance, created, update_fields, **kwargs):
     """Create notification when an invoice is paid"""
@@ -1,6 +1,9 @@
 from django.conf import settings
 from django_q.tasks import async_task
 from plugins.plugin_manager import plugin_manager
+from core.tracing import get_tracer, Lazy
+
+trace = get_tracer('plugins')
 
 def notify_plugins(event_name, **kwargs):
     """
@@ -16,22 +19,13 @@ def notify_plugins(event_name, **kwargs):
     Returns:
         List of results from all plugin hook implementations
     """
-    print(f"\n{'='*60}")
-    print(f"[PLUGIN] notify_plugins called: {event_name}")
-    print(f"   Arguments: {list(kwargs.keys())}")
+    trace.debug("notify_plugins called: {} with arguments: {}", event_name, Lazy(lambda: list(kwargs.keys())))
     try:
         result = plugin_manager.call_hook(event_name, **kwargs)
-        print(f"[SUCCESS] HOOK CALLED: {event_name}")
-        print(f"   Result: {result}")
-        print(f"   Result type: {type(result)}")
-        print(f"   Result length: {len(result) if result else 0}")
-        print(f"{'='*60}\n")
+        trace.debug("Hook called: {}, result: {}", event_name, Lazy(lambda: repr(result)))
         return result
     except Exception as e:
-        print(f"[ERROR] Error notifying plugins about {event_name}: {str(e)}")
-        import traceback
-        traceback.print_exc()
-        print(f"{'='*60}\n")
+        trace.error("Error notifying plugins about {}: {}", event_name, e, exc_info=True)
         return []
 
 def notify_plugins_async(event_name, **kwargs):
@@ -46,7 +40,7 @@ def notify_plugins_async(event_name, **kwargs):
         # Use Django Q for async execution
         async_task('plugins.events.notify_plugins', event_name, **kwargs)
     except Exception as e:
-        print(f"Error scheduling async plugin notification: {str(e)}")
+        trace.error("Error scheduling async plugin notification: {}", e)
         # Fallback to synchronous
         notify_plugins(event_name, **kwargs)
 
@@ -61,7 +55,7 @@ def notify_lead_created(lead, request=None, user=None):
         request: Current HTTP request (optional)
         user: Current user (optional)
     """
-    print(f"[LEAD] notify_lead_created called for lead: {lead.id if hasattr(lead, 'id') else lead}")
+    trace.debug("notify_lead_created called for lead: {}", getattr(lead, 'id', lead))
     context = {
         'request': request,
         'user': user
@@ -77,21 +71,18 @@ def notify_lead_created_async(lead, request=None, user=None):
         request: Current HTTP request (optional)
         user: Current user (optional)
     """
-    print(f"[ASYNC] notify_lead_created_async called for lead: {lead.id if hasattr(lead, 'id') else lead}")
+    trace.debug("notify_lead_created_async called for lead: {}", getattr(lead, 'id', lead))
     try:
         # Serialize lead ID instead of the object for async processing
-        print(f"   Scheduling async task...")
         async_task(
             'plugins.events.notify_lead_created',
             lead,
             request=request,
             user=user
         )
-        print(f"   [OK] Async task scheduled")
     except Exception as e:
-        print(f"   [ERROR] Error scheduling async lead notification: {str(e)}")
+        trace.error("Error scheduling async lead notification, falling back to synchronous: {}", e)
         # Fallback to synchronous
-        print(f"   Falling back to synchronous...")
         notify_lead_created(lead, request=request, user=user)
 
 def notify_booking_created(booking, request=None, user=None):
@@ -127,10 +118,25 @@ def notify_booking_created_async(booking, request=None, user=None):
             user=user
         )
     except Exception as e:
-        print(f"Error scheduling async booking notification: {str(e)}")
+        trace.error("Error scheduling async booking notification: {}", e)
         # Fallback to synchronous
         notify_booking_created(booking, request=request, user=user)
 
+def notify_bookings_created(bookings, request=None, user=None):
+    """
+    Notify plugins about a batch of bookings created together, e.g. a recurring booking
+    
+    Args:
+        bookings: List of Booking instances that were created
+        request: Current HTTP request (optional)
+        user: Current user (optional)
+    """
+    context = {
+        'request': request,
+        'user': user
+    }
+    notify_plugins('bookings_created', bookings=bookings, context=context)
+
 def notify_booking_updated(booking, previous_state, request=None, user=None):
     """
     Notify plugins about an updated booking
@@ -167,7 +173,7 @@ def notify_booking_updated_async(booking, previous_state, request=None, user=Non
             user=user
         )
     except Exception as e:
-        print(f"Error scheduling async booking update notification: {str(e)}")
+        trace.error("Error scheduling async booking update notification: {}", e)
         # Fallback to synchronous
         notify_booking_updated(booking, previous_state, request=request, user=user)
 
@@ -22,6 +22,17 @@ class PluginHooks:
             context: Dictionary containing context information including request and user
         """
     
+    @hookspec
+    def bookings_created(self, bookings, context, api):
+        """Hook called once for a batch of bookings created together, e.g. a recurring booking
+        
+        booking_created is not called for the bookings of a batch.
+        
+        Args:
+            bookings: List of the booking instances that were created
+            context: Dictionary containing context information including request and user
+        """
+    
     @hookspec
     def booking_updated(self, booking, previous_state, context, api):
         """Hook called when a booking is updated
@@ -8,6 +8,9 @@ import hashlib
 from django.conf import settings
 from plugins.hookspecs import PluginHooks
 from plugins.models import Plugin
+from core.tracing import get_tracer, Lazy
+
+trace = get_tracer('plugins')
 
 class SecurityError(Exception):
     """Raised when a plugin violates security policies"""
@@ -181,103 +184,84 @@ class ServicesAIPluginManager:
         # Don't pop it - keep it in kwargs so hooks can receive it
         target_plugin_id = kwargs.get('plugin_id', None)
         
-        print(f"  [MANAGER] call_hook: {hook_name}")
-        print(f"     Loaded plugins: {len(self.loaded_plugins)}")
-        print(f"     Registered instances: {len(self.registered_instances)}")
-        if target_plugin_id:
-            print(f"     Target plugin_id: {target_plugin_id}")
+        trace.debug("call_hook: {} (loaded plugins: {}, registered instances: {}, target plugin: {})",
+                    hook_name, len(self.loaded_plugins), len(self.registered_instances), target_plugin_id)
         
-        try:
-            # Access hook through manager.hook, this is the Pluggy way
-            if not hasattr(self.manager, 'hook'):
-                print(f"  [ERROR] Plugin manager has no 'hook' attribute. Manager type: {type(self.manager)}")
-                # Try to see if hookspecs are properly registered
-                print(f"     Registered hookspecs: {self.manager.get_hookspecs()}")
-                return []
-                
-            # Check if the hook exists
-            if not hasattr(self.manager.hook, hook_name):
-                print(f"  [WARN] Hook '{hook_name}' not found in manager.hook")
-                print(f"     Available hooks: {[h for h in dir(self.manager.hook) if not h.startswith('_')]}")
-                return []
-            
-            print(f"  [OK] Hook '{hook_name}' exists")
-            
-            # Get hook implementations
-            hook = getattr(self.manager.hook, hook_name)
-            
-            # Check how many implementations exist
+        with trace.span('call_hook', hook=hook_name) as span:
             try:
-                impls = hook.get_hookimpls()
-                print(f"     Hook implementations: {len(impls)}")
-                for impl in impls:
-                    print(f"       - {impl}")
-            except Exception as e:
-                print(f"     Could not get implementations: {e}")
-            
-            # Call the hook with error handling and sandboxing
-            print(f"  [CALL] Calling hook with kwargs: {list(kwargs.keys())}")
-            
-            from plugins.error_handler import safe_hook_execution
-            from plugins.sandbox import PluginSandbox
-            from plugins.models import Plugin
-            
-            results = []
-            
-            # Execute each plugin's hook implementation separately with error handling
-            for plugin_id, instance in self.registered_instances.items():
-                try:
-                    # If target_plugin_id is specified, only call that plugin
-                    if target_plugin_id is not None and plugin_id != target_plugin_id:
-                        continue
-                    
-                    plugin = Plugin.objects.get(id=plugin_id)
-                    
-                    # Skip if plugin is disabled
-                    if not plugin.enabled:
-                        continue
-                    
-                    # Check if instance has this hook
-                    if not hasattr(instance, hook_name):
-                        print(f"     Plugin {plugin_id} ({plugin.name}) does not have hook '{hook_name}'")
-                        continue
+                # Access hook through manager.hook, this is the Pluggy way
+                if not hasattr(self.manager, 'hook'):
+                    trace.error("Plugin manager has no 'hook' attribute. Manager type: {}, registered hookspecs: {}",
+                                type(self.manager), Lazy(lambda: self.manager.get_hookspecs()))
+                    return []
                     
-                    print(f"     Calling hook '{hook_name}' on plugin {plugin_id} ({plugin.name})")
-                    hook_method = getattr(instance, hook_name)
-                    
-                    # Create API instance for the plugin if not already provided
-                    if 'api' not in kwargs:
-                        from plugins.plugin_api import get_plugin_api
-                        context = kwargs.get('context', {})
-                        kwargs['api'] = get_plugin_api(plugin_id, context=context)
-                    
-                    # Execute in sandbox with error handling
-                    with PluginSandbox(plugin):
-                        result = safe_hook_execution(
-                            plugin=plugin,
-                            hook_name=hook_name,
-                            hook_callable=hook_method,
-                            **kwargs
-                        )
+                # Check if the hook exists
+                if not hasattr(self.manager.hook, hook_name):
+                    trace.warning("Hook '{}' not found in manager.hook. Available hooks: {}", hook_name,
+                                  Lazy(lambda: [h for h in dir(self.manager.hook) if not h.startswith('_')]))
+                    return []
+                
+                # Get hook implementations
+                hook = getattr(self.manager.hook, hook_name)
+                trace.debug("Hook '{}' implementations: {}", hook_name, Lazy(hook.get_hookimpls))
+                
+                from plugins.error_handler import safe_hook_execution
+                from plugins.sandbox import PluginSandbox
+                from plugins.models import Plugin
+                
+                results = []
+                
+                # Execute each plugin's hook implementation separately with error handling
+                for plugin_id, instance in self.registered_instances.items():
+                    try:
+                        # If target_plugin_id is specified, only call that plugin
+                        if target_plugin_id is not None and plugin_id != target_plugin_id:
+                            continue
+                        
+                        plugin = Plugin.objects.get(id=plugin_id)
+                        
+                        # Skip if plugin is disabled
+                        if not plugin.enabled:
+                            continue
+                        
+                        # Check if instance has this hook
+                        if not hasattr(instance, hook_name):
+                            trace.debug("Plugin {} ({}) does not have hook '{}'", plugin_id, plugin.name, hook_name)
+                            continue
                         
-                        if result is not None:
-                            results.append(result)
-                            print(f"     Hook returned result: {type(result)}")
+                        trace.debug("Calling hook '{}' on plugin {} ({}) with kwargs: {}",
+                                    hook_name, plugin_id, plugin.name, Lazy(lambda: list(kwargs.keys())))
+                        hook_method = getattr(instance, hook_name)
+                        
+                        # Create API instance for the plugin if not already provided
+                        if 'api' not in kwargs:
+                            from plugins.plugin_api import get_plugin_api
+                            context = kwargs.get('context', {})
+                            kwargs['api'] = get_plugin_api(plugin_id, context=context)
+                        
+                        # Execute in sandbox with error handling
+                        with PluginSandbox(plugin):
+                            result = safe_hook_execution(
+                                plugin=plugin,
+                                hook_name=hook_name,
+                                hook_callable=hook_method,
+                                **kwargs
+                            )
+                            
+                            if result is not None:
+                                results.append(result)
+                                trace.debug("Hook returned result: {}", type(result))
+                    
+                    except Exception as e:
+                        trace.error("Critical error in plugin {}: {}", plugin_id, e, exc_info=True)
+                        # Continue with other plugins
                 
-                except Exception as e:
-                    print(f"  [ERROR] Critical error in plugin {plugin_id}: {e}")
-                    import traceback
-                    traceback.print_exc()
-                    # Continue with other plugins
-            
-            print(f"  [RESULT] Hook returned {len(results)} results")
-            return results
-        except Exception as e:
-            print(f"  [ERROR] Error calling hook {hook_name}: {str(e)}")
-            import traceback
-            traceback.print_exc()
-            # Return empty list on error for safety
-            return []
+                span.set(results=len(results))
+                return results
+            except Exception as e:
+                trace.error("Error calling hook {}: {}", hook_name, e, exc_info=True)
+                # Return empty list on error for safety
+                return []
     
     def reload_all_plugins(self):
         """Reload all plugins"""
@@ -1,18 +1,23 @@
 from business.models import Business, ServiceOffering, ServiceItem
+from ai_agent.prompt_cache import cached_prompt
 
 
 
 def get_retell_prompt(business):
+    """Return the Retell voice prompt, rendered once per catalog version."""
+    return cached_prompt(business, 'voice', render_retell_prompt)
+
+
+def render_retell_prompt(business):
     services = ""
     service_offerings = ServiceOffering.objects.filter(business=business)
     for service in service_offerings:
         services += f"- {service.name} - ${service.price}, \n"
     
 
-    service_items = ServiceItem.objects.filter(business=business)
     service_items = ""
-    for service_item in service_items:
-        service_items += f"- {service_item.name} - ${service_item.price_value if not service_item.price_type == 'free' else "No Charges"}, - {service_item.description} - Optional: {service_item.is_optional} \n"
+    for service_item in ServiceItem.objects.filter(business=business):
+        service_items += f"- {service_item.name} - ${service_item.price_value if not service_item.price_type == 'free' else 'No Charges'}, - {service_item.description} - Optional: {service_item.is_optional} \n"
     
     
 
@@ -52,7 +57,7 @@ def get_retell_prompt(business):
 
 
     ##Business TimeZone
-    America/Chicago
+    {business.timezone}
 
     ##Business ID
     {business.id}
@@ -92,7 +97,7 @@ def get_retell_prompt(business):
     Record the client's address.
 
     ##Schedule Appointment:
-    "Thank you. Please select your preferred date and time for the service. Our available time slots are from 9:00 AM to 5:00 PM, Central Standard Time (America/Chicago)."
+    "Thank you. Please select your preferred date and time for the service. Our available time slots are from 9:00 AM to 5:00 PM, {business.timezone} time."
     (wait for response)
     run {{check_availability}}
 
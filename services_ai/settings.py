@@ -74,6 +74,7 @@ MIDDLEWARE = [
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'core.middleware.TracingMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
     'licence.middleware.LicenceMiddleware',
@@ -120,6 +121,59 @@ else:
     }
 
 
+# Cache
+# Availability lookups are cached per (business, date) and invalidated from bookings.signals.
+# Local memory is per process, so multi-process deployments should switch the availability
+# cache to the database backend (run `python manage.py createcachetable` first).
+AVAILABILITY_CACHE_TIMEOUT = int(os.getenv('AVAILABILITY_CACHE_TIMEOUT', 60))
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    'availability': {
+        'BACKEND': os.getenv('AVAILABILITY_CACHE_BACKEND', 'django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': os.getenv('AVAILABILITY_CACHE_LOCATION', 'availability'),
+        'TIMEOUT': AVAILABILITY_CACHE_TIMEOUT,
+        'OPTIONS': {'MAX_ENTRIES': 5000},
+    },
+}
+
+
+# Tracing (see core/tracing.py)
+# TRACE_LEVELS sets per-subsystem levels, e.g. "availability=info,plugins=debug".
+# Detail for a single business can be switched on at runtime with `python manage.py trace`.
+TRACING = {
+    'DEFAULT_LEVEL': os.getenv('TRACE_DEFAULT_LEVEL', 'warning'),
+    'LEVELS': os.getenv('TRACE_LEVELS', ''),
+    'SAMPLE_RATE': float(os.getenv('TRACE_SAMPLE_RATE', 1.0)),
+    'OVERRIDE_REFRESH_SECONDS': int(os.getenv('TRACE_OVERRIDE_REFRESH_SECONDS', 30)),
+}
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'trace_console': {
+            'class': 'logging.StreamHandler',
+            'formatter': 'trace',
+        },
+    },
+    'formatters': {
+        'trace': {
+            'format': '[TRACE] %(name)s %(levelname)s %(message)s',
+        },
+    },
+    'loggers': {
+        # Levels are decided by the tracers themselves
+        'trace': {
+            'handlers': ['trace_console'],
+            'level': 'DEBUG',
+            'propagate': False,
+        },
+    },
+}
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
@@ -1,8 +1,10 @@
 from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
+from django.urls import reverse
 from .models import StaffProfile
 from bookings.models import BookingStaffAssignment, Booking
+from bookings.calendar_feeds import feed_token
 from datetime import datetime, timedelta
 
 
@@ -53,6 +55,9 @@ def staff_bookings(request):
             'status_filter': status_filter,
             'date_from': date_from,
             'date_to': date_to,
+            'calendar_feed_url': request.build_absolute_uri(reverse(
+                'bookings:staff_calendar_feed', args=[staff_member.id, feed_token('staff', staff_member.id)]
+            )),
         }
         
         return render(request, 'staff/bookings.html', context)